@@ -28,11 +28,50 @@ class Settings(BaseSettings):
     # Redis
     redis_url: str = "redis://localhost:6379/0"
 
+    # Background jobs. job_executor picks where a new job runs first:
+    # queue | thread | process | celery (see workers/executors.py).
+    job_executor: str = "queue"
+    job_executor_concurrency: int = 4
+    # Job queue (job_records). Inline concurrency runs a queue consumer inside
+    # each API process; set it to 0 when dedicated workers are deployed.
+    job_queue_inline_concurrency: int = 2
+    job_queue_worker_concurrency: int = 4
+    job_queue_worker_pool: str = "thread"  # thread | process
+    job_queue_visibility_timeout: int = 300  # seconds a claimed job stays leased
+    job_queue_poll_interval: float = 1.0
+    job_queue_max_attempts: int = 3
+    # Each job class (workers/registry.py) runs on its own bounded pool. The
+    # concurrency settings above size the LLM pool; PDF rendering and DB
+    # maintenance get their own. Enqueueing past a class's max depth of
+    # open jobs is refused with 503 + Retry-After.
+    job_pool_pdf_concurrency: int = 2
+    job_pool_maintenance_concurrency: int = 1
+    job_queue_max_depth_llm: int = 200
+    job_queue_max_depth_pdf: int = 50
+    job_queue_max_depth_maintenance: int = 10
+    job_queue_retry_after: int = 30  # seconds, sent with back-pressure responses
+
     # Anthropic
     anthropic_api_key: str = ""
 
     # LLM
     llm_mock_mode: bool = False
+    llm_mock_latency_ms: int = 0  # simulated round trip in mock mode
+    # Per-process LLM gateway limits (llm/gateway.py). Size them so that
+    # processes x limits stays within the Anthropic account's rate limits.
+    llm_max_concurrency: int = 8
+    llm_tokens_per_minute: int = 80000
+    # Concurrent chunk prompts per long-contract parse/review/rewrite (services/chunking.py)
+    llm_map_concurrency: int = 4
+    # Response cache for deterministic prompts (llm/cache.py, llm_cache table)
+    llm_cache_enabled: bool = True
+    llm_cache_ttl_hours: int = 24 * 30
+    llm_cache_max_entries: int = 20000
+
+    # Contract versions: every Nth version of a deal stores its full text, the
+    # ones in between a compressed delta against it (services/text_deltas.py).
+    # 1 stores every version in full.
+    contract_keyframe_interval: int = 10
 
     # OpenAI (optional — voice transcription disabled if OPENAI_API_KEY is empty)
     openai_api_key: str = ""
@@ -40,6 +79,20 @@ class Settings(BaseSettings):
     # Resend (optional — email notifications disabled if RESEND_API_KEY is empty)
     resend_api_key: str = ""
     resend_from_email: str = "Pactly <notifications@updates.stayirrelevant.com>"
+    # Point at scripts/resend_stub.py to develop and test offline
+    resend_api_url: str = "https://api.resend.com"
+    # Email outbox (services/email_outbox.py): send_email only queues; a sender
+    # inside each API process (or python -m workers.email_sender) delivers up
+    # to email_batch_size per Resend batch call, retrying with backoff up to
+    # email_max_attempts. The same message to the same recipient within
+    # email_dedup_window_minutes is queued once.
+    email_sender_enabled: bool = True
+    email_batch_size: int = 100  # Resend's batch limit
+    email_send_concurrency: int = 4
+    email_poll_interval: float = 2.0
+    email_max_attempts: int = 6
+    email_dedup_window_minutes: int = 60
+    email_outbox_retention_days: int = 14
 
     # Frontend URL (for magic links)
     frontend_url: str = "http://localhost:3000"
@@ -48,6 +101,24 @@ class Settings(BaseSettings):
     log_level: str = "INFO"
     environment: str = "development"
     storage_path: str = "/app/storage"
+    # Multipart request bodies past this size are cut off with 413 while they
+    # stream in (services/uploads.py); endpoints apply their own lower limits
+    max_upload_request_bytes: int = 26 * 1024 * 1024
+    # PDF text extraction (services/ingestion.py): pages are split across up to
+    # this many processes, capped at the CPU count (0 = extract in the calling
+    # process, no timeout)
+    pdf_extraction_workers: int = 4
+    pdf_extraction_timeout_seconds: int = 60
+    # Extracted text of uploads, keyed by content hash (services/extraction_cache.py);
+    # the prune_extraction_cache job keeps it within this many MB
+    extraction_cache_enabled: bool = True
+    extraction_cache_max_mb: int = 512
+    # Batch PDF form filling (services/pdf_batch.py): fills run on up to this
+    # many processes, capped at the CPU count (0 = on a thread of the API
+    # process, no timeout); at most pdf_batch_max_items fills per request
+    pdf_fill_workers: int = 4
+    pdf_fill_timeout_seconds: int = 120
+    pdf_batch_max_items: int = 50
 
     class Config:
         env_file = str(_ENV_FILE)
@@ -2,17 +2,21 @@
 
 When ANTHROPIC_API_KEY is missing or LLM_MOCK_MODE=true, returns deterministic
 sample data so the full E2E flow works without a real key.
+
+All real calls go through llm/gateway.py (shared client, rate limits, fair
+queuing across organizations). org_id defaults to the job's org_scope.
 """
 from __future__ import annotations
 
 import json
 import logging
 import os
-from typing import Any, Dict
-
-import anthropic
+import time
+import uuid
+from typing import Any, AsyncIterator, Dict, Optional
 
 from config import settings
+from llm import gateway
 
 logger = logging.getLogger(__name__)
 
@@ -28,6 +32,12 @@ def is_mock_mode() -> bool:
     return False
 
 
+def _mock_latency() -> None:
+    """Simulate API round-trip time in mock mode (load tests, benchmarks)."""
+    if settings.llm_mock_latency_ms:
+        time.sleep(settings.llm_mock_latency_ms / 1000)
+
+
 # ── Mock responses ──────────────────────────────────────────────────────────
 
 MOCK_PARSE_RESULT: dict[str, Any] = {
@@ -135,24 +145,49 @@ MOCK_META = {"input_tokens": 0, "output_tokens": 0, "model": "mock"}
 # ── Real client ─────────────────────────────────────────────────────────────
 
 
-def _get_client() -> anthropic.Anthropic:
-    key = settings.anthropic_api_key
-    if not key:
-        raise RuntimeError("ANTHROPIC_API_KEY is not set. Cannot call LLM.")
-    return anthropic.Anthropic(api_key=key)
-
-
 def generate_json(
     prompt: str,
     json_schema_description: str = "",
     max_tokens: int = 4096,
     temperature: float = 0.1,
+    org_id: Optional[uuid.UUID] = None,
+    cache_as: Optional[str] = None,
 ) -> dict[str, Any]:
     """Call Anthropic and parse strict JSON response. Retries on parse failure.
-    Falls back to mock data when mock mode is active."""
+    Falls back to mock data when mock mode is active.
+
+    cache_as names the prompt template version (e.g. "parse_contract_v1") and
+    opts the call into the response cache (llm/cache.py). Only use it for
+    deterministic prompts whose result depends on nothing but the prompt.
+    """
+    from llm import cache
+
+    if not cache_as or not cache.enabled():
+        return _generate_json(prompt, json_schema_description, max_tokens, temperature, org_id)
+
+    # Mock results are cached under their own model name, never served as real ones
+    model = "mock" if is_mock_mode() else MODEL
+    key = cache.cache_key(model, cache_as, prompt, temperature, json_schema_description)
+    cached = cache.get(key)
+    if cached is not None:
+        logger.info("LLM cache hit for %s", cache_as)
+        return cached
+    result = _generate_json(prompt, json_schema_description, max_tokens, temperature, org_id)
+    cache.put(key, model, cache_as, result)
+    return result
+
+
+def _generate_json(
+    prompt: str,
+    json_schema_description: str,
+    max_tokens: int,
+    temperature: float,
+    org_id: Optional[uuid.UUID],
+) -> dict[str, Any]:
 
     if is_mock_mode():
         logger.warning("LLM_MOCK_MODE active — returning deterministic sample JSON")
+        _mock_latency()
         # Heuristic: detect which prompt is calling
         if "critical dates" in prompt.lower() or "extract_timeline" in prompt.lower() or "chronologically" in prompt.lower():
             result = dict(MOCK_TIMELINE_RESULT)
@@ -163,7 +198,6 @@ def generate_json(
         result["_meta"] = dict(MOCK_META)
         return result
 
-    client = _get_client()
     system_msg = (
         "You are an AI assistant for real estate contract analysis. "
         "You MUST return ONLY valid JSON. No markdown, no code fences, no explanation outside JSON. "
@@ -181,7 +215,8 @@ def generate_json(
                 "Please return ONLY valid JSON with no other text."
             )
 
-        response = client.messages.create(
+        response = gateway.create_message(
+            org_id,
             model=MODEL,
             max_tokens=max_tokens,
             temperature=temperature,
@@ -226,18 +261,19 @@ def generate_text(
     system: str = "You are an AI assistant for real estate contract drafting. Follow instructions precisely.",
     max_tokens: int = 8192,
     temperature: float = 0.2,
+    org_id: Optional[uuid.UUID] = None,
 ) -> dict[str, Any]:
     """Call Anthropic for freeform text generation. Returns text + usage metadata.
     Falls back to mock data when mock mode is active."""
 
     if is_mock_mode():
         logger.warning("LLM_MOCK_MODE active — returning deterministic sample text")
+        _mock_latency()
         mock_text = MOCK_GENERATE_INITIAL_TEXT if "TEMPLATE TYPE" in prompt else MOCK_GENERATE_TEXT
         return {"text": mock_text, "_meta": dict(MOCK_META)}
 
-    client = _get_client()
-
-    response = client.messages.create(
+    response = gateway.create_message(
+        org_id,
         model=MODEL,
         max_tokens=max_tokens,
         temperature=temperature,
@@ -254,3 +290,33 @@ def generate_text(
             "model": MODEL,
         },
     }
+
+
+async def generate_text_async(
+    prompt: str,
+    system: str,
+    max_tokens: int = 1024,
+    org_id: Optional[uuid.UUID] = None,
+) -> str:
+    """Short freeform completion for request handlers; does not block the
+    event loop. Callers handle mock mode themselves (canned copy differs)."""
+    response = await gateway.acreate_message(
+        org_id,
+        model=MODEL,
+        max_tokens=max_tokens,
+        system=system,
+        messages=[{"role": "user", "content": prompt}],
+    )
+    return response.content[0].text
+
+
+def stream_chat(
+    system: str,
+    messages: list[dict],
+    max_tokens: int = 1024,
+    org_id: Optional[uuid.UUID] = None,
+) -> AsyncIterator[str]:
+    """Stream a chat reply's text deltas through the gateway."""
+    return gateway.astream_text(
+        org_id, model=MODEL, max_tokens=max_tokens, system=system, messages=messages,
+    )
@@ -0,0 +1,140 @@
+"""Content-addressed cache for deterministic LLM calls.
+
+Parsing, timeline extraction and risk review run at low temperature on the
+same inputs again and again (re-uploads, the auto-parse after initial
+contract generation, timeline regeneration). Their parsed JSON is stored in
+the llm_cache table under sha256(model, prompt template version, rendered
+prompt, temperature), so a repeat costs one indexed lookup and no tokens.
+
+Entries expire after settings.llm_cache_ttl_hours; prune_llm_cache (run as a
+maintenance job) drops expired rows and trims the table to
+settings.llm_cache_max_entries by least recent use. The cache is
+best-effort: any backend error is logged and treated as a miss.
+"""
+from __future__ import annotations
+
+import copy
+import hashlib
+import json
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Optional
+
+from sqlalchemy import delete, update
+from sqlmodel import Session, func, select
+
+from config import settings
+from database import sync_engine
+from models.llm_cache import LLMCacheEntry
+
+logger = logging.getLogger(__name__)
+
+_stats_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "writes": 0, "errors": 0, "tokens_saved": 0}
+
+
+def _count(name: str, n: int = 1) -> None:
+    with _stats_lock:
+        _stats[name] += n
+
+
+def enabled() -> bool:
+    return settings.llm_cache_enabled
+
+
+def cache_key(model: str, prompt_version: str, prompt: str, temperature: float, system: str = "") -> str:
+    payload = json.dumps([model, prompt_version, temperature, system, prompt], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def get(key: str) -> Optional[dict[str, Any]]:
+    """Return a copy of the cached result (with a cache-hit _meta), or None."""
+    now = datetime.utcnow()
+    try:
+        with Session(sync_engine) as session:
+            entry = session.get(LLMCacheEntry, key)
+            if entry is None or (entry.expires_at and entry.expires_at <= now):
+                _count("misses")
+                return None
+            session.exec(
+                update(LLMCacheEntry)
+                .where(LLMCacheEntry.key == key)
+                .values(last_used_at=now, hits=LLMCacheEntry.hits + 1)
+            )
+            session.commit()
+            result = copy.deepcopy(entry.result)
+            saved = entry.input_tokens + entry.output_tokens
+            model = entry.model
+    except Exception:
+        logger.warning("LLM cache lookup failed", exc_info=True)
+        _count("errors")
+        return None
+
+    _count("hits")
+    _count("tokens_saved", saved)
+    result["_meta"] = {"input_tokens": 0, "output_tokens": 0, "model": model, "cache_hit": True}
+    return result
+
+
+def put(key: str, model: str, prompt_version: str, result: dict[str, Any]) -> None:
+    """Store a parsed result. The _meta token counts are kept as the saving
+    credited to later hits."""
+    meta = result.get("_meta") or {}
+    now = datetime.utcnow()
+    entry = LLMCacheEntry(
+        key=key,
+        model=model,
+        prompt_version=prompt_version,
+        result={k: v for k, v in result.items() if k != "_meta"},
+        input_tokens=meta.get("input_tokens") or 0,
+        output_tokens=meta.get("output_tokens") or 0,
+        created_at=now,
+        last_used_at=now,
+        expires_at=now + timedelta(hours=settings.llm_cache_ttl_hours) if settings.llm_cache_ttl_hours else None,
+    )
+    try:
+        with Session(sync_engine) as session:
+            # Another worker may have stored the same key meanwhile; last write wins
+            session.merge(entry)
+            session.commit()
+    except Exception:
+        logger.warning("LLM cache write failed", exc_info=True)
+        _count("errors")
+        return
+    _count("writes")
+
+
+def prune_llm_cache(session: Session, max_entries: Optional[int] = None) -> dict[str, int]:
+    """Delete expired entries, then the least recently used beyond
+    max_entries (default settings.llm_cache_max_entries). Commits."""
+    max_entries = settings.llm_cache_max_entries if max_entries is None else max_entries
+    expired = session.exec(
+        delete(LLMCacheEntry).where(LLMCacheEntry.expires_at <= datetime.utcnow())
+    ).rowcount
+
+    evicted = 0
+    total = session.exec(select(func.count()).select_from(LLMCacheEntry)).one()
+    if total > max_entries:
+        cutoff = session.exec(
+            select(LLMCacheEntry.last_used_at)
+            .order_by(LLMCacheEntry.last_used_at.desc())
+            .offset(max_entries)
+            .limit(1)
+        ).first()
+        evicted = session.exec(
+            delete(LLMCacheEntry).where(LLMCacheEntry.last_used_at <= cutoff)
+        ).rowcount
+    session.commit()
+    logger.info("Pruned LLM cache: %s expired, %s evicted", expired, evicted)
+    return {"expired": expired, "evicted": evicted}
+
+
+def cache_stats() -> dict[str, Any]:
+    """Hit/miss counters for this process since start."""
+    with _stats_lock:
+        stats = dict(_stats)
+    lookups = stats["hits"] + stats["misses"]
+    stats["hit_rate"] = round(stats["hits"] / lookups, 3) if lookups else 0.0
+    stats["enabled"] = enabled()
+    return stats
@@ -0,0 +1,281 @@
+"""Process-wide gateway for Anthropic API calls.
+
+One AsyncAnthropic client (one pooled HTTP connection set) per process,
+driven from a dedicated event loop thread so sync callers (job workers) and
+async callers (API handlers) share it. Every request first takes a slot from
+a FairLimiter, which caps concurrent requests and tokens per minute and
+hands out slots round-robin across organizations, so one org's batch of
+version generations cannot starve everyone else.
+
+Sync:  create_message(org_id, **messages_create_kwargs)
+Async: await acreate_message(...), async for text in astream_text(...)
+"""
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from typing import Any, AsyncIterator, Optional
+
+import anthropic
+import httpx
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ORG = "-"
+
+# Organization the current thread's LLM calls are billed to for fair queuing
+# (set by the job runner; API handlers pass org_id explicitly).
+_current_org: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("llm_org", default=None)
+
+
+@contextmanager
+def org_scope(org_id):
+    token = _current_org.set(str(org_id) if org_id else None)
+    try:
+        yield
+    finally:
+        _current_org.reset(token)
+
+
+def _org_key(org_id) -> str:
+    """Fair-queuing key: the explicit org, else the current org_scope."""
+    if org_id:
+        return str(org_id)
+    return _current_org.get() or DEFAULT_ORG
+
+
+def estimate_tokens(kwargs: dict) -> int:
+    """Rough upper bound on a request's token cost: ~4 chars per input token
+    plus the full output budget. Corrected with real usage on release."""
+    chars = len(kwargs.get("system") or "")
+    for message in kwargs.get("messages", []):
+        content = message.get("content")
+        chars += len(content) if isinstance(content, str) else len(str(content))
+    return chars // 4 + kwargs.get("max_tokens", 0)
+
+
+class FairLimiter:
+    """Concurrency + tokens-per-minute limiter with round-robin fairness
+    across keys (organizations). Not thread-safe: use from one event loop.
+
+    Waiters queue per key; whenever a slot and enough tokens are available
+    the next key in rotation is served, so a key with 100 queued requests
+    and a key with 1 alternate rather than the 1 waiting behind the 100.
+    """
+
+    def __init__(self, max_concurrency: int, tokens_per_minute: int):
+        self.max_concurrency = max_concurrency
+        self.capacity = float(tokens_per_minute)
+        self.tokens = float(tokens_per_minute)
+        self.in_flight = 0
+        self._refilled_at = time.monotonic()
+        self._waiters: OrderedDict[str, deque[tuple[asyncio.Future, int]]] = OrderedDict()
+        self._retry_handle: Optional[asyncio.TimerHandle] = None
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._refilled_at) * self.capacity / 60)
+        self._refilled_at = now
+
+    def _cost(self, tokens: int) -> float:
+        # A request bigger than the whole budget would otherwise wait forever
+        return float(min(tokens, self.capacity))
+
+    def waiting(self) -> dict[str, int]:
+        return {key: len(queue) for key, queue in self._waiters.items()}
+
+    async def acquire(self, key: str, tokens: int) -> None:
+        cost = self._cost(tokens)
+        self._refill()
+        if not self._waiters and self.in_flight < self.max_concurrency and self.tokens >= cost:
+            self._grant(cost)
+            return
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(key, deque()).append((future, cost))
+        # Serves older waiters first, or arms the refill timer if tokens are short
+        self._dispatch()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Granted just as we were cancelled; give the slot back
+                self.release(cost, 0)
+            else:
+                self._discard(key, future)
+            raise
+
+    def release(self, reserved: int, used: int) -> None:
+        """Free a slot; refund the part of the token reservation not used."""
+        self.in_flight -= 1
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens + self._cost(reserved) - used)
+        self._dispatch()
+
+    def _grant(self, cost: float) -> None:
+        self.in_flight += 1
+        self.tokens -= cost
+
+    def _discard(self, key: str, future: asyncio.Future) -> None:
+        queue = self._waiters.get(key)
+        if queue is None:
+            return
+        for item in list(queue):
+            if item[0] is future:
+                queue.remove(item)
+        if not queue:
+            del self._waiters[key]
+
+    def _dispatch(self) -> None:
+        self._refill()
+        while self._waiters and self.in_flight < self.max_concurrency:
+            key, queue = next(iter(self._waiters.items()))
+            future, cost = queue[0]
+            if self.tokens < cost:
+                self._schedule_retry(cost - self.tokens)
+                return
+            queue.popleft()
+            # Rotate: this key goes to the back of the line
+            del self._waiters[key]
+            if queue:
+                self._waiters[key] = queue
+            if not future.cancelled():
+                self._grant(cost)
+                future.set_result(None)
+
+    def _schedule_retry(self, missing_tokens: float) -> None:
+        if self._retry_handle and not self._retry_handle.cancelled():
+            return
+        delay = missing_tokens * 60 / self.capacity
+
+        def retry():
+            self._retry_handle = None
+            self._dispatch()
+
+        self._retry_handle = asyncio.get_running_loop().call_later(delay, retry)
+
+
+class LLMGateway:
+    """Owns the event loop thread, the shared AsyncAnthropic client and the
+    limiter for this process."""
+
+    def __init__(self):
+        self.pid = os.getpid()
+        self.loop = asyncio.new_event_loop()
+        self.limiter = FairLimiter(settings.llm_max_concurrency, settings.llm_tokens_per_minute)
+        self._client: Optional[anthropic.AsyncAnthropic] = None
+        self._thread = threading.Thread(target=self.loop.run_forever, name="llm-gateway", daemon=True)
+        self._thread.start()
+
+    @property
+    def client(self) -> anthropic.AsyncAnthropic:
+        # Created lazily on the gateway loop so its connection pool binds there
+        if self._client is None:
+            if not settings.anthropic_api_key:
+                raise RuntimeError("ANTHROPIC_API_KEY is not set. Cannot call LLM.")
+            self._client = anthropic.AsyncAnthropic(
+                api_key=settings.anthropic_api_key,
+                http_client=anthropic.DefaultAsyncHttpxClient(limits=httpx.Limits(
+                    max_connections=settings.llm_max_concurrency,
+                    max_keepalive_connections=settings.llm_max_concurrency,
+                )),
+            )
+        return self._client
+
+    # ── Coroutines running on the gateway loop ──────────────────────────────
+
+    async def _create(self, org_key: str, kwargs: dict) -> Any:
+        reserved = estimate_tokens(kwargs)
+        await self.limiter.acquire(org_key, reserved)
+        used = 0
+        try:
+            response = await self.client.messages.create(**kwargs)
+            used = response.usage.input_tokens + response.usage.output_tokens
+            return response
+        finally:
+            self.limiter.release(reserved, used or reserved)
+
+    async def _stream(self, org_key: str, kwargs: dict) -> AsyncIterator[str]:
+        reserved = estimate_tokens(kwargs)
+        await self.limiter.acquire(org_key, reserved)
+        used = 0
+        try:
+            async with self.client.messages.stream(**kwargs) as stream:
+                async for text in stream.text_stream:
+                    yield text
+                usage = (await stream.get_final_message()).usage
+                used = usage.input_tokens + usage.output_tokens
+        finally:
+            self.limiter.release(reserved, used or reserved)
+
+    async def _stats(self) -> dict:
+        self.limiter._refill()
+        return {
+            "in_flight": self.limiter.in_flight,
+            "max_concurrency": self.limiter.max_concurrency,
+            "tokens_available": int(self.limiter.tokens),
+            "tokens_per_minute": int(self.limiter.capacity),
+            "waiting_by_org": self.limiter.waiting(),
+        }
+
+    # ── Entry points, callable from any thread or loop ─────────────────────
+
+    def run(self, coro):
+        """Run a coroutine on the gateway loop and block for its result."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+
+    async def arun(self, coro):
+        """Await a coroutine on the gateway loop from another event loop."""
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, self.loop))
+
+
+_gateway: Optional[LLMGateway] = None
+_gateway_lock = threading.Lock()
+
+
+def get_gateway() -> LLMGateway:
+    global _gateway
+    with _gateway_lock:
+        # A forked job process inherits the object but not the loop thread
+        if _gateway is None or _gateway.pid != os.getpid():
+            _gateway = LLMGateway()
+        return _gateway
+
+
+def create_message(org_id=None, **kwargs) -> Any:
+    """Blocking messages.create through the gateway. org_id defaults to the
+    current org_scope."""
+    gateway = get_gateway()
+    return gateway.run(gateway._create(_org_key(org_id), kwargs))
+
+
+async def acreate_message(org_id=None, **kwargs) -> Any:
+    gateway = get_gateway()
+    return await gateway.arun(gateway._create(_org_key(org_id), kwargs))
+
+
+async def astream_text(org_id=None, **kwargs) -> AsyncIterator[str]:
+    """Stream text deltas of messages.stream through the gateway."""
+    gateway = get_gateway()
+    stream = gateway._stream(_org_key(org_id), kwargs)
+    try:
+        while True:
+            try:
+                yield await gateway.arun(stream.__anext__())
+            except StopAsyncIteration:
+                return
+    finally:
+        # Client went away mid-stream: close the upstream request and free the slot
+        await gateway.arun(stream.aclose())
+
+
+async def gateway_stats() -> dict:
+    gateway = get_gateway()
+    return await gateway.arun(gateway._stats())
@@ -18,6 +18,8 @@ from routers import plg
 from routers import deliverables
 from routers import offer_letters
 from routers import property
+from services.uploads import UploadSizeLimitMiddleware
+from workers.queue import QueueFullError
 
 # Structured logging
 structlog.configure(
@@ -36,8 +38,24 @@ logger = structlog.get_logger()
 async def lifespan(app: FastAPI):
     logger.info("starting_app", environment=settings.environment)
     await init_db()
+    queue_worker = None
+    if settings.job_queue_inline_concurrency > 0:
+        from workers.queue import QueueWorker
+        queue_worker = QueueWorker(concurrency=settings.job_queue_inline_concurrency)
+        queue_worker.start()
+    email_sender = None
+    if settings.email_sender_enabled and settings.resend_api_key:
+        from services.email_outbox import EmailSender
+        email_sender = EmailSender()
+        email_sender.start()
     yield
     logger.info("shutting_down")
+    if queue_worker:
+        # In-flight jobs keep their lease; if the process exits first another worker retries them
+        queue_worker.stop(wait=False)
+    if email_sender:
+        # Emails claimed but not yet recorded are resent once their lease lapses
+        email_sender.stop()
 
 
 app = FastAPI(
@@ -46,6 +64,8 @@ app = FastAPI(
     lifespan=lifespan,
 )
 
+# Added before CORS so 413s from the upload cutoff still carry CORS headers
+app.add_middleware(UploadSizeLimitMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=[
@@ -79,10 +99,21 @@ app.include_router(deliverables.router)
 app.include_router(offer_letters.router)
 app.include_router(property.router)
 
-# Mount storage for serving uploaded logos
+# Mount storage for serving uploaded logos. Only the logos directory is
+# public; blobs (services/blob_store.py) are served by access-checked endpoints.
 import os
-os.makedirs(settings.storage_path, exist_ok=True)
-app.mount("/storage", StaticFiles(directory=settings.storage_path), name="storage")
+os.makedirs(os.path.join(settings.storage_path, "logos"), exist_ok=True)
+app.mount("/storage/logos", StaticFiles(directory=os.path.join(settings.storage_path, "logos")), name="storage")
+
+
+@app.exception_handler(QueueFullError)
+async def queue_full_handler(request: Request, exc: QueueFullError):
+    # Back-pressure: the job class is saturated, ask the client to retry later
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Too many background jobs in progress. Please retry shortly.", "job_class": exc.job_class},
+        headers={"Retry-After": str(settings.job_queue_retry_after)},
+    )
 
 
 @app.exception_handler(Exception)
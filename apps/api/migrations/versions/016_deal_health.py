@@ -0,0 +1,47 @@
+"""Create materialized deal_health table
+
+Revision ID: 016
+Revises: 015
+Create Date: 2026-02-05
+
+The table starts empty. Rows are filled by the hourly reconcile_deal_health
+job, and any deal without one is computed on first read
+(services/deal_health.refresh_expired_deal_health), so the migration does
+not depend on application code.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "016"
+down_revision = "015"
+branch_labels = None
+depends_on = None
+
+
+def _table_exists(name: str) -> bool:
+    conn = op.get_bind()
+    result = conn.execute(sa.text(
+        "SELECT EXISTS (SELECT FROM information_schema.tables WHERE table_name = :t)"
+    ), {"t": name})
+    return result.scalar()
+
+
+def upgrade() -> None:
+    if not _table_exists("deal_health"):
+        op.create_table(
+            "deal_health",
+            sa.Column("deal_id", sa.Uuid(), sa.ForeignKey("deals.id"), primary_key=True),
+            sa.Column("last_activity_at", sa.DateTime(), nullable=True),
+            sa.Column("open_cr_count", sa.Integer(), nullable=False, server_default="0"),
+            sa.Column("versions_count", sa.Integer(), nullable=False, server_default="0"),
+            sa.Column("state_entered_at", sa.DateTime(), nullable=True),
+            sa.Column("score", sa.Integer(), nullable=False, server_default="100", index=True),
+            sa.Column("status", sa.String(), nullable=False, server_default="healthy", index=True),
+            sa.Column("score_expires_at", sa.DateTime(), nullable=True, index=True),
+            sa.Column("updated_at", sa.DateTime(), nullable=False, server_default=sa.func.now()),
+        )
+
+
+def downgrade() -> None:
+    if _table_exists("deal_health"):
+        op.drop_table("deal_health")
@@ -0,0 +1,73 @@
+"""Add durable queue columns to job_records
+
+Revision ID: 017
+Revises: 016
+Create Date: 2026-02-06
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "017"
+down_revision = "016"
+branch_labels = None
+depends_on = None
+
+
+def _column_exists(table: str, column: str) -> bool:
+    conn = op.get_bind()
+    result = conn.execute(sa.text(
+        """
+        SELECT EXISTS (
+            SELECT 1 FROM information_schema.columns
+            WHERE table_name = :table AND column_name = :column
+        )
+        """
+    ), {"table": table, "column": column})
+    return result.scalar()
+
+
+def _index_exists(name: str) -> bool:
+    conn = op.get_bind()
+    result = conn.execute(sa.text(
+        "SELECT EXISTS (SELECT 1 FROM pg_indexes WHERE indexname = :name)"
+    ), {"name": name})
+    return result.scalar()
+
+
+def upgrade() -> None:
+    if not _column_exists("job_records", "payload"):
+        op.add_column("job_records", sa.Column("payload", sa.JSON(), nullable=True))
+    if not _column_exists("job_records", "attempts"):
+        op.add_column("job_records", sa.Column("attempts", sa.Integer(), nullable=False, server_default="0"))
+    if not _column_exists("job_records", "max_attempts"):
+        op.add_column("job_records", sa.Column("max_attempts", sa.Integer(), nullable=False, server_default="3"))
+    if not _column_exists("job_records", "run_after"):
+        op.add_column("job_records", sa.Column("run_after", sa.DateTime(), nullable=False, server_default=sa.func.now()))
+    if not _column_exists("job_records", "locked_by"):
+        op.add_column("job_records", sa.Column("locked_by", sa.String(), nullable=True))
+    if not _column_exists("job_records", "locked_until"):
+        op.add_column("job_records", sa.Column("locked_until", sa.DateTime(), nullable=True))
+
+    if not _index_exists("ix_job_records_run_after"):
+        op.create_index("ix_job_records_run_after", "job_records", ["run_after"])
+
+    # Jobs dispatched with asyncio.create_task before this migration carry no
+    # payload and cannot be resumed; close them out instead of leaving them
+    # "processing" forever.
+    op.execute(sa.text(
+        """
+        UPDATE job_records
+        SET status = 'failed',
+            error = 'Interrupted before durable job queue was enabled',
+            completed_at = now()
+        WHERE status IN ('pending', 'processing') AND payload IS NULL
+        """
+    ))
+
+
+def downgrade() -> None:
+    if _index_exists("ix_job_records_run_after"):
+        op.drop_index("ix_job_records_run_after", table_name="job_records")
+    for column in ("locked_until", "locked_by", "run_after", "max_attempts", "attempts", "payload"):
+        if _column_exists("job_records", column):
+            op.drop_column("job_records", column)
@@ -0,0 +1,55 @@
+"""Job pool bookkeeping: started_at, deal-less maintenance jobs, depth index
+
+Revision ID: 018
+Revises: 017
+Create Date: 2026-02-09
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "018"
+down_revision = "017"
+branch_labels = None
+depends_on = None
+
+
+def _column_exists(table: str, column: str) -> bool:
+    conn = op.get_bind()
+    result = conn.execute(sa.text(
+        """
+        SELECT EXISTS (
+            SELECT 1 FROM information_schema.columns
+            WHERE table_name = :table AND column_name = :column
+        )
+        """
+    ), {"table": table, "column": column})
+    return result.scalar()
+
+
+def _index_exists(name: str) -> bool:
+    conn = op.get_bind()
+    result = conn.execute(sa.text(
+        "SELECT EXISTS (SELECT 1 FROM pg_indexes WHERE indexname = :name)"
+    ), {"name": name})
+    return result.scalar()
+
+
+def upgrade() -> None:
+    if not _column_exists("job_records", "started_at"):
+        op.add_column("job_records", sa.Column("started_at", sa.DateTime(), nullable=True))
+
+    # Maintenance jobs (e.g. reconcile_deal_health) are not tied to a deal
+    op.alter_column("job_records", "deal_id", existing_type=sa.dialects.postgresql.UUID(as_uuid=True), nullable=True)
+
+    # Queue-depth checks count open jobs per type on every enqueue
+    if not _index_exists("ix_job_records_status_job_type"):
+        op.create_index("ix_job_records_status_job_type", "job_records", ["status", "job_type"])
+
+
+def downgrade() -> None:
+    if _index_exists("ix_job_records_status_job_type"):
+        op.drop_index("ix_job_records_status_job_type", table_name="job_records")
+    op.execute(sa.text("DELETE FROM job_records WHERE deal_id IS NULL"))
+    op.alter_column("job_records", "deal_id", existing_type=sa.dialects.postgresql.UUID(as_uuid=True), nullable=False)
+    if _column_exists("job_records", "started_at"):
+        op.drop_column("job_records", "started_at")
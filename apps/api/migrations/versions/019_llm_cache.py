@@ -0,0 +1,43 @@
+"""Create llm_cache table for deterministic LLM results
+
+Revision ID: 019
+Revises: 018
+Create Date: 2026-02-10
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "019"
+down_revision = "018"
+branch_labels = None
+depends_on = None
+
+
+def _table_exists(name: str) -> bool:
+    conn = op.get_bind()
+    result = conn.execute(sa.text(
+        "SELECT EXISTS (SELECT FROM information_schema.tables WHERE table_name = :t)"
+    ), {"t": name})
+    return result.scalar()
+
+
+def upgrade() -> None:
+    if not _table_exists("llm_cache"):
+        op.create_table(
+            "llm_cache",
+            sa.Column("key", sa.String(), primary_key=True),
+            sa.Column("model", sa.String(), nullable=False),
+            sa.Column("prompt_version", sa.String(), nullable=False, index=True),
+            sa.Column("result", sa.JSON(), nullable=False),
+            sa.Column("input_tokens", sa.Integer(), nullable=False, server_default="0"),
+            sa.Column("output_tokens", sa.Integer(), nullable=False, server_default="0"),
+            sa.Column("hits", sa.Integer(), nullable=False, server_default="0"),
+            sa.Column("created_at", sa.DateTime(), nullable=False, server_default=sa.func.now()),
+            sa.Column("last_used_at", sa.DateTime(), nullable=False, server_default=sa.func.now(), index=True),
+            sa.Column("expires_at", sa.DateTime(), nullable=True, index=True),
+        )
+
+
+def downgrade() -> None:
+    if _table_exists("llm_cache"):
+        op.drop_table("llm_cache")
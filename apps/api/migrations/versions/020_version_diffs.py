@@ -0,0 +1,39 @@
+"""Create version_diffs table for precomputed version diffs
+
+Revision ID: 020
+Revises: 019
+Create Date: 2026-02-12
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import UUID
+
+revision = "020"
+down_revision = "019"
+branch_labels = None
+depends_on = None
+
+
+def _table_exists(name: str) -> bool:
+    conn = op.get_bind()
+    result = conn.execute(sa.text(
+        "SELECT EXISTS (SELECT FROM information_schema.tables WHERE table_name = :t)"
+    ), {"t": name})
+    return result.scalar()
+
+
+def upgrade() -> None:
+    if not _table_exists("version_diffs"):
+        op.create_table(
+            "version_diffs",
+            sa.Column("version_a_id", UUID(as_uuid=True), sa.ForeignKey("contract_versions.id"), primary_key=True),
+            sa.Column("version_b_id", UUID(as_uuid=True), sa.ForeignKey("contract_versions.id"), primary_key=True),
+            sa.Column("diff_lines", sa.JSON(), nullable=False),
+            sa.Column("diff_html", sa.Text(), nullable=False, server_default=""),
+            sa.Column("created_at", sa.DateTime(), nullable=False, server_default=sa.func.now()),
+        )
+
+
+def downgrade() -> None:
+    if _table_exists("version_diffs"):
+        op.drop_table("version_diffs")
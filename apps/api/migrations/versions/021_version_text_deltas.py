@@ -0,0 +1,135 @@
+"""Delta-compressed contract version text: text_base_id, text_delta
+
+Revision ID: 021
+Revises: 020
+Create Date: 2026-02-14
+
+Converts existing deals: walking each deal's versions in order, a version
+within KEYFRAME_INTERVAL of the last keyframe whose delta is small enough
+is rewritten as a delta. The freed space returns to the OS after VACUUM
+FULL contract_versions (run separately; it cannot run inside the migration
+transaction).
+
+The delta format (version 1, read by services/text_deltas.py) and the
+keyframe choice are copied here as they were at this revision, so later
+changes to the service or its settings do not change what this writes.
+"""
+import difflib
+import json
+import zlib
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import UUID
+
+revision = "021"
+down_revision = "020"
+branch_labels = None
+depends_on = None
+
+KEYFRAME_INTERVAL = 10
+MAX_DELTA_RATIO = 0.5
+FORMAT_VERSION = 1
+
+
+def _encode_delta(base: str, text: str) -> bytes:
+    """Ops: [i1, i2] copies lines i1..i2 of the keyframe, a string inserts text."""
+    base_lines = base.splitlines(keepends=True)
+    lines = text.splitlines(keepends=True)
+    matcher = difflib.SequenceMatcher(None, base_lines, lines, autojunk=False)
+    ops = []
+    j = 0
+    for i1, j1, size in matcher.get_matching_blocks():
+        if j1 > j:
+            ops.append("".join(lines[j:j1]))
+        if size:
+            ops.append([i1, i1 + size])
+        j = j1 + size
+    payload = json.dumps({"v": FORMAT_VERSION, "ops": ops}, ensure_ascii=False, separators=(",", ":"))
+    return zlib.compress(payload.encode("utf-8"), 9)
+
+
+def _apply_delta(base: str, delta: bytes) -> str:
+    payload = json.loads(zlib.decompress(delta).decode("utf-8"))
+    if payload.get("v") != FORMAT_VERSION:
+        raise ValueError(f"Unsupported text delta format {payload.get('v')!r}")
+    base_lines = base.splitlines(keepends=True)
+    return "".join(
+        op if isinstance(op, str) else "".join(base_lines[op[0]:op[1]])
+        for op in payload["ops"]
+    )
+
+
+def _choose_storage(text, version_number, keyframe):
+    """(keyframe id, delta) to store text as a delta, or None to keep it in full."""
+    if keyframe is None or not text:
+        return None
+    keyframe_id, keyframe_number, keyframe_text = keyframe
+    if not 0 < version_number - keyframe_number < KEYFRAME_INTERVAL:
+        return None
+    delta = _encode_delta(keyframe_text, text)
+    if len(delta) > MAX_DELTA_RATIO * len(zlib.compress(text.encode("utf-8"), 1)):
+        return None
+    return keyframe_id, delta
+
+
+def _column_exists(table: str, column: str) -> bool:
+    conn = op.get_bind()
+    result = conn.execute(sa.text(
+        """
+        SELECT EXISTS (
+            SELECT 1 FROM information_schema.columns
+            WHERE table_name = :table AND column_name = :column
+        )
+        """
+    ), {"table": table, "column": column})
+    return result.scalar()
+
+
+def upgrade() -> None:
+    if not _column_exists("contract_versions", "text_base_id"):
+        op.add_column("contract_versions", sa.Column(
+            "text_base_id", UUID(as_uuid=True), sa.ForeignKey("contract_versions.id"), nullable=True,
+        ))
+    if not _column_exists("contract_versions", "text_delta"):
+        op.add_column("contract_versions", sa.Column("text_delta", sa.LargeBinary(), nullable=True))
+
+    conn = op.get_bind()
+    deal_ids = [row[0] for row in conn.execute(sa.text(
+        "SELECT DISTINCT deal_id FROM contract_versions WHERE text_delta IS NULL"
+    ))]
+    for deal_id in deal_ids:
+        keyframe = None
+        rows = conn.execute(sa.text(
+            "SELECT id, version_number, full_text, text_delta FROM contract_versions "
+            "WHERE deal_id = :deal_id ORDER BY version_number, created_at"
+        ), {"deal_id": deal_id}).fetchall()
+        for version_id, version_number, text, delta in rows:
+            if delta is not None:
+                continue
+            storage = _choose_storage(text, version_number, keyframe)
+            if storage is None:
+                keyframe = (version_id, version_number, text)
+                continue
+            base_id, delta = storage
+            conn.execute(sa.text(
+                "UPDATE contract_versions SET full_text = '', text_base_id = :base_id, text_delta = :delta "
+                "WHERE id = :id"
+            ), {"base_id": base_id, "delta": delta, "id": version_id})
+
+
+def downgrade() -> None:
+    conn = op.get_bind()
+    if _column_exists("contract_versions", "text_delta"):
+        rows = conn.execute(sa.text(
+            "SELECT v.id, v.text_delta, base.full_text FROM contract_versions v "
+            "JOIN contract_versions base ON base.id = v.text_base_id "
+            "WHERE v.text_delta IS NOT NULL"
+        )).fetchall()
+        for version_id, delta, base_text in rows:
+            conn.execute(sa.text(
+                "UPDATE contract_versions SET full_text = :text WHERE id = :id"
+            ), {"text": _apply_delta(base_text, delta), "id": version_id})
+        op.drop_column("contract_versions", "text_delta")
+    if _column_exists("contract_versions", "text_base_id"):
+        op.drop_column("contract_versions", "text_base_id")
@@ -0,0 +1,107 @@
+"""Move base64 file columns into the content-addressed blob store
+
+Revision ID: 022
+Revises: 021
+Create Date: 2026-02-16
+
+deals.timeline_pdf_base64, deliverables.file_content_base64 and
+contract_versions.pdf_base64 are decoded into blobs under
+{STORAGE_PATH}/blobs and replaced by the 64-char SHA-256 digest. Run with
+the same STORAGE_PATH as the API.
+
+The blob layout (blobs/aa/bb/<digest>, written via temp file + rename) is
+the one services/blob_store.py reads; it is written here directly so later
+changes to that module do not change what this migration does.
+"""
+import base64
+import hashlib
+import os
+import tempfile
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "022"
+down_revision = "021"
+branch_labels = None
+depends_on = None
+
+# (table, old base64 column, new digest column)
+MOVES = [
+    ("deals", "timeline_pdf_base64", "timeline_pdf_blob"),
+    ("deliverables", "file_content_base64", "file_blob"),
+    ("contract_versions", "pdf_base64", "pdf_blob"),
+]
+
+
+def _column_exists(table: str, column: str) -> bool:
+    conn = op.get_bind()
+    result = conn.execute(sa.text(
+        """
+        SELECT EXISTS (
+            SELECT 1 FROM information_schema.columns
+            WHERE table_name = :table AND column_name = :column
+        )
+        """
+    ), {"table": table, "column": column})
+    return result.scalar()
+
+
+def _blob_root() -> str:
+    return os.path.join(os.environ.get("STORAGE_PATH", "/app/storage"), "blobs")
+
+
+def _blob_path(digest: str) -> str:
+    return os.path.join(_blob_root(), digest[:2], digest[2:4], digest)
+
+
+def _put_bytes(data: bytes) -> str:
+    digest = hashlib.sha256(data).hexdigest()
+    path = _blob_path(digest)
+    if os.path.exists(path):
+        return digest
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with tempfile.NamedTemporaryFile(dir=_blob_root(), prefix=".tmp-", delete=False) as tmp:
+        tmp.write(data)
+    os.replace(tmp.name, path)
+    return digest
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    for table, old, new in MOVES:
+        if not _column_exists(table, new):
+            op.add_column(table, sa.Column(new, sa.String(64), nullable=True))
+        if not _column_exists(table, old):
+            continue
+        rows = conn.execute(sa.text(
+            f"SELECT id, {old} FROM {table} WHERE {old} IS NOT NULL AND {old} <> ''"
+        )).fetchall()
+        for row_id, encoded in rows:
+            digest = _put_bytes(base64.b64decode(encoded))
+            conn.execute(sa.text(
+                f"UPDATE {table} SET {new} = :digest WHERE id = :id"
+            ), {"digest": digest, "id": row_id})
+        op.drop_column(table, old)
+
+
+def downgrade() -> None:
+    conn = op.get_bind()
+    for table, old, new in MOVES:
+        if not _column_exists(table, old):
+            op.add_column(table, sa.Column(old, sa.Text(), nullable=True))
+        if not _column_exists(table, new):
+            continue
+        rows = conn.execute(sa.text(
+            f"SELECT id, {new} FROM {table} WHERE {new} IS NOT NULL"
+        )).fetchall()
+        for row_id, digest in rows:
+            path = _blob_path(digest)
+            if not os.path.exists(path):
+                continue
+            with open(path, "rb") as f:
+                encoded = base64.b64encode(f.read()).decode()
+            conn.execute(sa.text(
+                f"UPDATE {table} SET {old} = :encoded WHERE id = :id"
+            ), {"encoded": encoded, "id": row_id})
+        op.drop_column(table, new)
@@ -0,0 +1,40 @@
+"""Keep uploaded contracts and supporting documents in the blob store
+
+Revision ID: 023
+Revises: 022
+Create Date: 2026-02-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "023"
+down_revision = "022"
+branch_labels = None
+depends_on = None
+
+
+def _column_exists(table: str, column: str) -> bool:
+    conn = op.get_bind()
+    result = conn.execute(sa.text(
+        """
+        SELECT EXISTS (
+            SELECT 1 FROM information_schema.columns
+            WHERE table_name = :table AND column_name = :column
+        )
+        """
+    ), {"table": table, "column": column})
+    return result.scalar()
+
+
+def upgrade() -> None:
+    if not _column_exists("contract_versions", "source_blob"):
+        op.add_column("contract_versions", sa.Column("source_blob", sa.String(64), nullable=True))
+    if not _column_exists("supporting_documents", "file_blob"):
+        op.add_column("supporting_documents", sa.Column("file_blob", sa.String(64), nullable=True))
+
+
+def downgrade() -> None:
+    if _column_exists("supporting_documents", "file_blob"):
+        op.drop_column("supporting_documents", "file_blob")
+    if _column_exists("contract_versions", "source_blob"):
+        op.drop_column("contract_versions", "source_blob")
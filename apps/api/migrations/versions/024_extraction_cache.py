@@ -0,0 +1,40 @@
+"""Create extraction_cache table for text extracted from uploads
+
+Revision ID: 024
+Revises: 023
+Create Date: 2026-02-20
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "024"
+down_revision = "023"
+branch_labels = None
+depends_on = None
+
+
+def _table_exists(name: str) -> bool:
+    conn = op.get_bind()
+    result = conn.execute(sa.text(
+        "SELECT EXISTS (SELECT FROM information_schema.tables WHERE table_name = :t)"
+    ), {"t": name})
+    return result.scalar()
+
+
+def upgrade() -> None:
+    if not _table_exists("extraction_cache"):
+        op.create_table(
+            "extraction_cache",
+            sa.Column("key", sa.String(), primary_key=True),
+            sa.Column("text", sa.Text(), nullable=False, server_default=""),
+            sa.Column("extraction_ok", sa.Boolean(), nullable=False, server_default=sa.false()),
+            sa.Column("size_bytes", sa.Integer(), nullable=False, server_default="0"),
+            sa.Column("hits", sa.Integer(), nullable=False, server_default="0"),
+            sa.Column("created_at", sa.DateTime(), nullable=False, server_default=sa.func.now()),
+            sa.Column("last_used_at", sa.DateTime(), nullable=False, server_default=sa.func.now(), index=True),
+        )
+
+
+def downgrade() -> None:
+    if _table_exists("extraction_cache"):
+        op.drop_table("extraction_cache")
@@ -0,0 +1,68 @@
+"""Create email_outbox table for queued email delivery
+
+Revision ID: 025
+Revises: 024
+Create Date: 2026-02-21
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import UUID
+
+revision = "025"
+down_revision = "024"
+branch_labels = None
+depends_on = None
+
+
+def _table_exists(name: str) -> bool:
+    conn = op.get_bind()
+    result = conn.execute(sa.text(
+        "SELECT EXISTS (SELECT FROM information_schema.tables WHERE table_name = :t)"
+    ), {"t": name})
+    return result.scalar()
+
+
+def _column_exists(table: str, column: str) -> bool:
+    conn = op.get_bind()
+    result = conn.execute(sa.text(
+        """
+        SELECT EXISTS (
+            SELECT 1 FROM information_schema.columns
+            WHERE table_name = :table AND column_name = :column
+        )
+        """
+    ), {"table": table, "column": column})
+    return result.scalar()
+
+
+def upgrade() -> None:
+    if not _table_exists("email_outbox"):
+        op.create_table(
+            "email_outbox",
+            sa.Column("id", UUID(as_uuid=True), primary_key=True),
+            sa.Column("to_email", sa.String(), nullable=False),
+            sa.Column("subject", sa.String(), nullable=False),
+            sa.Column("html", sa.Text(), nullable=False),
+            sa.Column("attachments", sa.JSON(), nullable=True),
+            sa.Column("dedup_key", sa.String(), nullable=False, index=True),
+            sa.Column("batch_key", sa.String(), nullable=True, index=True),
+            sa.Column("status", sa.String(), nullable=False, server_default="pending"),
+            sa.Column("attempts", sa.Integer(), nullable=False, server_default="0"),
+            sa.Column("next_attempt_at", sa.DateTime(), nullable=False, server_default=sa.func.now()),
+            sa.Column("locked_until", sa.DateTime(), nullable=True),
+            sa.Column("provider_id", sa.String(), nullable=True),
+            sa.Column("error", sa.String(), nullable=True),
+            sa.Column("created_at", sa.DateTime(), nullable=False, server_default=sa.func.now()),
+            sa.Column("sent_at", sa.DateTime(), nullable=True),
+        )
+        op.create_index(
+            "ix_email_outbox_status_next_attempt_at", "email_outbox", ["status", "next_attempt_at"],
+        )
+    elif not _column_exists("email_outbox", "batch_key"):
+        op.add_column("email_outbox", sa.Column("batch_key", sa.String(), nullable=True))
+        op.create_index("ix_email_outbox_batch_key", "email_outbox", ["batch_key"])
+
+
+def downgrade() -> None:
+    if _table_exists("email_outbox"):
+        op.drop_table("email_outbox")
@@ -0,0 +1,71 @@
+"""Add deliverables.due_on, a date column for the reminder scheduler
+
+Revision ID: 026
+Revises: 025
+Create Date: 2026-02-23
+
+due_date stays as the string shown to users (it can be descriptive, e.g.
+"10 days after acceptance"); due_on holds it as a date when it is
+YYYY-MM-DD, so reminders can be selected with an indexed range query.
+"""
+from datetime import date
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "026"
+down_revision = "025"
+branch_labels = None
+depends_on = None
+
+INDEX = "ix_deliverables_status_due_on"
+
+
+def _column_exists(table: str, column: str) -> bool:
+    conn = op.get_bind()
+    result = conn.execute(sa.text(
+        """
+        SELECT EXISTS (
+            SELECT 1 FROM information_schema.columns
+            WHERE table_name = :table AND column_name = :column
+        )
+        """
+    ), {"table": table, "column": column})
+    return result.scalar()
+
+
+def _index_exists(index_name: str) -> bool:
+    conn = op.get_bind()
+    result = conn.execute(sa.text(
+        "SELECT EXISTS (SELECT FROM pg_indexes WHERE indexname = :n)"
+    ), {"n": index_name})
+    return result.scalar()
+
+
+def upgrade() -> None:
+    if not _column_exists("deliverables", "due_on"):
+        op.add_column("deliverables", sa.Column("due_on", sa.Date(), nullable=True))
+
+    # Parse in Python: SQL casts reject impossible dates like 2026-02-30
+    conn = op.get_bind()
+    rows = conn.execute(sa.text(
+        "SELECT id, due_date FROM deliverables WHERE due_on IS NULL AND due_date <> ''"
+    )).fetchall()
+    for row_id, due_date in rows:
+        try:
+            due_on = date.fromisoformat(due_date)
+        except (ValueError, TypeError):
+            continue
+        conn.execute(sa.text(
+            "UPDATE deliverables SET due_on = :due_on WHERE id = :id"
+        ), {"due_on": due_on, "id": row_id})
+
+    if not _index_exists(INDEX):
+        op.create_index(INDEX, "deliverables", ["status", "due_on"])
+
+
+def downgrade() -> None:
+    if _index_exists(INDEX):
+        op.drop_index(INDEX, table_name="deliverables")
+    if _column_exists("deliverables", "due_on"):
+        op.drop_column("deliverables", "due_on")
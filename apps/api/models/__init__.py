@@ -16,6 +16,11 @@ from models.token_usage import TokenUsage
 from models.plg_event import PLGEvent
 from models.magic_link import MagicLink
 from models.offer_letter import OfferLetter
+from models.deal_health import DealHealth
+from models.llm_cache import LLMCacheEntry
+from models.version_diff import VersionDiff
+from models.extraction_cache import ExtractionCacheEntry
+from models.email_outbox import EmailOutbox
 
 __all__ = [
     "User",
@@ -38,4 +43,9 @@ __all__ = [
     "PLGEvent",
     "MagicLink",
     "OfferLetter",
+    "DealHealth",
+    "LLMCacheEntry",
+    "VersionDiff",
+    "ExtractionCacheEntry",
+    "EmailOutbox",
 ]
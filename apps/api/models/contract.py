@@ -1,8 +1,17 @@
 import uuid
 from datetime import datetime
 from typing import Optional
-from sqlmodel import SQLModel, Field, Column
-from sqlalchemy import Text, JSON
+from sqlmodel import SQLModel, Field, Column, Relationship
+from sqlalchemy import Text, JSON, LargeBinary, event
+from sqlalchemy.orm import deferred, selectinload, undefer_group
+
+from services import text_deltas
+
+# Version text is the bulk of every row. It is deferred, so list queries
+# never fetch it; queries that read full_text opt in with
+# .options(*ContractVersion.with_text())
+_text_column = Column("full_text", Text, nullable=False, default="")
+_delta_column = Column("text_delta", LargeBinary, nullable=True)
 
 
 class ContractVersion(SQLModel, table=True):
@@ -11,12 +20,17 @@ class ContractVersion(SQLModel, table=True):
     id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
     deal_id: uuid.UUID = Field(foreign_key="deals.id", index=True)
     version_number: int = Field(default=0)
-    full_text: str = Field(sa_column=Column(Text, nullable=False, default=""))
+    # Use full_text. The column holds the whole text for keyframes and ""
+    # for versions stored as a delta against text_base (services/text_deltas.py)
+    stored_text: str = Field(default="", sa_column=_text_column)
+    text_base_id: Optional[uuid.UUID] = Field(default=None, foreign_key="contract_versions.id")
+    text_delta: Optional[bytes] = Field(default=None, sa_column=_delta_column)
     extracted_fields: Optional[dict] = Field(default=None, sa_column=Column(JSON))
     clause_tags: Optional[list] = Field(default=None, sa_column=Column(JSON))
     contract_type: str = Field(default="UNKNOWN")
     change_summary: Optional[dict] = Field(default=None, sa_column=Column(JSON))
     source: str = Field(default="upload")  # upload, paste, generated
+    source_blob: Optional[str] = None  # uploaded file, sha256 digest in services/blob_store.py
     source_cr_id: Optional[uuid.UUID] = None
     cycle_id: Optional[uuid.UUID] = None
     prompt_version: Optional[str] = None
@@ -25,7 +39,56 @@ class ContractVersion(SQLModel, table=True):
     risk_prompt_version: Optional[str] = None
     suggestions: Optional[list] = Field(default=None, sa_column=Column(JSON, name="suggestions"))
     pdf_template_slug: Optional[str] = None
-    pdf_base64: Optional[str] = Field(default=None, sa_column=Column(Text, nullable=True))
+    pdf_blob: Optional[str] = None  # sha256 digest in services/blob_store.py
     pdf_generated_at: Optional[datetime] = None
     created_by: uuid.UUID = Field(foreign_key="users.id")
     created_at: datetime = Field(default_factory=datetime.utcnow)
+
+    text_base: Optional["ContractVersion"] = Relationship(sa_relationship_kwargs={
+        "remote_side": "ContractVersion.id",
+        "foreign_keys": "ContractVersion.text_base_id",
+    })
+
+    __mapper_args__ = {
+        "properties": {
+            "stored_text": deferred(_text_column, group="text"),
+            "text_delta": deferred(_delta_column, group="text"),
+        },
+    }
+
+    @classmethod
+    def with_text(cls) -> tuple:
+        """Loader options for queries that read full_text: the text columns
+        and the keyframe of delta-stored versions (one IN query per result
+        set), so full_text can be rebuilt without lazy IO in async handlers."""
+        return (
+            undefer_group("text"),
+            selectinload(cls.text_base).undefer_group("text"),
+        )
+
+    def __init__(self, **data):
+        full_text = data.pop("full_text", None)
+        super().__init__(**data)
+        if full_text is not None:
+            self.full_text = full_text
+
+    @property
+    def full_text(self) -> str:
+        if self.text_delta is None:
+            return self.stored_text
+        text = text_deltas.cached_text(self.id)
+        if text is None:
+            text = text_deltas.apply_delta(self.text_base.stored_text, self.text_delta)
+            text_deltas.cache_text(self.id, text)
+        return text
+
+    @full_text.setter
+    def full_text(self, value: str) -> None:
+        self.stored_text = value or ""
+        self.text_delta = None
+        self.text_base_id = None
+
+
+@event.listens_for(ContractVersion, "before_insert")
+def _store_text_as_delta(mapper, connection, target: ContractVersion) -> None:
+    text_deltas.encode_on_insert(connection, target)
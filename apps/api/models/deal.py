@@ -1,8 +1,7 @@
 import uuid
 from datetime import datetime
 from typing import Optional
-from sqlmodel import SQLModel, Field, Column
-from sqlalchemy import Text
+from sqlmodel import SQLModel, Field
 
 
 class Deal(SQLModel, table=True):
@@ -18,7 +17,7 @@ class Deal(SQLModel, table=True):
     current_state: str = Field(default="draft")  # NegotiationState value
     buyer_accepted_at: Optional[datetime] = None
     seller_accepted_at: Optional[datetime] = None
-    timeline_pdf_base64: Optional[str] = Field(default=None, sa_column=Column(Text, nullable=True))
+    timeline_pdf_blob: Optional[str] = None  # sha256 digest in services/blob_store.py
     timeline_generated_at: Optional[datetime] = None
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: Optional[datetime] = None
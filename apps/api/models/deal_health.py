@@ -0,0 +1,23 @@
+import uuid
+from datetime import datetime
+from typing import Optional
+from sqlmodel import SQLModel, Field
+
+
+class DealHealth(SQLModel, table=True):
+    """Materialized health inputs and score for a deal.
+
+    Kept current by services.deal_health.refresh_deal_health and repaired by
+    the reconcile_deal_health task.
+    """
+    __tablename__ = "deal_health"
+
+    deal_id: uuid.UUID = Field(foreign_key="deals.id", primary_key=True)
+    last_activity_at: Optional[datetime] = None
+    open_cr_count: int = Field(default=0)
+    versions_count: int = Field(default=0)
+    state_entered_at: Optional[datetime] = None
+    score: int = Field(default=100, index=True)
+    status: str = Field(default="healthy", index=True)  # healthy, needs_attention, at_risk
+    score_expires_at: Optional[datetime] = Field(default=None, index=True)  # next day boundary that changes the score
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
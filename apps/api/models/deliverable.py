@@ -1,24 +1,29 @@
 import uuid
-from datetime import datetime
+from datetime import date, datetime
 from typing import Optional
-from sqlmodel import SQLModel, Field, Column
-from sqlalchemy import Text
+from sqlmodel import SQLModel, Field
+from sqlalchemy import Index
 
 
 class Deliverable(SQLModel, table=True):
     __tablename__ = "deliverables"
+    __table_args__ = (
+        # The daily reminder run: pending rows by due date
+        Index("ix_deliverables_status_due_on", "status", "due_on"),
+    )
 
     id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
     deal_id: uuid.UUID = Field(foreign_key="deals.id", index=True)
     description: str
     due_date: str  # YYYY-MM-DD or descriptive string
+    due_on: Optional[date] = None  # due_date as a date; NULL when descriptive
     category: str = Field(default="other")
     responsible_party: str = Field(default="admin")  # "admin" or "counterparty"
     ai_suggested_party: Optional[str] = None
     is_confirmed: bool = Field(default=False)
     status: str = Field(default="pending")  # pending | submitted | approved | overdue
     filename: Optional[str] = None
-    file_content_base64: Optional[str] = Field(default=None, sa_column=Column(Text, nullable=True))
+    file_blob: Optional[str] = None  # sha256 digest in services/blob_store.py
     submitted_at: Optional[datetime] = None
     approved_at: Optional[datetime] = None
     approved_by: Optional[uuid.UUID] = Field(default=None, foreign_key="users.id")
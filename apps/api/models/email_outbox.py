@@ -0,0 +1,37 @@
+import uuid
+from datetime import datetime
+from typing import Optional
+from sqlmodel import SQLModel, Field, Column
+from sqlalchemy import JSON, Index, Text
+
+
+class EmailOutbox(SQLModel, table=True):
+    """An email queued for delivery through Resend.
+
+    Written by services/email.send_email; claimed, sent in batches and
+    retried by services/email_outbox.py. Delivered and failed rows are
+    pruned by the prune_email_outbox job.
+    """
+    __tablename__ = "email_outbox"
+    __table_args__ = (
+        # The sender's claim: due rows by status, oldest first
+        Index("ix_email_outbox_status_next_attempt_at", "status", "next_attempt_at"),
+    )
+
+    id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
+    to_email: str
+    subject: str
+    html: str = Field(sa_column=Column(Text, nullable=False))
+    attachments: Optional[list] = Field(default=None, sa_column=Column(JSON))
+    dedup_key: str = Field(index=True)  # sha256 of recipient + message
+    # Idempotency-Key of the Resend batch call this email goes out in; set
+    # when first claimed, so a retried batch is resent whole under it
+    batch_key: Optional[str] = Field(default=None, index=True)
+    status: str = Field(default="pending")  # pending, sending, sent, failed
+    attempts: int = Field(default=0)
+    next_attempt_at: datetime = Field(default_factory=datetime.utcnow)
+    locked_until: Optional[datetime] = None  # lease while status is sending
+    provider_id: Optional[str] = None  # Resend email id
+    error: Optional[str] = None
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    sent_at: Optional[datetime] = None
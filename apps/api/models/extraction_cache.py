@@ -0,0 +1,22 @@
+from datetime import datetime
+from sqlmodel import SQLModel, Field, Column
+from sqlalchemy import Text
+
+
+class ExtractionCacheEntry(SQLModel, table=True):
+    """Text extracted from an uploaded document, keyed by the file kind and
+    the sha256 of its content.
+
+    Written and read by services/extraction_cache.py; the least recently used
+    rows beyond settings.extraction_cache_max_mb of text are pruned by the
+    prune_extraction_cache job.
+    """
+    __tablename__ = "extraction_cache"
+
+    key: str = Field(primary_key=True)  # "{kind}:{sha256 hex}"
+    text: str = Field(sa_column=Column(Text, nullable=False, default=""))
+    extraction_ok: bool = Field(default=False)
+    size_bytes: int = Field(default=0)  # UTF-8 size of text, counted against the budget
+    hits: int = Field(default=0)
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    last_used_at: datetime = Field(default_factory=datetime.utcnow, index=True)
@@ -9,10 +9,19 @@ class JobRecord(SQLModel, table=True):
     __tablename__ = "job_records"
 
     id: str = Field(primary_key=True)  # celery task id
-    deal_id: uuid.UUID = Field(foreign_key="deals.id", index=True)
-    job_type: str  # parse_contract, analyze_change_request, generate_version
+    deal_id: Optional[uuid.UUID] = Field(default=None, foreign_key="deals.id", index=True)  # None for maintenance jobs
+    job_type: str  # registered task name (workers/jobs.py)
     status: str = Field(default="pending")  # pending, processing, completed, failed
     result: Optional[dict] = Field(default=None, sa_column=Column(JSON))
     error: Optional[str] = None
     created_at: datetime = Field(default_factory=datetime.utcnow)
     completed_at: Optional[datetime] = None
+
+    # Queue bookkeeping (see workers/queue.py)
+    payload: Optional[dict] = Field(default=None, sa_column=Column(JSON))
+    attempts: int = Field(default=0)
+    max_attempts: int = Field(default=3)
+    run_after: datetime = Field(default_factory=datetime.utcnow, index=True)
+    locked_by: Optional[str] = None
+    locked_until: Optional[datetime] = None
+    started_at: Optional[datetime] = None  # latest claim; started_at - run_after is queue wait
@@ -0,0 +1,25 @@
+from datetime import datetime
+from typing import Optional
+from sqlmodel import SQLModel, Field, Column
+from sqlalchemy import JSON
+
+
+class LLMCacheEntry(SQLModel, table=True):
+    """Parsed result of a deterministic LLM call, keyed by a hash of
+    (model, prompt template version, rendered prompt, temperature).
+
+    Written and read by llm/cache.py; expired and least-recently-used rows
+    are pruned by the prune_llm_cache job.
+    """
+    __tablename__ = "llm_cache"
+
+    key: str = Field(primary_key=True)  # sha256 hex
+    model: str
+    prompt_version: str = Field(index=True)
+    result: dict = Field(sa_column=Column(JSON, nullable=False))
+    input_tokens: int = Field(default=0)  # cost of the original call, saved on every hit
+    output_tokens: int = Field(default=0)
+    hits: int = Field(default=0)
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    last_used_at: datetime = Field(default_factory=datetime.utcnow, index=True)
+    expires_at: Optional[datetime] = Field(default=None, index=True)
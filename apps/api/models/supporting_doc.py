@@ -12,6 +12,7 @@ class SupportingDocument(SQLModel, table=True):
     deal_id: uuid.UUID = Field(foreign_key="deals.id", index=True)
     doc_type: str  # mls_listing, inspection_report, pre_approval_letter
     filename: str
+    file_blob: Optional[str] = None  # sha256 digest in services/blob_store.py
     extracted_text: str = Field(sa_column=Column(Text, nullable=False, default=""))
     created_by: uuid.UUID = Field(foreign_key="users.id")
     created_at: datetime = Field(default_factory=datetime.utcnow)
@@ -0,0 +1,20 @@
+import uuid
+from datetime import datetime
+from sqlmodel import SQLModel, Field, Column
+from sqlalchemy import Text, JSON
+
+
+class VersionDiff(SQLModel, table=True):
+    """Rendered text diff between two contract versions.
+
+    Versions are immutable, so a diff never goes stale: it is computed when
+    a version is generated (against its predecessor) or on the first request
+    for another pair, and served from here afterwards (services/diffing.py).
+    """
+    __tablename__ = "version_diffs"
+
+    version_a_id: uuid.UUID = Field(foreign_key="contract_versions.id", primary_key=True)
+    version_b_id: uuid.UUID = Field(foreign_key="contract_versions.id", primary_key=True)
+    diff_lines: list = Field(sa_column=Column(JSON, nullable=False))
+    diff_html: str = Field(sa_column=Column(Text, nullable=False, default=""))
+    created_at: datetime = Field(default_factory=datetime.utcnow)
@@ -4,12 +4,12 @@ import uuid
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlmodel import select
+from starlette.concurrency import run_in_threadpool
 
 from database import get_session
 from models.user import User
 from models.change_request import ChangeRequest
 from models.deal import Deal
-from models.job import JobRecord
 from schemas.change_requests import (
     ChangeRequestCreate, ChangeRequestResponse, AnalyzeResponse,
     GenerateVersionRequest, GenerateVersionResponse,
@@ -20,8 +20,7 @@ from services.auth import get_current_user
 from services.rbac import check_deal_access
 from services.timeline import record_event, transition_state, get_next_state
 from services.notifications import notify_deal_participants
-import asyncio
-from workers.inline_runner import run_analyze_change_request, run_generate_version
+from workers.queue import dispatch, enqueue_job, ensure_queue_capacity, new_job
 from services.email import notify_cr_submitted
 
 router = APIRouter(prefix="/deals/{deal_id}/change-requests", tags=["change-requests"])
@@ -69,6 +68,7 @@ async def create_change_request(
     user: User = Depends(get_current_user),
 ):
     await check_deal_access(session, user, deal_id)
+    await ensure_queue_capacity(session, "analyze_change_request")
 
     cr = ChangeRequest(
         deal_id=deal_id, raw_text=req.raw_text,
@@ -89,21 +89,20 @@ async def create_change_request(
         await transition_state(session, deal_id, next_state, user.id)
 
     # Auto-dispatch analysis job
-    job_id = str(uuid.uuid4())
-    job = JobRecord(id=job_id, deal_id=deal_id, job_type="analyze_change_request", status="pending")
+    job = new_job(deal_id, "analyze_change_request", {"deal_id": str(deal_id), "cr_id": str(cr.id)})
     session.add(job)
     cr.analysis_status = "processing"
-    cr.analysis_job_id = job_id
+    cr.analysis_job_id = job.id
     session.add(cr)
     await session.commit()
     await session.refresh(cr)
-
-    asyncio.create_task(run_analyze_change_request(job_id, str(deal_id), str(cr.id)))
+    dispatch(job)
 
     # Fire-and-forget email notification for CR creation
     try:
         deal_obj = await _get_deal(session, deal_id)
-        notify_cr_submitted(
+        await run_in_threadpool(
+            notify_cr_submitted,
             to=user.email if hasattr(user, "email") and user.email else "",
             deal_title=deal_obj.title,
             cr_preview=req.raw_text[:200],
@@ -145,12 +144,10 @@ async def analyze_cr(
     if not cr:
         raise HTTPException(status_code=404, detail="Change request not found")
 
-    job_id = str(uuid.uuid4())
-    job = JobRecord(id=job_id, deal_id=deal_id, job_type="analyze_change_request", status="pending")
-    session.add(job)
-    await session.commit()
-
-    asyncio.create_task(run_analyze_change_request(job_id, str(deal_id), str(cr_id)))
+    await ensure_queue_capacity(session, "analyze_change_request")
+    job_id = await enqueue_job(session, deal_id, "analyze_change_request", {
+        "deal_id": str(deal_id), "cr_id": str(cr_id),
+    })
 
     return AnalyzeResponse(job_id=job_id, status="pending")
 
@@ -181,18 +178,16 @@ async def accept_change_request(
         raise HTTPException(status_code=400, detail="CR must be analyzed before accepting")
     if cr.status != "open":
         raise HTTPException(status_code=400, detail="CR is not open")
+    await ensure_queue_capacity(session, "generate_version")
 
     cr.status = "accepted"
     session.add(cr)
     await session.commit()
 
     # Create job for version generation
-    job_id = str(uuid.uuid4())
-    job = JobRecord(id=job_id, deal_id=deal_id, job_type="generate_version", status="pending")
-    session.add(job)
-    await session.commit()
-
-    asyncio.create_task(run_generate_version(job_id, str(deal_id), str(cr_id), str(user.id)))
+    job_id = await enqueue_job(session, deal_id, "generate_version", {
+        "deal_id": str(deal_id), "cr_id": str(cr_id), "user_id": str(user.id),
+    })
 
     # Transition state
     deal = await _get_deal(session, deal_id)
@@ -215,7 +210,7 @@ async def accept_change_request(
         from services.email import notify_cr_accepted, get_counterparty_emails
         counterparties = await get_counterparty_emails(session, deal_id)
         for email, name, slug in counterparties:
-            notify_cr_accepted(to=email, deal_title=deal.title, deal_url_or_review_url=f"/review/{slug}")
+            await run_in_threadpool(notify_cr_accepted, to=email, deal_title=deal.title, deal_url_or_review_url=f"/review/{slug}")
     except Exception:
         pass
 
@@ -265,7 +260,7 @@ async def reject_change_request(
         from services.email import notify_cr_rejected, get_counterparty_emails
         counterparties = await get_counterparty_emails(session, deal_id)
         for email, name, slug in counterparties:
-            notify_cr_rejected(to=email, deal_title=deal.title, reason=req.reason or "", deal_url_or_review_url=f"/review/{slug}")
+            await run_in_threadpool(notify_cr_rejected, to=email, deal_title=deal.title, reason=req.reason or "", deal_url_or_review_url=f"/review/{slug}")
     except Exception:
         pass
 
@@ -329,7 +324,7 @@ async def counter_change_request(
         from services.email import notify_cr_countered, get_counterparty_emails
         counterparties = await get_counterparty_emails(session, deal_id)
         for email, name, slug in counterparties:
-            notify_cr_countered(to=email, deal_title=deal.title, counter_text=req.counter_text[:200], deal_url_or_review_url=f"/review/{slug}")
+            await run_in_threadpool(notify_cr_countered, to=email, deal_title=deal.title, counter_text=req.counter_text[:200], deal_url_or_review_url=f"/review/{slug}")
     except Exception:
         pass
 
@@ -363,6 +358,11 @@ async def batch_action(
     crs = result.all()
     if not crs:
         raise HTTPException(status_code=404, detail="No open change requests found for this batch")
+    if req.action == "accept":
+        # Refuse the whole batch up front rather than accepting part of it
+        await ensure_queue_capacity(
+            session, "generate_version", sum(1 for cr in crs if cr.analysis_status == "completed"),
+        )
 
     results = []
     for cr in crs:
@@ -373,11 +373,9 @@ async def batch_action(
             session.add(cr)
             await session.commit()
 
-            job_id = str(uuid.uuid4())
-            job = JobRecord(id=job_id, deal_id=deal_id, job_type="generate_version", status="pending")
-            session.add(job)
-            await session.commit()
-            asyncio.create_task(run_generate_version(job_id, str(deal_id), str(cr.id), str(user.id)))
+            job_id = await enqueue_job(session, deal_id, "generate_version", {
+                "deal_id": str(deal_id), "cr_id": str(cr.id), "user_id": str(user.id),
+            })
             results.append({"cr_id": str(cr.id), "action": "accepted", "job_id": job_id})
 
         elif req.action == "reject":
@@ -411,11 +409,11 @@ async def batch_action(
         if req.action == "accept":
             from services.email import notify_cr_accepted
             for email, name, slug in await get_counterparty_emails(session, deal_id):
-                notify_cr_accepted(to=email, deal_title=deal.title, deal_url_or_review_url=f"/review/{slug}")
+                await run_in_threadpool(notify_cr_accepted, to=email, deal_title=deal.title, deal_url_or_review_url=f"/review/{slug}")
         elif req.action == "reject":
             from services.email import notify_cr_rejected
             for email, name, slug in await get_counterparty_emails(session, deal_id):
-                notify_cr_rejected(to=email, deal_title=deal.title, reason=req.reason or "", deal_url_or_review_url=f"/review/{slug}")
+                await run_in_threadpool(notify_cr_rejected, to=email, deal_title=deal.title, reason=req.reason or "", deal_url_or_review_url=f"/review/{slug}")
     except Exception:
         pass
 
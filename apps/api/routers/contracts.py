@@ -1,30 +1,32 @@
 from __future__ import annotations
 
 import uuid
-from fastapi import APIRouter, Depends, Form, HTTPException, UploadFile, File, Query
-from fastapi.responses import Response
+from fastapi import APIRouter, Depends, Form, HTTPException, UploadFile, File, Query, Path
+from fastapi.responses import Response, StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlmodel import select, desc
+from sqlmodel import select, desc, func
+from starlette.concurrency import run_in_threadpool
 
 from database import get_session
 from models.user import User
 from models.contract import ContractVersion
 from models.contract_template import ContractTemplate
 from models.supporting_doc import SupportingDocument
-from models.job import JobRecord
 from schemas.contracts import (
     ContractPasteRequest, ContractVersionResponse, DiffResponse,
     ContractTemplateResponse, ContractGenerateRequest, SupportingDocResponse,
     PDFGenerateRequest, PDFGenerateResponse, PDFTemplateInfo,
+    PDFBatchFillRequest, PDFBatchFillResponse, PDFBatchFillResult,
 )
 from services.auth import get_current_user
 from services.rbac import check_deal_access
+from services import blob_store
 from services.ingestion import extract_text
+from services.uploads import check_upload_size, store_upload
 from services.diffing import compute_diff
 from services.transcription import transcribe_audio
 from services.timeline import record_event
-import asyncio
-from workers.inline_runner import run_parse_contract, run_generate_initial_contract
+from workers.queue import enqueue_job, ensure_queue_capacity
 
 router = APIRouter(prefix="/deals/{deal_id}/contract", tags=["contracts"])
 templates_router = APIRouter(prefix="/contract-templates", tags=["contracts"])
@@ -53,39 +55,33 @@ async def upload_contract(
     user: User = Depends(get_current_user),
 ):
     await check_deal_access(session, user, deal_id)
+    await ensure_queue_capacity(session, "parse_contract")
 
-    file_bytes = await file.read()
-    if len(file_bytes) > MAX_UPLOAD_SIZE:
-        raise HTTPException(status_code=413, detail="File too large. Maximum 10 MB.")
-
-    text, ok = extract_text(file.filename or "unknown.txt", file_bytes)
+    digest, size = await store_upload(file, MAX_UPLOAD_SIZE, "File too large. Maximum 10 MB.")
+    filename = file.filename or "unknown.txt"
 
+    # Text is extracted from the stored file by the parse job
     version = ContractVersion(
-        deal_id=deal_id, version_number=0, full_text=text,
-        source="upload", created_by=user.id,
+        deal_id=deal_id, version_number=0, full_text="",
+        source="upload", source_blob=digest, created_by=user.id,
     )
     session.add(version)
     await session.commit()
     await session.refresh(version)
 
-    # Create job and run parse inline in background
-    job_id = str(uuid.uuid4())
-    job = JobRecord(id=job_id, deal_id=deal_id, job_type="parse_contract", status="pending")
-    session.add(job)
-    await session.commit()
-
-    asyncio.create_task(run_parse_contract(job_id, str(deal_id), str(version.id)))
+    # Queue the parse job
+    job_id = await enqueue_job(session, deal_id, "parse_contract", {
+        "deal_id": str(deal_id), "version_id": str(version.id), "filename": filename,
+    })
 
     await record_event(session, deal_id, "contract_uploaded", user.id, {
-        "version_id": str(version.id), "filename": file.filename, "extraction_ok": ok,
+        "version_id": str(version.id), "filename": file.filename, "size": size,
     })
 
     return {
         "version_id": str(version.id),
-        "extraction_ok": ok,
         "job_id": job_id,
-        "message": "Contract uploaded. Parsing in background." if ok else
-                   "Extraction quality may be poor. Consider using paste fallback.",
+        "message": "Contract uploaded. Extracting and parsing in background.",
     }
 
 
@@ -97,6 +93,7 @@ async def paste_contract(
     user: User = Depends(get_current_user),
 ):
     await check_deal_access(session, user, deal_id)
+    await ensure_queue_capacity(session, "parse_contract")
 
     version = ContractVersion(
         deal_id=deal_id, version_number=0, full_text=req.text,
@@ -106,12 +103,9 @@ async def paste_contract(
     await session.commit()
     await session.refresh(version)
 
-    job_id = str(uuid.uuid4())
-    job = JobRecord(id=job_id, deal_id=deal_id, job_type="parse_contract", status="pending")
-    session.add(job)
-    await session.commit()
-
-    asyncio.create_task(run_parse_contract(job_id, str(deal_id), str(version.id)))
+    job_id = await enqueue_job(session, deal_id, "parse_contract", {
+        "deal_id": str(deal_id), "version_id": str(version.id),
+    })
 
     await record_event(session, deal_id, "contract_pasted", user.id, {
         "version_id": str(version.id),
@@ -131,6 +125,8 @@ async def get_current_contract(
         select(ContractVersion)
         .where(ContractVersion.deal_id == deal_id)
         .order_by(desc(ContractVersion.version_number))
+        .limit(1)
+        .options(*ContractVersion.with_text())
     )
     version = result.first()
     if not version:
@@ -178,16 +174,17 @@ async def upload_supporting_doc(
     if doc_type not in allowed_types:
         raise HTTPException(status_code=400, detail=f"doc_type must be one of {allowed_types}")
 
-    file_bytes = await file.read()
-    if len(file_bytes) > MAX_UPLOAD_SIZE:
-        raise HTTPException(status_code=413, detail="File too large. Maximum 10 MB.")
-
-    text, _ = extract_text(file.filename or "unknown.txt", file_bytes)
+    digest, _ = await store_upload(file, MAX_UPLOAD_SIZE, "File too large. Maximum 10 MB.")
+    # Off the event loop; the text is needed as soon as the contract is generated
+    text, _ = await run_in_threadpool(
+        extract_text, file.filename or "unknown.txt", blob_store.blob_path(digest), digest,
+    )
 
     doc = SupportingDocument(
         deal_id=deal_id,
         doc_type=doc_type,
         filename=file.filename or "unknown",
+        file_blob=digest,
         extracted_text=text,
         created_by=user.id,
     )
@@ -237,6 +234,7 @@ async def generate_contract(
     user: User = Depends(get_current_user),
 ):
     await check_deal_access(session, user, deal_id)
+    await ensure_queue_capacity(session, "generate_initial_contract")
 
     # Validate template
     template = await session.get(ContractTemplate, uuid.UUID(req.template_id))
@@ -250,15 +248,13 @@ async def generate_contract(
         if doc and doc.deal_id == deal_id:
             supporting_texts.append(f"[{doc.doc_type} — {doc.filename}]\n{doc.extracted_text[:5000]}")
 
-    job_id = str(uuid.uuid4())
-    job = JobRecord(id=job_id, deal_id=deal_id, job_type="generate_initial_contract", status="pending")
-    session.add(job)
-    await session.commit()
-
-    asyncio.create_task(run_generate_initial_contract(
-        job_id, str(deal_id), template.slug, req.deal_details,
-        supporting_texts, str(user.id),
-    ))
+    job_id = await enqueue_job(session, deal_id, "generate_initial_contract", {
+        "deal_id": str(deal_id),
+        "template_slug": template.slug,
+        "deal_details": req.deal_details,
+        "supporting_texts": supporting_texts,
+        "user_id": str(user.id),
+    })
 
     await record_event(session, deal_id, "contract_generation_started", user.id, {
         "template": template.slug, "job_id": job_id,
@@ -280,12 +276,11 @@ async def transcribe_voice(
     """Transcribe an audio file using Whisper STT."""
     await check_deal_access(session, user, deal_id)
 
-    audio_bytes = await file.read()
-    if len(audio_bytes) > MAX_AUDIO_SIZE:
-        raise HTTPException(status_code=413, detail="Audio file too large. Maximum 25 MB.")
+    check_upload_size(file, MAX_AUDIO_SIZE, "Audio file too large. Maximum 25 MB.")
+    await file.seek(0)
 
     try:
-        text = await transcribe_audio(audio_bytes, file.filename or "audio.webm")
+        text = await transcribe_audio(file.file, file.filename or "audio.webm")
     except Exception as e:
         raise HTTPException(status_code=502, detail=f"Transcription failed: {str(e)}")
 
@@ -295,10 +290,17 @@ async def transcribe_voice(
 # ── PDF Form Filling ──────────────────────────────────────────────────────────
 
 
+from config import settings
+from services import pdf_batch
 from services.pdf_form_filler import pdf_filler, PDFFormFillerError
 from models.deal import Deal
 
 
+def _pdf_filename(deal: Deal, template_slug: str) -> str:
+    safe_title = (deal.title or "contract").replace(" ", "_").replace("/", "-")
+    return f"{safe_title}_{template_slug}.pdf"
+
+
 @templates_router.get("/pdf-templates", response_model=list[PDFTemplateInfo])
 async def list_pdf_templates(
     user: User = Depends(get_current_user),
@@ -341,6 +343,7 @@ async def generate_filled_pdf(
         select(ContractVersion)
         .where(ContractVersion.deal_id == deal_id)
         .order_by(desc(ContractVersion.version_number))
+        .limit(1)
     )
     version = result.first()
 
@@ -364,15 +367,13 @@ async def generate_filled_pdf(
 
     # Fill the PDF
     try:
-        pdf_base64, warnings = pdf_filler.fill_pdf_base64(
-            req.template_slug, deal_data, req.flatten
+        pdf_base64, warnings = await run_in_threadpool(
+            pdf_filler.fill_pdf_base64, req.template_slug, deal_data, req.flatten
         )
     except PDFFormFillerError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
-    # Generate filename
-    safe_title = (deal.title or "contract").replace(" ", "_").replace("/", "-")
-    filename = f"{safe_title}_{req.template_slug}.pdf"
+    filename = _pdf_filename(deal, req.template_slug)
 
     await record_event(session, deal_id, "pdf_generated", user.id, {
         "template_slug": req.template_slug,
@@ -413,6 +414,7 @@ async def download_filled_pdf(
         select(ContractVersion)
         .where(ContractVersion.deal_id == deal_id)
         .order_by(desc(ContractVersion.version_number))
+        .limit(1)
     )
     version = result.first()
 
@@ -423,12 +425,13 @@ async def download_filled_pdf(
         deal_data.setdefault("property_address", deal.address)
 
     try:
-        pdf_bytes, warnings = pdf_filler.fill_pdf(template_slug, deal_data, flatten)
+        pdf_bytes, warnings = await run_in_threadpool(
+            pdf_filler.fill_pdf, template_slug, deal_data, flatten
+        )
     except PDFFormFillerError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
-    safe_title = (deal.title or "contract").replace(" ", "_").replace("/", "-")
-    filename = f"{safe_title}_{template_slug}.pdf"
+    filename = _pdf_filename(deal, template_slug)
 
     await record_event(session, deal_id, "pdf_downloaded", user.id, {
         "template_slug": template_slug,
@@ -442,3 +445,148 @@ async def download_filled_pdf(
             "Content-Disposition": f'attachment; filename="{filename}"'
         }
     )
+
+
+@router.get("/filled-pdfs/{digest}")
+async def download_batch_filled_pdf(
+    deal_id: uuid.UUID,
+    digest: str = Path(..., pattern="^[0-9a-f]{64}$"),
+    session: AsyncSession = Depends(get_session),
+    user: User = Depends(get_current_user),
+):
+    """Download a PDF filled by the batch endpoint with output="blobs"."""
+    await check_deal_access(session, user, deal_id)
+    # Digests are global: only serve one a batch filled for this deal
+    if not pdf_batch.is_output_of(deal_id, digest):
+        raise HTTPException(status_code=404, detail="Filled PDF not found")
+    return blob_store.blob_response(
+        digest, "application/pdf", f"filled_{digest[:12]}.pdf", "Filled PDF not found",
+    )
+
+
+async def _latest_extracted_fields(
+    session: AsyncSession, deal_ids: list[uuid.UUID]
+) -> dict[uuid.UUID, dict]:
+    """extracted_fields of each deal's latest contract version, in one query."""
+    latest = (
+        select(
+            ContractVersion.deal_id,
+            func.max(ContractVersion.version_number).label("version_number"),
+        )
+        .where(ContractVersion.deal_id.in_(deal_ids))
+        .group_by(ContractVersion.deal_id)
+        .subquery()
+    )
+    result = await session.exec(
+        select(ContractVersion.deal_id, ContractVersion.extracted_fields).join(
+            latest,
+            (ContractVersion.deal_id == latest.c.deal_id)
+            & (ContractVersion.version_number == latest.c.version_number),
+        )
+    )
+    return {deal_id: fields or {} for deal_id, fields in result.all()}
+
+
+def _unique_names(filenames: list[str]) -> list[str]:
+    """Repeats of a filename get a numeric suffix, so each names one ZIP entry."""
+    seen: dict[str, int] = {}
+    names = []
+    for filename in filenames:
+        count = seen.get(filename, 0)
+        seen[filename] = count + 1
+        stem, _, ext = filename.rpartition(".")
+        names.append(filename if count == 0 else f"{stem}_{count + 1}.{ext}")
+    return names
+
+
+@templates_router.post("/pdf-templates/fill-batch", response_model=PDFBatchFillResponse)
+async def fill_pdf_batch(
+    req: PDFBatchFillRequest,
+    session: AsyncSession = Depends(get_session),
+    user: User = Depends(get_current_user),
+):
+    """
+    Fill several (deal, template) pairs at once, e.g. a closing packet.
+
+    Fills run on a process pool (services/pdf_batch.py). With output="zip"
+    (default) the PDFs are streamed back as a ZIP with a manifest.json of
+    per-item results and warnings; with output="blobs" the response lists a
+    download URL per item. A failed item does not fail the batch.
+    """
+    if len(req.items) > settings.pdf_batch_max_items:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.pdf_batch_max_items} items per batch",
+        )
+
+    deal_ids = list(dict.fromkeys(item.deal_id for item in req.items))
+    for deal_id in deal_ids:
+        await check_deal_access(session, user, deal_id)
+    result = await session.exec(select(Deal).where(Deal.id.in_(deal_ids)))
+    deals = {deal.id: deal for deal in result.all()}
+    missing = [str(deal_id) for deal_id in deal_ids if deal_id not in deals]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Deal not found: {', '.join(missing)}")
+
+    # Unknown or invalid templates fail the request before anything renders
+    mappings = {}
+    for slug in dict.fromkeys(item.template_slug for item in req.items):
+        try:
+            mappings[slug] = pdf_filler.get_mapping(slug)
+        except PDFFormFillerError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    extracted = await _latest_extracted_fields(session, deal_ids)
+    requests = []
+    for item in req.items:
+        deal = deals[item.deal_id]
+        deal_data = dict(item.deal_data or extracted.get(item.deal_id, {}))
+        if deal.address:
+            deal_data.setdefault("property_address", deal.address)
+        requests.append(pdf_batch.FillRequest(item.template_slug, deal_data, item.flatten))
+
+    fills = await pdf_batch.fill_batch(requests)
+
+    filenames = _unique_names([
+        _pdf_filename(deals[item.deal_id], item.template_slug) for item in req.items
+    ])
+    items = []
+    for item, fill, filename in zip(req.items, fills, filenames):
+        items.append(PDFBatchFillResult(
+            deal_id=str(item.deal_id),
+            template_slug=item.template_slug,
+            template_version=mappings[item.template_slug].get("template_version", "UNKNOWN"),
+            filename=filename,
+            blob=fill.blob,
+            download_url=(
+                f"/deals/{item.deal_id}/contract/filled-pdfs/{fill.blob}" if fill.blob else None
+            ),
+            size=fill.size,
+            warnings=fill.warnings,
+            error=fill.error,
+        ))
+        if fill.blob:
+            pdf_batch.record_output(item.deal_id, fill.blob)
+            await record_event(session, item.deal_id, "pdf_generated", user.id, {
+                "template_slug": item.template_slug,
+                "flatten": item.flatten,
+                "warnings_count": len(fill.warnings),
+                "batch": True,
+            })
+
+    response = PDFBatchFillResponse(
+        items=items,
+        filled=sum(1 for i in items if i.blob),
+        failed=sum(1 for i in items if not i.blob),
+        warnings=[f"{i.filename}: {w}" for i in items for w in i.warnings],
+    )
+    if req.output == "blobs":
+        return response
+
+    entries = [(i.filename, i.blob) for i in items if i.blob]
+    manifest = response.model_dump_json(indent=2).encode("utf-8")
+    return StreamingResponse(
+        pdf_batch.zip_stream(entries, [("manifest.json", manifest)]),
+        media_type="application/zip",
+        headers={"Content-Disposition": 'attachment; filename="pdf_batch.zip"'},
+    )
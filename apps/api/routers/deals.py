@@ -1,21 +1,20 @@
 from __future__ import annotations
 
-import io
 import uuid
-import base64
-import asyncio
 from datetime import datetime
 from typing import Optional
 from fastapi import APIRouter, Depends, HTTPException, Query
-from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlmodel import select
+from sqlmodel import select, func
+from starlette.concurrency import run_in_threadpool
 
 from database import get_session
 from models.user import User, UserRole
 from models.deal import Deal, DealAssignment
+from models.deal_health import DealHealth
 from models.audit import AuditEvent
 from schemas.deals import DealCreate, DealResponse, DealAssignRequest, DealAssignmentResponse, EnrichedDealResponse, HealthSummary
+from services import blob_store
 from services.auth import get_current_user
 from services.rbac import check_deal_access
 from services.timeline import record_event
@@ -94,17 +93,15 @@ async def list_deals(
     with_health: bool = Query(default=False, description="Include health metrics"),
     sort_by: str = Query(default="created_at", description="Sort by: created_at, health, activity"),
     health_status: Optional[str] = Query(default=None, description="Filter by health: healthy, needs_attention, at_risk"),
+    limit: Optional[int] = Query(default=None, ge=1, le=500, description="Page size"),
+    offset: int = Query(default=0, ge=0, description="Rows to skip"),
     session: AsyncSession = Depends(get_session),
     user: User = Depends(get_current_user),
 ):
     if user.role == UserRole.super_admin:
-        stmt = select(Deal).order_by(Deal.created_at.desc())  # type: ignore
+        stmt = select(Deal)
     elif user.role == UserRole.admin:
-        stmt = (
-            select(Deal)
-            .where(Deal.organization_id == user.organization_id)
-            .order_by(Deal.created_at.desc())  # type: ignore
-        )
+        stmt = select(Deal).where(Deal.organization_id == user.organization_id)
     else:
         stmt = (
             select(Deal)
@@ -113,35 +110,43 @@ async def list_deals(
                 DealAssignment.user_id == user.id,
                 Deal.organization_id == user.organization_id,
             )
-            .order_by(Deal.created_at.desc())  # type: ignore
         )
 
     if deal_type and deal_type in ("purchase", "sale"):
         stmt = stmt.where(Deal.deal_type == deal_type)
 
-    result = await session.exec(stmt)
-    deals = result.all()
-
     if not with_health:
-        return [_deal_response(d) for d in deals]
+        stmt = stmt.order_by(Deal.created_at.desc()).offset(offset)  # type: ignore
+        if limit:
+            stmt = stmt.limit(limit)
+        result = await session.exec(stmt)
+        return [_deal_response(d) for d in result.all()]
 
-    # Compute health for all deals using sync engine
-    import asyncio
-    from database import sync_engine
-    from sqlmodel import Session as SyncSession
-    from services.deal_health import compute_deals_health_batch
+    # Health is read from the materialized deal_health table; only rows in
+    # scope that are missing or whose score has decayed are recomputed here.
+    from services.deal_health import health_from_row, refresh_expired_deal_health
 
-    deal_ids = [d.id for d in deals]
+    scope = stmt.with_only_columns(Deal.id)
+    await session.run_sync(refresh_expired_deal_health, scope)
 
-    def _compute():
-        with SyncSession(sync_engine) as sync_session:
-            return compute_deals_health_batch(sync_session, deal_ids)
+    stmt = stmt.add_columns(DealHealth).outerjoin(DealHealth, DealHealth.deal_id == Deal.id)
+    if health_status:
+        stmt = stmt.where(DealHealth.status == health_status)
+
+    if sort_by == "health":
+        stmt = stmt.order_by(DealHealth.score.asc())  # type: ignore
+    elif sort_by == "activity":
+        stmt = stmt.order_by(func.coalesce(DealHealth.last_activity_at, Deal.created_at).asc())
+    stmt = stmt.order_by(Deal.created_at.desc()).offset(offset)  # type: ignore
+    if limit:
+        stmt = stmt.limit(limit)
 
-    health_map = await asyncio.to_thread(_compute)
+    rows = (await session.exec(stmt)).all()
+    now = datetime.utcnow()
 
     enriched = []
-    for d in deals:
-        h = health_map.get(str(d.id), {})
+    for d, row in rows:
+        h = health_from_row(d, row, now) if row else {}
         enriched.append(EnrichedDealResponse(
             id=str(d.id), title=d.title, address=d.address,
             description=d.description, deal_type=d.deal_type,
@@ -159,16 +164,6 @@ async def list_deals(
             issues=h.get("issues", []),
         ))
 
-    # Filter by health_status
-    if health_status:
-        enriched = [e for e in enriched if e.health_status == health_status]
-
-    # Sort
-    if sort_by == "health":
-        enriched.sort(key=lambda e: e.health_score or 100)
-    elif sort_by == "activity":
-        enriched.sort(key=lambda e: e.days_since_last_activity or 0, reverse=True)
-
     return enriched
 
 
@@ -178,40 +173,33 @@ async def health_summary(
     user: User = Depends(get_current_user),
 ):
     """Returns aggregate health counts for the user's deals."""
-    import asyncio
-    from database import sync_engine
-    from sqlmodel import Session as SyncSession
-    from services.deal_health import compute_deals_health_batch
+    from services.deal_health import refresh_expired_deal_health
 
     if user.role == UserRole.super_admin:
-        stmt = select(Deal)
+        scope = select(Deal.id)
     elif user.role == UserRole.admin:
-        stmt = select(Deal).where(Deal.organization_id == user.organization_id)
+        scope = select(Deal.id).where(Deal.organization_id == user.organization_id)
     else:
-        stmt = (
-            select(Deal)
+        scope = (
+            select(Deal.id)
             .join(DealAssignment, Deal.id == DealAssignment.deal_id)
             .where(DealAssignment.user_id == user.id)
         )
 
-    deals = (await session.exec(stmt)).all()
-    deal_ids = [d.id for d in deals]
-
-    def _compute():
-        with SyncSession(sync_engine) as sync_session:
-            return compute_deals_health_batch(sync_session, deal_ids)
+    await session.run_sync(refresh_expired_deal_health, scope)
 
-    health_map = await asyncio.to_thread(_compute)
-
-    healthy = sum(1 for h in health_map.values() if h.get("health_status") == "healthy")
-    needs_attention = sum(1 for h in health_map.values() if h.get("health_status") == "needs_attention")
-    at_risk = sum(1 for h in health_map.values() if h.get("health_status") == "at_risk")
+    total = (await session.exec(select(func.count()).select_from(scope.subquery()))).one()
+    counts = dict((await session.exec(
+        select(DealHealth.status, func.count())
+        .where(DealHealth.deal_id.in_(scope))
+        .group_by(DealHealth.status)
+    )).all())
 
     return HealthSummary(
-        total=len(deals),
-        healthy_count=healthy,
-        needs_attention_count=needs_attention,
-        at_risk_count=at_risk,
+        total=total,
+        healthy_count=counts.get("healthy", 0),
+        needs_attention_count=counts.get("needs_attention", 0),
+        at_risk_count=counts.get("at_risk", 0),
     )
 
 
@@ -318,13 +306,8 @@ async def accept_terms(
     # Trigger timeline PDF generation on both_accepted
     if both_accepted:
         try:
-            from models.job import JobRecord
-            from workers.inline_runner import run_generate_timeline_pdf
-            timeline_job_id = str(uuid.uuid4())
-            timeline_job = JobRecord(id=timeline_job_id, deal_id=deal.id, job_type="generate_timeline_pdf", status="pending")
-            session.add(timeline_job)
-            await session.commit()
-            asyncio.create_task(run_generate_timeline_pdf(timeline_job_id, str(deal.id)))
+            from workers.queue import enqueue_job
+            await enqueue_job(session, deal.id, "generate_timeline_pdf", {"deal_id": str(deal.id)})
         except Exception:
             pass
 
@@ -334,11 +317,12 @@ async def accept_terms(
         counterparties = await get_counterparty_emails(session, deal.id)
         if both_accepted:
             for email, name, slug in counterparties:
-                notify_deal_accepted(to=email, deal_title=deal.title, deal_url_or_review_url=f"/review/{slug}")
+                await run_in_threadpool(notify_deal_accepted, to=email, deal_title=deal.title, deal_url_or_review_url=f"/review/{slug}")
         else:
             for email, name, slug in counterparties:
                 from services.email import send_email
-                send_email(
+                await run_in_threadpool(
+                    send_email,
                     to=email,
                     subject=f"Terms accepted on {deal.title}",
                     html=f"<p>The other party has accepted the terms on <strong>{deal.title}</strong>. Please review and accept to finalize the deal.</p>",
@@ -440,14 +424,9 @@ async def get_timeline_pdf(
     """Download the Critical Dates PDF."""
     await check_deal_access(session, user, deal_id)
     deal = (await session.exec(select(Deal).where(Deal.id == deal_id))).first()
-    if not deal or not deal.timeline_pdf_base64:
-        raise HTTPException(status_code=404, detail="Timeline PDF not yet generated")
-
-    pdf_bytes = base64.b64decode(deal.timeline_pdf_base64)
-    return StreamingResponse(
-        io.BytesIO(pdf_bytes),
-        media_type="application/pdf",
-        headers={"Content-Disposition": f'attachment; filename="Critical_Dates_{deal.title}.pdf"'},
+    return blob_store.blob_response(
+        deal.timeline_pdf_blob if deal else None, "application/pdf",
+        f"Critical_Dates_{deal.title if deal else ''}.pdf", "Timeline PDF not yet generated",
     )
 
 
@@ -462,14 +441,9 @@ async def generate_timeline(
         raise HTTPException(status_code=403, detail="Only admins can generate timeline PDFs")
     await check_deal_access(session, user, deal_id)
 
-    from models.job import JobRecord
-    from workers.inline_runner import run_generate_timeline_pdf
-
-    job_id = str(uuid.uuid4())
-    job = JobRecord(id=job_id, deal_id=deal_id, job_type="generate_timeline_pdf", status="pending")
-    session.add(job)
-    await session.commit()
+    from workers.queue import enqueue_job, ensure_queue_capacity
 
-    asyncio.create_task(run_generate_timeline_pdf(job_id, str(deal_id)))
+    await ensure_queue_capacity(session, "generate_timeline_pdf")
+    job_id = await enqueue_job(session, deal_id, "generate_timeline_pdf", {"deal_id": str(deal_id)})
 
     return {"job_id": job_id}
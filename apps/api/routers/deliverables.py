@@ -1,7 +1,6 @@
 """Deliverables CRUD for deal participants (authenticated)."""
 from __future__ import annotations
 
-import base64
 import uuid
 from datetime import datetime
 from typing import List
@@ -13,8 +12,11 @@ from sqlmodel import select
 from database import get_session
 from models.deliverable import Deliverable
 from schemas.deliverables import DeliverableResponse, DeliverableUpdate
+from services import blob_store
 from services.auth import get_current_user
 from services.rbac import check_deal_access
+from services.uploads import store_upload
+from services.deal_health import refresh_deal_health_for_event_async
 from models.user import User
 from models.audit import AuditEvent
 
@@ -117,12 +119,10 @@ async def upload_deliverable_file(
     if not d:
         raise HTTPException(status_code=404, detail="Deliverable not found")
 
-    content = await file.read()
-    if len(content) > MAX_UPLOAD_SIZE:
-        raise HTTPException(status_code=413, detail="File exceeds 10 MB limit")
+    digest, _ = await store_upload(file, MAX_UPLOAD_SIZE, "File exceeds 10 MB limit")
 
     d.filename = file.filename
-    d.file_content_base64 = base64.b64encode(content).decode()
+    d.file_blob = digest
     d.status = "submitted"
     d.submitted_at = datetime.utcnow()
     d.updated_at = datetime.utcnow()
@@ -160,6 +160,7 @@ async def confirm_all_deliverables(
         details={"count": count},
     )
     session.add(event)
+    await refresh_deal_health_for_event_async(session, event)
     await session.commit()
     return {"confirmed": count}
 
@@ -179,15 +180,7 @@ async def download_deliverable_file(
             Deliverable.deal_id == deal_id,
         )
     )).first()
-    if not d or not d.file_content_base64:
-        raise HTTPException(status_code=404, detail="No file uploaded")
-
-    import io
-    from fastapi.responses import StreamingResponse
-
-    file_bytes = base64.b64decode(d.file_content_base64)
-    return StreamingResponse(
-        io.BytesIO(file_bytes),
-        media_type="application/octet-stream",
-        headers={"Content-Disposition": f'attachment; filename="{d.filename or "file"}"'},
+    return blob_store.blob_response(
+        d.file_blob if d else None, "application/octet-stream",
+        (d.filename if d else None) or "file", "No file uploaded",
     )
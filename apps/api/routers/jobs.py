@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlmodel import select
 
@@ -13,6 +13,26 @@ from services.auth import get_current_user
 router = APIRouter(prefix="/jobs", tags=["jobs"])
 
 
+@router.get("/metrics")
+async def get_job_metrics(
+    window_minutes: int = Query(default=15, ge=1, le=1440),
+    session: AsyncSession = Depends(get_session),
+    user: User = Depends(get_current_user),
+):
+    """Queue length and wait time per job class, plus this process's LLM
+    gateway usage and cache hit rate (super admin only)."""
+    if user.role != UserRole.super_admin:
+        raise HTTPException(status_code=403, detail="Super admin access required")
+    from llm.cache import cache_stats
+    from llm.gateway import gateway_stats
+    from workers.queue import queue_metrics
+
+    metrics = await session.run_sync(queue_metrics, window_minutes)
+    metrics["llm_gateway"] = await gateway_stats()
+    metrics["llm_cache"] = cache_stats()
+    return metrics
+
+
 @router.get("/{job_id}")
 async def get_job_status(
     job_id: str,
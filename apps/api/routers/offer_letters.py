@@ -1,7 +1,6 @@
 from __future__ import annotations
 
 import uuid
-import asyncio
 from datetime import datetime
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -11,7 +10,6 @@ from database import get_session
 from models.user import User
 from models.deal import Deal
 from models.offer_letter import OfferLetter
-from models.job import JobRecord
 from models.audit import AuditEvent
 from schemas.offer_letter import (
     GenerateOfferLetterRequest,
@@ -20,7 +18,8 @@ from schemas.offer_letter import (
 )
 from services.auth import get_current_user
 from services.rbac import check_deal_access
-from workers.inline_runner import run_generate_offer_letter
+from services.deal_health import refresh_deal_health_for_event_async
+from workers.queue import enqueue_job, ensure_queue_capacity
 
 router = APIRouter(prefix="/deals/{deal_id}/offer-letters", tags=["offer-letters"])
 
@@ -56,35 +55,22 @@ async def generate_offer_letter(
 ):
     """Generate an AI-powered offer letter for the deal."""
     await check_deal_access(session, user, deal_id)
+    await ensure_queue_capacity(session, "generate_offer_letter")
 
     # Get deal for context
     deal = await session.get(Deal, deal_id)
     if not deal:
         raise HTTPException(status_code=404, detail="Deal not found")
 
-    # Create job record
-    job_id = str(uuid.uuid4())
-    job = JobRecord(
-        id=job_id,
-        deal_id=deal_id,
-        job_type="generate_offer_letter",
-        status="pending",
-    )
-    session.add(job)
-    await session.commit()
-
-    # Run generation in background
-    asyncio.create_task(
-        run_generate_offer_letter(
-            job_id=job_id,
-            deal_id=str(deal_id),
-            user_prompt=req.prompt,
-            deal_title=deal.title,
-            deal_address=deal.address or "",
-            deal_type=deal.deal_type,
-            user_id=str(user.id),
-        )
-    )
+    # Queue generation
+    job_id = await enqueue_job(session, deal_id, "generate_offer_letter", {
+        "deal_id": str(deal_id),
+        "user_prompt": req.prompt,
+        "deal_title": deal.title,
+        "deal_address": deal.address or "",
+        "deal_type": deal.deal_type,
+        "user_id": str(user.id),
+    })
 
     # Record audit event
     audit_event = AuditEvent(
@@ -94,6 +80,7 @@ async def generate_offer_letter(
         details={"job_id": job_id},
     )
     session.add(audit_event)
+    await refresh_deal_health_for_event_async(session, audit_event)
     await session.commit()
 
     return {"job_id": job_id, "message": "Offer letter generation started."}
@@ -165,6 +152,7 @@ async def update_offer_letter(
         details={"offer_letter_id": str(offer_letter_id), "fields_updated": list(update_data.keys())},
     )
     session.add(audit_event)
+    await refresh_deal_health_for_event_async(session, audit_event)
 
     await session.commit()
     await session.refresh(ol)
@@ -196,6 +184,7 @@ async def delete_offer_letter(
         details={"offer_letter_id": str(offer_letter_id)},
     )
     session.add(audit_event)
+    await refresh_deal_health_for_event_async(session, audit_event)
 
     await session.commit()
 
@@ -1,17 +1,17 @@
 from __future__ import annotations
 
-import io
 import os
 import json
 import uuid
 import asyncio
 from datetime import datetime
 from typing import List
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, Query, UploadFile, File
 from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import or_
 from sqlmodel import select
+from starlette.concurrency import run_in_threadpool
 
 from database import get_session
 from models.share_link import ShareLink
@@ -21,6 +21,7 @@ from models.contract import ContractVersion
 from models.change_request import ChangeRequest
 from models.company_settings import CompanySettings
 from models.audit import AuditEvent
+from models.job import JobRecord
 from schemas.share_link import (
     PublicContractResponse, SubmitFeedbackRequest, FeedbackResponse,
     PublicFeedbackHistoryItem, SubmitCounterResponseRequest, ChatRequest,
@@ -28,17 +29,19 @@ from schemas.share_link import (
     SubmitBatchFeedbackRequest, BatchFeedbackResponse, GroupFeedbackRequest,
     PublicDiffResponse, PublicChangesSummary, FieldChangeItem,
 )
+from services import blob_store
 from services.timeline import record_event
-from services.diffing import compute_diff, compute_field_changes
+from services.deal_health import refresh_deal_health_for_event_async
+from services.diffing import cached_version_diff, compute_field_changes, compute_word_diff
 from services.plg import record_plg_event
 from services.notifications import notify_deal_participants
 from config import settings as app_settings
 from services.email import notify_external_feedback
-from models.job import JobRecord
 from models.user import User
 import asyncio
-from workers.inline_runner import run_analyze_change_request, run_generate_timeline_pdf
+from workers.queue import dispatch, enqueue_job, ensure_queue_capacity, new_job
 from services.transcription import transcribe_audio
+from services.uploads import check_upload_size, store_upload
 import time
 
 _chat_counts: dict[str, list] = {}  # session_id -> list of timestamps
@@ -79,6 +82,8 @@ async def get_public_contract(
         select(ContractVersion)
         .where(ContractVersion.deal_id == link.deal_id)
         .order_by(ContractVersion.version_number.desc())  # type: ignore
+        .limit(1)
+        .options(*ContractVersion.with_text())
     )).first()
     if not version:
         raise HTTPException(status_code=404, detail="No contract version found")
@@ -111,15 +116,18 @@ async def get_version_diff(
     token: str,
     version_id: str,
     against: str = "prev",
+    mode: str = Query(default="line", pattern="^(line|word)$"),
     session: AsyncSession = Depends(get_session),
 ):
     link = await _get_active_link(session, token)
+    # Line diffs are usually read from version_diffs; only word diffs need the text
+    text_options = ContractVersion.with_text() if mode == "word" else ()
 
     version_b = (await session.exec(
         select(ContractVersion).where(
             ContractVersion.id == uuid.UUID(version_id),
             ContractVersion.deal_id == link.deal_id,
-        )
+        ).options(*text_options)
     )).first()
     if not version_b:
         raise HTTPException(status_code=404, detail="Version not found")
@@ -132,6 +140,8 @@ async def get_version_diff(
                 ContractVersion.version_number < version_b.version_number,
             )
             .order_by(ContractVersion.version_number.desc())
+            .limit(1)
+            .options(*text_options)
         )).first()
         if not version_a:
             raise HTTPException(status_code=400, detail="No previous version to diff against")
@@ -140,12 +150,15 @@ async def get_version_diff(
             select(ContractVersion).where(
                 ContractVersion.id == uuid.UUID(against),
                 ContractVersion.deal_id == link.deal_id,
-            )
+            ).options(*text_options)
         )).first()
         if not version_a:
             raise HTTPException(status_code=404, detail="Comparison version not found")
 
-    diff_result = compute_diff(version_a.full_text, version_b.full_text)
+    if mode == "word":
+        diff_result = compute_word_diff(version_a.full_text, version_b.full_text)
+    else:
+        diff_result = await session.run_sync(cached_version_diff, version_a, version_b)
     field_changes = compute_field_changes(version_a.extracted_fields, version_b.extracted_fields)
 
     return PublicDiffResponse(
@@ -153,6 +166,8 @@ async def get_version_diff(
         version_b_number=version_b.version_number,
         diff_html=diff_result["diff_html"],
         field_changes=field_changes,
+        mode=mode,
+        diff_ops=diff_result.get("diff_ops"),
     )
 
 
@@ -253,14 +268,15 @@ async def _create_feedback_item(
     )
     session.add(feedback)
 
-    job_id = str(uuid.uuid4())
-    job = JobRecord(id=job_id, deal_id=link.deal_id, job_type="analyze_change_request", status="pending")
+    job = new_job(link.deal_id, "analyze_change_request", {
+        "deal_id": str(link.deal_id), "cr_id": str(cr.id),
+    })
     session.add(job)
     cr.analysis_status = "processing"
-    cr.analysis_job_id = job_id
+    cr.analysis_job_id = job.id
     session.add(cr)
 
-    return feedback, cr, job_id
+    return feedback, cr, job
 
 
 @router.post("/{token}/feedback", response_model=FeedbackResponse, status_code=201)
@@ -270,18 +286,18 @@ async def submit_feedback(
     session: AsyncSession = Depends(get_session),
 ):
     link = await _get_active_link(session, token)
+    await ensure_queue_capacity(session, "analyze_change_request")
 
     reviewer_name = req.reviewer_name or link.counterparty_name
     reviewer_email = req.reviewer_email or getattr(link, "counterparty_email", None)
 
-    feedback, cr, job_id = await _create_feedback_item(
+    feedback, cr, job = await _create_feedback_item(
         session, link, reviewer_name, reviewer_email, req.feedback_text,
     )
 
     await session.commit()
     await session.refresh(feedback)
-
-    asyncio.create_task(run_analyze_change_request(job_id, str(link.deal_id), str(cr.id)))
+    dispatch(job)
 
     await record_event(session, link.deal_id, "external_feedback_received", details={
         "reviewer_name": reviewer_name,
@@ -302,7 +318,8 @@ async def submit_feedback(
         if deal:
             owner = (await session.exec(select(User).where(User.id == link.created_by))).first()
             if owner and owner.email:
-                notify_external_feedback(
+                await run_in_threadpool(
+                    notify_external_feedback,
                     to=owner.email,
                     deal_title=deal.title,
                     reviewer_name=reviewer_name,
@@ -330,20 +347,21 @@ async def submit_batch_feedback(
 ):
     """Submit multiple feedback items at once, grouped under a batch_id."""
     link = await _get_active_link(session, token)
+    await ensure_queue_capacity(session, "analyze_change_request", len(req.items))
     batch_id = str(uuid.uuid4())
 
     items: list[FeedbackResponse] = []
-    job_ids: list[tuple[str, str]] = []  # (job_id, cr_id)
+    jobs: list[JobRecord] = []
 
     for item in req.items:
         reviewer_name = item.reviewer_name or link.counterparty_name
         reviewer_email = item.reviewer_email or getattr(link, "counterparty_email", None)
 
-        feedback, cr, job_id = await _create_feedback_item(
+        feedback, cr, job = await _create_feedback_item(
             session, link, reviewer_name, reviewer_email, item.feedback_text, batch_id,
         )
         await session.flush()
-        job_ids.append((job_id, str(cr.id)))
+        jobs.append(job)
         items.append(FeedbackResponse(
             id=str(feedback.id),
             reviewer_name=feedback.reviewer_name,
@@ -354,10 +372,7 @@ async def submit_batch_feedback(
         ))
 
     await session.commit()
-
-    # Dispatch analysis for all CRs
-    for job_id, cr_id in job_ids:
-        asyncio.create_task(run_analyze_change_request(job_id, str(link.deal_id), cr_id))
+    dispatch(*jobs)
 
     # Single timeline event for the batch
     reviewer_name = req.items[0].reviewer_name or link.counterparty_name
@@ -381,7 +396,7 @@ async def submit_batch_feedback(
         if deal:
             owner = (await session.exec(select(User).where(User.id == link.created_by))).first()
             if owner and owner.email:
-                notify_external_feedback(to=owner.email, deal_title=deal.title, reviewer_name=reviewer_name)
+                await run_in_threadpool(notify_external_feedback, to=owner.email, deal_title=deal.title, reviewer_name=reviewer_name)
     except Exception:
         pass
 
@@ -472,19 +487,16 @@ async def counterparty_accept_terms(
         owner = (await session.exec(select(User).where(User.id == link.created_by))).first()
         if owner and owner.email:
             if both_accepted:
-                notify_deal_accepted(to=owner.email, deal_title=deal.title, deal_url_or_review_url=f"/deals/{deal.id}")
+                await run_in_threadpool(notify_deal_accepted, to=owner.email, deal_title=deal.title, deal_url_or_review_url=f"/deals/{deal.id}")
                 # Trigger timeline PDF generation
                 try:
-                    timeline_job_id = str(uuid.uuid4())
-                    timeline_job = JobRecord(id=timeline_job_id, deal_id=deal.id, job_type="generate_timeline_pdf", status="pending")
-                    session.add(timeline_job)
-                    await session.commit()
-                    asyncio.create_task(run_generate_timeline_pdf(timeline_job_id, str(deal.id)))
+                    await enqueue_job(session, deal.id, "generate_timeline_pdf", {"deal_id": str(deal.id)})
                 except Exception:
                     pass
             else:
                 magic_url = await create_magic_link(session, owner.id, deal.id, f"/deals/{deal.id}")
-                send_email(
+                await run_in_threadpool(
+                    send_email,
                     to=owner.email,
                     subject=f"Counterparty accepted terms on {deal.title}",
                     html=f'<p>The counterparty has accepted the terms on <strong>{deal.title}</strong>. '
@@ -563,6 +575,7 @@ async def submit_counter_response(
     session: AsyncSession = Depends(get_session),
 ):
     link = await _get_active_link(session, token)
+    await ensure_queue_capacity(session, "analyze_change_request")
 
     reviewer_name = req.reviewer_name or link.counterparty_name
     reviewer_email = req.reviewer_email or getattr(link, "counterparty_email", None)
@@ -604,17 +617,17 @@ async def submit_counter_response(
     )
     session.add(new_feedback)
 
-    job_id = str(uuid.uuid4())
-    job = JobRecord(id=job_id, deal_id=link.deal_id, job_type="analyze_change_request", status="pending")
+    job = new_job(link.deal_id, "analyze_change_request", {
+        "deal_id": str(link.deal_id), "cr_id": str(new_cr.id),
+    })
     session.add(job)
     new_cr.analysis_status = "processing"
-    new_cr.analysis_job_id = job_id
+    new_cr.analysis_job_id = job.id
     session.add(new_cr)
 
     await session.commit()
     await session.refresh(new_feedback)
-
-    asyncio.create_task(run_analyze_change_request(job_id, str(link.deal_id), str(new_cr.id)))
+    dispatch(job)
 
     await record_event(session, link.deal_id, "external_counter_response", details={
         "reviewer_name": reviewer_name,
@@ -667,6 +680,8 @@ async def chat_with_contract(
         select(ContractVersion)
         .where(ContractVersion.deal_id == link.deal_id)
         .order_by(ContractVersion.version_number.desc())  # type: ignore
+        .limit(1)
+        .options(*ContractVersion.with_text())
     )).first()
     if not version:
         raise HTTPException(status_code=404, detail="No contract version found")
@@ -711,20 +726,12 @@ async def chat_with_contract(
 
         return StreamingResponse(mock_stream(), media_type="text/event-stream")
 
-    import anthropic
-
-    client = anthropic.Anthropic(api_key=api_key)
+    from llm.anthropic_client import stream_chat
 
     async def stream_response():
         try:
-            with client.messages.stream(
-                model="claude-sonnet-4-20250514",
-                max_tokens=1024,
-                system=system_prompt,
-                messages=messages,
-            ) as stream:
-                for text in stream.text_stream:
-                    yield f"data: {json.dumps({'text': text})}\n\n"
+            async for text in stream_chat(system_prompt, messages, org_id=deal.organization_id):
+                yield f"data: {json.dumps({'text': text})}\n\n"
         except Exception as e:
             yield f"data: {json.dumps({'text': f'Error: {str(e)}'})}\n\n"
         yield "data: [DONE]\n\n"
@@ -819,15 +826,9 @@ async def get_public_timeline_pdf(
     """Download the Critical Dates PDF (public)."""
     link = await _get_active_link(session, token)
     deal = (await session.exec(select(Deal).where(Deal.id == link.deal_id))).first()
-    if not deal or not deal.timeline_pdf_base64:
-        raise HTTPException(status_code=404, detail="Timeline PDF not yet generated")
-
-    import base64
-    pdf_bytes = base64.b64decode(deal.timeline_pdf_base64)
-    return StreamingResponse(
-        io.BytesIO(pdf_bytes),
-        media_type="application/pdf",
-        headers={"Content-Disposition": f'attachment; filename="Critical_Dates_{deal.title}.pdf"'},
+    return blob_store.blob_response(
+        deal.timeline_pdf_blob if deal else None, "application/pdf",
+        f"Critical_Dates_{deal.title if deal else ''}.pdf", "Timeline PDF not yet generated",
     )
 
 
@@ -872,7 +873,6 @@ async def public_upload_deliverable_file(
     session: AsyncSession = Depends(get_session),
 ):
     """Counterparty uploads a file for their assigned deliverable (multipart)."""
-    import base64
     from models.deliverable import Deliverable
 
     link = await _get_active_link(session, token)
@@ -888,12 +888,10 @@ async def public_upload_deliverable_file(
     if not d:
         raise HTTPException(status_code=404, detail="Deliverable not found or not assigned to you")
 
-    content = await file.read()
-    if len(content) > 10 * 1024 * 1024:
-        raise HTTPException(status_code=413, detail="File exceeds 10 MB limit")
+    digest, _ = await store_upload(file, 10 * 1024 * 1024, "File exceeds 10 MB limit")
 
     d.filename = file.filename
-    d.file_content_base64 = base64.b64encode(content).decode()
+    d.file_blob = digest
     d.status = "submitted"
     d.submitted_at = datetime.utcnow()
     d.updated_at = datetime.utcnow()
@@ -910,6 +908,7 @@ async def public_upload_deliverable_file(
         },
     )
     session.add(event)
+    await refresh_deal_health_for_event_async(session, event)
 
     # Notify deal participants
     from services.notifications import notify_deal_participants
@@ -955,6 +954,8 @@ async def get_contract_insight(
         select(ContractVersion)
         .where(ContractVersion.deal_id == link.deal_id)
         .order_by(ContractVersion.version_number.desc())
+        .limit(1)
+        .options(*ContractVersion.with_text())
     )).first()
     if not version:
         return {"insight": None}
@@ -963,19 +964,17 @@ async def get_contract_insight(
     if not api_key:
         return {"insight": "This contract is ready for your review. Use the AI chat to ask specific questions about terms, obligations, and deadlines."}
 
-    import anthropic
+    from llm.anthropic_client import generate_text_async
     try:
-        client = anthropic.Anthropic(api_key=api_key)
         contract_preview = (version.full_text or "")[:3000]
         fields_str = json.dumps(version.extracted_fields, indent=2) if version.extracted_fields else ""
 
-        response = client.messages.create(
-            model="claude-sonnet-4-20250514",
-            max_tokens=200,
+        insight = await generate_text_async(
+            f"Contract title: {deal.title}\n\nKey fields:\n{fields_str}\n\nContract text (preview):\n{contract_preview}",
             system="Give a 2-3 sentence insight about the most important thing a reviewer should know about this contract. Focus on key obligations, deadlines, or financial terms. Be specific with numbers and dates from the contract. Do not use markdown.",
-            messages=[{"role": "user", "content": f"Contract title: {deal.title}\n\nKey fields:\n{fields_str}\n\nContract text (preview):\n{contract_preview}"}],
+            max_tokens=200,
+            org_id=deal.organization_id,
         )
-        insight = response.content[0].text
     except Exception:
         insight = "This contract is ready for your review. Use the AI chat to ask specific questions."
 
@@ -998,12 +997,11 @@ async def public_transcribe_voice(
     """Transcribe audio for public review users."""
     await _get_active_link(session, token)
 
-    audio_bytes = await file.read()
-    if len(audio_bytes) > MAX_AUDIO_SIZE:
-        raise HTTPException(status_code=413, detail="Audio file too large. Maximum 25 MB.")
+    check_upload_size(file, MAX_AUDIO_SIZE, "Audio file too large. Maximum 25 MB.")
+    await file.seek(0)
 
     try:
-        text = await transcribe_audio(audio_bytes, file.filename or "audio.webm")
+        text = await transcribe_audio(file.file, file.filename or "audio.webm")
     except Exception as e:
         raise HTTPException(status_code=502, detail=f"Transcription failed: {str(e)}")
 
@@ -8,22 +8,20 @@ from sqlmodel import select, desc
 from database import get_session
 from models.user import User
 from models.contract import ContractVersion
-from models.job import JobRecord
 from schemas.contracts import ContractVersionResponse, DiffResponse
 from schemas.change_requests import GenerateVersionRequest, GenerateVersionResponse
 from services.auth import get_current_user
 from services.rbac import check_deal_access
-from services.diffing import compute_diff, compute_field_changes
-import asyncio
-from workers.inline_runner import run_generate_version
+from services.diffing import cached_version_diff, compute_field_changes, compute_word_diff
+from workers.queue import enqueue_job, ensure_queue_capacity
 
 router = APIRouter(prefix="/deals/{deal_id}/versions", tags=["versions"])
 
 
-def _version_response(v: ContractVersion) -> ContractVersionResponse:
+def _version_response(v: ContractVersion, include_text: bool = True) -> ContractVersionResponse:
     return ContractVersionResponse(
         id=str(v.id), deal_id=str(v.deal_id), version_number=v.version_number,
-        full_text=v.full_text, extracted_fields=v.extracted_fields,
+        full_text=v.full_text if include_text else None, extracted_fields=v.extracted_fields,
         clause_tags=v.clause_tags, contract_type=v.contract_type,
         change_summary=v.change_summary, source=v.source,
         source_cr_id=str(v.source_cr_id) if v.source_cr_id else None,
@@ -41,13 +39,11 @@ async def generate_new_version(
     user: User = Depends(get_current_user),
 ):
     await check_deal_access(session, user, deal_id)
+    await ensure_queue_capacity(session, "generate_version")
 
-    job_id = str(uuid.uuid4())
-    job = JobRecord(id=job_id, deal_id=deal_id, job_type="generate_version", status="pending")
-    session.add(job)
-    await session.commit()
-
-    asyncio.create_task(run_generate_version(job_id, str(deal_id), req.change_request_id, str(user.id)))
+    job_id = await enqueue_job(session, deal_id, "generate_version", {
+        "deal_id": str(deal_id), "cr_id": req.change_request_id, "user_id": str(user.id),
+    })
 
     return GenerateVersionResponse(job_id=job_id, status="pending")
 
@@ -55,16 +51,20 @@ async def generate_new_version(
 @router.get("", response_model=list[ContractVersionResponse])
 async def list_versions(
     deal_id: uuid.UUID,
+    include_text: bool = Query(default=False, description="Include each version's full_text"),
     session: AsyncSession = Depends(get_session),
     user: User = Depends(get_current_user),
 ):
     await check_deal_access(session, user, deal_id)
-    result = await session.exec(
+    stmt = (
         select(ContractVersion)
         .where(ContractVersion.deal_id == deal_id)
         .order_by(ContractVersion.version_number)
     )
-    return [_version_response(v) for v in result.all()]
+    if include_text:
+        stmt = stmt.options(*ContractVersion.with_text())
+    result = await session.exec(stmt)
+    return [_version_response(v, include_text) for v in result.all()]
 
 
 @router.get("/{version_id}", response_model=ContractVersionResponse)
@@ -76,9 +76,9 @@ async def get_version(
 ):
     await check_deal_access(session, user, deal_id)
     result = await session.exec(
-        select(ContractVersion).where(
-            ContractVersion.id == version_id, ContractVersion.deal_id == deal_id
-        )
+        select(ContractVersion)
+        .where(ContractVersion.id == version_id, ContractVersion.deal_id == deal_id)
+        .options(*ContractVersion.with_text())
     )
     v = result.first()
     if not v:
@@ -91,15 +91,18 @@ async def get_diff(
     deal_id: uuid.UUID,
     version_id: uuid.UUID,
     against: str = Query(default="prev", description="Version ID or 'prev'"),
+    mode: str = Query(default="line", pattern="^(line|word)$", description="'line' or 'word'"),
     session: AsyncSession = Depends(get_session),
     user: User = Depends(get_current_user),
 ):
     await check_deal_access(session, user, deal_id)
+    # Line diffs are usually read from version_diffs; only word diffs need the text
+    text_options = ContractVersion.with_text() if mode == "word" else ()
 
     result = await session.exec(
-        select(ContractVersion).where(
-            ContractVersion.id == version_id, ContractVersion.deal_id == deal_id
-        )
+        select(ContractVersion)
+        .where(ContractVersion.id == version_id, ContractVersion.deal_id == deal_id)
+        .options(*text_options)
     )
     version_b = result.first()
     if not version_b:
@@ -110,7 +113,7 @@ async def get_diff(
             select(ContractVersion).where(
                 ContractVersion.deal_id == deal_id,
                 ContractVersion.version_number == version_b.version_number - 1,
-            )
+            ).options(*text_options)
         )
         version_a = result.first()
         if not version_a:
@@ -120,13 +123,16 @@ async def get_diff(
             select(ContractVersion).where(
                 ContractVersion.id == uuid.UUID(against),
                 ContractVersion.deal_id == deal_id,
-            )
+            ).options(*text_options)
         )
         version_a = result.first()
         if not version_a:
             raise HTTPException(status_code=404, detail="Comparison version not found")
 
-    diff = compute_diff(version_a.full_text, version_b.full_text)
+    if mode == "word":
+        diff = compute_word_diff(version_a.full_text, version_b.full_text)
+    else:
+        diff = await session.run_sync(cached_version_diff, version_a, version_b)
     field_changes = compute_field_changes(version_a.extracted_fields, version_b.extracted_fields)
 
     return DiffResponse(
@@ -135,6 +141,8 @@ async def get_diff(
         version_a_number=version_a.version_number,
         version_b_number=version_b.version_number,
         diff_html=diff["diff_html"],
-        diff_lines=diff["diff_lines"],
+        diff_lines=diff.get("diff_lines", []),
         field_changes=field_changes,
+        mode=mode,
+        diff_ops=diff.get("diff_ops"),
     )
@@ -1,7 +1,9 @@
 from __future__ import annotations
 
-from pydantic import BaseModel
-from typing import Optional, Union
+import uuid
+
+from pydantic import BaseModel, Field
+from typing import Literal, Optional, Union
 from datetime import datetime
 
 
@@ -13,7 +15,7 @@ class ContractVersionResponse(BaseModel):
     id: str
     deal_id: str
     version_number: int
-    full_text: str
+    full_text: Optional[str] = None  # omitted by list endpoints unless include_text=true
     extracted_fields: Optional[dict]
     clause_tags: Optional[list]
     contract_type: str
@@ -37,6 +39,8 @@ class DiffResponse(BaseModel):
     diff_html: str
     diff_lines: list
     field_changes: Optional[list] = None
+    mode: str = "line"
+    diff_ops: Optional[list] = None  # word mode: span ops, see services.diffing.compute_word_diff
 
 
 class ContractTemplateResponse(BaseModel):
@@ -82,6 +86,37 @@ class PDFGenerateResponse(BaseModel):
     warnings: list[str]
 
 
+class PDFBatchFillItem(BaseModel):
+    deal_id: uuid.UUID
+    template_slug: str
+    deal_data: Optional[dict] = None  # Override data; if None, uses extracted_fields
+    flatten: bool = False
+
+
+class PDFBatchFillRequest(BaseModel):
+    items: list[PDFBatchFillItem] = Field(min_length=1)
+    output: Literal["zip", "blobs"] = "zip"
+
+
+class PDFBatchFillResult(BaseModel):
+    deal_id: str
+    template_slug: str
+    template_version: str
+    filename: str
+    blob: Optional[str] = None  # sha256 digest; download from download_url
+    download_url: Optional[str] = None
+    size: int = 0
+    warnings: list[str]
+    error: Optional[str] = None
+
+
+class PDFBatchFillResponse(BaseModel):
+    items: list[PDFBatchFillResult]
+    filled: int
+    failed: int
+    warnings: list[str]  # Every item's warnings, prefixed with its filename
+
+
 class PDFTemplateInfo(BaseModel):
     slug: str
     name: str
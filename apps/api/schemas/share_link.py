@@ -106,6 +106,8 @@ class PublicDiffResponse(BaseModel):
     version_b_number: int
     diff_html: str
     field_changes: list
+    mode: str = "line"
+    diff_ops: Optional[list] = None
 
 
 class FieldChangeItem(BaseModel):
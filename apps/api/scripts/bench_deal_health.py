@@ -0,0 +1,69 @@
+"""
+Deal health benchmark — query count and wall time of compute_deals_health_batch.
+Run: python scripts/bench_deal_health.py [database_url]
+Defaults to an in-memory SQLite database seeded with synthetic deals.
+"""
+
+import os
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import event
+from sqlmodel import SQLModel, Session, create_engine
+
+from models.user import User
+from models.deal import Deal
+from models.audit import AuditEvent
+from models.change_request import ChangeRequest
+from models.contract import ContractVersion
+from services.deal_health import compute_deals_health_batch
+
+DB_URL = sys.argv[1] if len(sys.argv) > 1 else "sqlite://"
+SIZES = (10, 100, 500, 2000)
+
+
+def seed(session: Session, n: int) -> list[uuid.UUID]:
+    owner = uuid.uuid4()
+    now = datetime.utcnow()
+    ids = []
+    for i in range(n):
+        deal = Deal(title=f"Bench deal {i}", created_by=owner, created_at=now - timedelta(days=i % 20))
+        session.add(deal)
+        ids.append(deal.id)
+        for j in range(3):
+            session.add(AuditEvent(deal_id=deal.id, action="bench", created_at=now - timedelta(days=(i + j) % 9)))
+        for _ in range(i % 3):
+            session.add(ChangeRequest(deal_id=deal.id, raw_text="bench", created_by=owner))
+        for v in range(i % 5):
+            session.add(ContractVersion(deal_id=deal.id, version_number=v, full_text="bench", created_by=owner))
+    session.commit()
+    return ids
+
+
+def run():
+    engine = create_engine(DB_URL)
+    SQLModel.metadata.create_all(engine, tables=[
+        User.__table__, Deal.__table__, AuditEvent.__table__,
+        ChangeRequest.__table__, ContractVersion.__table__,
+    ])
+    queries = []
+    event.listen(engine, "before_cursor_execute", lambda *args: queries.append(args[2]))
+
+    with Session(engine) as session:
+        ids = seed(session, max(SIZES))
+        print(f"{'deals':>8} {'queries':>8} {'ms':>10}")
+        for n in SIZES:
+            queries.clear()
+            start = time.perf_counter()
+            compute_deals_health_batch(session, ids[:n])
+            elapsed = (time.perf_counter() - start) * 1000
+            print(f"{n:>8} {len(queries):>8} {elapsed:>10.1f}")
+        print(f"\nPrevious per-deal engine: 4 queries per deal ({4 * max(SIZES)} for {max(SIZES)} deals)")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,120 @@
+"""
+Version diff benchmark — 100-page contracts, difflib vs patience diff vs stored diff.
+Run: python scripts/bench_diff.py [--pages 100] [--lines-per-page 50] [--repeats 5]
+
+"difflib" is the previous compute_diff (difflib.unified_diff over full
+texts); "patience" is services.diffing.compute_diff; "stored" is a
+cached_version_diff hit against a throwaway SQLite file.
+"""
+
+import argparse
+import difflib
+import os
+import random
+import sys
+import tempfile
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def make_contract(pages: int, lines_per_page: int, rng: random.Random) -> list[str]:
+    words = ("buyer seller closing deposit escrow title inspection period shall days "
+             "property agreement party notice contract date price terms purchase").split()
+    lines = []
+    for page in range(pages):
+        lines.append(f"{page + 1}. SECTION {page + 1}\n")
+        for _ in range(lines_per_page - 1):
+            lines.append(" ".join(rng.choice(words) for _ in range(12)) + ".\n")
+        # Boilerplate repeated on every page: never unique, so left to the Myers fallback
+        lines.append("Buyer's Initials ______ Seller's Initials ______\n")
+        lines.append("\n")
+    return lines
+
+
+def edit(lines: list[str], fraction: float, rng: random.Random) -> list[str]:
+    result = list(lines)
+    for _ in range(max(1, int(len(lines) * fraction))):
+        i = rng.randrange(len(result))
+        op = rng.random()
+        if op < 0.5:
+            result[i] = "Amended: " + result[i]
+        elif op < 0.75:
+            del result[i]
+        else:
+            result.insert(i, "Additional term agreed by the parties.\n")
+    return result
+
+
+def legacy_diff(text_a: str, text_b: str) -> list[str]:
+    return list(difflib.unified_diff(
+        text_a.splitlines(keepends=True), text_b.splitlines(keepends=True),
+        fromfile="Version A", tofile="Version B", lineterm="",
+    ))
+
+
+def timed(fn, repeats: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    return (time.perf_counter() - start) / repeats * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, default=100)
+    parser.add_argument("--lines-per-page", type=int, default=50)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    if "DATABASE_URL_SYNC" not in os.environ:
+        path = os.path.join(tempfile.mkdtemp(), "bench_diff.db")
+        os.environ["DATABASE_URL_SYNC"] = f"sqlite:///{path}"
+
+    from sqlmodel import Session, SQLModel
+
+    from database import sync_engine
+    from models.contract import ContractVersion
+    from models.version_diff import VersionDiff
+    from services.diffing import cached_version_diff, compute_diff
+
+    SQLModel.metadata.create_all(sync_engine, tables=[ContractVersion.__table__, VersionDiff.__table__])
+    rng = random.Random(42)
+    base = make_contract(args.pages, args.lines_per_page, rng)
+    text_a = "".join(base)
+    print(f"{args.pages} pages, {len(base)} lines, {len(text_a) / 1024:.0f} KB; ms per diff\n")
+    print(f"{'edit':<14} {'difflib':>9} {'patience':>9} {'stored':>9} {'lines':>7}")
+
+    deal_id, user_id = uuid.uuid4(), uuid.uuid4()
+    for label, fraction in (("one field", 0.0), ("1% of lines", 0.01), ("10% of lines", 0.10)):
+        changed = edit(base, fraction, rng) if fraction else [
+            line.replace("SECTION 42", "SECTION 42 (AMENDED)") for line in base
+        ]
+        text_b = "".join(changed)
+
+        legacy_ms = timed(lambda: legacy_diff(text_a, text_b), args.repeats)
+        patience_ms = timed(lambda: compute_diff(text_a, text_b), args.repeats)
+
+        with Session(sync_engine) as session:
+            # expire_on_commit=False keeps ids readable after the session closes
+            session.expire_on_commit = False
+            v_a = ContractVersion(deal_id=deal_id, full_text=text_a, created_by=user_id)
+            v_b = ContractVersion(deal_id=deal_id, version_number=1, full_text=text_b, created_by=user_id)
+            session.add_all([v_a, v_b])
+            session.commit()
+            cached_version_diff(session, v_a, v_b)
+
+        def stored():
+            # Fresh session each time, so the row is read from the database
+            with Session(sync_engine) as session:
+                cached_version_diff(session, v_a, v_b)
+
+        stored_ms = timed(stored, args.repeats)
+
+        changed_lines = sum(1 for line in compute_diff(text_a, text_b)["diff_lines"] if line[:1] in "+-")
+        print(f"{label:<14} {legacy_ms:>9.1f} {patience_ms:>9.1f} {stored_ms:>9.1f} {changed_lines:>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Job executor benchmark — the same job mix through each executor, mock LLM.
+Run: python scripts/bench_executors.py [--jobs 60] [--concurrency 8] [--latency-ms 200] [--celery]
+
+Uses a throwaway SQLite file unless DATABASE_URL_SYNC is set. --celery also
+measures CeleryJobExecutor; it needs Redis and a Celery worker
+(celery -A workers.celery_app:celery_app worker) on the same database.
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+JOB_MIX = ("parse_contract", "analyze_change_request", "generate_version")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--jobs", type=int, default=60)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency-ms", type=int, default=200, help="simulated LLM round trip")
+    parser.add_argument("--celery", action="store_true")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    os.environ["LLM_MOCK_MODE"] = "true"
+    os.environ["LLM_MOCK_LATENCY_MS"] = str(args.latency_ms)
+    os.environ.setdefault("RESEND_API_KEY", "")
+    if "DATABASE_URL_SYNC" not in os.environ:
+        path = os.path.join(tempfile.mkdtemp(), "bench_executors.db")
+        os.environ["DATABASE_URL_SYNC"] = f"sqlite:///{path}"
+
+    from sqlmodel import SQLModel, Session, func, select
+
+    from database import sync_engine
+    from llm.anthropic_client import MOCK_ANALYZE_RESULT
+    from models.audit import AuditEvent
+    from models.change_request import ChangeRequest
+    from models.contract import ContractVersion
+    from models.deal import Deal, DealAssignment
+    from models.deal_health import DealHealth
+    from models.job import JobRecord
+    from models.llm_cache import LLMCacheEntry
+    from models.notification import Notification
+    from models.user import User
+    from workers import executors
+    from workers.queue import JobRef, QueueWorker, new_job
+
+    SQLModel.metadata.create_all(sync_engine, tables=[
+        User.__table__, Deal.__table__, DealAssignment.__table__, ContractVersion.__table__,
+        ChangeRequest.__table__, AuditEvent.__table__, DealHealth.__table__,
+        JobRecord.__table__, Notification.__table__, LLMCacheEntry.__table__,
+    ])
+
+    def seed_jobs(n: int) -> list[JobRef]:
+        owner = uuid.uuid4()
+        jobs = []
+        with Session(sync_engine) as session:
+            for i in range(n):
+                deal = Deal(title=f"Bench deal {i}", created_by=owner)
+                version = ContractVersion(deal_id=deal.id, full_text="Purchase price $350,000. " * 400, created_by=owner)
+                cr = ChangeRequest(
+                    deal_id=deal.id, raw_text="Raise price to $360,000", created_by=owner,
+                    analysis_status="completed", analysis_result=dict(MOCK_ANALYZE_RESULT),
+                )
+                session.add_all([deal, version, cr])
+                job_type = JOB_MIX[i % len(JOB_MIX)]
+                payload = {"deal_id": str(deal.id)}
+                if job_type == "parse_contract":
+                    payload["version_id"] = str(version.id)
+                else:
+                    payload["cr_id"] = str(cr.id)
+                if job_type == "generate_version":
+                    payload["user_id"] = str(owner)
+                job = new_job(deal.id, job_type, payload, max_attempts=1)
+                session.add(job)
+                jobs.append(JobRef(job.id, job_type))
+            session.commit()
+        return jobs
+
+    def wait_for_queue_to_drain(timeout: float = 600) -> None:
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            with Session(sync_engine) as session:
+                open_jobs = session.exec(
+                    select(func.count()).select_from(JobRecord)
+                    .where(JobRecord.status.in_(["pending", "processing"]))
+                ).one()
+            if not open_jobs:
+                return
+            time.sleep(0.05)
+        raise TimeoutError("jobs did not finish")
+
+    def failed_count(job_ids: list[str]) -> int:
+        with Session(sync_engine) as session:
+            return session.exec(
+                select(func.count()).select_from(JobRecord)
+                .where(JobRecord.id.in_(job_ids), JobRecord.status == "failed")
+            ).one()
+
+    runs = ["queue (thread pool)", "queue (process pool)", "thread", "process"]
+    if args.celery:
+        runs.append("celery")
+
+    print(f"{args.jobs} jobs ({', '.join(JOB_MIX)}), concurrency {args.concurrency}, "
+          f"mock LLM latency {args.latency_ms} ms\n")
+    print(f"{'executor':<22} {'jobs':>6} {'seconds':>9} {'jobs/s':>8} {'failed':>7}")
+
+    for name in runs:
+        jobs = seed_jobs(args.jobs)
+        worker = None
+        start = time.perf_counter()
+        if name.startswith("queue"):
+            pool = "process" if "process" in name else "thread"
+            executors._executor = executors.QueueJobExecutor()
+            worker = QueueWorker(concurrency=args.concurrency, pool=pool, poll_interval=0.05)
+            worker.start()
+        else:
+            executors._executor = executors.make_executor(name, args.concurrency)
+            for job in jobs:
+                executors._executor.submit(job.id, job.job_type)
+        wait_for_queue_to_drain()
+        elapsed = time.perf_counter() - start
+        if worker:
+            worker.stop()
+        executors._executor.shutdown()
+        failed = failed_count([job.id for job in jobs])
+        print(f"{name:<22} {len(jobs):>6} {elapsed:>9.2f} {len(jobs) / elapsed:>8.1f} {failed:>7}")
+
+    print("\nTimings include follow-up risk_analysis jobs queued by parse_contract.")
+
+
+if __name__ == "__main__":
+    main()
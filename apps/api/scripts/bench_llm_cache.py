@@ -0,0 +1,60 @@
+"""
+LLM response cache benchmark — repeated parse_contract prompts, mock LLM.
+Run: python scripts/bench_llm_cache.py [--contracts 20] [--repeats 5] [--latency-ms 2000]
+
+Uses a throwaway SQLite file unless DATABASE_URL_SYNC is set. --latency-ms
+stands in for the real API round trip a cache miss pays.
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--contracts", type=int, default=20)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--latency-ms", type=int, default=2000)
+    args = parser.parse_args()
+
+    os.environ["LLM_MOCK_MODE"] = "true"
+    os.environ["LLM_MOCK_LATENCY_MS"] = str(args.latency_ms)
+    if "DATABASE_URL_SYNC" not in os.environ:
+        path = os.path.join(tempfile.mkdtemp(), "bench_llm_cache.db")
+        os.environ["DATABASE_URL_SYNC"] = f"sqlite:///{path}"
+
+    from sqlmodel import SQLModel
+
+    from database import sync_engine
+    from llm.anthropic_client import generate_json
+    from llm.cache import cache_stats
+    from models.llm_cache import LLMCacheEntry
+    from workers.registry import read_prompt
+
+    SQLModel.metadata.create_all(sync_engine, tables=[LLMCacheEntry.__table__])
+    template = read_prompt("parse_contract_v1.md")
+    prompts = [
+        template.replace("{contract_text}", f"Contract {i}. Purchase price ${300_000 + i * 1000}. " * 200)
+        for i in range(args.contracts)
+    ]
+
+    print(f"{args.contracts} contracts x {args.repeats} parses, mock LLM latency {args.latency_ms} ms\n")
+    print(f"{'round':<8} {'calls':>6} {'total s':>9} {'ms/call':>9}")
+    for round_no in range(1, args.repeats + 1):
+        start = time.perf_counter()
+        for prompt in prompts:
+            generate_json(prompt, "Return the contract analysis JSON.", cache_as="parse_contract_v1")
+        elapsed = time.perf_counter() - start
+        label = "miss" if round_no == 1 else "hit"
+        print(f"{round_no} ({label}) {len(prompts):>6} {elapsed:>9.2f} {elapsed / len(prompts) * 1000:>9.1f}")
+
+    print(f"\n{cache_stats()}")
+
+
+if __name__ == "__main__":
+    main()
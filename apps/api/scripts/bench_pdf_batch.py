@@ -0,0 +1,58 @@
+"""
+Batch PDF form fill benchmark — fills per second by pool size.
+Run: python scripts/bench_pdf_batch.py [--items 40] [--workers 0,1,2,4]
+
+Fills --items copies of the form-field version of far_bar_asis (see
+bench_pdf_fill.py) with services.pdf_batch.fill_batch. "0" fills on one
+thread of the calling process, as the single-PDF endpoints do; other
+values run a process pool of that size. Pools are capped at the CPU
+count, so throughput only scales on a machine with that many cores.
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_pdf_fill import DEAL_DATA, build_templates_dir  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--items", type=int, default=40)
+    parser.add_argument("--workers", default="0,1,2,4")
+    args = parser.parse_args()
+
+    from services import pdf_batch
+    from services.pdf_form_filler import PDFFormFiller
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf_batch.settings.storage_path = os.path.join(tmp, "storage")
+        filler = PDFFormFiller(templates_dir=build_templates_dir(Path(tmp) / "templates", 400))
+        requests = [
+            pdf_batch.FillRequest("far_bar_asis", {**DEAL_DATA, "purchase_price": 300000 + i})
+            for i in range(args.items)
+        ]
+        print(f"{args.items} fills of far_bar_asis, {os.cpu_count()} CPUs\n")
+        print(f"{'workers':>7} {'effective':>9} {'seconds':>8} {'fills/s':>8}")
+        for workers in (int(w) for w in args.workers.split(",")):
+            pdf_batch.settings.pdf_fill_workers = workers
+            pdf_batch._discard_pool()
+            # Warm up: start the processes and let each parse the template
+            asyncio.run(pdf_batch.fill_batch(requests[:max(workers, 1) * 2], filler))
+            start = time.perf_counter()
+            results = asyncio.run(pdf_batch.fill_batch(requests, filler))
+            seconds = time.perf_counter() - start
+            assert all(r.blob for r in results), [r.error for r in results if r.error]
+            effective = pdf_batch._worker_count() if workers > 0 else 0
+            print(f"{workers:>7} {effective:>9} {seconds:>8.2f} {args.items / seconds:>8.1f}")
+        pdf_batch._discard_pool()
+
+
+if __name__ == "__main__":
+    main()
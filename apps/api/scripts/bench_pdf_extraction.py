@@ -0,0 +1,102 @@
+"""
+PDF text extraction benchmark — serial pdfplumber walk vs page-parallel pool.
+Run: python scripts/bench_pdf_extraction.py [--pages 60] [--workers 4] [--repeats 3]
+
+"serial" is the previous extract_text_from_pdf (one process, page by page);
+"pool" is services.ingestion.extract_text_from_pdf with --workers processes.
+"loop lag" is the worst delay seen by a 10 ms asyncio ticker while the
+extraction runs on a thread, as the API does: the serial walk holds the GIL,
+the pool does not. Speedup is bounded by the cores available.
+"""
+
+import argparse
+import asyncio
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def make_pdf(pages: int) -> bytes:
+    from reportlab.lib.pagesizes import letter
+    from reportlab.pdfgen import canvas
+
+    words = ("buyer seller closing deposit escrow title inspection period shall days "
+             "property agreement party notice contract date price terms purchase").split()
+    buf = io.BytesIO()
+    c = canvas.Canvas(buf, pagesize=letter)
+    for page in range(pages):
+        c.setFont("Helvetica", 9)
+        for line in range(60):
+            text = " ".join(words[(page + line + i) % len(words)] for i in range(16))
+            c.drawString(40, 750 - 12 * line, f"{page + 1}.{line + 1} {text}")
+        c.showPage()
+    c.save()
+    return buf.getvalue()
+
+
+def serial_extract(data: bytes) -> str:
+    import pdfplumber
+
+    parts = []
+    with pdfplumber.open(io.BytesIO(data)) as pdf:
+        for page in pdf.pages:
+            text = page.extract_text()
+            if text:
+                parts.append(text)
+    return "\n\n".join(parts)
+
+
+async def loop_lag(fn) -> tuple[float, float]:
+    """(seconds fn took on a thread, worst ticker delay in ms)."""
+    worst = 0.0
+    done = False
+
+    async def ticker():
+        nonlocal worst
+        while not done:
+            start = time.perf_counter()
+            await asyncio.sleep(0.01)
+            worst = max(worst, time.perf_counter() - start - 0.01)
+
+    task = asyncio.create_task(ticker())
+    start = time.perf_counter()
+    await asyncio.to_thread(fn)
+    elapsed = time.perf_counter() - start
+    done = True
+    await task
+    return elapsed, worst * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, default=60)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    from services import ingestion
+
+    ingestion.settings.pdf_extraction_workers = args.workers
+    data = make_pdf(args.pages)
+    print(f"{args.pages} pages, {len(data) / 1024:.0f} KB PDF, {args.workers} workers, "
+          f"{os.cpu_count()} CPUs\n")
+
+    # Warm the pool so process start-up isn't billed to the first run
+    ingestion.extract_text_from_pdf(data)
+    assert ingestion.extract_text_from_pdf(data) == serial_extract(data)
+
+    print(f"{'method':<8} {'seconds':>8} {'loop lag ms':>12}")
+    for label, fn in (("serial", serial_extract), ("pool", ingestion.extract_text_from_pdf)):
+        runs = [asyncio.run(loop_lag(lambda: fn(data))) for _ in range(args.repeats)]
+        seconds = min(r[0] for r in runs)
+        lag = max(r[1] for r in runs)
+        print(f"{label:<8} {seconds:>8.2f} {lag:>12.0f}")
+
+    ingestion._discard_pool()
+
+
+if __name__ == "__main__":
+    main()
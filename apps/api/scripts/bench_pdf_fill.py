@@ -0,0 +1,141 @@
+"""
+PDF form fill benchmark — per-field widget scan vs indexed template.
+Run: python scripts/bench_pdf_fill.py [--extra-fields 400] [--repeats 20]
+
+The shipped far_bar_asis.pdf is a flat copy of the form, so the benchmark
+adds a widget for every mapped field plus --extra-fields unmapped ones
+(the official form has several hundred) and fills that with the real
+far_bar_asis mapping.
+
+"scan" is the previous fill_pdf: the template is opened from disk on each
+call and every page's widgets are walked for each mapped field. "indexed"
+is services.pdf_form_filler.PDFFormFiller.fill_pdf after the template has
+been indexed once (it also serializes the result through a file instead
+of Document.tobytes()).
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+DEAL_DATA = {
+    "buyer_name": "John Smith",
+    "seller_name": "Jane Doe",
+    "buyer_agent": "Maria Lopez",
+    "seller_agent": "Tom Baker",
+    "property_address": "123 Main St",
+    "property_city": "Miami",
+    "property_county": "Miami-Dade",
+    "property_zip": "33101",
+    "legal_description": "LOT 4 BLOCK 7 OF SUNNY ISLES ESTATES, PB 44-12",
+    "purchase_price": 350000,
+    "earnest_money": 10000,
+    "additional_deposit": 5000,
+    "loan_amount": 280000,
+    "closing_date": "2024-06-15",
+    "financing_type": "Conventional",
+    "inspection_contingency": True,
+}
+
+
+def build_templates_dir(root: Path, extra_fields: int) -> Path:
+    """Copy of templates/ whose far_bar_asis.pdf has form fields."""
+    import fitz
+
+    src = Path(__file__).resolve().parent.parent / "templates"
+    shutil.copytree(src / "mappings", root / "mappings")
+    mapping = json.loads((root / "mappings" / "far_bar_asis.json").read_text())
+    groups = mapping["field_mappings"]
+    fields = [(c["pdf_field_name"], fitz.PDF_WIDGET_TYPE_TEXT)
+              for name in ("text_fields", "calculated_fields") for c in groups.get(name, {}).values()]
+    fields += [(c["pdf_field_name"], fitz.PDF_WIDGET_TYPE_CHECKBOX)
+               for c in groups.get("checkbox_fields", {}).values()]
+    fields += [(f"Unmapped{i}", fitz.PDF_WIDGET_TYPE_TEXT) for i in range(extra_fields)]
+
+    doc = fitz.open(src / mapping["pdf_file"])
+    per_page = -(-len(fields) // len(doc))
+    for i, (name, field_type) in enumerate(fields):
+        page = doc[i // per_page]
+        slot = i % per_page
+        x, y = 40 + (slot % 4) * 135, 40 + (slot // 4) * 14
+        widget = fitz.Widget()
+        widget.field_name = name
+        widget.field_type = field_type
+        widget.rect = fitz.Rect(x, y, x + 125, y + 12)
+        page.add_widget(widget)
+    out = root / mapping["pdf_file"]
+    out.parent.mkdir(parents=True, exist_ok=True)
+    doc.save(out)
+    doc.close()
+    return root
+
+
+def scan_fill(filler, slug: str, deal_data: dict) -> bytes:
+    """The previous fill_pdf, without transforms and warnings."""
+    import fitz
+
+    def fill(doc, field_name, value):
+        for page in doc:
+            for widget in page.widgets():
+                if widget.field_name == field_name:
+                    widget.field_value = value
+                    widget.update()
+                    return
+
+    mapping = filler.get_mapping(slug)
+    groups = mapping["field_mappings"]
+    doc = fitz.open(str(filler.templates_dir / mapping["pdf_file"]))
+    try:
+        for key, config in groups.get("text_fields", {}).items():
+            value = filler._get_nested_value(deal_data, key)
+            if value is not None:
+                fill(doc, config["pdf_field_name"], filler._format_value(value, config.get("format")))
+        for config in groups.get("checkbox_fields", {}).values():
+            checked = filler._evaluate_condition(config["condition"], deal_data)
+            fill(doc, config["pdf_field_name"], "Yes" if checked else "Off")
+        return doc.tobytes()
+    finally:
+        doc.close()
+
+
+def best(fn, repeats: int) -> float:
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--extra-fields", type=int, default=400)
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+
+    from services.pdf_form_filler import PDFFormFiller
+
+    with tempfile.TemporaryDirectory() as tmp:
+        filler = PDFFormFiller(templates_dir=build_templates_dir(Path(tmp), args.extra_fields))
+        template = filler.get_template("far_bar_asis")
+        _, warnings = filler.fill_pdf("far_bar_asis", DEAL_DATA)
+        assert not warnings, warnings
+        print(f"far_bar_asis: {len(template.fields)} fields, {len(template.pdf_bytes) / 1024:.0f} KB\n")
+
+        print(f"{'method':<8} {'ms/fill':>8}")
+        scan = best(lambda: scan_fill(filler, "far_bar_asis", DEAL_DATA), args.repeats)
+        indexed = best(lambda: filler.fill_pdf("far_bar_asis", DEAL_DATA), args.repeats)
+        for label, seconds in (("scan", scan), ("indexed", indexed)):
+            print(f"{label:<8} {seconds * 1000:>8.1f}")
+        print(f"\n{scan / indexed:.1f}x faster")
+
+
+if __name__ == "__main__":
+    main()
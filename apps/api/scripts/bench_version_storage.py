@@ -0,0 +1,100 @@
+"""
+Contract version storage benchmark — full text per version vs keyframes + deltas.
+Run: python scripts/bench_version_storage.py [--deals 20] [--versions 30] [--kb 80]
+
+Each deal gets --versions versions of a ~--kb KB contract, each differing
+from the previous one in a few lines. Reports stored text bytes and the time
+to load the latest version and read its full_text (cold and warm text cache).
+Uses throwaway SQLite files unless DATABASE_URL_SYNC is set.
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def contract(kb: int) -> list[str]:
+    rng = random.Random(1)
+    words = "buyer seller closing deposit escrow title inspection shall days property notice price".split()
+    lines, size, n = [], 0, 0
+    while size < kb * 1024:
+        n += 1
+        line = f"{n}. " + " ".join(rng.choice(words) for _ in range(14)) + ".\n"
+        lines.append(line)
+        size += len(line)
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--deals", type=int, default=20)
+    parser.add_argument("--versions", type=int, default=30)
+    parser.add_argument("--kb", type=int, default=80)
+    args = parser.parse_args()
+
+    if "DATABASE_URL_SYNC" not in os.environ:
+        os.environ["DATABASE_URL_SYNC"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'unused.db')}"
+
+    from sqlalchemy import func
+    from sqlmodel import Session, SQLModel, create_engine, select
+
+    from models.contract import ContractVersion
+    from services import text_deltas
+
+    base = contract(args.kb)
+    print(f"{args.deals} deals x {args.versions} versions of {args.kb} KB\n")
+    print(f"{'interval':>9} {'stored MB':>10} {'latest cold ms':>15} {'latest warm ms':>15}")
+
+    for interval in (1, 5, 10):
+        text_deltas.settings.contract_keyframe_interval = interval
+        text_deltas._cache.clear()
+        engine = create_engine(f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench_versions.db')}")
+        SQLModel.metadata.create_all(engine, tables=[ContractVersion.__table__])
+        rng = random.Random(2)
+        deal_ids = [uuid.uuid4() for _ in range(args.deals)]
+        for deal_id in deal_ids:
+            lines = list(base)
+            for n in range(args.versions):
+                for _ in range(3):
+                    i = rng.randrange(len(lines))
+                    lines[i] = lines[i].replace(".\n", f" (amended v{n}).\n")
+                with Session(engine) as session:
+                    session.add(ContractVersion(
+                        deal_id=deal_id, version_number=n, full_text="".join(lines), created_by=uuid.uuid4(),
+                    ))
+                    session.commit()
+
+        with Session(engine) as session:
+            stored = session.exec(select(
+                func.sum(func.length(ContractVersion.stored_text))
+                + func.coalesce(func.sum(func.length(ContractVersion.text_delta)), 0)
+            )).one()
+
+        def latest_all():
+            for deal_id in deal_ids:
+                with Session(engine) as session:
+                    version = session.exec(
+                        select(ContractVersion)
+                        .where(ContractVersion.deal_id == deal_id)
+                        .order_by(ContractVersion.version_number.desc())
+                    ).first()
+                    assert len(version.full_text) > 0
+
+        text_deltas._cache.clear()
+        start = time.perf_counter()
+        latest_all()
+        cold = (time.perf_counter() - start) / len(deal_ids) * 1000
+        start = time.perf_counter()
+        latest_all()
+        warm = (time.perf_counter() - start) / len(deal_ids) * 1000
+        print(f"{interval:>9} {stored / 1e6:>10.1f} {cold:>15.2f} {warm:>15.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""
+Local stand-in for the Resend API, for running the email outbox offline.
+Run: python scripts/resend_stub.py [--port 8025] [--fail 500,429]
+
+Then start the API (or python -m workers.email_sender) with
+RESEND_API_URL=http://127.0.0.1:8025 and any RESEND_API_KEY. Accepted
+emails are printed instead of sent. --fail answers the first requests
+with the given statuses, to exercise retries.
+
+Implements POST /emails and POST /emails/batch, including Idempotency-Key
+replay. Tests use ResendStub in-process.
+"""
+
+import argparse
+import json
+import threading
+import uuid
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Iterable, Optional
+
+
+class ResendStub:
+    """Records every request and every accepted email.
+
+    fail_next(*statuses) answers the next requests with those statuses;
+    drop_next(n) accepts the next n requests but closes the connection
+    instead of answering, like a response lost in transit; reject(address)
+    answers 422 to any request addressed to it.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, echo: bool = False):
+        self.requests: list[dict] = []
+        self.emails: list[dict] = []
+        self.rejected: set[str] = set()
+        self.echo = echo
+        self._failures: deque[int] = deque()
+        self._drops = 0
+        self._replies: dict[str, tuple[int, dict]] = {}
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def fail_next(self, *statuses: int) -> None:
+        self._failures.extend(statuses)
+
+    def drop_next(self, n: int = 1) -> None:
+        self._drops += n
+
+    def _take_drop(self) -> bool:
+        with self._lock:
+            if self._drops:
+                self._drops -= 1
+                return True
+            return False
+
+    def reject(self, address: str) -> None:
+        self.rejected.add(address)
+
+    def start(self) -> "ResendStub":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def paths(self) -> list[str]:
+        return [r["path"] for r in self.requests]
+
+    def _respond(self, path: str, body, idempotency_key: Optional[str]) -> tuple[int, dict]:
+        with self._lock:
+            self.requests.append({"path": path, "body": body, "idempotency_key": idempotency_key})
+            if self._failures:
+                return self._failures.popleft(), {"message": "Injected failure"}
+            if idempotency_key and idempotency_key in self._replies:
+                return self._replies[idempotency_key]
+
+            if path == "/emails":
+                emails = [body]
+            elif path == "/emails/batch" and isinstance(body, list):
+                emails = body
+                if any("attachments" in email for email in emails):
+                    return 422, {"message": "Attachments are not supported in batch emails"}
+            else:
+                return 404, {"message": "Not found"}
+
+            if any(self.rejected.intersection(_recipients(email)) for email in emails):
+                return 422, {"message": "Invalid `to` field"}
+
+            ids = []
+            for email in emails:
+                email_id = str(uuid.uuid4())
+                self.emails.append({**email, "id": email_id})
+                ids.append(email_id)
+                if self.echo:
+                    print(f"[{email_id}] to {', '.join(_recipients(email))}: {email.get('subject')}", flush=True)
+            reply = (200, {"id": ids[0]} if path == "/emails" else {"data": [{"id": i} for i in ids]})
+            if idempotency_key:
+                self._replies[idempotency_key] = reply
+            return reply
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                try:
+                    body = json.loads(self.rfile.read(length) or b"null")
+                except ValueError:
+                    status, reply = 400, {"message": "Invalid JSON"}
+                else:
+                    status, reply = stub._respond(self.path, body, self.headers.get("Idempotency-Key"))
+                    if stub._take_drop():
+                        self.close_connection = True
+                        return
+                data = json.dumps(reply).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+def _recipients(email: dict) -> Iterable[str]:
+    to = email.get("to") or []
+    return [to] if isinstance(to, str) else to
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8025)
+    parser.add_argument("--fail", default="", help="comma-separated statuses for the first requests")
+    args = parser.parse_args()
+
+    stub = ResendStub(args.host, args.port, echo=True)
+    if args.fail:
+        stub.fail_next(*(int(s) for s in args.fail.split(",")))
+    print(f"Resend stub on {stub.url}", flush=True)
+    try:
+        stub._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""Content-addressed blob store on local disk.
+
+Binary files (timeline PDFs, deliverable uploads, filled contract PDFs) live
+under {settings.storage_path}/blobs, named by the SHA-256 of their content,
+instead of as base64 text in hot tables. Rows keep only the 64-char digest.
+Identical content is stored once; blobs are written atomically
+(temp file + rename) so a reader never sees a partial file.
+
+Downloads are served with blob_response, which streams from disk and honours
+Range requests.
+
+Refs (read_ref/write_ref) name a blob by a key other than its content, e.g.
+the inputs a rendered PDF was built from, so the render can be reused.
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import re
+import tempfile
+from typing import BinaryIO, Optional
+
+from fastapi import HTTPException
+from fastapi.responses import FileResponse
+
+from config import settings
+
+CHUNK_SIZE = 1024 * 1024
+_DIGEST_RE = re.compile(r"^[0-9a-f]{64}$")
+_REF_NAMESPACE_RE = re.compile(r"^[a-z0-9_-]+$")
+
+
+def blob_root() -> str:
+    return os.path.join(settings.storage_path, "blobs")
+
+
+def blob_path(digest: str) -> str:
+    if not _DIGEST_RE.match(digest or ""):
+        raise ValueError(f"Invalid blob digest: {digest!r}")
+    return os.path.join(blob_root(), digest[:2], digest[2:4], digest)
+
+
+def exists(digest: Optional[str]) -> bool:
+    return bool(digest) and os.path.exists(blob_path(digest))
+
+
+def _commit_temp(tmp_path: str, digest: str) -> None:
+    path = blob_path(digest)
+    if os.path.exists(path):
+        # Deduplicated: same content already stored
+        os.unlink(tmp_path)
+        return
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    os.replace(tmp_path, path)
+
+
+def _temp_file():
+    os.makedirs(blob_root(), exist_ok=True)
+    return tempfile.NamedTemporaryFile(dir=blob_root(), prefix=".tmp-", delete=False)
+
+
+def put_bytes(data: bytes) -> str:
+    """Store data; returns its digest."""
+    digest = hashlib.sha256(data).hexdigest()
+    if os.path.exists(blob_path(digest)):
+        return digest
+    with _temp_file() as tmp:
+        tmp.write(data)
+    _commit_temp(tmp.name, digest)
+    return digest
+
+
+class BlobTooLarge(ValueError):
+    pass
+
+
+def put_file(fileobj: BinaryIO, max_size: Optional[int] = None) -> tuple[str, int]:
+    """Store a file object chunk by chunk, hashing as it is copied; returns
+    (digest, size). Raises BlobTooLarge, leaving nothing behind, as soon as
+    more than max_size bytes have been read."""
+    sha = hashlib.sha256()
+    size = 0
+    with _temp_file() as tmp:
+        while chunk := fileobj.read(CHUNK_SIZE):
+            size += len(chunk)
+            if max_size is not None and size > max_size:
+                break
+            sha.update(chunk)
+            tmp.write(chunk)
+    if max_size is not None and size > max_size:
+        os.unlink(tmp.name)
+        raise BlobTooLarge(f"Blob exceeds {max_size} bytes")
+    digest = sha.hexdigest()
+    _commit_temp(tmp.name, digest)
+    return digest, size
+
+
+def read_bytes(digest: str) -> bytes:
+    with open(blob_path(digest), "rb") as f:
+        return f.read()
+
+
+def _ref_path(namespace: str, key: str) -> str:
+    if not _REF_NAMESPACE_RE.match(namespace):
+        raise ValueError(f"Invalid ref namespace: {namespace!r}")
+    # Keys are hashed, so any string is a safe file name
+    name = hashlib.sha256(key.encode("utf-8")).hexdigest()
+    return os.path.join(blob_root(), "refs", namespace, name[:2], name)
+
+
+def read_ref(namespace: str, key: str) -> Optional[str]:
+    """Digest stored under key, if the ref and its blob both exist."""
+    try:
+        with open(_ref_path(namespace, key)) as f:
+            digest = f.read().strip()
+    except FileNotFoundError:
+        return None
+    return digest if _DIGEST_RE.match(digest) and exists(digest) else None
+
+
+def write_ref(namespace: str, key: str, digest: str) -> None:
+    blob_path(digest)  # validates
+    path = _ref_path(namespace, key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with _temp_file() as tmp:
+        tmp.write(digest.encode("ascii"))
+    os.replace(tmp.name, path)
+
+
+def blob_response(digest: Optional[str], media_type: str, filename: str, missing_detail: str) -> FileResponse:
+    """Stream a blob as a download (Range requests supported). 404 with
+    missing_detail if there is no blob or its file is gone."""
+    if not exists(digest):
+        raise HTTPException(status_code=404, detail=missing_detail)
+    return FileResponse(blob_path(digest), media_type=media_type, filename=filename)
@@ -0,0 +1,116 @@
+"""Section-aware chunking and bounded fan-out for long contracts.
+
+Prompts used to see only full_text[:15000], silently dropping the tail of
+long FAR/BAR contracts. Texts over SINGLE_PROMPT_MAX_CHARS are instead split
+on section headings into chunks of at most CHUNK_MAX_CHARS, each chunk is
+sent through the per-chunk prompt concurrently, and the caller merges the
+results deterministically (in chunk order).
+
+Chunks are exact slices: "".join(split_contract(text)) == text.
+"""
+from __future__ import annotations
+
+import contextvars
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, TypeVar
+
+from config import settings
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+SINGLE_PROMPT_MAX_CHARS = 15000
+CHUNK_MAX_CHARS = 8000
+
+# Start of a section: "12. CLOSING DATE", "A. TITLE:", "ARTICLE 4", "STANDARDS FOR
+# REAL ESTATE TRANSACTIONS", or any other short all-caps line.
+_HEADING_RE = re.compile(
+    r"^[ \t]*(?:"
+    r"(?:\d{1,3}|[A-Z])\.[ \t]+[A-Z][A-Z0-9 ,'&/()\-]{2,}"
+    r"|(?:ARTICLE|SECTION|ADDENDUM|STANDARDS?|EXHIBIT|SCHEDULE|RIDER)\b[^\n]*"
+    r"|[A-Z][A-Z0-9 ,'&/()\-]{5,80}:?[ \t]*$"
+    r")",
+    re.MULTILINE,
+)
+
+
+def needs_chunking(text: str) -> bool:
+    return len(text or "") > SINGLE_PROMPT_MAX_CHARS
+
+
+def split_sections(text: str) -> list[str]:
+    """Split at section headings; the first piece holds any preamble."""
+    starts = sorted({0} | {m.start() for m in _HEADING_RE.finditer(text)})
+    ends = starts[1:] + [len(text)]
+    return [text[a:b] for a, b in zip(starts, ends) if b > a]
+
+
+def _split_at(text: str, separator: str, max_chars: int) -> list[str]:
+    """Greedy split after `separator` so pieces stay within max_chars where
+    the text allows it."""
+    pieces, current = [], ""
+    parts = text.split(separator)
+    for i, part in enumerate(parts):
+        part = part + separator if i < len(parts) - 1 else part
+        if current and len(current) + len(part) > max_chars:
+            pieces.append(current)
+            current = ""
+        current += part
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def _split_long(section: str, max_chars: int) -> list[str]:
+    """Break one oversized section at paragraphs, then lines, then hard."""
+    result = []
+    for paragraph in _split_at(section, "\n\n", max_chars):
+        if len(paragraph) <= max_chars:
+            result.append(paragraph)
+            continue
+        for line in _split_at(paragraph, "\n", max_chars):
+            result.extend(line[i:i + max_chars] for i in range(0, len(line), max_chars))
+    return result
+
+
+def split_contract(text: str, max_chars: int = CHUNK_MAX_CHARS) -> list[str]:
+    """Pack whole sections into chunks of at most max_chars. A section longer
+    than max_chars is split on its own at paragraph or line boundaries."""
+    chunks, current = [], ""
+    for section in split_sections(text):
+        if len(section) > max_chars:
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.extend(_split_long(section, max_chars))
+            continue
+        if current and len(current) + len(section) > max_chars:
+            chunks.append(current)
+            current = ""
+        current += section
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def map_chunks(fn: Callable[[T], R], items: list[T], max_workers: int | None = None) -> list[R]:
+    """Apply fn to every item on a bounded thread pool; results in input
+    order. Each call keeps the caller's context (e.g. the LLM org scope).
+    The first exception, in input order, is re-raised."""
+    if len(items) <= 1:
+        return [fn(item) for item in items]
+    max_workers = min(max_workers or settings.llm_map_concurrency, len(items))
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="llm-map") as pool:
+        futures = [pool.submit(contextvars.copy_context().run, fn, item) for item in items]
+        return [future.result() for future in futures]
+
+
+def sum_meta(metas: list[dict]) -> dict:
+    """Token usage of a fanned-out call, for _meta bookkeeping."""
+    return {
+        "input_tokens": sum(m.get("input_tokens") or 0 for m in metas),
+        "output_tokens": sum(m.get("output_tokens") or 0 for m in metas),
+        "model": next((m.get("model") for m in metas if m.get("model")), None),
+        "chunks": len(metas),
+    }
@@ -0,0 +1,92 @@
+"""Contract parsing — field extraction and clause tagging via the LLM.
+
+Contracts up to SINGLE_PROMPT_MAX_CHARS are parsed with one prompt. Longer
+ones are split into sections (services/chunking.py), each chunk is parsed
+with the same prompt, and the partial results are merged in chunk order so
+the outcome does not depend on which call finished first.
+"""
+from __future__ import annotations
+
+import json
+import logging
+from pathlib import Path
+
+from llm.anthropic_client import generate_json
+from services.chunking import map_chunks, needs_chunking, split_contract, sum_meta
+
+logger = logging.getLogger(__name__)
+
+PROMPTS_DIR = Path(__file__).parent.parent / "prompts"
+PROMPT_VERSION = "parse_contract_v1"
+MAX_QUESTIONS = 3
+
+
+def _parse_chunk(text: str) -> dict:
+    prompt = (PROMPTS_DIR / f"{PROMPT_VERSION}.md").read_text().replace("{contract_text}", text)
+    return generate_json(prompt, "Return the contract analysis JSON.", cache_as=PROMPT_VERSION)
+
+
+def parse_contract_text(text: str) -> dict:
+    """Extract contract_type, fields, clauses and questions from the full text.
+    The result carries summed token usage in _meta."""
+    if not needs_chunking(text):
+        return _parse_chunk(text)
+
+    chunks = split_contract(text)
+    logger.info("Parsing contract in %s chunks (%s chars)", len(chunks), len(text))
+    results = map_chunks(_parse_chunk, chunks)
+    merged = merge_parse_results(results)
+    merged["_meta"] = sum_meta([r.get("_meta") or {} for r in results])
+    return merged
+
+
+def merge_parse_results(results: list[dict]) -> dict:
+    """Combine per-chunk parses, earliest chunk first.
+
+    - fields: the first non-null value wins; a later, different value adds a
+      question instead of silently overriding it
+    - clauses: union by key in order of first appearance; "removed" wins
+      because waivers are explicit
+    - contract_type: FAR_BAR_ASIS if any chunk recognised the form
+    """
+    fields: dict = {}
+    conflicts: dict[str, list] = {}
+    clauses: dict[str, dict] = {}
+    questions: list[str] = []
+    contract_type = "UNKNOWN"
+
+    for result in results:
+        if result.get("contract_type") == "FAR_BAR_ASIS":
+            contract_type = "FAR_BAR_ASIS"
+
+        for name, value in (result.get("fields") or {}).items():
+            if value is None:
+                fields.setdefault(name, None)
+            elif fields.get(name) is None:
+                fields[name] = value
+            elif fields[name] != value and value not in conflicts.setdefault(name, []):
+                conflicts[name].append(value)
+
+        for clause in result.get("clauses") or []:
+            key = clause.get("key")
+            if not key:
+                continue
+            if key not in clauses:
+                clauses[key] = dict(clause)
+            elif clause.get("status") == "removed":
+                clauses[key]["status"] = "removed"
+
+        for question in result.get("questions") or []:
+            if question not in questions:
+                questions.append(question)
+
+    conflict_questions = [
+        f"{name} appears with different values ({json.dumps([fields[name], *values])}); which one applies?"
+        for name, values in conflicts.items() if values
+    ]
+    return {
+        "contract_type": contract_type,
+        "fields": fields,
+        "clauses": list(clauses.values()),
+        "questions": (conflict_questions + questions)[:MAX_QUESTIONS],
+    }
@@ -5,42 +5,56 @@ import logging
 from datetime import datetime, timedelta
 from typing import Optional
 
+from sqlalchemy import or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlmodel import Session, select, func
 from models.deal import Deal
+from models.deal_health import DealHealth
 from models.audit import AuditEvent
 from models.change_request import ChangeRequest
 from models.contract import ContractVersion
 
 logger = logging.getLogger(__name__)
 
+# Audit actions that change a deal's open CR count or version count. Actions
+# outside these sets only bump last activity; anything missed here is
+# repaired by reconcile_deal_health.
+CR_EVENTS = {
+    "change_request_created",
+    "change_request_accepted",
+    "change_request_rejected",
+    "change_request_countered",
+    "batch_accept",
+    "batch_reject",
+    "batch_counter",
+    "external_feedback_received",
+    "external_feedback_batch_received",
+    "external_counter_response",
+}
+VERSION_EVENTS = {
+    "contract_uploaded",
+    "contract_pasted",
+    "contract_ai_generated",
+    "version_generated",
+}
 
-def compute_deal_health(session: Session, deal_id: uuid.UUID) -> dict:
-    """Compute health metrics for a single deal.
-
-    Returns:
-        dict with health_score, health_status, days_since_last_activity,
-        days_in_current_state, open_crs, versions_count, issues
-    """
-    deal = session.get(Deal, deal_id)
-    if not deal:
-        return {"health_score": 0, "health_status": "at_risk", "issues": ["Deal not found"]}
 
-    now = datetime.utcnow()
+def _score_health(
+    now: datetime,
+    created_at: datetime,
+    updated_at: Optional[datetime],
+    current_state: str,
+    last_activity_at: Optional[datetime],
+    open_crs_count: int,
+    versions_count: int,
+) -> dict:
+    """Score a deal from its already-loaded health inputs."""
     score = 100
     issues: list[str] = []
 
     # Days since last activity (from latest AuditEvent)
-    latest_event = session.exec(
-        select(AuditEvent)
-        .where(AuditEvent.deal_id == deal_id)
-        .order_by(AuditEvent.created_at.desc())
-        .limit(1)
-    ).first()
-
-    if latest_event:
-        days_since_activity = (now - latest_event.created_at).days
-    else:
-        days_since_activity = (now - deal.created_at).days
+    days_since_activity = (now - (last_activity_at or created_at)).days
 
     if days_since_activity > 2:
         penalty = min(30, (days_since_activity - 2) * 5)
@@ -48,35 +62,20 @@ def compute_deal_health(session: Session, deal_id: uuid.UUID) -> dict:
         issues.append(f"No activity in {days_since_activity} days")
 
     # Days in current state
-    state_ref = deal.updated_at or deal.created_at
+    state_ref = updated_at or created_at
     days_in_state = (now - state_ref).days
 
     if days_in_state > 3:
         penalty = min(40, (days_in_state - 3) * 8)
         score -= penalty
-        state_label = deal.current_state.replace("_", " ")
+        state_label = current_state.replace("_", " ")
         issues.append(f"Stuck in {state_label} for {days_in_state} days")
 
-    # Open CRs count
-    open_crs_count = session.exec(
-        select(func.count()).select_from(ChangeRequest).where(
-            ChangeRequest.deal_id == deal_id,
-            ChangeRequest.status == "open",
-        )
-    ).one()
-
     if open_crs_count > 0:
         penalty = min(20, open_crs_count * 5)
         score -= penalty
         issues.append(f"{open_crs_count} open CRs pending")
 
-    # Version count
-    versions_count = session.exec(
-        select(func.count()).select_from(ContractVersion).where(
-            ContractVersion.deal_id == deal_id,
-        )
-    ).one()
-
     if versions_count > 3:
         penalty = min(10, (versions_count - 3) * 2)
         score -= penalty
@@ -102,43 +101,296 @@ def compute_deal_health(session: Session, deal_id: uuid.UUID) -> dict:
     }
 
 
+def _deal_not_found() -> dict:
+    return {"health_score": 0, "health_status": "at_risk", "issues": ["Deal not found"]}
+
+
+def compute_deal_health(session: Session, deal_id: uuid.UUID) -> dict:
+    """Compute health metrics for a single deal.
+
+    Returns:
+        dict with health_score, health_status, days_since_last_activity,
+        days_in_current_state, open_crs, versions_count, issues
+    """
+    return compute_deals_health_batch(session, [deal_id])[str(deal_id)]
+
+
+def _load_health_inputs(session: Session, deal_ids: list[uuid.UUID]) -> dict[uuid.UUID, dict]:
+    """Load health inputs for a deal set with four grouped queries."""
+    deal_rows = session.exec(
+        select(Deal.id, Deal.created_at, Deal.updated_at, Deal.current_state)
+        .where(Deal.id.in_(deal_ids))
+    ).all()
+
+    last_activity = dict(session.exec(
+        select(AuditEvent.deal_id, func.max(AuditEvent.created_at))
+        .where(AuditEvent.deal_id.in_(deal_ids))
+        .group_by(AuditEvent.deal_id)
+    ).all())
+
+    open_crs = dict(session.exec(
+        select(ChangeRequest.deal_id, func.count())
+        .where(
+            ChangeRequest.deal_id.in_(deal_ids),
+            ChangeRequest.status == "open",
+        )
+        .group_by(ChangeRequest.deal_id)
+    ).all())
+
+    versions = dict(session.exec(
+        select(ContractVersion.deal_id, func.count())
+        .where(ContractVersion.deal_id.in_(deal_ids))
+        .group_by(ContractVersion.deal_id)
+    ).all())
+
+    return {
+        did: {
+            "created_at": created_at,
+            "updated_at": updated_at,
+            "current_state": current_state,
+            "last_activity_at": last_activity.get(did),
+            "open_crs_count": open_crs.get(did, 0),
+            "versions_count": versions.get(did, 0),
+        }
+        for did, created_at, updated_at, current_state in deal_rows
+    }
+
+
 def compute_deals_health_batch(session: Session, deal_ids: list[uuid.UUID]) -> dict[str, dict]:
-    """Compute health for multiple deals. Returns {deal_id_str: health_dict}."""
+    """Compute health for multiple deals. Returns {deal_id_str: health_dict}.
+
+    All inputs are loaded with four set-based queries (deal columns, latest
+    audit event, open CR count and version count, each grouped by deal), so
+    the number of round trips does not grow with len(deal_ids).
+    """
+    if not deal_ids:
+        return {}
+
+    inputs = _load_health_inputs(session, deal_ids)
+    now = datetime.utcnow()
     result = {}
     for did in deal_ids:
-        result[str(did)] = compute_deal_health(session, did)
+        deal_inputs = inputs.get(did)
+        if deal_inputs is None:
+            result[str(did)] = _deal_not_found()
+            continue
+        result[str(did)] = _score_health(now, **deal_inputs)
     return result
 
 
+# ── Materialized health rows ────────────────────────────────────────────────
+
+
+def _score_expires_at(now: datetime, *refs: datetime) -> datetime:
+    """Next moment a day counter derived from refs ticks over."""
+    return min(ref + timedelta(days=(now - ref).days + 1) for ref in refs)
+
+
+def _apply_to_row(row: DealHealth, inputs: dict, now: datetime) -> None:
+    health = _score_health(now, **inputs)
+    row.last_activity_at = inputs["last_activity_at"]
+    row.open_cr_count = inputs["open_crs_count"]
+    row.versions_count = inputs["versions_count"]
+    row.state_entered_at = inputs["updated_at"] or inputs["created_at"]
+    row.score = health["health_score"]
+    row.status = health["health_status"]
+    row.score_expires_at = _score_expires_at(
+        now, row.last_activity_at or inputs["created_at"], row.state_entered_at,
+    )
+    row.updated_at = now
+
+
+def _insert_rows(session: Session, deal_ids: list[uuid.UUID]) -> dict[uuid.UUID, DealHealth]:
+    """Create health rows for deals that had none, returning them by deal id.
+
+    Two requests can both find a deal's row missing (the table starts empty
+    after migration 016). The inserts run in a savepoint, so the loser only
+    undoes its own insert and re-reads the row the winner wrote; the caller's
+    transaction (e.g. the audit event being recorded) is kept. A deal deleted
+    meanwhile is left out.
+    """
+    if not deal_ids:
+        return {}
+    try:
+        with session.begin_nested():
+            rows = {did: DealHealth(deal_id=did) for did in deal_ids}
+            session.add_all(rows.values())
+        return rows
+    except IntegrityError:
+        logger.info("Health rows for %s deal(s) created concurrently", len(deal_ids))
+
+    if len(deal_ids) > 1:
+        rows = {}
+        for did in deal_ids:
+            rows.update(_insert_rows(session, [did]))
+        return rows
+    row = session.get(DealHealth, deal_ids[0])
+    return {row.deal_id: row} if row else {}
+
+
+def health_from_row(deal: Deal, row: DealHealth, now: Optional[datetime] = None) -> dict:
+    """Build the health dict for a deal from its materialized row."""
+    return _score_health(
+        now or datetime.utcnow(),
+        created_at=deal.created_at,
+        updated_at=row.state_entered_at,
+        current_state=deal.current_state,
+        last_activity_at=row.last_activity_at,
+        open_crs_count=row.open_cr_count,
+        versions_count=row.versions_count,
+    )
+
+
+def refresh_deal_health(
+    session: Session,
+    deal_id: uuid.UUID,
+    activity_at: Optional[datetime] = None,
+    recount_crs: bool = False,
+    recount_versions: bool = False,
+) -> Optional[DealHealth]:
+    """Update a deal's health row in place. Does not commit.
+
+    Only the inputs that changed are re-read: activity_at bumps the last
+    activity timestamp, recount_crs / recount_versions re-count with a single
+    indexed query. The state timestamp is always taken from the deal row, so
+    transition_state is covered by the event it records.
+    """
+    deal = session.exec(
+        select(Deal.created_at, Deal.updated_at, Deal.current_state).where(Deal.id == deal_id)
+    ).first()
+    if not deal:
+        return None
+    created_at, updated_at, current_state = deal
+
+    row = session.get(DealHealth, deal_id)
+    if row is None:
+        row = _insert_rows(session, [deal_id]).get(deal_id)
+        if row is None:
+            return None
+        inputs = _load_health_inputs(session, [deal_id])[deal_id]
+    else:
+        inputs = {
+            "created_at": created_at,
+            "updated_at": updated_at,
+            "current_state": current_state,
+            "last_activity_at": row.last_activity_at,
+            "open_crs_count": row.open_cr_count,
+            "versions_count": row.versions_count,
+        }
+        if activity_at and (row.last_activity_at is None or activity_at > row.last_activity_at):
+            inputs["last_activity_at"] = activity_at
+        if recount_crs:
+            inputs["open_crs_count"] = session.exec(
+                select(func.count()).select_from(ChangeRequest).where(
+                    ChangeRequest.deal_id == deal_id,
+                    ChangeRequest.status == "open",
+                )
+            ).one()
+        if recount_versions:
+            inputs["versions_count"] = session.exec(
+                select(func.count()).select_from(ContractVersion).where(
+                    ContractVersion.deal_id == deal_id,
+                )
+            ).one()
+
+    _apply_to_row(row, inputs, datetime.utcnow())
+    session.add(row)
+    return row
+
+
+def refresh_deal_health_for_event(session: Session, event: AuditEvent) -> Optional[DealHealth]:
+    """Apply a just-recorded audit event to the deal's health row. Does not commit."""
+    return refresh_deal_health(
+        session, event.deal_id,
+        activity_at=event.created_at,
+        recount_crs=event.action in CR_EVENTS,
+        recount_versions=event.action in VERSION_EVENTS,
+    )
+
+
+async def refresh_deal_health_for_event_async(session: AsyncSession, event: AuditEvent) -> Optional[DealHealth]:
+    return await session.run_sync(refresh_deal_health_for_event, event)
+
+
+def reconcile_deal_health(
+    session: Session,
+    deal_ids: Optional[list[uuid.UUID]] = None,
+    batch_size: int = 1000,
+) -> int:
+    """Recompute health rows from source tables, repairing drift and
+    refreshing time-decayed scores. Commits per batch. Returns rows written."""
+    if deal_ids is None:
+        deal_ids = list(session.exec(select(Deal.id)).all())
+
+    written = 0
+    for i in range(0, len(deal_ids), batch_size):
+        chunk = deal_ids[i:i + batch_size]
+        rows = {
+            r.deal_id: r
+            for r in session.exec(select(DealHealth).where(DealHealth.deal_id.in_(chunk))).all()
+        }
+        inputs = _load_health_inputs(session, chunk)
+        rows.update(_insert_rows(session, [did for did in inputs if did not in rows]))
+        now = datetime.utcnow()
+        for did, deal_inputs in inputs.items():
+            row = rows.get(did)
+            if row is None:
+                continue
+            _apply_to_row(row, deal_inputs, now)
+            session.add(row)
+            written += 1
+        session.commit()
+    return written
+
+
+def refresh_expired_deal_health(session: Session, deal_scope) -> int:
+    """Reconcile rows in deal_scope (a select of Deal.id) that are missing or
+    whose score has decayed since it was stored. Returns rows written."""
+    stale_ids = session.exec(
+        select(Deal.id)
+        .outerjoin(DealHealth, DealHealth.deal_id == Deal.id)
+        .where(
+            Deal.id.in_(deal_scope),
+            or_(DealHealth.deal_id.is_(None), DealHealth.score_expires_at <= datetime.utcnow()),
+        )
+    ).all()
+    if not stale_ids:
+        return 0
+    return reconcile_deal_health(session, list(stale_ids))
+
+
 def detect_stale_deals(session: Session, org_id: uuid.UUID, threshold_days: int = 7) -> list[dict]:
     """Find deals with no activity in threshold_days."""
     cutoff = datetime.utcnow() - timedelta(days=threshold_days)
 
-    # Get all org deals
-    deals = session.exec(
-        select(Deal).where(
+    # Get all open org deals with their latest activity in one grouped query
+    latest = (
+        select(AuditEvent.deal_id, func.max(AuditEvent.created_at).label("last_activity_at"))
+        .join(Deal, Deal.id == AuditEvent.deal_id)
+        .where(Deal.organization_id == org_id)
+        .group_by(AuditEvent.deal_id)
+        .subquery()
+    )
+    rows = session.exec(
+        select(Deal.id, Deal.title, Deal.current_state, Deal.created_at, latest.c.last_activity_at)
+        .outerjoin(latest, latest.c.deal_id == Deal.id)
+        .where(
             Deal.organization_id == org_id,
             Deal.current_state != "accepted",
         )
     ).all()
 
+    now = datetime.utcnow()
     stale = []
-    for deal in deals:
-        latest = session.exec(
-            select(AuditEvent)
-            .where(AuditEvent.deal_id == deal.id)
-            .order_by(AuditEvent.created_at.desc())
-            .limit(1)
-        ).first()
-
-        last_activity = latest.created_at if latest else deal.created_at
+    for deal_id, title, current_state, created_at, last_activity_at in rows:
+        last_activity = last_activity_at or created_at
         if last_activity < cutoff:
-            days = (datetime.utcnow() - last_activity).days
+            days = (now - last_activity).days
             stale.append({
-                "deal_id": str(deal.id),
-                "title": deal.title,
+                "deal_id": str(deal_id),
+                "title": title,
                 "days_inactive": days,
-                "current_state": deal.current_state,
+                "current_state": current_state,
             })
 
     return stale
@@ -1,10 +1,31 @@
-"""Deterministic diff computation between contract versions."""
+"""Deterministic diff computation between contract versions.
+
+Line diffs use patience diff over hashed lines (unique lines as anchors,
+Myers in between), which stays close to linear on contracts where most
+lines are unchanged, instead of difflib's SequenceMatcher. Rendered diffs
+are stored per version pair in version_diffs: generate_version stores the
+diff against the predecessor, and other pairs are stored on first request.
+
+compute_word_diff is the word-level mode: sections aligned first, then
+words diffed inside changed sections, returned as compact span ops.
+"""
 
 from __future__ import annotations
 
+import bisect
 import difflib
+import logging
+import re
 from typing import Optional
 
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session
+
+from models.contract import ContractVersion
+from models.version_diff import VersionDiff
+
+logger = logging.getLogger(__name__)
+
 
 def compute_field_changes(fields_a: Optional[dict], fields_b: Optional[dict]) -> list:
     """Compare extracted_fields between two versions and return a list of changes."""
@@ -24,12 +45,200 @@ def compute_field_changes(fields_a: Optional[dict], fields_b: Optional[dict]) ->
     return changes
 
 
+def _hash_lines(lines_a: list[str], lines_b: list[str]) -> tuple[list[int], list[int]]:
+    """Intern each distinct line to a small int so every later comparison is
+    an int compare instead of a string compare."""
+    ids: dict[str, int] = {}
+    a = [ids.setdefault(line, len(ids)) for line in lines_a]
+    b = [ids.setdefault(line, len(ids)) for line in lines_b]
+    return a, b
+
+
+def _unique_common(a: list[int], alo: int, ahi: int, b: list[int], blo: int, bhi: int) -> list[tuple[int, int]]:
+    """(i, j) for lines occurring exactly once in a[alo:ahi] and in b[blo:bhi],
+    in order of i."""
+    counts: dict[int, list] = {}
+    for i in range(alo, ahi):
+        entry = counts.setdefault(a[i], [0, i, 0, -1])
+        entry[0] += 1
+    for j in range(blo, bhi):
+        entry = counts.get(b[j])
+        if entry is not None:
+            entry[2] += 1
+            entry[3] = j
+    return sorted((e[1], e[3]) for e in counts.values() if e[0] == 1 and e[2] == 1)
+
+
+def _longest_increasing(pairs: list[tuple[int, int]]) -> list[tuple[int, int]]:
+    """Patience sorting: the longest subsequence of pairs whose j increases
+    (pairs are already sorted by i)."""
+    tails: list[int] = []  # index into pairs of the smallest tail of each pile
+    back: list[int] = [-1] * len(pairs)
+    tail_js: list[int] = []
+    for k, (_, j) in enumerate(pairs):
+        pile = bisect.bisect_left(tail_js, j)
+        if pile:
+            back[k] = tails[pile - 1]
+        if pile == len(tails):
+            tails.append(k)
+            tail_js.append(j)
+        else:
+            tails[pile] = k
+            tail_js[pile] = j
+    result = []
+    k = tails[-1] if tails else -1
+    while k >= 0:
+        result.append(pairs[k])
+        k = back[k]
+    return result[::-1]
+
+
+def _myers(a: list[int], alo: int, ahi: int, b: list[int], blo: int, bhi: int, max_d: int) -> list[tuple[int, int]]:
+    """Matched (i, j) pairs of a shortest edit script (Myers' O(ND) greedy
+    algorithm). Returns [] if more than max_d edits are needed; the range is
+    then reported as one replaced block."""
+    n, m = ahi - alo, bhi - blo
+    offset = max_d + 1
+    v = [0] * (2 * max_d + 3)
+    trace = []
+    for d in range(max_d + 1):
+        trace.append(v[:])
+        for k in range(-d, d + 1, 2):
+            if k == -d or (k != d and v[offset + k - 1] < v[offset + k + 1]):
+                x = v[offset + k + 1]
+            else:
+                x = v[offset + k - 1] + 1
+            y = x - k
+            while x < n and y < m and a[alo + x] == b[blo + y]:
+                x += 1
+                y += 1
+            v[offset + k] = x
+            if x >= n and y >= m:
+                return _myers_backtrack(a, alo, b, blo, trace, offset, n, m, d)
+    return []
+
+
+def _myers_backtrack(a, alo, b, blo, trace, offset, x, y, d) -> list[tuple[int, int]]:
+    pairs = []
+    for depth in range(d, 0, -1):
+        v = trace[depth]
+        k = x - y
+        if k == -depth or (k != depth and v[offset + k - 1] < v[offset + k + 1]):
+            prev_k = k + 1
+        else:
+            prev_k = k - 1
+        prev_x = v[offset + prev_k]
+        prev_y = prev_x - prev_k
+        while x > prev_x and y > prev_y:
+            x -= 1
+            y -= 1
+            pairs.append((alo + x, blo + y))
+        x, y = prev_x, prev_y
+    while x > 0 and y > 0:
+        x -= 1
+        y -= 1
+        pairs.append((alo + x, blo + y))
+    return pairs[::-1]
+
+
+MYERS_MAX_EDITS = 1000
+
+
+def _match(a: list[int], alo: int, ahi: int, b: list[int], blo: int, bhi: int, out: list) -> None:
+    """Patience diff: match the common prefix and suffix, anchor on lines
+    unique to both sides, recurse between anchors; Myers where no unique
+    line is left. Appends matched (i, j) pairs to out in order."""
+    while alo < ahi and blo < bhi and a[alo] == b[blo]:
+        out.append((alo, blo))
+        alo += 1
+        blo += 1
+    suffix = []
+    while alo < ahi and blo < bhi and a[ahi - 1] == b[bhi - 1]:
+        ahi -= 1
+        bhi -= 1
+        suffix.append((ahi, bhi))
+
+    if alo < ahi and blo < bhi:
+        anchors = _longest_increasing(_unique_common(a, alo, ahi, b, blo, bhi))
+        if anchors:
+            for i, j in anchors:
+                if i > alo and j > blo:
+                    _match(a, alo, i, b, blo, j, out)
+                out.append((i, j))
+                alo, blo = i + 1, j + 1
+            _match(a, alo, ahi, b, blo, bhi, out)
+        else:
+            out.extend(_myers(a, alo, ahi, b, blo, bhi, MYERS_MAX_EDITS))
+    out.extend(reversed(suffix))
+
+
+def matching_blocks(lines_a: list[str], lines_b: list[str]) -> list[tuple[int, int, int]]:
+    """Matching blocks in SequenceMatcher.get_matching_blocks() form,
+    computed with a patience diff over hashed lines."""
+    a, b = _hash_lines(lines_a, lines_b)
+    pairs: list[tuple[int, int]] = []
+    _match(a, 0, len(a), b, 0, len(b), pairs)
+    blocks = []
+    for i, j in pairs:
+        if blocks and blocks[-1][0] + blocks[-1][2] == i and blocks[-1][1] + blocks[-1][2] == j:
+            blocks[-1][2] += 1
+        else:
+            blocks.append([i, j, 1])
+    return [tuple(block) for block in blocks] + [(len(a), len(b), 0)]
+
+
+class _PatienceMatcher(difflib.SequenceMatcher):
+    """SequenceMatcher whose matching blocks come from matching_blocks(), so
+    get_opcodes()/get_grouped_opcodes() work unchanged. Skips the b2j index
+    SequenceMatcher builds on construction."""
+
+    def __init__(self, a: list[str], b: list[str]):
+        self.a, self.b = a, b
+        self.matching_blocks = None
+        self.opcodes = None
+
+    def get_matching_blocks(self):
+        if self.matching_blocks is None:
+            self.matching_blocks = matching_blocks(self.a, self.b)
+        return self.matching_blocks
+
+
+def unified_diff(a: list[str], b: list[str], fromfile: str = "", tofile: str = "", n: int = 3):
+    """difflib.unified_diff(..., lineterm="") output, from the patience matcher."""
+    started = False
+    for group in _PatienceMatcher(a, b).get_grouped_opcodes(n):
+        if not started:
+            started = True
+            yield f"--- {fromfile}"
+            yield f"+++ {tofile}"
+        first, last = group[0], group[-1]
+        yield f"@@ -{_format_range(first[1], last[2])} +{_format_range(first[3], last[4])} @@"
+        for tag, i1, i2, j1, j2 in group:
+            if tag == "equal":
+                for line in a[i1:i2]:
+                    yield " " + line
+                continue
+            if tag in ("replace", "delete"):
+                for line in a[i1:i2]:
+                    yield "-" + line
+            if tag in ("replace", "insert"):
+                for line in b[j1:j2]:
+                    yield "+" + line
+
+
+def _format_range(start: int, stop: int) -> str:
+    length = stop - start
+    if length == 1:
+        return str(start + 1)
+    return f"{start + 1 if length else start},{length}"
+
+
 def compute_diff(text_a: str, text_b: str) -> dict:
     """Compute a unified diff between two texts. Returns diff lines and an HTML representation."""
     lines_a = text_a.splitlines(keepends=True)
     lines_b = text_b.splitlines(keepends=True)
 
-    diff_lines = list(difflib.unified_diff(lines_a, lines_b, fromfile="Version A", tofile="Version B", lineterm=""))
+    diff_lines = list(unified_diff(lines_a, lines_b, fromfile="Version A", tofile="Version B"))
 
     # Build simple HTML diff
     html_parts = []
@@ -51,5 +260,144 @@ def compute_diff(text_a: str, text_b: str) -> dict:
     }
 
 
+# Words, runs of whitespace, single punctuation marks. Whitespace tokens
+# compare equal to each other so a reflowed paragraph is not a change.
+_TOKEN_RE = re.compile(r"\w+|\s+|[^\w\s]")
+WORD_DIFF_CONTEXT_CHARS = 80
+
+
+def _tokenize(text: str, start: int, end: int) -> tuple[list[str], list[int]]:
+    """Comparison keys and start offsets of the tokens in text[start:end];
+    offsets has one extra entry for the end."""
+    keys, offsets = [], []
+    for m in _TOKEN_RE.finditer(text, start, end):
+        token = m.group()
+        keys.append(" " if token.isspace() else token)
+        offsets.append(m.start())
+    offsets.append(end)
+    return keys, offsets
+
+
+def _add_op(ops: list[dict], op: str, a: tuple[int, int], b: tuple[int, int], text: str = "") -> None:
+    if a[0] == a[1] and b[0] == b[1]:
+        return
+    last = ops[-1] if ops else None
+    if last and last["op"] == op and last["a"][1] == a[0] and last["b"][1] == b[0]:
+        last["a"][1], last["b"][1] = a[1], b[1]
+        if op != "equal":
+            last["text"] += text
+        return
+    entry = {"op": op, "a": [a[0], a[1]], "b": [b[0], b[1]]}
+    if op != "equal":
+        entry["text"] = text
+    ops.append(entry)
+
+
+def _word_ops(text_a: str, alo: int, ahi: int, text_b: str, blo: int, bhi: int, ops: list[dict]) -> None:
+    keys_a, offs_a = _tokenize(text_a, alo, ahi)
+    keys_b, offs_b = _tokenize(text_b, blo, bhi)
+    for tag, i1, i2, j1, j2 in _PatienceMatcher(keys_a, keys_b).get_opcodes():
+        a = (offs_a[i1], offs_a[i2])
+        b = (offs_b[j1], offs_b[j2])
+        if tag == "equal":
+            _add_op(ops, "equal", a, b)
+            continue
+        if tag in ("replace", "delete"):
+            _add_op(ops, "delete", a, (b[0], b[0]), text_a[a[0]:a[1]])
+        if tag in ("replace", "insert"):
+            _add_op(ops, "insert", (a[1], a[1]), b, text_b[b[0]:b[1]])
+
+
+def compute_word_diff(text_a: str, text_b: str) -> dict:
+    """Word-level diff as compact span ops.
+
+    Sections (services/sections.py) are aligned first, so unchanged sections
+    become one equal span each and only changed sections are tokenized and
+    diffed word by word. Each op is {"op": "equal"|"insert"|"delete",
+    "a": [start, end], "b": [start, end]} with character offsets into
+    text_a / text_b; insert and delete ops also carry their "text".
+    """
+    from services.sections import split_into_sections
+
+    sections_a = [s.text for s in split_into_sections(text_a)]
+    sections_b = [s.text for s in split_into_sections(text_b)]
+    starts_a = [0]
+    for section in sections_a:
+        starts_a.append(starts_a[-1] + len(section))
+    starts_b = [0]
+    for section in sections_b:
+        starts_b.append(starts_b[-1] + len(section))
+
+    ops: list[dict] = []
+    for tag, i1, i2, j1, j2 in _PatienceMatcher(sections_a, sections_b).get_opcodes():
+        a = (starts_a[i1], starts_a[i2])
+        b = (starts_b[j1], starts_b[j2])
+        if tag == "equal":
+            _add_op(ops, "equal", a, b)
+        else:
+            _word_ops(text_a, a[0], a[1], text_b, b[0], b[1], ops)
+
+    return {"diff_ops": ops, "diff_html": render_word_diff_html(text_b, ops)}
+
+
+def render_word_diff_html(text_b: str, ops: list[dict], context: int = WORD_DIFF_CONTEXT_CHARS) -> str:
+    """Changed passages only, each with up to `context` characters of
+    unchanged text around it; changes are inline <del>/<ins> spans."""
+    hunks: list[list[str]] = []
+    previous_end = None
+    for index, op in enumerate(ops):
+        if op["op"] == "equal":
+            continue
+        before = ops[index - 1] if index and ops[index - 1]["op"] == "equal" else None
+        if before is not None:
+            start, end = before["b"]
+            if previous_end is None or end - start > 2 * context:
+                # Gap too long: close the hunk and start a new one
+                if hunks:
+                    hunks[-1].append(_escape(text_b[previous_end:previous_end + context]) + "&hellip;")
+                hunks.append([])
+                lead = max(start, end - context)
+                hunks[-1].append(("&hellip;" if lead > 0 else "") + _escape(text_b[lead:end]))
+            else:
+                hunks[-1].append(_escape(text_b[start:end]))
+        elif not hunks:
+            hunks.append([])
+        tag, css = ("del", "diff-remove") if op["op"] == "delete" else ("ins", "diff-add")
+        hunks[-1].append(f'<{tag} class="{css}">{_escape(op["text"])}</{tag}>')
+        previous_end = op["b"][1]
+    if hunks and previous_end is not None:
+        tail = text_b[previous_end:previous_end + context]
+        hunks[-1].append(_escape(tail) + ("&hellip;" if previous_end + context < len(text_b) else ""))
+    return "\n".join(f'<div class="diff-context diff-words">{"".join(parts)}</div>' for parts in hunks)
+
+
+def store_diff(session: Session, version_a: ContractVersion, version_b: ContractVersion) -> dict:
+    """Compute the diff of two versions and add it to the session (the
+    caller commits)."""
+    diff = compute_diff(version_a.full_text, version_b.full_text)
+    session.add(VersionDiff(
+        version_a_id=version_a.id, version_b_id=version_b.id,
+        diff_lines=diff["diff_lines"], diff_html=diff["diff_html"],
+    ))
+    return diff
+
+
+def cached_version_diff(session: Session, version_a: ContractVersion, version_b: ContractVersion) -> dict:
+    """Stored diff of the pair, computing and storing it on a miss. Commits.
+    Sync; async routers call it through session.run_sync."""
+    cached = session.get(VersionDiff, (version_a.id, version_b.id))
+    if cached is not None:
+        return {"diff_lines": cached.diff_lines, "diff_html": cached.diff_html}
+
+    try:
+        # Savepoint, so losing a race only undoes this insert
+        with session.begin_nested():
+            diff = store_diff(session, version_a, version_b)
+    except IntegrityError:
+        logger.info("Diff %s..%s stored concurrently", version_a.id, version_b.id)
+    session.commit()
+    return diff
+
+
 def _escape(s: str) -> str:
     return s.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
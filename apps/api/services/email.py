@@ -1,54 +1,40 @@
-"""Lightweight email notifications via Resend. Skips silently if not configured."""
+"""Lightweight email notifications via Resend. Skips silently if not configured.
+
+Emails are queued in the outbox and delivered in the background, so these
+helpers never wait on Resend. Queueing is a sync_engine insert, though:
+async request handlers call them through run_in_threadpool, never directly
+on the event loop.
+"""
 
 from __future__ import annotations
 
 import logging
-import httpx
 
 from config import settings
+from services import email_outbox
 
 logger = logging.getLogger(__name__)
 
-RESEND_API_URL = "https://api.resend.com/emails"
-
-
 def _is_configured() -> bool:
     return bool(settings.resend_api_key)
 
 
 def send_email(to: str, subject: str, html: str, attachments: list[dict] | None = None) -> bool:
-    """Send an email via Resend. Returns True on success, False on failure. Never raises."""
+    """Queue an email for delivery via Resend (services/email_outbox.py).
+    Returns True if it is queued, False otherwise. Never raises."""
     if not _is_configured() or not to:
         return False
+    return email_outbox.enqueue(to, subject, html, attachments)
 
-    try:
-        payload: dict = {
-            "from": settings.resend_from_email,
-            "to": [to],
-            "subject": subject,
-            "html": html,
-        }
-        if attachments:
-            payload["attachments"] = attachments
-
-        response = httpx.post(
-            RESEND_API_URL,
-            headers={
-                "Authorization": f"Bearer {settings.resend_api_key}",
-                "Content-Type": "application/json",
-            },
-            json=payload,
-            timeout=10,
-        )
-        if response.status_code in (200, 201):
-            logger.info("Email sent to %s: %s", to, subject)
-            return True
-        else:
-            logger.warning("Resend returned %s: %s", response.status_code, response.text)
-            return False
-    except Exception:
-        logger.exception("Failed to send email to %s", to)
-        return False
+
+def send_emails(recipients: list[str], subject: str, html: str, attachments: list[dict] | None = None) -> int:
+    """Queue the same email to several recipients at once; attachments
+    can reference blob store files (services/email_outbox.py). Returns how
+    many are queued. Never raises."""
+    recipients = [to for to in recipients if to]
+    if not _is_configured() or not recipients:
+        return 0
+    return email_outbox.enqueue_many(recipients, subject, html, attachments)
 
 
 def notify_cr_submitted(to: str, deal_title: str, cr_preview: str) -> bool:
@@ -235,8 +221,9 @@ async def get_deal_owner_email(session, deal_id) -> tuple[str, str]:
     return (user.email or "", str(user.id))
 
 
-def notify_timeline_generated(to: str, deal_title: str, address: str, pdf_base64: str) -> bool:
-    """Notify with the Critical Dates PDF attached."""
+def notify_timeline_generated(recipients: list[str], deal_title: str, address: str, pdf_blob: str) -> int:
+    """Notify every recipient with the Critical Dates PDF (a blob store
+    digest) attached. Returns how many are queued."""
     html = f"""
     <div style="font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, sans-serif; max-width: 560px; margin: 0 auto;">
       <div style="background: linear-gradient(135deg, #6366f1, #8b5cf6); padding: 24px; border-radius: 12px 12px 0 0;">
@@ -249,8 +236,8 @@ def notify_timeline_generated(to: str, deal_title: str, address: str, pdf_base64
       <p style="text-align: center; color: #94a3b8; font-size: 12px; margin-top: 16px;">Sent by Pactly — AI-powered contract management</p>
     </div>
     """
-    attachments = [{"filename": "Critical_Dates.pdf", "content": pdf_base64}]
-    return send_email(to, f"Critical Dates: {deal_title}", html, attachments=attachments)
+    attachments = [{"filename": "Critical_Dates.pdf", "blob": pdf_blob}]
+    return send_emails(recipients, f"Critical Dates: {deal_title}", html, attachments=attachments)
 
 
 def notify_deliverable_reminder(to: str, deal_title: str, description: str, due_date: str, days_remaining: int) -> bool:
@@ -0,0 +1,465 @@
+"""Email outbox: queued, batched and retried delivery through Resend.
+
+services/email.send_email only inserts a row into email_outbox, so request
+handlers never wait on Resend. An EmailSender (started in each API process,
+or standalone via python -m workers.email_sender) claims due rows with
+FOR UPDATE SKIP LOCKED and a lease, like the job queue, and delivers them
+on one pooled httpx.AsyncClient:
+
+- emails without attachments go out up to settings.email_batch_size per
+  POST /emails/batch (Resend's batch endpoint does not take attachments);
+- emails with attachments go out one POST /emails each, at most
+  settings.email_send_concurrency at a time.
+
+Rate limits, 5xx and network errors are retried with jittered exponential
+backoff; any other rejection of a batch is retried email by email, so one
+bad address fails alone. Every request carries an Idempotency-Key, so a
+retry after a lost response is not delivered twice: single sends use the
+row id, and batches are formed when claimed, with their key stored on the
+rows before the call. A retried batch shares one next attempt, is only
+claimed whole, and is resent with the same body and key. The same message
+to the same recipient is queued only once per
+settings.email_dedup_window_minutes.
+
+An attachment is {"filename", "content": base64} or {"filename", "blob":
+digest}. Blob references keep rows small and let one stored file go to
+many recipients: the sender reads and encodes each blob once per batch
+and shares the encoded content across every email in it.
+"""
+from __future__ import annotations
+
+import asyncio
+import base64
+import hashlib
+import json
+import logging
+import random
+import threading
+import uuid
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Optional
+
+import httpx
+from sqlalchemy import and_, delete, or_
+from sqlmodel import Session, func, select
+
+from config import settings
+from database import sync_engine
+from models.email_outbox import EmailOutbox
+from services import blob_store
+
+logger = logging.getLogger(__name__)
+
+EMAILS_PATH = "/emails"
+BATCH_PATH = "/emails/batch"
+BACKOFF_BASE_SECONDS = 30
+BACKOFF_MAX_SECONDS = 3600
+# A claimed batch not recorded within this long is claimed again
+SEND_LEASE_SECONDS = 120
+REQUEST_TIMEOUT_SECONDS = 10
+
+# Delivery outcome per email: ("sent", provider id), ("retry", error) or
+# ("failed", error)
+Outcome = tuple[str, Optional[str]]
+
+
+# ── Enqueue ──────────────────────────────────────────────────────────────
+
+def dedup_key(to: str, subject: str, html: str, attachments: Optional[list] = None) -> str:
+    payload = json.dumps(
+        [to.strip().lower(), subject, html, attachments or []],
+        sort_keys=True, separators=(",", ":"),
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def enqueue(to: str, subject: str, html: str, attachments: Optional[list] = None) -> bool:
+    """Queue an email. Returns True if it is queued (now or already, within
+    the dedup window), False if it could not be stored. Never raises."""
+    return enqueue_many([to], subject, html, attachments) == 1
+
+
+def enqueue_many(recipients: list[str], subject: str, html: str, attachments: Optional[list] = None) -> int:
+    """Queue the same email to each recipient in one transaction. Returns
+    how many recipients are queued (now or already, within the dedup
+    window); 0 if the rows could not be stored. Never raises."""
+    keys: dict[str, str] = {}
+    for to in recipients:
+        keys.setdefault(dedup_key(to, subject, html, attachments), to)
+    if not keys:
+        return 0
+    since = datetime.utcnow() - timedelta(minutes=settings.email_dedup_window_minutes)
+    try:
+        with Session(sync_engine) as session:
+            queued = set(session.exec(
+                select(EmailOutbox.dedup_key).where(
+                    EmailOutbox.dedup_key.in_(list(keys)),
+                    EmailOutbox.status != "failed",
+                    EmailOutbox.created_at >= since,
+                )
+            ).all())
+            for key, to in keys.items():
+                if key in queued:
+                    logger.info("Email to %s already queued: %s", to, subject)
+                    continue
+                session.add(EmailOutbox(
+                    to_email=to, subject=subject, html=html,
+                    attachments=attachments or None, dedup_key=key,
+                ))
+            session.commit()
+    except Exception:
+        logger.exception("Failed to queue email to %s", ", ".join(keys.values()))
+        return 0
+    if len(queued) < len(keys):
+        wake_local_senders()
+    return len(keys)
+
+
+# ── Claim and record ─────────────────────────────────────────────────────
+
+def retry_delay(attempts: int) -> float:
+    """Seconds to wait before retry number `attempts` (1-based), with jitter."""
+    delay = min(BACKOFF_BASE_SECONDS * 2 ** (attempts - 1), BACKOFF_MAX_SECONDS)
+    return delay * random.uniform(0.8, 1.2)
+
+
+def batch_key(ids) -> str:
+    return hashlib.sha256(",".join(sorted(str(i) for i in ids)).encode()).hexdigest()
+
+
+def claim_batch(session: Session, limit: int, lease_seconds: int = SEND_LEASE_SECONDS) -> list[dict]:
+    """Lease up to `limit` due emails: pending rows whose next attempt has
+    come, plus sending rows whose lease lapsed. New plain emails are grouped
+    into batches of settings.email_batch_size and the group's key stored on
+    them. Commits."""
+    now = datetime.utcnow()
+    claimable = or_(
+        and_(EmailOutbox.status == "pending", EmailOutbox.next_attempt_at <= now),
+        and_(EmailOutbox.status == "sending", EmailOutbox.locked_until < now),
+    )
+    rows = session.exec(
+        select(EmailOutbox)
+        .where(claimable)
+        .order_by(EmailOutbox.next_attempt_at, EmailOutbox.batch_key)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    ).all()
+    rows = _whole_batches(session, rows, claimable)
+
+    claimed, unbatched = [], []
+    for row in rows:
+        if row.attempts >= settings.email_max_attempts:
+            # Lease lapsed during the final attempt
+            row.status = "failed"
+            row.error = row.error or "Send lease expired on final attempt"
+            row.locked_until = None
+        else:
+            row.status = "sending"
+            row.attempts += 1
+            row.locked_until = now + timedelta(seconds=lease_seconds)
+            claimed.append(row)
+            if row.batch_key is None and not row.attachments:
+                unbatched.append(row)
+        session.add(row)
+    size = settings.email_batch_size
+    for group in (unbatched[i:i + size] for i in range(0, len(unbatched), size)):
+        if len(group) > 1:
+            key = batch_key(row.id for row in group)
+            for row in group:
+                row.batch_key = key
+    messages = [_message(row) for row in claimed]
+    session.commit()
+    return messages
+
+
+def _whole_batches(session: Session, rows: list[EmailOutbox], claimable) -> list[EmailOutbox]:
+    """Add the rest of each retried batch to the claim, and leave out any
+    batch that cannot be claimed whole (another sender holds part of it):
+    a partial batch under the same key would not be the request Resend saw."""
+    keys = {row.batch_key for row in rows if row.batch_key}
+    if not keys:
+        return rows
+    rows = list(rows) + list(session.exec(
+        select(EmailOutbox)
+        .where(
+            EmailOutbox.batch_key.in_(keys),
+            EmailOutbox.id.not_in([row.id for row in rows]),
+            claimable,
+        )
+        .with_for_update(skip_locked=True)
+    ).all())
+    unsent = dict(session.exec(
+        select(EmailOutbox.batch_key, func.count())
+        .where(EmailOutbox.batch_key.in_(keys), EmailOutbox.status.in_(["pending", "sending"]))
+        .group_by(EmailOutbox.batch_key)
+    ).all())
+    claimed = Counter(row.batch_key for row in rows if row.batch_key)
+    partial = {key for key in keys if claimed[key] < unsent.get(key, 0)}
+    return [row for row in rows if row.batch_key not in partial]
+
+
+def _message(row: EmailOutbox) -> dict:
+    payload = {
+        "from": settings.resend_from_email,
+        "to": [row.to_email],
+        "subject": row.subject,
+        "html": row.html,
+    }
+    if row.attachments:
+        payload["attachments"] = row.attachments
+    return {"id": str(row.id), "batch_key": row.batch_key, "payload": payload}
+
+
+def record_outcomes(
+    session: Session, outcomes: dict[str, Outcome], batch_keys: Optional[dict[str, Optional[str]]] = None
+) -> None:
+    """Store delivery outcomes; retries past settings.email_max_attempts
+    fail for good. A batch retried as a whole gets one next attempt, so it
+    is claimed together again. batch_keys: each email's batch after the
+    send (None once a rejected batch was split up). Commits."""
+    now = datetime.utcnow()
+    delays: dict[str, float] = {}
+    for email_id, (outcome, detail) in outcomes.items():
+        row = session.get(EmailOutbox, uuid.UUID(email_id))
+        if row is None:
+            continue
+        row.locked_until = None
+        if batch_keys is not None:
+            row.batch_key = batch_keys.get(email_id, row.batch_key)
+        if outcome == "sent":
+            row.status = "sent"
+            row.provider_id = detail
+            row.sent_at = now
+            row.error = None
+            logger.info("Email sent to %s: %s", row.to_email, row.subject)
+        elif outcome == "retry" and row.attempts < settings.email_max_attempts:
+            row.status = "pending"
+            row.error = detail
+            if row.batch_key:
+                delay = delays.setdefault(row.batch_key, retry_delay(row.attempts))
+            else:
+                delay = retry_delay(row.attempts)
+            row.next_attempt_at = now + timedelta(seconds=delay)
+        else:
+            row.status = "failed"
+            row.error = detail
+            logger.warning("Email to %s failed after %s attempts: %s", row.to_email, row.attempts, detail)
+        session.add(row)
+    session.commit()
+
+
+def prune_email_outbox(session: Session, retention_days: Optional[int] = None) -> dict[str, int]:
+    """Delete sent and failed emails older than retention_days (default
+    settings.email_outbox_retention_days). Commits."""
+    days = settings.email_outbox_retention_days if retention_days is None else retention_days
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    deleted = session.exec(
+        delete(EmailOutbox).where(
+            EmailOutbox.status.in_(["sent", "failed"]),
+            EmailOutbox.created_at < cutoff,
+        )
+    ).rowcount
+    session.commit()
+    logger.info("Pruned email outbox: %s deleted", deleted)
+    return {"deleted": deleted}
+
+
+# ── Delivery ─────────────────────────────────────────────────────────────
+
+def new_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        base_url=settings.resend_api_url,
+        headers={"Authorization": f"Bearer {settings.resend_api_key}"},
+        timeout=REQUEST_TIMEOUT_SECONDS,
+        limits=httpx.Limits(
+            max_connections=settings.email_send_concurrency + 1,
+            max_keepalive_connections=settings.email_send_concurrency + 1,
+        ),
+    )
+
+
+def attach_blobs(messages: list[dict]) -> dict[str, Outcome]:
+    """Replace blob attachment references with their base64 content, in
+    place. Each blob is read and encoded once, and the encoded string is
+    shared by every message that references it. Returns failed outcomes
+    for messages whose blob is gone."""
+    encoded: dict[str, str] = {}
+    missing: dict[str, Outcome] = {}
+    for message in messages:
+        attachments = message["payload"].get("attachments") or []
+        if not any("blob" in a for a in attachments):
+            continue
+        resolved = []
+        for attachment in attachments:
+            digest = attachment.get("blob")
+            if digest is None:
+                resolved.append(attachment)
+                continue
+            if digest not in encoded:
+                if not blob_store.exists(digest):
+                    missing[message["id"]] = ("failed", f"Attachment blob {digest} is missing")
+                    break
+                encoded[digest] = base64.b64encode(blob_store.read_bytes(digest)).decode()
+            resolved.append({"filename": attachment["filename"], "content": encoded[digest]})
+        else:
+            message["payload"]["attachments"] = resolved
+    return missing
+
+
+def _failure(response: httpx.Response) -> Outcome:
+    error = f"Resend returned {response.status_code}: {response.text[:200]}"
+    if response.status_code == 429 or response.status_code >= 500:
+        return "retry", error
+    return "failed", error
+
+
+async def _send_one(client: httpx.AsyncClient, message: dict) -> Outcome:
+    try:
+        response = await client.post(
+            EMAILS_PATH, json=message["payload"], headers={"Idempotency-Key": message["id"]},
+        )
+    except httpx.HTTPError as e:
+        return "retry", f"{type(e).__name__}: {e}"
+    if response.status_code in (200, 201):
+        return "sent", response.json().get("id")
+    return _failure(response)
+
+
+async def _send_batch(
+    client: httpx.AsyncClient, messages: list[dict], limit: asyncio.Semaphore
+) -> dict[str, Outcome]:
+    async def one(message: dict) -> Outcome:
+        async with limit:
+            return await _send_one(client, message)
+
+    if not messages[0]["batch_key"]:
+        return {messages[0]["id"]: await one(messages[0])}
+
+    # Same order, body and key on every attempt
+    messages = sorted(messages, key=lambda m: m["id"])
+    ids = [m["id"] for m in messages]
+    try:
+        async with limit:
+            response = await client.post(
+                BATCH_PATH, json=[m["payload"] for m in messages],
+                headers={"Idempotency-Key": messages[0]["batch_key"]},
+            )
+    except httpx.HTTPError as e:
+        return {email_id: ("retry", f"{type(e).__name__}: {e}") for email_id in ids}
+
+    if response.status_code in (200, 201):
+        data = response.json().get("data") or []
+        return {
+            email_id: ("sent", (data[i] or {}).get("id") if i < len(data) else None)
+            for i, email_id in enumerate(ids)
+        }
+    outcome = _failure(response)
+    if outcome[0] == "retry":
+        return {email_id: outcome for email_id in ids}
+    # Rejected as a whole: find out which emails are at fault. From here on
+    # each is retried alone under its own key
+    for message in messages:
+        message["batch_key"] = None
+    results = await asyncio.gather(*(one(m) for m in messages))
+    return dict(zip(ids, results))
+
+
+async def deliver(client: httpx.AsyncClient, messages: list[dict]) -> dict[str, Outcome]:
+    """Send claimed emails: each batch formed by claim_batch in one call,
+    the rest (attachments, or no batch partner) individually."""
+    limit = asyncio.Semaphore(settings.email_send_concurrency)
+    batches: dict[str, list[dict]] = {}
+    for message in messages:
+        batches.setdefault(message["batch_key"] or message["id"], []).append(message)
+    groups = list(batches.values())
+    outcomes: dict[str, Outcome] = {}
+    for result in await asyncio.gather(*(_send_batch(client, group, limit) for group in groups)):
+        outcomes.update(result)
+    return outcomes
+
+
+# ── Sender ───────────────────────────────────────────────────────────────
+
+_local_senders: list["EmailSender"] = []
+
+
+def wake_local_senders() -> None:
+    """Deliver newly queued email now rather than at the next poll."""
+    for sender in list(_local_senders):
+        sender.wake()
+
+
+class EmailSender:
+    """Delivers the outbox from a background thread running its own event
+    loop and one pooled AsyncClient.
+
+    start() runs inside API processes; run_forever() blocks (used by
+    workers/email_sender.py). Several senders can run at once: claims skip
+    rows another sender holds.
+    """
+
+    def __init__(self, batch_size: Optional[int] = None, poll_interval: Optional[float] = None):
+        self.batch_size = batch_size or settings.email_batch_size
+        self.poll_interval = poll_interval or settings.email_poll_interval
+        self._stop = threading.Event()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def wake(self) -> None:
+        loop, event = self._loop, self._wake
+        if loop is not None and event is not None:
+            loop.call_soon_threadsafe(event.set)
+
+    def start(self) -> None:
+        _local_senders.append(self)
+        self._thread = threading.Thread(target=self.run_forever, name="email-sender", daemon=True)
+        self._thread.start()
+
+    def request_stop(self) -> None:
+        self._stop.set()
+        self.wake()
+
+    def stop(self) -> None:
+        """Stop after the batch in flight; unrecorded emails are retried once
+        their lease lapses."""
+        self.request_stop()
+        if self in _local_senders:
+            _local_senders.remove(self)
+        if self._thread:
+            self._thread.join(timeout=REQUEST_TIMEOUT_SECONDS)
+
+    def run_forever(self) -> None:
+        asyncio.run(self._run())
+
+    async def _run(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        logger.info("Email sender started (batch size %s)", self.batch_size)
+        async with new_client() as client:
+            while not self._stop.is_set():
+                try:
+                    delivered = await self.deliver_once(client)
+                except Exception:
+                    logger.exception("Email sender poll failed")
+                    delivered = 0
+                if delivered < self.batch_size:
+                    try:
+                        await asyncio.wait_for(self._wake.wait(), self.poll_interval)
+                    except asyncio.TimeoutError:
+                        pass
+                    self._wake.clear()
+        logger.info("Email sender stopped")
+
+    async def deliver_once(self, client: httpx.AsyncClient) -> int:
+        """Claim, send and record one batch; returns how many were claimed."""
+        with Session(sync_engine) as session:
+            messages = claim_batch(session, self.batch_size)
+        if not messages:
+            return 0
+        outcomes = attach_blobs(messages)
+        outcomes.update(await deliver(client, [m for m in messages if m["id"] not in outcomes]))
+        with Session(sync_engine) as session:
+            record_outcomes(session, outcomes, {m["id"]: m["batch_key"] for m in messages})
+        return len(messages)
@@ -0,0 +1,102 @@
+"""Content-addressed cache of text extracted from uploaded documents.
+
+The same MLS listings, inspection reports and contract PDFs are uploaded to
+several deals. services/ingestion.extract_text stores each result (text and
+quality flag) in the extraction_cache table under "{kind}:{sha256 of the
+file}", so a duplicate upload costs one indexed lookup and never reaches
+pdfplumber or python-docx. Only the extractor's verdict on the file is
+stored; timeouts, pool failures and I/O errors are not.
+
+prune_extraction_cache (run as a maintenance job) keeps the cached text
+within settings.extraction_cache_max_mb, dropping the least recently used
+entries first. The cache is best-effort: any backend error is logged and
+treated as a miss.
+"""
+from __future__ import annotations
+
+import logging
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import delete, update
+from sqlmodel import Session, func, select
+
+from config import settings
+from database import sync_engine
+from models.extraction_cache import ExtractionCacheEntry
+
+logger = logging.getLogger(__name__)
+
+
+def enabled() -> bool:
+    return settings.extraction_cache_enabled
+
+
+def cache_key(digest: str, kind: str) -> str:
+    return f"{kind}:{digest}"
+
+
+def get(key: str) -> Optional[tuple[str, bool]]:
+    """(text, extraction_ok) if cached, else None."""
+    if not enabled():
+        return None
+    try:
+        with Session(sync_engine) as session:
+            entry = session.get(ExtractionCacheEntry, key)
+            if entry is None:
+                return None
+            session.exec(
+                update(ExtractionCacheEntry)
+                .where(ExtractionCacheEntry.key == key)
+                .values(last_used_at=datetime.utcnow(), hits=ExtractionCacheEntry.hits + 1)
+            )
+            session.commit()
+            return entry.text, entry.extraction_ok
+    except Exception:
+        logger.warning("Extraction cache lookup failed", exc_info=True)
+        return None
+
+
+def put(key: str, text: str, extraction_ok: bool) -> None:
+    if not enabled():
+        return
+    now = datetime.utcnow()
+    entry = ExtractionCacheEntry(
+        key=key,
+        text=text,
+        extraction_ok=extraction_ok,
+        size_bytes=len(text.encode("utf-8")),
+        created_at=now,
+        last_used_at=now,
+    )
+    try:
+        with Session(sync_engine) as session:
+            # Another worker may have extracted the same file meanwhile; same result
+            session.merge(entry)
+            session.commit()
+    except Exception:
+        logger.warning("Extraction cache write failed", exc_info=True)
+
+
+def prune_extraction_cache(session: Session, max_bytes: Optional[int] = None) -> dict[str, int]:
+    """Delete the least recently used entries beyond max_bytes of text
+    (default settings.extraction_cache_max_mb). Commits."""
+    max_bytes = settings.extraction_cache_max_mb * 1024 * 1024 if max_bytes is None else max_bytes
+    # Running total of text size, most recently used first
+    ranked = select(
+        ExtractionCacheEntry.key,
+        func.sum(ExtractionCacheEntry.size_bytes).over(
+            order_by=(ExtractionCacheEntry.last_used_at.desc(), ExtractionCacheEntry.key),
+        ).label("running_bytes"),
+    ).subquery()
+    evicted = session.exec(
+        delete(ExtractionCacheEntry).where(ExtractionCacheEntry.key.in_(
+            select(ranked.c.key).where(ranked.c.running_bytes > max_bytes)
+        ))
+    ).rowcount
+    remaining = session.exec(
+        select(func.coalesce(func.sum(ExtractionCacheEntry.size_bytes), 0))
+    ).one()
+    session.commit()
+    logger.info("Pruned extraction cache: %s evicted, %s bytes kept", evicted, remaining)
+    return {"evicted": evicted, "bytes": remaining}
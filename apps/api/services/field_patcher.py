@@ -0,0 +1,167 @@
+"""Rule-based text patching for field-only change requests.
+
+Most change requests only move a price, a date, a deposit or an inspection
+period. For those the new text is the old text with one value replaced, so
+instead of an LLM rewrite each change's current value is located in the
+contract in the format its ALLOWED_FIELDS type is written in ("$350,000.00",
+"July 15, 2025", "15 days") and substituted in that same format.
+
+A change is only patched when its value has exactly one anchor in the text,
+so no other copy of it is left stale. Anything else —
+clause actions, removals, enum/bool fields, missing or ambiguous values —
+returns None and the caller falls back to the LLM.
+"""
+from __future__ import annotations
+
+import logging
+import re
+from datetime import date
+from typing import Optional
+
+from services.contract_intelligence import ALLOWED_FIELDS
+
+logger = logging.getLogger(__name__)
+
+PATCHABLE_TYPES = ("number", "int", "date", "string")
+
+_MONTHS = ["January", "February", "March", "April", "May", "June", "July",
+           "August", "September", "October", "November", "December"]
+
+_ONES = ["zero", "one", "two", "three", "four", "five", "six", "seven", "eight", "nine", "ten",
+         "eleven", "twelve", "thirteen", "fourteen", "fifteen", "sixteen", "seventeen",
+         "eighteen", "nineteen"]
+_TENS = ["", "", "twenty", "thirty", "forty", "fifty", "sixty", "seventy", "eighty", "ninety"]
+
+
+def _number_words(n: int) -> Optional[str]:
+    if n < 0:
+        return None
+    if n < 20:
+        return _ONES[n]
+    if n < 100:
+        tens, ones = divmod(n, 10)
+        return _TENS[tens] + (f"-{_ONES[ones]}" if ones else "")
+    return None
+
+
+# ── Renderers: the ways a value of each type is written in a contract ─────
+# Each takes the parsed value and returns its text, or None if not applicable.
+
+def _as_number(value) -> Optional[float]:
+    try:
+        return float(str(value).replace(",", "").replace("$", ""))
+    except (TypeError, ValueError):
+        return None
+
+
+def _as_date(value) -> Optional[date]:
+    try:
+        return date.fromisoformat(str(value)[:10])
+    except ValueError:
+        return None
+
+
+def _whole(v: float) -> Optional[int]:
+    return int(v) if v == int(v) else None
+
+
+def _days(v: float) -> Optional[str]:
+    n = _whole(v)
+    return f"{_number_words(n)} ({n})" if n is not None and _number_words(n) else None
+
+
+_PARSERS = {"number": _as_number, "int": _as_number, "date": _as_date, "string": str}
+
+_FORMATS = {
+    "number": [
+        lambda v: f"{v:,.2f}",
+        lambda v: f"{v:,.0f}" if _whole(v) is not None else None,
+        lambda v: str(_whole(v)) if _whole(v) is not None else None,
+    ],
+    "int": [
+        _days,
+        lambda v: _days(v).capitalize() if _days(v) else None,
+        lambda v: str(_whole(v)) if _whole(v) is not None else None,
+    ],
+    "date": [
+        lambda d: f"{_MONTHS[d.month - 1]} {d.day}, {d.year}",
+        lambda d: d.strftime("%m/%d/%Y"),
+        lambda d: f"{d.month}/{d.day}/{d.year}",
+        lambda d: d.isoformat(),
+    ],
+    "string": [
+        lambda v: v if len(v.strip()) >= 3 else None,
+    ],
+}
+
+# A number must not be part of a longer number; an int also has to be a
+# count of days ("15 days", "fifteen (15) calendar days")
+_NOT_DIGIT_BEFORE = r"(?<![\w.,])"
+_NOT_DIGIT_AFTER = r"(?![\w]|[.,]\d)"
+_DAYS_AFTER = r"(?=\s*(?:calendar\s+|business\s+)?days?\b)"
+
+
+def _anchors(text: str, field_type: str, value) -> list[tuple[int, int, object]]:
+    """(start, end, renderer) of every place `value` is written in text.
+    Overlapping matches keep the longest (e.g. "fifteen (15)" over "15")."""
+    parsed = _PARSERS[field_type](value)
+    if parsed is None:
+        return []
+    spans = []
+    for render in _FORMATS[field_type]:
+        rendered = render(parsed)
+        if not rendered:
+            continue
+        pattern = _NOT_DIGIT_BEFORE + re.escape(rendered) + _NOT_DIGIT_AFTER
+        if field_type == "int":
+            pattern += _DAYS_AFTER
+        flags = re.IGNORECASE if field_type == "string" else 0
+        spans.extend((m.start(), m.end(), render) for m in re.finditer(pattern, text, flags))
+
+    spans.sort(key=lambda s: (s[0], -(s[1] - s[0])))
+    result = []
+    for span in spans:
+        if result and span[0] < result[-1][1]:
+            continue
+        result.append(span)
+    return result
+
+
+def patch_field_changes(text: str, changes: list[dict]) -> Optional[str]:
+    """Apply field-only changes by substitution, or None if any change has no
+    unique anchor and the text has to be rewritten by the LLM."""
+    if not changes:
+        return None
+
+    edits = []
+    for change in changes:
+        field = change.get("field")
+        spec = ALLOWED_FIELDS.get(field)
+        old, new = change.get("from"), change.get("to")
+        if (
+            spec is None
+            or spec["type"] not in PATCHABLE_TYPES
+            or change.get("action", "update") != "update"
+            or old in (None, "")
+            or new in (None, "")
+        ):
+            return None
+
+        anchors = _anchors(text, spec["type"], old)
+        if len(anchors) != 1:
+            logger.info("No unique anchor for %s=%r (%s found)", field, old, len(anchors))
+            return None
+
+        start, end, render = anchors[0]
+        parsed = _PARSERS[spec["type"]](new)
+        replacement = render(parsed) if parsed is not None else None
+        if not replacement:
+            return None
+        edits.append((start, end, replacement))
+
+    edits.sort()
+    if any(a[1] > b[0] for a, b in zip(edits, edits[1:])):
+        return None
+    for start, end, replacement in reversed(edits):
+        text = text[:start] + replacement + text[end:]
+    return text
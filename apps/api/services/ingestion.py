@@ -1,41 +1,192 @@
+"""Text extraction from uploaded contracts and documents.
+
+PDF pages are extracted on a process pool (settings.pdf_extraction_workers):
+the page range is split across workers and reassembled in order, with a
+per-document timeout. Concurrent uploads share the pool
+(services/process_pools.py): one that times out or finds a dead worker
+retires it without killing the others' pages. Results are cached by
+content hash (services/extraction_cache.py), so a file uploaded to several
+deals is only extracted once.
+"""
+import hashlib
 import io
+import logging
+import math
+import os
+import time
 import uuid
-from typing import Optional
+from concurrent.futures import TimeoutError as FuturesTimeout
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional, Union
 
 import docx
 import pdfplumber
 
+from config import settings
 from models.contract import ContractVersion
+from services import extraction_cache
+from services.process_pools import SharedProcessPool
+
+logger = logging.getLogger(__name__)
+
+# File contents, or the path of the file (e.g. a blob_store.blob_path) so
+# large uploads are read from disk page by page instead of held in memory
+Source = Union[bytes, str]
+
+# Fewer pages per task than this and the per-task reopen of the PDF costs
+# more than the parallelism saves
+MIN_PAGES_PER_TASK = 4
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+class ExtractionTimeout(Exception):
+    pass
+
+
+class ExtractionUnavailable(Exception):
+    """The extraction pool failed; says nothing about the document."""
+
+
+def _open(source: Source):
+    return io.BytesIO(source) if isinstance(source, bytes) else source
 
 
-def extract_text_from_docx(file_bytes: bytes) -> str:
-    doc = docx.Document(io.BytesIO(file_bytes))
+def extract_text_from_docx(source: Source) -> str:
+    doc = docx.Document(_open(source))
     paragraphs = [p.text for p in doc.paragraphs if p.text.strip()]
     return "\n\n".join(paragraphs)
 
 
-def extract_text_from_pdf(file_bytes: bytes) -> str:
-    text_parts = []
-    with pdfplumber.open(io.BytesIO(file_bytes)) as pdf:
-        for page in pdf.pages:
-            page_text = page.extract_text()
-            if page_text:
-                text_parts.append(page_text)
-    return "\n\n".join(text_parts)
+# ── PDF: page-parallel extraction ────────────────────────────────────────
 
+def _pdf_page_texts(source: Source, start: int, stop: int) -> list[str]:
+    """Text of pages start..stop; runs in a pool worker."""
+    # pdfplumber page numbers are 1-based
+    with pdfplumber.open(_open(source), pages=range(start + 1, stop + 1)) as pdf:
+        return [page.extract_text() or "" for page in pdf.pages]
 
-def extract_text(filename: str, file_bytes: bytes) -> tuple[str, bool]:
-    """Returns (text, extraction_ok). extraction_ok=False means poor quality."""
+
+def _worker_count() -> int:
+    # Extraction is CPU-bound: processes beyond the core count only contend
+    return min(settings.pdf_extraction_workers, os.cpu_count() or 1)
+
+
+_pools = SharedProcessPool(_worker_count, "PDF extraction")
+
+
+def _discard_pool() -> None:
+    _pools.discard()
+
+
+def _page_ranges(page_count: int, workers: int) -> list[tuple[int, int]]:
+    # Two ranges per worker so one slow range doesn't leave the others idle
+    step = max(MIN_PAGES_PER_TASK, math.ceil(page_count / (workers * 2)))
+    return [(start, min(start + step, page_count)) for start in range(0, page_count, step)]
+
+
+def _pool_page_texts(source: Source, ranges: list[tuple[int, int]], timeout: float) -> list[str]:
+    deadline = time.monotonic() + timeout
+    try:
+        pool, futures = _pools.submit(_pdf_page_texts, [(source, start, stop) for start, stop in ranges])
+    except RuntimeError as e:
+        raise ExtractionUnavailable(f"PDF extraction pool unavailable: {e!r}") from e
+    retire = False
+    try:
+        return [
+            text
+            for future in futures
+            for text in future.result(timeout=max(0.0, deadline - time.monotonic()))
+        ]
+    except FuturesTimeout:
+        retire = True
+        raise ExtractionTimeout(f"PDF extraction exceeded {timeout}s")
+    except BrokenProcessPool as e:
+        # A worker died; later extractions need a new pool
+        retire = True
+        raise ExtractionUnavailable(f"PDF extraction pool failed: {e!r}") from e
+    finally:
+        # Pages not started yet never run; running ones stop with the pool
+        for future in futures:
+            future.cancel()
+        _pools.release(pool, retire=retire)
+
+
+def extract_text_from_pdf(source: Source, timeout: Optional[float] = None) -> str:
+    if settings.pdf_extraction_workers <= 0:
+        pages = _pdf_page_texts(source, 0, _page_count(source))
+    else:
+        timeout = timeout if timeout is not None else settings.pdf_extraction_timeout_seconds
+        ranges = _page_ranges(_page_count(source), _worker_count())
+        pages = _pool_page_texts(source, ranges, timeout)
+    return "\n\n".join(text for text in pages if text)
+
+
+def _page_count(source: Source) -> int:
+    with pdfplumber.open(_open(source)) as pdf:
+        return len(pdf.pages)
+
+
+# ── Cached extraction ────────────────────────────────────────────────────
+
+def content_hash(source: Source) -> str:
+    if isinstance(source, bytes):
+        return hashlib.sha256(source).hexdigest()
+    sha = hashlib.sha256()
+    with open(source, "rb") as f:
+        while chunk := f.read(HASH_CHUNK_SIZE):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def _kind(filename: str) -> str:
     lower = filename.lower()
+    if lower.endswith(".docx"):
+        return "docx"
+    if lower.endswith(".pdf"):
+        return "pdf"
+    return "text"
+
+
+def extract_text(filename: str, source: Source, digest: Optional[str] = None) -> tuple[str, bool]:
+    """Returns (text, extraction_ok). extraction_ok=False means poor quality.
+    Pass digest (the blob store's sha256) when known to skip re-hashing."""
+    kind = _kind(filename)
+    key = extraction_cache.cache_key(digest or content_hash(source), kind)
+    cached = extraction_cache.get(key)
+    if cached is not None:
+        return cached
+
+    try:
+        text, ok = _extract(kind, source)
+    except _TRANSIENT_ERRORS as e:
+        # Not cached: says nothing about the document, which may extract
+        # fine on a less loaded or fresh pool
+        logger.warning("Text extraction failed (%s): %s", type(e).__name__, e)
+        return "", False
+    extraction_cache.put(key, text, ok)
+    return text, ok
+
+
+# Failures of the machinery rather than the file: raised out of _extract
+# instead of being recorded as a poor-quality document
+_TRANSIENT_ERRORS = (ExtractionTimeout, ExtractionUnavailable, MemoryError, OSError)
+
+
+def _extract(kind: str, source: Source) -> tuple[str, bool]:
     text = ""
     try:
-        if lower.endswith(".docx"):
-            text = extract_text_from_docx(file_bytes)
-        elif lower.endswith(".pdf"):
-            text = extract_text_from_pdf(file_bytes)
+        if kind == "docx":
+            text = extract_text_from_docx(source)
+        elif kind == "pdf":
+            text = extract_text_from_pdf(source)
         else:
             # Try as plain text
-            text = file_bytes.decode("utf-8", errors="replace")
+            if not isinstance(source, bytes):
+                with open(source, "rb") as f:
+                    source = f.read()
+            text = source.decode("utf-8", errors="replace")
+    except _TRANSIENT_ERRORS:
+        raise
     except Exception:
         return "", False
 
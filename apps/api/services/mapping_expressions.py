@@ -0,0 +1,184 @@
+"""
+Compiled expressions for PDF template mappings.
+
+Checkbox conditions ("financing_type == 'Cash'") and calculated-field
+formulas ("purchase_price - earnest_money - (additional_deposit or 0)") are
+compiled once, when a mapping is loaded, into closures over pre-split field
+accessors. Filling a form then only calls them: nothing is parsed or
+eval'd per fill, and a malformed mapping fails at load time.
+"""
+import ast
+import operator
+from functools import lru_cache
+from typing import Any, Callable, Dict
+
+Accessor = Callable[[dict], Any]
+Condition = Callable[[dict], bool]
+Formula = Callable[[dict], float]
+
+
+class MappingExpressionError(ValueError):
+    """Raised when a condition or formula cannot be compiled."""
+    pass
+
+
+def field_accessor(key: str) -> Accessor:
+    """Accessor for a dot-notation key ("buyer.address.city")."""
+    keys = key.split(".")
+    if len(keys) == 1:
+        return lambda data: data.get(key) if isinstance(data, dict) else None
+
+    def get(data: dict) -> Any:
+        value = data
+        for k in keys:
+            if not isinstance(value, dict):
+                return None
+            value = value.get(k)
+        return value
+    return get
+
+
+@lru_cache(maxsize=None)
+def compile_condition(condition: str) -> Condition:
+    """
+    Compile a checkbox condition.
+
+    Supports:
+    - "field == 'value'"
+    - "field == true/false"
+    - "field != 'value'"
+    - "field"  (truthy check)
+    """
+    condition = condition.strip()
+
+    for op in ["==", "!="]:
+        if op not in condition:
+            continue
+        parts = condition.split(op)
+        if len(parts) != 2 or not parts[0].strip():
+            raise MappingExpressionError(f"Invalid condition: {condition!r}")
+
+        get = field_accessor(parts[0].strip())
+        expected = parts[1].strip().strip("'\"")
+        negate = op == "!="
+
+        # Boolean literals compare truthiness
+        if expected.lower() == "true":
+            return lambda data: bool(get(data)) != negate
+        if expected.lower() == "false":
+            return lambda data: (not get(data)) != negate
+        return lambda data: (str(get(data)) == expected) != negate
+
+    if not condition:
+        raise MappingExpressionError("Empty condition")
+    get = field_accessor(condition)
+    return lambda data: bool(get(data))
+
+
+_BINARY_OPS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+}
+
+
+@lru_cache(maxsize=None)
+def compile_formula(formula: str) -> Formula:
+    """
+    Compile a simple arithmetic formula.
+
+    Supports: +, -, *, /, parentheses, numbers, field references (dot
+    notation for nested fields) and "or" for defaults, e.g.
+    "(additional_deposit or 0)". Missing or non-numeric fields count as 0.
+    """
+    try:
+        tree = ast.parse(formula.strip(), mode="eval")
+    except SyntaxError as e:
+        raise MappingExpressionError(f"Invalid formula {formula!r}: {e.msg}")
+    return _compile_node(tree.body, formula)
+
+
+def _number(value: Any) -> float:
+    if value is None:
+        return 0.0
+    try:
+        return float(value)
+    except (ValueError, TypeError):
+        return 0.0
+
+
+def _dotted_name(node: ast.expr) -> str:
+    if isinstance(node, ast.Name):
+        return node.id
+    if isinstance(node, ast.Attribute):
+        return f"{_dotted_name(node.value)}.{node.attr}"
+    raise MappingExpressionError(f"Unsupported field reference: {ast.dump(node)}")
+
+
+def _compile_node(node: ast.expr, formula: str) -> Formula:
+    if isinstance(node, ast.Constant):
+        if isinstance(node.value, bool) or not isinstance(node.value, (int, float)):
+            raise MappingExpressionError(f"Invalid formula {formula!r}: {node.value!r} is not a number")
+        value = float(node.value)
+        return lambda data: value
+
+    if isinstance(node, (ast.Name, ast.Attribute)):
+        get = field_accessor(_dotted_name(node))
+        return lambda data: _number(get(data))
+
+    if isinstance(node, ast.BinOp) and type(node.op) in _BINARY_OPS:
+        op = _BINARY_OPS[type(node.op)]
+        left = _compile_node(node.left, formula)
+        right = _compile_node(node.right, formula)
+        return lambda data: op(left(data), right(data))
+
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.UAdd)):
+        operand = _compile_node(node.operand, formula)
+        if isinstance(node.op, ast.USub):
+            return lambda data: -operand(data)
+        return operand
+
+    if isinstance(node, ast.BoolOp) and isinstance(node.op, ast.Or):
+        values = [_compile_node(value, formula) for value in node.values]
+
+        def first_nonzero(data: dict) -> float:
+            result = 0.0
+            for value in values:
+                result = value(data)
+                if result:
+                    break
+            return result
+        return first_nonzero
+
+    raise MappingExpressionError(
+        f"Invalid formula {formula!r}: unsupported {type(node).__name__}"
+    )
+
+
+def compile_mapping(mapping: dict) -> Dict[str, list]:
+    """Compile every field of a mapping's field_mappings into lists of
+    (field_key, compiled, config) per field group."""
+    groups = mapping.get("field_mappings", {})
+    compilers = {
+        "text_fields": lambda key, config: field_accessor(key),
+        "checkbox_fields": lambda key, config: compile_condition(_required(config, "condition")),
+        "calculated_fields": lambda key, config: compile_formula(_required(config, "formula")),
+    }
+    compiled: Dict[str, list] = {}
+    for group, compile_field in compilers.items():
+        compiled[group] = []
+        for field_key, config in groups.get(group, {}).items():
+            try:
+                _required(config, "pdf_field_name")
+                compiled[group].append((field_key, compile_field(field_key, config), config))
+            except MappingExpressionError as e:
+                raise MappingExpressionError(f"{group}.{field_key}: {e}")
+    return compiled
+
+
+def _required(config: dict, name: str) -> str:
+    value = config.get(name) if isinstance(config, dict) else None
+    if not isinstance(value, str):
+        raise MappingExpressionError(f"missing {name}")
+    return value
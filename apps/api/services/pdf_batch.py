@@ -0,0 +1,188 @@
+"""Batch PDF form filling on a process pool.
+
+A batch is a list of (template, deal data) fills. Each fill runs in a pool
+worker (settings.pdf_fill_workers processes, capped at the CPU count) with
+its own PDFFormFiller, so templates and compiled mappings are parsed once
+per worker rather than per request, and PyMuPDF never runs on the event
+loop. Concurrent batches share the pool (services/process_pools.py): one
+that times out or finds a dead worker retires it without killing the
+others' fills. Workers write each result straight into the blob store and
+return only its digest; the API then answers with blob references or
+streams a ZIP read back from the store, never holding the whole packet in
+memory.
+
+The blob store is global and content-addressed, so each output is also
+recorded against its deal (a blob store ref); the per-deal download
+endpoint serves only digests recorded for that deal.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import zipfile
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Iterable, Iterator, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+from config import settings
+from services import blob_store
+from services.pdf_form_filler import PDFFormFiller, PDFFormFillerError, pdf_filler
+from services.process_pools import SharedProcessPool
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class FillRequest:
+    template_slug: str
+    deal_data: dict
+    flatten: bool = False
+
+
+@dataclass
+class FillResult:
+    blob: Optional[str] = None
+    size: int = 0
+    warnings: list[str] = field(default_factory=list)
+    error: Optional[str] = None
+
+
+# ── Worker side ──────────────────────────────────────────────────────────
+
+# One filler per templates directory in each worker process
+_fillers: dict[str, PDFFormFiller] = {}
+
+
+def _filler(templates_dir: str) -> PDFFormFiller:
+    if Path(templates_dir) == pdf_filler.templates_dir:
+        return pdf_filler
+    if templates_dir not in _fillers:
+        _fillers[templates_dir] = PDFFormFiller(templates_dir=Path(templates_dir))
+    return _fillers[templates_dir]
+
+
+def _fill_to_blob(templates_dir: str, request: FillRequest) -> FillResult:
+    """Fill one template and store it; runs in a pool worker."""
+    try:
+        pdf_bytes, warnings = _filler(templates_dir).fill_pdf(
+            request.template_slug, request.deal_data, request.flatten
+        )
+    except PDFFormFillerError as e:
+        return FillResult(error=str(e))
+    return FillResult(blob=blob_store.put_bytes(pdf_bytes), size=len(pdf_bytes), warnings=warnings)
+
+
+# ── Pool ─────────────────────────────────────────────────────────────────
+
+def _worker_count() -> int:
+    # Filling is CPU-bound: processes beyond the core count only contend
+    return min(settings.pdf_fill_workers, os.cpu_count() or 1)
+
+
+_pools = SharedProcessPool(_worker_count, "PDF batch")
+
+
+def _discard_pool() -> None:
+    _pools.discard()
+
+
+async def fill_batch(
+    requests: list[FillRequest],
+    filler: PDFFormFiller = pdf_filler,
+    timeout: Optional[float] = None,
+) -> list[FillResult]:
+    """Fill every request, in order. Failures are reported per item; fills
+    still running after timeout (default settings.pdf_fill_timeout_seconds)
+    are abandoned and reported as timed out."""
+    templates_dir = str(filler.templates_dir)
+    if settings.pdf_fill_workers <= 0:
+        return [await run_in_threadpool(_fill_to_blob, templates_dir, r) for r in requests]
+
+    timeout = timeout if timeout is not None else settings.pdf_fill_timeout_seconds
+    try:
+        pool, submitted = _pools.submit(_fill_to_blob, [(templates_dir, r) for r in requests])
+    except RuntimeError:
+        logger.exception("PDF batch: no usable pool")
+        return [FillResult(error="PDF generation unavailable") for _ in requests]
+
+    retire = False
+    try:
+        futures = [asyncio.wrap_future(f) for f in submitted]
+        done, pending = await asyncio.wait(futures, timeout=timeout)
+        if pending:
+            logger.warning("PDF batch: %s of %s fills exceeded %ss", len(pending), len(futures), timeout)
+            retire = True
+
+        results = []
+        for future in futures:
+            if future in pending:
+                # Not started yet: never runs. Running: stopped when the pool is terminated
+                future.cancel()
+                results.append(FillResult(error=f"Timed out after {timeout}s"))
+            elif future.exception() is not None:
+                # A dead worker breaks the pool; later batches need a new one
+                retire = retire or isinstance(future.exception(), BrokenProcessPool)
+                logger.error("PDF batch fill failed", exc_info=future.exception())
+                results.append(FillResult(error="PDF generation failed"))
+            else:
+                results.append(future.result())
+        return results
+    finally:
+        _pools.release(pool, retire=retire)
+
+
+# ── Per-deal outputs ─────────────────────────────────────────────────────
+
+OUTPUT_REF_NAMESPACE = "filled-pdf"
+
+
+def record_output(deal_id, digest: str) -> None:
+    """Record that a batch filled digest for deal_id."""
+    blob_store.write_ref(OUTPUT_REF_NAMESPACE, f"{deal_id}:{digest}", digest)
+
+
+def is_output_of(deal_id, digest: str) -> bool:
+    """True if digest was filled by a batch for deal_id (and still exists)."""
+    return blob_store.read_ref(OUTPUT_REF_NAMESPACE, f"{deal_id}:{digest}") == digest
+
+
+# ── ZIP streaming ────────────────────────────────────────────────────────
+
+class _ChunkSink:
+    """Write-only file object for zipfile that hands its output to a
+    generator instead of keeping it."""
+
+    def __init__(self):
+        self.chunks: list[bytes] = []
+
+    def write(self, data: bytes) -> int:
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data, self.chunks = b"".join(self.chunks), []
+        return data
+
+
+def zip_stream(entries: Iterable[tuple[str, str]], extra: Iterable[tuple[str, bytes]] = ()) -> Iterator[bytes]:
+    """Stream a ZIP of (archive name, blob digest) entries plus in-memory
+    (name, data) files, reading each blob from disk a chunk at a time.
+    PDFs are already compressed, so entries are stored, not deflated."""
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_STORED) as archive:
+        for name, digest in entries:
+            with open(blob_store.blob_path(digest), "rb") as src, archive.open(name, "w") as dst:
+                while chunk := src.read(blob_store.CHUNK_SIZE):
+                    dst.write(chunk)
+                    yield sink.drain()
+        for name, data in extra:
+            archive.writestr(name, data)
+            yield sink.drain()
+    yield sink.drain()
@@ -3,15 +3,32 @@ PDF Form Filler Service for FAR/BAR contracts.
 
 This service fills official FAR/BAR PDF forms with deal data,
 ensuring legal compliance by using official templates.
+
+Each template is read and walked once per process: its bytes and a
+field name -> (page, widget xref) index are cached, so a fill opens the
+document from memory and loads only the widgets it writes. Mapping
+conditions and formulas are compiled when the mapping is loaded
+(services/mapping_expressions.py).
 """
 import fitz
 import json
 import logging
 import base64
+import os
+import tempfile
+from dataclasses import dataclass
 from pathlib import Path
 from typing import Optional, Dict, Any, Tuple, List
 from datetime import datetime
 
+from services.mapping_expressions import (
+    MappingExpressionError,
+    compile_condition,
+    compile_formula,
+    compile_mapping,
+    field_accessor,
+)
+
 logger = logging.getLogger(__name__)
 
 TEMPLATES_DIR = Path(__file__).parent.parent / "templates"
@@ -22,12 +39,23 @@ class PDFFormFillerError(Exception):
     pass
 
 
+@dataclass(frozen=True)
+class PDFTemplate:
+    """A parsed PDF template: file contents and where each field lives."""
+    pdf_bytes: bytes
+    # Field name -> (page number, widget xref); first widget wins, as a
+    # page-by-page scan would find it
+    fields: Dict[str, Tuple[int, int]]
+
+
 class PDFFormFiller:
     """Service for filling official FAR/BAR PDF forms."""
 
     def __init__(self, templates_dir: Path = TEMPLATES_DIR):
         self.templates_dir = templates_dir
         self._mappings_cache: Dict[str, dict] = {}
+        self._compiled_cache: Dict[str, Dict[str, list]] = {}
+        self._templates_cache: Dict[str, PDFTemplate] = {}
 
     def get_available_templates(self) -> List[dict]:
         """List available PDF templates."""
@@ -52,15 +80,45 @@ class PDFFormFiller:
         return templates
 
     def get_mapping(self, template_slug: str) -> dict:
-        """Load field mapping for template."""
+        """Load field mapping for template, compiling its expressions."""
         if template_slug not in self._mappings_cache:
             mapping_path = self.templates_dir / "mappings" / f"{template_slug}.json"
             if not mapping_path.exists():
                 raise PDFFormFillerError(f"Mapping not found: {template_slug}")
             with open(mapping_path) as f:
-                self._mappings_cache[template_slug] = json.load(f)
+                mapping = json.load(f)
+            try:
+                self._compiled_cache[template_slug] = compile_mapping(mapping)
+            except MappingExpressionError as e:
+                raise PDFFormFillerError(f"Invalid mapping {template_slug}: {e}")
+            self._mappings_cache[template_slug] = mapping
         return self._mappings_cache[template_slug]
 
+    def get_compiled_mapping(self, template_slug: str) -> Dict[str, list]:
+        """(field_key, compiled, config) lists per field group."""
+        self.get_mapping(template_slug)
+        return self._compiled_cache[template_slug]
+
+    def get_template(self, template_slug: str) -> PDFTemplate:
+        """Load and index the PDF template for a mapping."""
+        if template_slug not in self._templates_cache:
+            mapping = self.get_mapping(template_slug)
+            pdf_path = self.templates_dir / mapping["pdf_file"]
+            if not pdf_path.exists():
+                raise PDFFormFillerError(f"PDF template not found: {pdf_path}")
+
+            pdf_bytes = pdf_path.read_bytes()
+            fields: Dict[str, Tuple[int, int]] = {}
+            doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+            try:
+                for page in doc:
+                    for widget in page.widgets():
+                        fields.setdefault(widget.field_name, (page.number, widget.xref))
+            finally:
+                doc.close()
+            self._templates_cache[template_slug] = PDFTemplate(pdf_bytes, fields)
+        return self._templates_cache[template_slug]
+
     def fill_pdf(
         self,
         template_slug: str,
@@ -78,39 +136,37 @@ class PDFFormFiller:
         Returns:
             Tuple of (filled_pdf_bytes, list_of_warnings)
         """
-        mapping = self.get_mapping(template_slug)
-        pdf_path = self.templates_dir / mapping["pdf_file"]
-
-        if not pdf_path.exists():
-            raise PDFFormFillerError(f"PDF template not found: {pdf_path}")
+        compiled = self.get_compiled_mapping(template_slug)
+        template = self.get_template(template_slug)
 
         warnings = []
-        doc = fitz.open(str(pdf_path))
+        doc = fitz.open(stream=template.pdf_bytes, filetype="pdf")
+        fields = _FieldLookup(doc, template.fields)
 
         try:
             # Fill text fields
-            for field_key, config in mapping.get("field_mappings", {}).get("text_fields", {}).items():
-                value = self._get_nested_value(deal_data, field_key)
+            for field_key, get_value, config in compiled["text_fields"]:
+                value = get_value(deal_data)
                 if value is not None:
                     try:
-                        self._fill_text_field(doc, config, value)
+                        self._fill_text_field(fields, config, value)
                     except Exception as e:
                         warnings.append(f"Failed to fill {field_key}: {e}")
 
             # Fill checkbox fields
-            for field_key, config in mapping.get("field_mappings", {}).get("checkbox_fields", {}).items():
+            for field_key, condition, config in compiled["checkbox_fields"]:
                 try:
-                    checked = self._evaluate_condition(config["condition"], deal_data)
-                    self._fill_checkbox(doc, config["pdf_field_name"], checked)
+                    checked = condition(deal_data)
+                    self._fill_checkbox(fields, config["pdf_field_name"], checked)
                 except Exception as e:
                     warnings.append(f"Failed to fill checkbox {field_key}: {e}")
 
             # Fill calculated fields
-            for field_key, config in mapping.get("field_mappings", {}).get("calculated_fields", {}).items():
+            for field_key, formula, config in compiled["calculated_fields"]:
                 try:
-                    value = self._evaluate_formula(config["formula"], deal_data)
+                    value = formula(deal_data)
                     formatted = self._format_value(value, config.get("format"))
-                    self._fill_text_field(doc, config, formatted)
+                    self._fill_text_field(fields, config, formatted)
                 except Exception as e:
                     warnings.append(f"Failed to calculate {field_key}: {e}")
 
@@ -120,7 +176,7 @@ class PDFFormFiller:
                         widget.field_flags = fitz.PDF_FIELD_IS_READ_ONLY
                         widget.update()
 
-            pdf_bytes = doc.tobytes()
+            pdf_bytes = _document_bytes(doc)
 
         finally:
             doc.close()
@@ -149,16 +205,9 @@ class PDFFormFiller:
 
     def _get_nested_value(self, data: dict, key: str) -> Any:
         """Get value from nested dict using dot notation."""
-        keys = key.split(".")
-        value = data
-        for k in keys:
-            if isinstance(value, dict):
-                value = value.get(k)
-            else:
-                return None
-        return value
-
-    def _fill_text_field(self, doc: fitz.Document, config: dict, value: Any):
+        return field_accessor(key)(data)
+
+    def _fill_text_field(self, fields: "_FieldLookup", config: dict, value: Any):
         """Fill a text field with auto-sizing."""
         field_name = config["pdf_field_name"]
 
@@ -180,37 +229,35 @@ class PDFFormFiller:
         )
 
         # Find and fill field
-        for page in doc:
-            for widget in page.widgets():
-                if widget.field_name == field_name:
-                    # Auto-size font if needed
-                    max_font = config.get("max_font_size", 10)
-                    min_font = config.get("min_font_size", 6)
-
-                    widget.field_value = str(formatted)
-
-                    # Calculate appropriate font size
-                    font_size = self._calculate_font_size(
-                        widget.rect, str(formatted), max_font, min_font
-                    )
-                    widget.text_fontsize = font_size
-                    widget.update()
-                    return
-
-        # Field not found - this is logged as debug, not warning
-        logger.debug(f"PDF field not found: {field_name}")
-
-    def _fill_checkbox(self, doc: fitz.Document, field_name: str, checked: bool):
+        widget = fields.widget(field_name)
+        if widget is None:
+            # Field not found - this is logged as debug, not warning
+            logger.debug(f"PDF field not found: {field_name}")
+            return
+
+        # Auto-size font if needed
+        max_font = config.get("max_font_size", 10)
+        min_font = config.get("min_font_size", 6)
+
+        widget.field_value = str(formatted)
+
+        # Calculate appropriate font size
+        font_size = self._calculate_font_size(
+            widget.rect, str(formatted), max_font, min_font
+        )
+        widget.text_fontsize = font_size
+        widget.update()
+
+    def _fill_checkbox(self, fields: "_FieldLookup", field_name: str, checked: bool):
         """Fill a checkbox field."""
-        for page in doc:
-            for widget in page.widgets():
-                if widget.field_name == field_name:
-                    # Common checkbox values: "Yes", "On", "True", or "Off", ""
-                    widget.field_value = "Yes" if checked else "Off"
-                    widget.update()
-                    return
+        widget = fields.widget(field_name)
+        if widget is None:
+            logger.debug(f"Checkbox field not found: {field_name}")
+            return
 
-        logger.debug(f"Checkbox field not found: {field_name}")
+        # Common checkbox values: "Yes", "On", "True", or "Off", ""
+        widget.field_value = "Yes" if checked else "Off"
+        widget.update()
 
     def _format_value(
         self,
@@ -297,7 +344,7 @@ class PDFFormFiller:
 
     def _evaluate_condition(self, condition: str, data: dict) -> bool:
         """
-        Safely evaluate a condition string.
+        Evaluate a condition string (see compile_condition).
 
         Supports:
         - "field == 'value'"
@@ -305,70 +352,57 @@ class PDFFormFiller:
         - "field != 'value'"
         - "field"  (truthy check)
         """
-        condition = condition.strip()
-
-        # Handle comparison operators
-        for op in ["==", "!="]:
-            if op in condition:
-                parts = condition.split(op)
-                if len(parts) != 2:
-                    return False
-
-                field = parts[0].strip()
-                expected = parts[1].strip().strip("'\"")
-                actual = self._get_nested_value(data, field)
-
-                # Handle boolean literals
-                if expected.lower() == "true":
-                    result = bool(actual)
-                elif expected.lower() == "false":
-                    result = not bool(actual)
-                else:
-                    result = str(actual) == expected
-
-                return result if op == "==" else not result
-
-        # Simple truthy check
-        return bool(self._get_nested_value(data, condition))
+        try:
+            return compile_condition(condition)(data)
+        except MappingExpressionError as e:
+            logger.warning(f"Condition evaluation failed: {e}")
+            return False
 
     def _evaluate_formula(self, formula: str, data: dict) -> float:
         """
-        Safely evaluate a simple arithmetic formula.
+        Evaluate a simple arithmetic formula (see compile_formula).
 
-        Supports: +, -, *, /, parentheses, and field references.
+        Supports: +, -, *, /, parentheses, field references and "or" defaults.
         """
-        # Build a safe evaluation context
-        result = formula
-
-        # Replace field names with values (longer names first to avoid partial replacement)
-        sorted_keys = sorted(data.keys(), key=len, reverse=True)
-        for key in sorted_keys:
-            if key in result:
-                value = data.get(key)
-                # Handle None and non-numeric values
-                if value is None:
-                    value = 0
-                try:
-                    value = float(value)
-                except (ValueError, TypeError):
-                    value = 0
-                result = result.replace(key, str(value))
-
-        # Handle "or 0" patterns for optional fields
-        result = result.replace(" or 0", "")
-
-        # Safe eval with only math operations
         try:
-            # Only allow numbers, operators, parentheses, and spaces
-            allowed_chars = set("0123456789.+-*/() ")
-            if not all(c in allowed_chars for c in result):
-                logger.warning(f"Invalid formula characters: {result}")
-                return 0.0
-            return float(eval(result, {"__builtins__": {}}, {}))
-        except Exception as e:
-            logger.warning(f"Formula evaluation failed: {formula} -> {result}: {e}")
+            return compile_formula(formula)(data)
+        except (MappingExpressionError, ZeroDivisionError) as e:
+            logger.warning(f"Formula evaluation failed: {formula}: {e}")
             return 0.0
 
 
+def _document_bytes(doc: fitz.Document) -> bytes:
+    """Serialize a document. Document.tobytes() streams the output through
+    a Python file object a few bytes at a time; saving to a path writes
+    from C and is several times faster for a full contract."""
+    fd, path = tempfile.mkstemp(suffix=".pdf")
+    os.close(fd)
+    try:
+        doc.save(path)
+        with open(path, "rb") as f:
+            return f.read()
+    finally:
+        os.unlink(path)
+
+
+class _FieldLookup:
+    """Loads widgets of one open document by name through a template index."""
+
+    def __init__(self, doc: fitz.Document, index: Dict[str, Tuple[int, int]]):
+        self.doc = doc
+        self.index = index
+        # Widgets keep a reference to their page, but not the other way round
+        self._pages: Dict[int, fitz.Page] = {}
+
+    def widget(self, field_name: str) -> Optional[fitz.Widget]:
+        location = self.index.get(field_name)
+        if location is None:
+            return None
+        page_number, xref = location
+        if page_number not in self._pages:
+            self._pages[page_number] = self.doc[page_number]
+        return self._pages[page_number].load_widget(xref)
+
+
 # Singleton instance
 pdf_filler = PDFFormFiller()
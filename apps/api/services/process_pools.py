@@ -0,0 +1,95 @@
+"""Process pools shared by concurrent callers.
+
+PDF text extraction (services/ingestion.py) and batch form filling
+(services/pdf_batch.py) each run their CPU-bound work on one long-lived
+ProcessPoolExecutor shared by every request in flight. A caller acquires
+the current pool, submits its tasks and releases the pool when done.
+
+A caller whose tasks timed out, or found a dead worker, retires the pool on
+release: later callers get a fresh one, and the retired pool's processes
+are terminated only once every caller still using it has released it. One
+request's timeout therefore never kills another request's tasks.
+"""
+from __future__ import annotations
+
+import logging
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Callable, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class SharedProcessPool:
+    def __init__(self, max_workers: Callable[[], int], name: str):
+        self._max_workers = max_workers
+        self._name = name
+        self._lock = threading.Lock()
+        self.current: Optional[ProcessPoolExecutor] = None
+        # Callers in flight per pool, and pools retired while still in use
+        self._users: dict[ProcessPoolExecutor, int] = {}
+        self._retired: set[ProcessPoolExecutor] = set()
+
+    def acquire(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self.current is None:
+                self.current = ProcessPoolExecutor(max_workers=self._max_workers())
+            self._users[self.current] = self._users.get(self.current, 0) + 1
+            return self.current
+
+    def release(self, pool: ProcessPoolExecutor, retire: bool = False) -> None:
+        """Stop using pool. retire: its workers are stuck or dead, so later
+        callers get a fresh pool; it is terminated once no caller uses it."""
+        with self._lock:
+            if retire:
+                self._retired.add(pool)
+                if self.current is pool:
+                    self.current = None
+            self._users[pool] -= 1
+            if self._users[pool] > 0:
+                return
+            del self._users[pool]
+            if pool not in self._retired:
+                return
+            self._retired.discard(pool)
+        _terminate(pool)
+
+    def discard(self) -> None:
+        """Retire the current pool now (terminated immediately if idle); the
+        next caller starts a fresh one."""
+        with self._lock:
+            pool, self.current = self.current, None
+            if pool is None:
+                return
+            if self._users.get(pool):
+                self._retired.add(pool)
+                return
+        _terminate(pool)
+
+    def submit(self, fn: Callable, calls: Iterable[tuple]) -> tuple[ProcessPoolExecutor, list[Future]]:
+        """Submit fn(*args) for each args in calls, replacing the pool once if
+        it is unusable (a worker died since the last caller). Returns the
+        pool, still acquired: the caller must release it. Raises RuntimeError
+        if no pool is usable."""
+        calls = list(calls)
+        pool = self.acquire()
+        try:
+            return pool, [pool.submit(fn, *args) for args in calls]
+        except RuntimeError as e:
+            # BrokenProcessPool, or shut down since it was acquired
+            logger.warning("%s: pool unusable (%r); starting a new one", self._name, e)
+            self.release(pool, retire=True)
+        pool = self.acquire()
+        try:
+            return pool, [pool.submit(fn, *args) for args in calls]
+        except RuntimeError:
+            self.release(pool, retire=True)
+            raise
+
+
+def _terminate(pool: ProcessPoolExecutor) -> None:
+    # concurrent.futures has no public way to stop a running task
+    processes = list((getattr(pool, "_processes", None) or {}).values())
+    pool.shutdown(wait=False, cancel_futures=True)
+    for process in processes:
+        process.terminate()
@@ -7,10 +7,63 @@ from pathlib import Path
 from sqlmodel import Session
 from models.contract import ContractVersion
 from llm.anthropic_client import generate_json
+from services.chunking import map_chunks, needs_chunking, split_contract, sum_meta
 
 logger = logging.getLogger(__name__)
 
 PROMPTS_DIR = Path(__file__).parent.parent / "prompts"
+PROMPT_VERSION = "proactive_risk_review_v1"
+SEVERITY_RANK = {"low": 0, "medium": 1, "high": 2}
+
+
+def review_contract_text(full_text: str, extracted_fields: dict, clause_tags: list) -> dict:
+    """Run the risk review prompt over the whole contract. Long contracts are
+    reviewed chunk by chunk (with the full field and clause state each time)
+    and the findings merged; see merge_risk_results."""
+    prompt_template = (PROMPTS_DIR / f"{PROMPT_VERSION}.md").read_text()
+    fields_json = json.dumps(extracted_fields, indent=2)
+    clauses_json = json.dumps(clause_tags, indent=2)
+
+    def review(text: str) -> dict:
+        prompt = (
+            prompt_template
+            .replace("{extracted_fields}", fields_json)
+            .replace("{clause_tags}", clauses_json)
+            .replace("{full_text}", text)
+        )
+        return generate_json(prompt, "Return the risk analysis JSON.", cache_as=PROMPT_VERSION)
+
+    if not needs_chunking(full_text):
+        return review(full_text)
+    results = map_chunks(review, split_contract(full_text))
+    merged = merge_risk_results(results)
+    merged["_meta"] = sum_meta([r.get("_meta") or {} for r in results])
+    return merged
+
+
+def merge_risk_results(results: list[dict]) -> dict:
+    """Combine per-chunk reviews in chunk order. Flags that several chunks
+    raise (same category, title and field) are kept once, at their highest
+    severity; suggestions are de-duplicated by title."""
+    flags: dict[tuple, dict] = {}
+    suggestions: dict[str, dict] = {}
+    score = 0
+    for result in results:
+        score = max(score, result.get("overall_risk_score") or 0)
+        for flag in result.get("risk_flags") or []:
+            key = (flag.get("category"), (flag.get("title") or "").strip().lower(), flag.get("affected_field"))
+            kept = flags.get(key)
+            if kept is None:
+                flags[key] = dict(flag)
+            elif SEVERITY_RANK.get(flag.get("severity"), 0) > SEVERITY_RANK.get(kept.get("severity"), 0):
+                kept["severity"] = flag.get("severity")
+        for suggestion in result.get("suggestions") or []:
+            suggestions.setdefault((suggestion.get("title") or "").strip().lower(), suggestion)
+    return {
+        "risk_flags": list(flags.values()),
+        "overall_risk_score": score,
+        "suggestions": list(suggestions.values()),
+    }
 
 
 def run_risk_analysis_sync(session: Session, version: ContractVersion) -> None:
@@ -24,26 +77,15 @@ def run_risk_analysis_sync(session: Session, version: ContractVersion) -> None:
         session.add(version)
         session.commit()
 
-        prompt_template = (PROMPTS_DIR / "proactive_risk_review_v1.md").read_text()
-
-        extracted_fields = json.dumps(version.extracted_fields or {}, indent=2)
-        clause_tags = json.dumps(version.clause_tags or [], indent=2)
-        full_text = (version.full_text or "")[:15000]
-
-        prompt = (
-            prompt_template
-            .replace("{extracted_fields}", extracted_fields)
-            .replace("{clause_tags}", clause_tags)
-            .replace("{full_text}", full_text)
+        result = review_contract_text(
+            version.full_text or "", version.extracted_fields or {}, version.clause_tags or [],
         )
-
-        result = generate_json(prompt, "Return the risk analysis JSON.")
         result.pop("_meta", None)
 
         version.risk_flags = result.get("risk_flags", [])
         version.suggestions = result.get("suggestions", [])
         version.risk_analysis_status = "completed"
-        version.risk_prompt_version = "proactive_risk_review_v1"
+        version.risk_prompt_version = PROMPT_VERSION
         session.add(version)
         session.commit()
 
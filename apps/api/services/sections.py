@@ -0,0 +1,169 @@
+"""Addressable contract sections for incremental version generation.
+
+A contract is split at its section headings (services/chunking.py) into
+Sections with a stable id derived from the heading ("12-closing-date") and
+a content hash. A change request usually touches one or two sections; only
+those are sent to the LLM and the document is reassembled around them, so
+output tokens scale with the change rather than with the contract.
+"""
+from __future__ import annotations
+
+import hashlib
+import re
+from dataclasses import dataclass
+from datetime import date
+from typing import Optional
+
+from services.chunking import _HEADING_RE, CHUNK_MAX_CHARS, split_contract, split_sections
+
+# Phrases that locate each field / clause in FAR/BAR-style contract text.
+# Unknown keys fall back to their own name with underscores as spaces.
+FIELD_KEYWORDS: dict[str, list[str]] = {
+    "purchase_price": ["purchase price"],
+    "closing_date": ["closing date", "closing"],
+    "inspection_period_days": ["inspection period", "inspection"],
+    "earnest_money": ["earnest money", "deposit", "escrow"],
+    "financing_type": ["financing", "mortgage", "loan"],
+    "appraisal_contingency": ["appraisal"],
+    "title_company": ["title company", "title", "escrow agent"],
+    "occupancy_date": ["occupancy", "possession"],
+    "seller_concessions": ["seller concession", "concession", "closing costs"],
+    "effective_date": ["effective date"],
+    "first_deposit_date": ["initial deposit", "deposit"],
+    "first_deposit_amount": ["initial deposit", "deposit"],
+    "financing_deadline": ["financing", "loan approval"],
+    "additional_deposit_date": ["additional deposit"],
+    "additional_deposit_amount": ["additional deposit"],
+    "loan_approval_deadline": ["loan approval", "financing"],
+}
+
+CLAUSE_KEYWORDS: dict[str, list[str]] = {
+    "inspection_contingency": ["inspection"],
+    "financing_contingency": ["financing", "mortgage", "loan"],
+    "appraisal_contingency": ["appraisal"],
+    "title_contingency": ["title"],
+    "closing_terms": ["closing"],
+    "earnest_money_terms": ["earnest money", "deposit"],
+    "seller_disclosure": ["disclosure"],
+    "property_condition": ["as is", "as-is", "condition"],
+    "occupancy_terms": ["occupancy", "possession"],
+}
+
+_MONTHS = ["January", "February", "March", "April", "May", "June", "July",
+           "August", "September", "October", "November", "December"]
+
+
+@dataclass
+class Section:
+    id: str
+    heading: str
+    text: str
+
+    @property
+    def hash(self) -> str:
+        return hashlib.sha256(self.text.encode("utf-8")).hexdigest()[:16]
+
+
+def _slug(heading: str) -> str:
+    slug = re.sub(r"[^a-z0-9]+", "-", heading.lower()).strip("-")
+    return "-".join(slug.split("-")[:8]) or "section"
+
+
+def split_into_sections(text: str, max_chars: int = CHUNK_MAX_CHARS) -> list[Section]:
+    """Sections in document order; "".join(s.text for s in ...) == text.
+
+    Ids come from the heading, so they survive edits elsewhere in the
+    document. Repeated headings get a -2, -3 suffix; a section longer than
+    max_chars is addressed in parts ("7-standards.1", "7-standards.2").
+    """
+    sections: list[Section] = []
+    seen: dict[str, int] = {}
+    for i, piece in enumerate(split_sections(text)):
+        match = _HEADING_RE.match(piece)
+        # The heading proper ("12. CLOSING DATE"), not the terms that follow
+        # it on the same line, so editing those terms keeps the id
+        heading = match.group(0).strip().rstrip(":").strip() if match else ""
+        base = _slug(heading) if match else ("preamble" if i == 0 else "section")
+        seen[base] = seen.get(base, 0) + 1
+        section_id = base if seen[base] == 1 else f"{base}-{seen[base]}"
+        if len(piece) <= max_chars:
+            sections.append(Section(section_id, heading, piece))
+        else:
+            for n, part in enumerate(split_contract(piece, max_chars), start=1):
+                sections.append(Section(f"{section_id}.{n}", heading, part))
+    return sections
+
+
+def value_variants(value) -> list[str]:
+    """Ways a stored field value may be written in the contract text."""
+    if value is None or value == "" or isinstance(value, bool):
+        return []
+    text = str(value)
+    variants = {text}
+    try:
+        number = float(text.replace(",", "").replace("$", ""))
+        if number >= 1000:
+            variants |= {f"{number:,.0f}", f"{number:,.2f}"}
+    except ValueError:
+        pass
+    try:
+        d = date.fromisoformat(text)
+        variants |= {f"{_MONTHS[d.month - 1]} {d.day}, {d.year}", d.strftime("%m/%d/%Y")}
+    except ValueError:
+        pass
+    return sorted(v for v in variants if len(v) >= 3)
+
+
+def _locate(sections: list[Section], keywords: list[str], values: list[str]) -> list[str]:
+    """Most specific evidence first: a heading naming the term, then the
+    current value in the text, then the term anywhere in the text."""
+    def heading_hit(s: Section) -> bool:
+        return any(k in s.heading.lower() for k in keywords)
+
+    def value_hit(s: Section) -> bool:
+        return any(v in s.text for v in values)
+
+    def body_hit(s: Section) -> bool:
+        return any(k in s.text.lower() for k in keywords)
+
+    for test in (heading_hit, value_hit, body_hit):
+        hits = [s.id for s in sections if test(s)]
+        if hits:
+            return hits
+    return []
+
+
+def sections_for_changes(
+    sections: list[Section],
+    changes: list[dict],
+    clause_actions: list[dict],
+) -> tuple[list[str], list[str]]:
+    """Ids of the sections a CR touches (document order), and the changes
+    that could not be located (field names / clause keys)."""
+    touched: set[str] = set()
+    unlocated: list[str] = []
+    for change in changes:
+        field = change.get("field") or ""
+        keywords = FIELD_KEYWORDS.get(field, [field.replace("_", " ")])
+        hits = _locate(sections, keywords, value_variants(change.get("from")))
+        if hits:
+            touched.update(hits)
+        else:
+            unlocated.append(field)
+    for action in clause_actions:
+        key = action.get("clause_key") or ""
+        keywords = CLAUSE_KEYWORDS.get(key, [key.replace("_", " ")])
+        hits = _locate(sections, keywords, [])
+        if hits:
+            touched.update(hits)
+        else:
+            unlocated.append(key)
+    return [s.id for s in sections if s.id in touched], unlocated
+
+
+def section_index(sections: list[Section], regenerated: Optional[list[str]] = None) -> list[dict]:
+    regenerated = set(regenerated or [])
+    return [
+        {"id": s.id, "hash": s.hash, "chars": len(s.text), "regenerated": s.id in regenerated}
+        for s in sections
+    ]
@@ -0,0 +1,138 @@
+"""Delta-compressed storage of ContractVersion text.
+
+A negotiation produces dozens of versions that differ in a few lines. Every
+settings.contract_keyframe_interval versions one is stored in full (a
+keyframe); the versions in between store only a zlib-compressed line delta
+against that keyframe, and an empty full_text column. Deltas are always
+against the keyframe, never chained, so reading any version costs one
+keyframe row plus one delta.
+
+models/contract.py applies this transparently: ContractVersion.full_text is
+a property that rebuilds delta-stored text (cached per process), and
+encode_on_insert runs before every ContractVersion INSERT.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import threading
+import uuid
+import zlib
+from collections import OrderedDict
+from typing import Optional
+
+from sqlalchemy import select
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+# A delta bigger than this share of the compressed text is not worth it;
+# the version is stored in full and becomes the next keyframe
+MAX_DELTA_RATIO = 0.5
+TEXT_CACHE_ENTRIES = 256
+
+# Ops: [i1, i2] copies lines i1..i2 of the keyframe, a string inserts text
+Op = list | str
+
+
+def encode_delta(base: str, text: str) -> bytes:
+    from services.diffing import matching_blocks
+
+    base_lines = base.splitlines(keepends=True)
+    lines = text.splitlines(keepends=True)
+    ops: list[Op] = []
+    j = 0
+    for i1, j1, size in matching_blocks(base_lines, lines):
+        if j1 > j:
+            ops.append("".join(lines[j:j1]))
+        if size:
+            ops.append([i1, i1 + size])
+        j = j1 + size
+    payload = json.dumps({"v": FORMAT_VERSION, "ops": ops}, ensure_ascii=False, separators=(",", ":"))
+    return zlib.compress(payload.encode("utf-8"), 9)
+
+
+def apply_delta(base: str, delta: bytes) -> str:
+    payload = json.loads(zlib.decompress(delta).decode("utf-8"))
+    if payload.get("v") != FORMAT_VERSION:
+        raise ValueError(f"Unsupported text delta format {payload.get('v')!r}")
+    base_lines = base.splitlines(keepends=True)
+    return "".join(
+        op if isinstance(op, str) else "".join(base_lines[op[0]:op[1]])
+        for op in payload["ops"]
+    )
+
+
+def worth_storing_as_delta(text: str, delta: bytes) -> bool:
+    return len(delta) <= MAX_DELTA_RATIO * len(zlib.compress(text.encode("utf-8"), 1))
+
+
+# ── Reconstructed text cache ─────────────────────────────────────────────
+# Versions are immutable, so an entry never goes stale.
+
+_cache: OrderedDict[uuid.UUID, str] = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def cached_text(version_id: uuid.UUID) -> Optional[str]:
+    with _cache_lock:
+        text = _cache.get(version_id)
+        if text is not None:
+            _cache.move_to_end(version_id)
+        return text
+
+
+def cache_text(version_id: uuid.UUID, text: str) -> None:
+    with _cache_lock:
+        _cache[version_id] = text
+        _cache.move_to_end(version_id)
+        while len(_cache) > TEXT_CACHE_ENTRIES:
+            _cache.popitem(last=False)
+
+
+# ── Write path ───────────────────────────────────────────────────────────
+
+def choose_storage(
+    text: str,
+    version_number: int,
+    keyframe: Optional[tuple[uuid.UUID, int, str]],
+) -> Optional[tuple[uuid.UUID, bytes]]:
+    """(keyframe id, delta) to store `text` as a delta, or None to store it
+    in full. keyframe is (id, version_number, text) of the deal's latest
+    keyframe, if any."""
+    interval = settings.contract_keyframe_interval
+    if interval <= 1 or keyframe is None or not text:
+        return None
+    keyframe_id, keyframe_number, keyframe_text = keyframe
+    if not 0 < version_number - keyframe_number < interval:
+        return None
+    delta = encode_delta(keyframe_text, text)
+    if not worth_storing_as_delta(text, delta):
+        return None
+    return keyframe_id, delta
+
+
+def encode_on_insert(connection, version) -> None:
+    """before_insert hook: turn a full-text ContractVersion into a delta
+    against its deal's latest keyframe when that is worth it."""
+    if version.text_delta is not None or not version.stored_text:
+        return
+    table = version.__table__
+    row = connection.execute(
+        select(table.c.id, table.c.version_number, table.c.full_text)
+        .where(
+            table.c.deal_id == version.deal_id,
+            table.c.text_base_id.is_(None),
+            table.c.version_number < version.version_number,
+        )
+        .order_by(table.c.version_number.desc())
+        .limit(1)
+    ).first()
+    storage = choose_storage(version.stored_text, version.version_number, tuple(row) if row else None)
+    if storage is None:
+        return
+    cache_text(version.id, version.stored_text)
+    version.text_base_id, version.text_delta = storage
+    version.stored_text = ""
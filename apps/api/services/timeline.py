@@ -7,6 +7,7 @@ from sqlmodel import select
 from models.audit import AuditEvent
 from models.deal import Deal
 from models.negotiation import NegotiationCycle, NegotiationState
+from services.deal_health import refresh_deal_health_for_event_async
 
 
 def get_next_state(current_state: str, action: str, actor_role: str) -> Optional[NegotiationState]:
@@ -58,6 +59,7 @@ async def record_event(
         details=details or {},
     )
     session.add(event)
+    await refresh_deal_health_for_event_async(session, event)
     await session.commit()
     await session.refresh(event)
     return event
@@ -1,13 +1,29 @@
-"""Timeline PDF generation — extract dates via LLM and build branded PDF."""
+"""Timeline PDF generation — extract dates via LLM and build branded PDF.
+
+Renders are memoized: render_pdf keys each PDF on its inputs (timeline
+items, address, brand and TEMPLATE_VERSION) and keeps the bytes in the
+blob store, so regenerating an unchanged timeline is a ref lookup.
+"""
 from __future__ import annotations
 
-import base64
+import hashlib
 import io
+import json
 import logging
+from datetime import date
+from functools import lru_cache
 from pathlib import Path
 from typing import Optional
 
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+from reportlab.lib.units import inch
+from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
 from llm.anthropic_client import generate_json
+from services import blob_store
+from services.chunking import map_chunks, needs_chunking, split_contract
 
 logger = logging.getLogger(__name__)
 
@@ -15,14 +31,37 @@ PROMPTS_DIR = Path(__file__).parent.parent / "prompts"
 
 
 def extract_timeline_dates(contract_text: str) -> list[dict]:
-    """Use Claude to extract critical dates from the contract text."""
+    """Use Claude to extract critical dates from the contract text. Long
+    contracts are read chunk by chunk; items are merged, de-duplicated and
+    ordered by due date."""
     v2_path = PROMPTS_DIR / "extract_timeline_v2.md"
     v1_path = PROMPTS_DIR / "extract_timeline_v1.md"
-    prompt_template = (v2_path if v2_path.exists() else v1_path).read_text()
-    prompt = prompt_template.replace("{contract_text}", contract_text[:15000])
-    result = generate_json(prompt, "Return the timeline JSON.")
-    result.pop("_meta", None)
-    return result.get("timeline", [])
+    template_path = v2_path if v2_path.exists() else v1_path
+    prompt_template = template_path.read_text()
+
+    def extract(text: str) -> list[dict]:
+        prompt = prompt_template.replace("{contract_text}", text)
+        result = generate_json(prompt, "Return the timeline JSON.", cache_as=template_path.stem)
+        return result.get("timeline", [])
+
+    if not needs_chunking(contract_text):
+        return extract(contract_text)
+
+    items: dict[tuple, dict] = {}
+    for chunk_items in map_chunks(extract, split_contract(contract_text)):
+        for item in chunk_items:
+            key = ((item.get("description") or "").strip().lower(), item.get("due_date"))
+            items.setdefault(key, item)
+    # Undated items last; stable sort keeps chunk order among equal dates
+    return sorted(items.values(), key=lambda item: (item.get("due_date") is None, item.get("due_date") or ""))
+
+
+def parse_due_date(value) -> Optional[date]:
+    """A YYYY-MM-DD due date as a date; None for descriptive ones."""
+    try:
+        return date.fromisoformat(value)
+    except (ValueError, TypeError):
+        return None
 
 
 def create_deliverables_from_timeline(session, deal, timeline: list[dict]) -> list:
@@ -44,6 +83,7 @@ def create_deliverables_from_timeline(session, deal, timeline: list[dict]) -> li
             deal_id=deal.id,
             description=item.get("description", ""),
             due_date=item.get("due_date", ""),
+            due_on=parse_due_date(item.get("due_date")),
             category=item.get("category", "other"),
             responsible_party=mapped,
             ai_suggested_party=llm_party,
@@ -55,49 +95,74 @@ def create_deliverables_from_timeline(session, deal, timeline: list[dict]) -> li
     return deliverables
 
 
-def build_pdf(
-    timeline: list[dict],
-    property_address: str,
-    company_name: str = "Pactly",
-    primary_color: str = "#14B8A6",
-) -> bytes:
-    """Generate a branded Critical Dates PDF using reportlab."""
-    from reportlab.lib.pagesizes import letter
-    from reportlab.lib.units import inch
-    from reportlab.lib import colors
-    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-
-    buf = io.BytesIO()
-    doc = SimpleDocTemplate(buf, pagesize=letter, topMargin=0.75 * inch, bottomMargin=0.5 * inch)
-    elements = []
-    styles = getSampleStyleSheet()
-
-    # Parse primary color
+# Bump when the layout below changes, so cached renders are rebuilt
+TEMPLATE_VERSION = "timeline-pdf-v1"
+DEFAULT_COLOR = "#14B8A6"
+
+# Styles are built once; ReportLab only reads them while laying out
+_STYLES = getSampleStyleSheet()
+_FOOTER_STYLE = ParagraphStyle("Footer", parent=_STYLES["Normal"], fontSize=8, textColor=colors.grey)
+_TABLE_COMMANDS = [
+    ("TEXTCOLOR", (0, 0), (-1, 0), colors.white),
+    ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
+    ("FONTSIZE", (0, 0), (-1, 0), 10),
+    ("FONTSIZE", (0, 1), (-1, -1), 9),
+    ("BOTTOMPADDING", (0, 0), (-1, 0), 8),
+    ("TOPPADDING", (0, 1), (-1, -1), 6),
+    ("BOTTOMPADDING", (0, 1), (-1, -1), 6),
+    ("GRID", (0, 0), (-1, -1), 0.5, colors.grey),
+    ("ROWBACKGROUNDS", (0, 1), (-1, -1), [colors.whitesmoke, colors.white]),
+    ("VALIGN", (0, 0), (-1, -1), "TOP"),
+]
+_COL_WIDTHS = [0.4 * inch, 3.2 * inch, 1.5 * inch, 1.2 * inch]
+
+
+@lru_cache(maxsize=64)
+def _brand_styles(primary_color: str) -> tuple[ParagraphStyle, TableStyle]:
+    """Title and table styles in an organization's color."""
     try:
         r = int(primary_color[1:3], 16) / 255
         g = int(primary_color[3:5], 16) / 255
         b = int(primary_color[5:7], 16) / 255
         brand_color = colors.Color(r, g, b)
     except Exception:
-        brand_color = colors.HexColor("#14B8A6")
+        brand_color = colors.HexColor(DEFAULT_COLOR)
 
-    # Title
     title_style = ParagraphStyle(
         "TitleStyle",
-        parent=styles["Heading1"],
+        parent=_STYLES["Heading1"],
         fontSize=18,
         textColor=brand_color,
         spaceAfter=6,
     )
+    table_style = TableStyle([("BACKGROUND", (0, 0), (-1, 0), brand_color), *_TABLE_COMMANDS])
+    return title_style, table_style
+
+
+def build_pdf(
+    timeline: list[dict],
+    property_address: str,
+    company_name: str = "Pactly",
+    primary_color: str = DEFAULT_COLOR,
+) -> bytes:
+    """Generate a branded Critical Dates PDF using reportlab."""
+    buf = io.BytesIO()
+    # invariant: no timestamps or random IDs, so equal inputs give equal bytes
+    doc = SimpleDocTemplate(
+        buf, pagesize=letter, topMargin=0.75 * inch, bottomMargin=0.5 * inch, invariant=True,
+    )
+    elements = []
+    title_style, table_style = _brand_styles(primary_color)
+
+    # Title
     elements.append(Paragraph(f"{company_name}", title_style))
-    elements.append(Paragraph("Critical Dates", styles["Heading2"]))
+    elements.append(Paragraph("Critical Dates", _STYLES["Heading2"]))
     if property_address:
-        elements.append(Paragraph(f"Property: {property_address}", styles["Normal"]))
+        elements.append(Paragraph(f"Property: {property_address}", _STYLES["Normal"]))
     elements.append(Spacer(1, 0.3 * inch))
 
     if not timeline:
-        elements.append(Paragraph("No critical dates were extracted from this contract.", styles["Normal"]))
+        elements.append(Paragraph("No critical dates were extracted from this contract.", _STYLES["Normal"]))
     else:
         # Build table
         header = ["#", "Description", "Due Date", "Category"]
@@ -110,38 +175,57 @@ def build_pdf(
                 item.get("category", "").replace("_", " ").title(),
             ])
 
-        table = Table(data, colWidths=[0.4 * inch, 3.2 * inch, 1.5 * inch, 1.2 * inch])
-        table.setStyle(TableStyle([
-            ("BACKGROUND", (0, 0), (-1, 0), brand_color),
-            ("TEXTCOLOR", (0, 0), (-1, 0), colors.white),
-            ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
-            ("FONTSIZE", (0, 0), (-1, 0), 10),
-            ("FONTSIZE", (0, 1), (-1, -1), 9),
-            ("BOTTOMPADDING", (0, 0), (-1, 0), 8),
-            ("TOPPADDING", (0, 1), (-1, -1), 6),
-            ("BOTTOMPADDING", (0, 1), (-1, -1), 6),
-            ("GRID", (0, 0), (-1, -1), 0.5, colors.grey),
-            ("ROWBACKGROUNDS", (0, 1), (-1, -1), [colors.whitesmoke, colors.white]),
-            ("VALIGN", (0, 0), (-1, -1), "TOP"),
-        ]))
+        table = Table(data, colWidths=_COL_WIDTHS)
+        table.setStyle(table_style)
         elements.append(table)
 
     elements.append(Spacer(1, 0.5 * inch))
-    footer_style = ParagraphStyle("Footer", parent=styles["Normal"], fontSize=8, textColor=colors.grey)
-    elements.append(Paragraph(f"Generated by {company_name} via Pactly — AI-powered contract management", footer_style))
+    elements.append(Paragraph(f"Generated by {company_name} via Pactly — AI-powered contract management", _FOOTER_STYLE))
 
     doc.build(elements)
     return buf.getvalue()
 
 
+def render_key(
+    timeline: list[dict],
+    property_address: str,
+    company_name: str,
+    primary_color: str,
+) -> str:
+    """Hash of everything that affects the rendered PDF."""
+    payload = json.dumps(
+        [TEMPLATE_VERSION, timeline, property_address, company_name, primary_color],
+        sort_keys=True, default=str, separators=(",", ":"),
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def render_pdf(
+    timeline: list[dict],
+    property_address: str,
+    company_name: str = "Pactly",
+    primary_color: str = DEFAULT_COLOR,
+) -> tuple[str, bool]:
+    """Blob digest of the timeline PDF, built only if these inputs have not
+    been rendered before. Returns (digest, reused)."""
+    key = render_key(timeline, property_address, company_name, primary_color)
+    digest = blob_store.read_ref("timeline-pdf", key)
+    if digest:
+        return digest, True
+    pdf_bytes = build_pdf(timeline, property_address, company_name, primary_color)
+    digest = blob_store.put_bytes(pdf_bytes)
+    blob_store.write_ref("timeline-pdf", key, digest)
+    return digest, False
+
+
 def get_brand_for_deal_sync(session, deal) -> dict:
     """Fetch organization brand settings for a deal (sync context)."""
-    brand = {"company_name": "Pactly", "primary_color": "#14B8A6", "logo_url": None}
+    brand = {"company_name": "Pactly", "primary_color": DEFAULT_COLOR, "logo_url": None}
     if deal.organization_id:
         from models.organization import Organization
         org = session.get(Organization, deal.organization_id)
         if org:
             brand["company_name"] = org.name or "Pactly"
-            brand["primary_color"] = org.primary_color or "#14B8A6"
+            brand["primary_color"] = org.primary_color or DEFAULT_COLOR
             brand["logo_url"] = org.logo_url
     return brand
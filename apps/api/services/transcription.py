@@ -3,6 +3,7 @@
 from __future__ import annotations
 
 import logging
+from typing import BinaryIO
 
 import httpx
 
@@ -15,8 +16,9 @@ MOCK_TRANSCRIPTION = (
 )
 
 
-async def transcribe_audio(audio_bytes: bytes, filename: str = "audio.webm") -> str:
-    """Transcribe audio bytes using OpenAI Whisper API.
+async def transcribe_audio(audio: bytes | BinaryIO, filename: str = "audio.webm") -> str:
+    """Transcribe audio using OpenAI Whisper API. Pass a file object (e.g. an
+    upload's spooled file) to stream it instead of holding it in memory.
 
     Returns mock text when OPENAI_API_KEY is not configured.
     """
@@ -28,7 +30,7 @@ async def transcribe_audio(audio_bytes: bytes, filename: str = "audio.webm") ->
         resp = await client.post(
             "https://api.openai.com/v1/audio/transcriptions",
             headers={"Authorization": f"Bearer {settings.openai_api_key}"},
-            files={"file": (filename, audio_bytes)},
+            files={"file": (filename, audio)},
             data={"model": "whisper-1"},
         )
         resp.raise_for_status()
@@ -0,0 +1,95 @@
+"""Streaming ingest for multipart uploads.
+
+Uploads never pass through memory whole:
+
+- UploadSizeLimitMiddleware cuts a multipart request off with 413 once its
+  body passes settings.max_upload_request_bytes — up front from
+  Content-Length, or while the body streams in — before Starlette has
+  spooled the rest of it. Starlette keeps at most 1 MB of each file in
+  memory and spools the remainder to a temporary file.
+- store_upload copies the spooled file into the blob store in CHUNK_SIZE
+  pieces on a worker thread, hashing as it goes, and stops at the endpoint's
+  own limit. Extraction then works from the blob's path (in the
+  parse_contract job for contracts).
+
+Peak memory per upload is a couple of chunks, whatever the file size.
+"""
+from __future__ import annotations
+
+from typing import Optional
+
+from fastapi import HTTPException, UploadFile
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from config import settings
+from services import blob_store
+
+
+class UploadTooLarge(HTTPException):
+    def __init__(self, detail: str = "Upload too large"):
+        super().__init__(status_code=413, detail=detail)
+
+
+def check_upload_size(upload: UploadFile, max_size: int, detail: str) -> None:
+    """413 if the (already spooled) upload is larger than max_size."""
+    if upload.size is not None and upload.size > max_size:
+        raise UploadTooLarge(detail)
+
+
+async def store_upload(upload: UploadFile, max_size: int, detail: str) -> tuple[str, int]:
+    """Copy an upload into the blob store without reading it into memory;
+    returns (digest, size). 413 with detail past max_size."""
+    check_upload_size(upload, max_size, detail)
+    await upload.seek(0)
+    try:
+        return await run_in_threadpool(blob_store.put_file, upload.file, max_size)
+    except blob_store.BlobTooLarge:
+        raise UploadTooLarge(detail)
+
+
+class UploadSizeLimitMiddleware:
+    """Reject multipart request bodies larger than max_bytes while they are
+    received, so an oversized upload is never spooled in full."""
+
+    def __init__(self, app: ASGIApp, max_bytes: Optional[int] = None):
+        self.app = app
+        self.max_bytes = max_bytes if max_bytes is not None else settings.max_upload_request_bytes
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not self._is_multipart(scope):
+            await self.app(scope, receive, send)
+            return
+
+        detail = f"Upload too large. Maximum {self.max_bytes // (1024 * 1024)} MB."
+        length = self._header(scope, b"content-length")
+        if length and length.isdigit() and int(length) > self.max_bytes:
+            await JSONResponse({"detail": detail}, status_code=413)(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive() -> Message:
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    # Raised inside body parsing; FastAPI passes HTTPExceptions
+                    # through, so the client gets the 413
+                    raise UploadTooLarge(detail)
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+    @staticmethod
+    def _header(scope: Scope, name: bytes) -> Optional[str]:
+        for key, value in scope.get("headers", []):
+            if key == name:
+                return value.decode("latin-1")
+        return None
+
+    def _is_multipart(self, scope: Scope) -> bool:
+        content_type = self._header(scope, b"content-type") or ""
+        return content_type.startswith("multipart/")
@@ -1,6 +1,9 @@
 """Version generation service — deterministic field apply + constrained LLM text generation."""
 
+import json
+import logging
 import uuid
+from pathlib import Path
 from datetime import datetime
 from typing import Optional
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -9,6 +12,14 @@ from sqlmodel import select, desc
 from models.contract import ContractVersion
 from models.change_request import ChangeRequest
 from services.contract_intelligence import apply_field_changes, apply_clause_actions
+from services.chunking import map_chunks, needs_chunking, split_contract, sum_meta
+from services.field_patcher import patch_field_changes
+from services.sections import sections_for_changes, split_into_sections
+from llm.anthropic_client import generate_text
+
+logger = logging.getLogger(__name__)
+
+PROMPTS_DIR = Path(__file__).parent.parent / "prompts"
 
 
 async def get_latest_version(session: AsyncSession, deal_id: uuid.UUID) -> Optional[ContractVersion]:
@@ -16,6 +27,8 @@ async def get_latest_version(session: AsyncSession, deal_id: uuid.UUID) -> Optio
         select(ContractVersion)
         .where(ContractVersion.deal_id == deal_id)
         .order_by(desc(ContractVersion.version_number))
+        .limit(1)
+        .options(*ContractVersion.with_text())
     )
     return result.first()
 
@@ -49,3 +62,109 @@ async def create_new_version(
     await session.commit()
     await session.refresh(version)
     return version
+
+
+def _section_prompt(template: str, changes_json: str, actions_json: str, excerpt: str) -> str:
+    return (
+        template
+        .replace("{field_changes}", changes_json)
+        .replace("{clause_actions}", actions_json)
+        .replace("{original_text}", excerpt)
+    )
+
+
+def _rewrite_excerpt(prompt: str, excerpt: str, max_tokens: int = 8192) -> dict:
+    """Generate one excerpt and keep its original surrounding whitespace so
+    the seams with the untouched text are unchanged."""
+    result = generate_text(prompt, max_tokens=max_tokens)
+    body = result["text"].strip()
+    leading = excerpt[:len(excerpt) - len(excerpt.lstrip())]
+    trailing = excerpt[len(excerpt.rstrip()):]
+    return {"text": f"{leading}{body}{trailing}", "_meta": result.get("_meta") or {}}
+
+
+def _output_budget(excerpt: str) -> int:
+    # ~3 chars per output token plus headroom for an added sentence or two
+    return min(8192, len(excerpt) // 3 + 512)
+
+
+def rewrite_contract_text(original_text: str, changes: list, clause_actions: list) -> dict:
+    """Constrained LLM rewrite of the contract text with approved changes.
+
+    Field-only changes whose current values can be found unambiguously in
+    the text are substituted without the LLM (services/field_patcher.py).
+    Otherwise the contract is split into addressable sections (services/sections.py)
+    and only the sections the changes touch are regenerated with
+    generate_version_section_v1; every other section is carried over
+    byte-for-byte. If any change cannot be located in a section (e.g. a new
+    clause with no existing home), the whole text is rewritten as before:
+    in one prompt, or chunk by chunk for long contracts.
+
+    Returns {"text", "_meta", "sections", "method"} where sections records
+    the total count and the ids that were regenerated, and method is
+    "patch", "sections" or "full".
+    """
+    if not clause_actions:
+        patched = patch_field_changes(original_text, changes)
+        if patched is not None:
+            logger.info("Patched %s field change(s) without the LLM", len(changes))
+            return {
+                "text": patched,
+                "_meta": {"input_tokens": 0, "output_tokens": 0, "model": None},
+                "sections": {"total": len(split_into_sections(original_text)), "regenerated": []},
+                "method": "patch",
+            }
+
+    changes_json = json.dumps(changes, indent=2)
+    actions_json = json.dumps(clause_actions, indent=2)
+    section_template = (PROMPTS_DIR / "generate_version_section_v1.md").read_text()
+
+    sections = split_into_sections(original_text)
+    touched, unlocated = sections_for_changes(sections, changes, clause_actions)
+    if touched and not unlocated:
+        targets = [s for s in sections if s.id in set(touched)]
+        results = map_chunks(
+            lambda s: _rewrite_excerpt(
+                _section_prompt(section_template, changes_json, actions_json, s.text),
+                s.text,
+                max_tokens=_output_budget(s.text),
+            ),
+            targets,
+        )
+        rewritten = {s.id: r["text"] for s, r in zip(targets, results)}
+        logger.info("Regenerated %s of %s sections: %s", len(targets), len(sections), ", ".join(touched))
+        return {
+            "text": "".join(rewritten.get(s.id, s.text) for s in sections),
+            "_meta": sum_meta([r["_meta"] for r in results]),
+            "sections": {"total": len(sections), "regenerated": touched},
+            "method": "sections",
+        }
+
+    if unlocated:
+        logger.info("Full rewrite: could not locate %s in any section", ", ".join(unlocated))
+    all_ids = [s.id for s in sections]
+
+    if not needs_chunking(original_text):
+        prompt = (
+            (PROMPTS_DIR / "generate_version_v1.md").read_text()
+            .replace("{field_changes}", changes_json)
+            .replace("{clause_actions}", actions_json)
+            .replace("{original_text}", original_text)
+        )
+        result = generate_text(prompt)
+        result["sections"] = {"total": len(sections), "regenerated": all_ids}
+        result["method"] = "full"
+        return result
+
+    results = map_chunks(
+        lambda chunk: _rewrite_excerpt(
+            _section_prompt(section_template, changes_json, actions_json, chunk), chunk,
+        ),
+        split_contract(original_text),
+    )
+    return {
+        "text": "".join(r["text"] for r in results),
+        "_meta": sum_meta([r["_meta"] for r in results]),
+        "sections": {"total": len(sections), "regenerated": all_ids},
+        "method": "full",
+    }
@@ -0,0 +1,19 @@
+"""Shared test fixtures."""
+
+import pytest
+from sqlalchemy.pool import StaticPool
+from sqlmodel import SQLModel, create_engine
+
+
+@pytest.fixture
+def sqlite_engine(monkeypatch):
+    """Factory for an in-memory SQLite engine: sqlite_engine(models, *modules)
+    creates the models' tables and points each module's sync_engine at it.
+    One shared connection, so every session sees the same database."""
+    def make(models, *modules):
+        engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+        SQLModel.metadata.create_all(engine, tables=[model.__table__ for model in models])
+        for module in modules:
+            monkeypatch.setattr(module, "sync_engine", engine)
+        return engine
+    return make
@@ -0,0 +1,84 @@
+"""Content-addressed blob store and its download responses."""
+
+import hashlib
+import io
+import os
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from services import blob_store
+
+
+@pytest.fixture(autouse=True)
+def storage(tmp_path, monkeypatch):
+    monkeypatch.setattr(blob_store.settings, "storage_path", str(tmp_path))
+    return tmp_path
+
+
+def test_put_bytes_is_content_addressed_and_deduplicated():
+    data = b"%PDF-1.4 timeline"
+    digest = blob_store.put_bytes(data)
+    assert digest == hashlib.sha256(data).hexdigest()
+    assert blob_store.put_bytes(data) == digest
+    assert blob_store.read_bytes(digest) == data
+
+    files = [name for _, _, names in os.walk(blob_store.blob_root()) for name in names]
+    # One copy, no leftover temp files
+    assert files == [digest]
+
+
+def test_put_file_streams_and_matches_put_bytes():
+    data = os.urandom(blob_store.CHUNK_SIZE * 2 + 17)
+    digest, size = blob_store.put_file(io.BytesIO(data))
+    assert size == len(data)
+    assert digest == blob_store.put_bytes(data)
+
+
+def test_invalid_digest_rejected():
+    with pytest.raises(ValueError):
+        blob_store.blob_path("../../etc/passwd")
+    assert not blob_store.exists(None)
+
+
+def test_refs_name_blobs_by_key():
+    digest = blob_store.put_bytes(b"render")
+    assert blob_store.read_ref("renders", "inputs/../a") is None
+    blob_store.write_ref("renders", "inputs/../a", digest)
+    assert blob_store.read_ref("renders", "inputs/../a") == digest
+    assert blob_store.read_ref("other", "inputs/../a") is None
+
+    # A ref whose blob is gone is a miss
+    os.unlink(blob_store.blob_path(digest))
+    assert blob_store.read_ref("renders", "inputs/../a") is None
+    with pytest.raises(ValueError):
+        blob_store.write_ref("../renders", "a", digest)
+
+
+def test_blob_response_supports_range_and_404():
+    data = bytes(range(256)) * 40
+    digest = blob_store.put_bytes(data)
+    app = FastAPI()
+
+    @app.get("/file/{digest}")
+    def download(digest: str):
+        return blob_store.blob_response(digest, "application/pdf", "Critical_Dates.pdf", "missing")
+
+    @app.get("/none")
+    def none():
+        return blob_store.blob_response(None, "application/pdf", "x.pdf", "Timeline PDF not yet generated")
+
+    client = TestClient(app)
+    full = client.get(f"/file/{digest}")
+    assert full.status_code == 200
+    assert full.content == data
+    assert "Critical_Dates.pdf" in full.headers["content-disposition"]
+
+    part = client.get(f"/file/{digest}", headers={"Range": "bytes=100-199"})
+    assert part.status_code == 206
+    assert part.content == data[100:200]
+
+    missing = client.get("/none")
+    assert missing.status_code == 404
+    assert missing.json()["detail"] == "Timeline PDF not yet generated"
@@ -0,0 +1,86 @@
+"""Tests for section-aware chunking and map-reduce merges."""
+
+import threading
+
+from services.chunking import map_chunks, split_contract, split_sections
+from services.contract_parsing import merge_parse_results
+from services.risk_analysis import merge_risk_results
+
+
+def _contract(sections: int, body: str = "The parties agree as follows. " * 20) -> str:
+    parts = ["FAR/BAR AS-IS RESIDENTIAL CONTRACT FOR SALE AND PURCHASE\n\n"]
+    for i in range(1, sections + 1):
+        parts.append(f"{i}. SECTION NUMBER {i}:\n{body}\n\n")
+    return "".join(parts)
+
+
+def test_split_sections_on_headings():
+    text = "Preamble\n1. PURCHASE PRICE: $1\nbody\n2. CLOSING DATE: soon\nA. TITLE: ok\n"
+    assert split_sections(text) == [
+        "Preamble\n", "1. PURCHASE PRICE: $1\nbody\n", "2. CLOSING DATE: soon\n", "A. TITLE: ok\n",
+    ]
+
+
+def test_chunks_are_exact_slices_of_whole_sections():
+    text = _contract(40)
+    chunks = split_contract(text, max_chars=2000)
+    assert "".join(chunks) == text
+    assert len(chunks) > 1
+    assert all(len(c) <= 2000 for c in chunks)
+    # Every chunk after the first starts at a section heading
+    assert all(c.lstrip()[:1].isdigit() for c in chunks[1:])
+
+
+def test_oversized_section_is_split_at_paragraphs():
+    text = "1. HUGE SECTION\n" + ("paragraph text " * 30 + "\n\n") * 20
+    chunks = split_contract(text, max_chars=1000)
+    assert "".join(chunks) == text
+    assert all(len(c) <= 1000 for c in chunks)
+
+
+def test_map_chunks_keeps_order_and_bounds_concurrency():
+    active, peak = [0], [0]
+    lock = threading.Lock()
+
+    def work(n):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        threading.Event().wait(0.01)
+        with lock:
+            active[0] -= 1
+        return n * 2
+
+    assert map_chunks(work, list(range(10)), max_workers=3) == [n * 2 for n in range(10)]
+    assert peak[0] <= 3
+
+
+def test_merge_parse_results_is_order_deterministic():
+    merged = merge_parse_results([
+        {"contract_type": "UNKNOWN", "fields": {"purchase_price": 350000, "closing_date": None},
+         "clauses": [{"key": "inspection_contingency", "status": "active", "editable": True}],
+         "questions": ["q1"]},
+        {"contract_type": "FAR_BAR_ASIS", "fields": {"purchase_price": 360000, "closing_date": "2025-07-15"},
+         "clauses": [{"key": "inspection_contingency", "status": "removed", "editable": True},
+                     {"key": "closing_terms", "status": "active", "editable": True}],
+         "questions": ["q1", "q2"]},
+    ])
+    assert merged["contract_type"] == "FAR_BAR_ASIS"
+    assert merged["fields"] == {"purchase_price": 350000, "closing_date": "2025-07-15"}
+    assert [c["key"] for c in merged["clauses"]] == ["inspection_contingency", "closing_terms"]
+    assert merged["clauses"][0]["status"] == "removed"
+    assert merged["questions"][0].startswith("purchase_price appears with different values")
+    assert merged["questions"][1:] == ["q1", "q2"]
+
+
+def test_merge_risk_results_dedupes_at_highest_severity():
+    flag = {"category": "financial", "title": "Low deposit", "affected_field": "earnest_money"}
+    merged = merge_risk_results([
+        {"risk_flags": [dict(flag, severity="low")], "overall_risk_score": 40,
+         "suggestions": [{"title": "Raise deposit"}]},
+        {"risk_flags": [dict(flag, title="low deposit ", severity="high")], "overall_risk_score": 70,
+         "suggestions": [{"title": "raise deposit"}, {"title": "Shorten inspection"}]},
+    ])
+    assert [(f["title"], f["severity"]) for f in merged["risk_flags"]] == [("Low deposit", "high")]
+    assert merged["overall_risk_score"] == 70
+    assert [s["title"] for s in merged["suggestions"]] == ["Raise deposit", "Shorten inspection"]
@@ -0,0 +1,198 @@
+"""Deal health batch engine tests (in-memory SQLite)."""
+
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event
+from sqlmodel import SQLModel, Session, create_engine, select
+
+from models.user import User
+from models.deal import Deal
+from models.audit import AuditEvent
+from models.change_request import ChangeRequest
+from models.contract import ContractVersion
+from models.deal_health import DealHealth
+from services import deal_health
+from services.deal_health import (
+    compute_deal_health,
+    compute_deals_health_batch,
+    health_from_row,
+    reconcile_deal_health,
+    refresh_deal_health_for_event,
+    refresh_expired_deal_health,
+)
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine("sqlite://")
+    SQLModel.metadata.create_all(engine, tables=[
+        User.__table__, Deal.__table__, AuditEvent.__table__,
+        ChangeRequest.__table__, ContractVersion.__table__, DealHealth.__table__,
+    ])
+    return engine
+
+
+def _seed(session: Session, n: int) -> list[uuid.UUID]:
+    owner = uuid.uuid4()
+    now = datetime.utcnow()
+    ids = []
+    for i in range(n):
+        deal = Deal(title=f"Deal {i}", created_by=owner, created_at=now - timedelta(days=i % 10))
+        session.add(deal)
+        ids.append(deal.id)
+        if i % 2:
+            session.add(AuditEvent(deal_id=deal.id, action="deal_created", created_at=now - timedelta(days=i % 7)))
+        for _ in range(i % 3):
+            session.add(ChangeRequest(deal_id=deal.id, raw_text="x", created_by=owner))
+        for v in range(i % 6):
+            session.add(ContractVersion(deal_id=deal.id, version_number=v, full_text="t", created_by=owner))
+    session.commit()
+    return ids
+
+
+def _count_queries(engine) -> list:
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+    return statements
+
+
+def test_batch_matches_single_deal(engine):
+    with Session(engine) as session:
+        ids = _seed(session, 12)
+        batch = compute_deals_health_batch(session, ids)
+        for did in ids:
+            assert batch[str(did)] == compute_deal_health(session, did)
+
+
+def test_batch_scores_inputs(engine):
+    with Session(engine) as session:
+        ids = _seed(session, 6)
+        h = compute_deals_health_batch(session, ids)[str(ids[5])]
+        assert h["open_crs"] == 2
+        assert h["versions_count"] == 5
+        assert h["days_since_last_activity"] == 5
+        assert "2 open CRs pending" in h["issues"]
+
+
+def test_missing_deal_reported(engine):
+    with Session(engine) as session:
+        missing = uuid.uuid4()
+        assert compute_deals_health_batch(session, [missing])[str(missing)]["issues"] == ["Deal not found"]
+
+
+def test_query_count_is_constant(engine):
+    with Session(engine) as session:
+        ids = _seed(session, 60)
+        statements = _count_queries(engine)
+        compute_deals_health_batch(session, ids[:5])
+        small = len(statements)
+        statements.clear()
+        compute_deals_health_batch(session, ids)
+        assert len(statements) == small == 4
+
+
+def test_reconcile_matches_batch(engine):
+    with Session(engine) as session:
+        ids = _seed(session, 12)
+        assert reconcile_deal_health(session, batch_size=5) == 12
+        batch = compute_deals_health_batch(session, ids)
+        for did in ids:
+            row = session.get(DealHealth, did)
+            expected = batch[str(did)]
+            assert row.score == expected["health_score"]
+            assert row.status == expected["health_status"]
+            assert health_from_row(session.get(Deal, did), row) == expected
+
+
+def test_event_refresh_updates_row_incrementally(engine):
+    with Session(engine) as session:
+        ids = _seed(session, 6)
+        reconcile_deal_health(session)
+        deal = session.get(Deal, ids[5])
+
+        session.add(ChangeRequest(deal_id=deal.id, raw_text="x", created_by=deal.created_by))
+        event = AuditEvent(deal_id=deal.id, action="change_request_created")
+        session.add(event)
+        refresh_deal_health_for_event(session, event)
+        session.commit()
+
+        row = session.get(DealHealth, deal.id)
+        assert row.open_cr_count == 3
+        assert row.last_activity_at == event.created_at
+        assert row.score == compute_deal_health(session, deal.id)["health_score"]
+
+
+def test_refresh_expired_only_touches_stale_rows(engine):
+    with Session(engine) as session:
+        ids = _seed(session, 6)
+        reconcile_deal_health(session)
+        assert refresh_expired_deal_health(session, select(Deal.id)) == 0
+
+        row = session.get(DealHealth, ids[2])
+        row.score_expires_at = datetime.utcnow() - timedelta(minutes=1)
+        session.add(row)
+        session.delete(session.get(DealHealth, ids[3]))
+        session.commit()
+        assert refresh_expired_deal_health(session, select(Deal.id)) == 2
+
+
+@pytest.fixture
+def file_engine(tmp_path):
+    """A file database, so two sessions use separate connections."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'health.db'}")
+    SQLModel.metadata.create_all(engine, tables=[
+        User.__table__, Deal.__table__, AuditEvent.__table__,
+        ChangeRequest.__table__, ContractVersion.__table__, DealHealth.__table__,
+    ])
+    return engine
+
+
+def test_concurrent_first_event_keeps_the_event(file_engine, monkeypatch):
+    with Session(file_engine) as session:
+        ids = _seed(session, 3)
+        reconcile_deal_health(session, ids)  # the other request's write
+
+    with Session(file_engine) as session:
+        # ...which this request's lookup ran too early to see
+        get = session.get
+        missed = []
+        monkeypatch.setattr(session, "get", lambda entity, ident, **kw: (
+            missed.append(ident) if entity is DealHealth and not missed else get(entity, ident, **kw)
+        ))
+        event = AuditEvent(deal_id=ids[1], action="change_request_created")
+        session.add(event)
+        row = refresh_deal_health_for_event(session, event)
+        session.commit()
+        assert missed and row.open_cr_count == 1
+        event_id, event_at = event.id, event.created_at
+
+    with Session(file_engine) as session:
+        assert session.get(AuditEvent, event_id) is not None
+        assert session.get(DealHealth, ids[1]).last_activity_at == event_at
+
+
+def test_concurrent_reconcile_writes_each_row_once(file_engine, monkeypatch):
+    with Session(file_engine) as session:
+        ids = _seed(session, 4)
+        reconcile_deal_health(session, ids[:1])  # one row already there
+
+    # Another session writes two of the missing rows after this one looked
+    load = deal_health._load_health_inputs
+
+    def racing_load(session, deal_ids):
+        monkeypatch.setattr(deal_health, "_load_health_inputs", load)
+        with Session(file_engine) as other:
+            reconcile_deal_health(other, ids[2:])
+        return load(session, deal_ids)
+
+    monkeypatch.setattr(deal_health, "_load_health_inputs", racing_load)
+    with Session(file_engine) as session:
+        assert reconcile_deal_health(session, ids) == 4
+
+    with Session(file_engine) as session:
+        batch = compute_deals_health_batch(session, ids)
+        rows = session.exec(select(DealHealth)).all()
+        assert sorted(r.deal_id for r in rows) == sorted(ids)
+        assert all(r.score == batch[str(r.deal_id)]["health_score"] for r in rows)
@@ -0,0 +1,134 @@
+"""List endpoints must not fetch contract text (in-memory SQLite).
+
+Bytes are counted at the DB-API cursor, so anything the ORM loads — including
+lazy loads of deferred columns — shows up.
+"""
+
+import asyncio
+import sqlite3
+import uuid
+
+import pytest
+from sqlalchemy.pool import StaticPool
+from sqlmodel import SQLModel, Session, create_engine
+
+from models.contract import ContractVersion
+from models.external_feedback import ExternalFeedback
+from models.share_link import ShareLink
+from routers import public, versions
+from services import text_deltas
+
+VERSIONS = 12
+TEXT = "".join(f"{i}. SECTION {i}: the parties agree to term number {i}.\n" for i in range(1, 800))
+
+_fetched = [0]
+
+
+def _size(rows) -> None:
+    for row in rows:
+        _fetched[0] += sum(len(v) if isinstance(v, (str, bytes)) else 8 for v in row)
+
+
+class _CountingCursor(sqlite3.Cursor):
+    def fetchone(self):
+        row = super().fetchone()
+        if row is not None:
+            _size([row])
+        return row
+
+    def fetchmany(self, *args):
+        rows = super().fetchmany(*args)
+        _size(rows)
+        return rows
+
+    def fetchall(self):
+        rows = super().fetchall()
+        _size(rows)
+        return rows
+
+
+class _CountingConnection(sqlite3.Connection):
+    def cursor(self, factory=_CountingCursor):
+        return super().cursor(factory)
+
+
+class _AsyncAdapter:
+    """Drives the async endpoints with a sync Session (no async SQLite driver
+    is installed). Lazy loads still hit the counting cursor."""
+
+    def __init__(self, session: Session):
+        self._session = session
+
+    async def exec(self, stmt):
+        return self._session.exec(stmt)
+
+    async def run_sync(self, fn, *args):
+        return fn(self._session, *args)
+
+
+@pytest.fixture
+def seeded(monkeypatch):
+    engine = create_engine(
+        "sqlite://",
+        creator=lambda: sqlite3.connect(":memory:", factory=_CountingConnection, check_same_thread=False),
+        poolclass=StaticPool,
+    )
+    SQLModel.metadata.create_all(engine, tables=[
+        ContractVersion.__table__, ShareLink.__table__, ExternalFeedback.__table__,
+    ])
+    # Every version stored in full: the worst case for list payloads
+    monkeypatch.setattr(text_deltas.settings, "contract_keyframe_interval", 1)
+
+    async def allow(*args, **kwargs):
+        return None
+    monkeypatch.setattr(versions, "check_deal_access", allow)
+
+    deal_id, owner = uuid.uuid4(), uuid.uuid4()
+    with Session(engine) as session:
+        for n in range(VERSIONS):
+            session.add(ContractVersion(
+                deal_id=deal_id, version_number=n, full_text=TEXT + f"Revision {n}\n",
+                extracted_fields={"purchase_price": 500000 + n}, created_by=owner,
+            ))
+        session.add(ShareLink(
+            deal_id=deal_id, token="tok", created_by=owner, counterparty_name="Buyer",
+            last_viewed_version_number=0,
+        ))
+        session.commit()
+    return engine, deal_id
+
+
+def _fetch(engine, endpoint, **kwargs):
+    text_deltas._cache.clear()
+    with Session(engine) as session:
+        _fetched[0] = 0
+        result = asyncio.run(endpoint(session=_AsyncAdapter(session), **kwargs))
+        return result, _fetched[0]
+
+
+def test_list_versions_skips_text_unless_requested(seeded):
+    engine, deal_id = seeded
+    total_text = VERSIONS * len(TEXT)
+
+    listed, fetched = _fetch(engine, versions.list_versions, deal_id=deal_id, include_text=False, user=None)
+    assert len(listed) == VERSIONS
+    assert all(v.full_text is None for v in listed)
+    assert fetched < total_text / 50
+
+    listed, fetched = _fetch(engine, versions.list_versions, deal_id=deal_id, include_text=True, user=None)
+    assert listed[-1].full_text.endswith(f"Revision {VERSIONS - 1}\n")
+    assert fetched > total_text
+
+
+def test_public_lists_skip_text(seeded):
+    engine, _ = seeded
+    total_text = VERSIONS * len(TEXT)
+
+    items, fetched = _fetch(engine, public.get_public_versions, token="tok")
+    assert [v.version_number for v in items] == list(range(VERSIONS - 1, -1, -1))
+    assert fetched < total_text / 50
+
+    summary, fetched = _fetch(engine, public.get_changes_summary, token="tok")
+    assert summary.new_versions_count == VERSIONS - 1
+    assert summary.changes[0].field == "purchase_price"
+    assert fetched < total_text / 50
@@ -0,0 +1,128 @@
+"""Deliverable reminder scheduler tests (in-memory SQLite)."""
+
+from datetime import date, timedelta
+
+import pytest
+from sqlalchemy import event
+from sqlmodel import Session, select
+
+from models.deal import Deal, DealAssignment
+from models.deliverable import Deliverable
+from models.notification import Notification
+from models.share_link import ShareLink
+from models.user import User
+from services import email
+from services.timeline_pdf import create_deliverables_from_timeline, parse_due_date
+from workers import tasks
+
+TODAY = date.today()
+
+
+@pytest.fixture
+def engine(sqlite_engine):
+    return sqlite_engine([User, Deal, DealAssignment, ShareLink, Deliverable, Notification], tasks)
+
+
+@pytest.fixture
+def sent(monkeypatch):
+    """Emails the run sends, as (kind, to, days remaining)."""
+    sent = []
+    monkeypatch.setattr(email, "notify_deliverable_reminder",
+                        lambda to, days_remaining, **kw: sent.append(("reminder", to, days_remaining)))
+    monkeypatch.setattr(email, "notify_deliverable_overdue", lambda to, **kw: sent.append(("overdue", to, None)))
+    return sent
+
+
+def _seed_deal(session: Session, n: int = 0) -> Deal:
+    agent = User(email=f"agent{n}@example.com", hashed_password="x", full_name="Agent")
+    deal = Deal(title=f"Deal {n}", created_by=agent.id)
+    session.add_all([
+        agent, deal,
+        DealAssignment(deal_id=deal.id, user_id=agent.id, role_in_deal="seller_agent"),
+        ShareLink(deal_id=deal.id, token=f"t{n}", created_by=agent.id, counterparty_name="Buyer",
+                  counterparty_email=f"buyer{n}@example.com"),
+    ])
+    return deal
+
+
+def _deliverable(deal: Deal, days: int | None, party: str = "admin", is_confirmed: bool = True, **kw) -> Deliverable:
+    due_date = (TODAY + timedelta(days=days)).isoformat() if days is not None else "At closing"
+    return Deliverable(deal_id=deal.id, description=f"Due {days}", due_date=due_date,
+                       due_on=parse_due_date(due_date), responsible_party=party, is_confirmed=is_confirmed, **kw)
+
+
+def test_query_selects_only_crossed_thresholds(engine):
+    with Session(engine) as session:
+        deal = _seed_deal(session)
+        session.add_all([
+            _deliverable(deal, -2),
+            _deliverable(deal, 1),
+            _deliverable(deal, 5),
+            _deliverable(deal, 5, reminder_7d_sent=True),  # next one at 3 days
+            _deliverable(deal, 3, reminder_7d_sent=True),
+            _deliverable(deal, 30),
+            _deliverable(deal, None),
+            _deliverable(deal, 2, is_confirmed=False),
+            _deliverable(deal, 2, status="submitted"),
+        ])
+        session.commit()
+        due = session.exec(tasks.due_deliverables_query(TODAY)).all()
+        assert sorted((d.due_on - TODAY).days for d in due) == [-2, 1, 3, 5]
+
+
+def test_reminders_and_overdue(engine, sent):
+    with Session(engine) as session:
+        deal = _seed_deal(session)
+        session.add_all([
+            _deliverable(deal, -1),
+            _deliverable(deal, 5),
+            _deliverable(deal, 2, party="counterparty", reminder_7d_sent=True),
+            _deliverable(deal, 20),
+        ])
+        session.commit()
+
+    tasks.check_deliverable_reminders()
+
+    assert sorted(sent) == [
+        ("overdue", "agent0@example.com", None),
+        ("reminder", "agent0@example.com", 5),
+        ("reminder", "buyer0@example.com", 2),
+    ]
+    with Session(engine) as session:
+        rows = {(d.due_on - TODAY).days: d for d in session.exec(select(Deliverable)).all()}
+        assert rows[-1].status == "overdue"
+        assert (rows[5].reminder_7d_sent, rows[5].reminder_3d_sent) == (True, False)
+        assert (rows[2].reminder_3d_sent, rows[2].reminder_1d_sent) == (True, False)
+        assert not rows[20].reminder_7d_sent
+        # Counterparty deliverables are email only
+        assert len(session.exec(select(Notification)).all()) == 2
+
+    sent.clear()
+    tasks.check_deliverable_reminders()
+    assert sent == []
+
+
+def test_queries_do_not_grow_with_deals(engine, sent):
+    with Session(engine) as session:
+        for n in range(10):
+            deal = _seed_deal(session, n)
+            session.add_all([_deliverable(deal, 2), _deliverable(deal, 6, party="counterparty"), _deliverable(deal, 40)])
+        session.commit()
+
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+    tasks.check_deliverable_reminders()
+    selects = [s for s in statements if s.lstrip().upper().startswith("SELECT")]
+    # Deliverables, deals, assignments, users, share links
+    assert len(selects) == 5
+    assert len(sent) == 10 * 3
+
+
+def test_timeline_deliverables_get_due_on(engine):
+    with Session(engine) as session:
+        deal = _seed_deal(session)
+        rows = create_deliverables_from_timeline(session, deal, [
+            {"description": "Deposit", "due_date": "2026-03-04", "responsible_party": "buyer"},
+            {"description": "Closing", "due_date": "At closing"},
+        ])
+    assert [d.due_on for d in rows] == [date(2026, 3, 4), None]
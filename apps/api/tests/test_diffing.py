@@ -1,6 +1,16 @@
 """Diff generation sanity tests."""
 
-from services.diffing import compute_diff
+import difflib
+import random
+import uuid
+
+from sqlmodel import Session, select
+
+from models.contract import ContractVersion
+from models.version_diff import VersionDiff
+from services.diffing import (
+    _PatienceMatcher, cached_version_diff, compute_diff, compute_word_diff, matching_blocks, unified_diff,
+)
 
 
 def test_identical_texts_no_diff():
@@ -20,3 +30,77 @@ def test_multiline_diff():
     b = "Line 1\nLine 2 modified\nLine 3"
     result = compute_diff(a, b)
     assert any("-Line 2" in line or "+Line 2" in line for line in result["diff_lines"])
+
+
+def test_matches_difflib_on_small_edit():
+    a = ["Line 1\n", "Line 2\n", "Line 3"]
+    b = ["Line 1\n", "Line 2 modified\n", "Line 3"]
+    assert list(unified_diff(a, b, "Version A", "Version B")) == list(
+        difflib.unified_diff(a, b, "Version A", "Version B", lineterm="")
+    )
+
+
+def test_opcodes_reconstruct_target():
+    rng = random.Random(7)
+    for _ in range(300):
+        a = [rng.choice("abcdefg") + "\n" for _ in range(rng.randint(0, 40))]
+        b = list(a)
+        for _ in range(rng.randint(0, 8)):
+            if b and rng.random() < 0.4:
+                del b[rng.randrange(len(b))]
+            else:
+                b.insert(rng.randint(0, len(b)), rng.choice("abcxyz") + "\n")
+        rebuilt = []
+        for i, j, size in matching_blocks(a, b):
+            assert a[i:i + size] == b[j:j + size]
+        for tag, i1, i2, j1, j2 in _PatienceMatcher(a, b).get_opcodes():
+            rebuilt += a[i1:i2] if tag == "equal" else b[j1:j2]
+        assert rebuilt == b
+
+
+def test_version_diff_is_stored_once(sqlite_engine):
+    engine = sqlite_engine([ContractVersion, VersionDiff])
+    deal_id, user_id = uuid.uuid4(), uuid.uuid4()
+    with Session(engine) as session:
+        v0 = ContractVersion(deal_id=deal_id, version_number=0, full_text="A\nB\n", created_by=user_id)
+        v1 = ContractVersion(deal_id=deal_id, version_number=1, full_text="A\nC\n", created_by=user_id)
+        session.add_all([v0, v1])
+        session.commit()
+
+        first = cached_version_diff(session, v0, v1)
+        assert "-B\n" in first["diff_lines"]
+        v1.full_text = "changed underneath"  # a cache hit must not recompute
+        assert cached_version_diff(session, v0, v1) == first
+        assert len(session.exec(select(VersionDiff)).all()) == 1
+
+
+def _apply_ops(text_a: str, text_b: str, ops: list) -> str:
+    out = []
+    for op in ops:
+        if op["op"] == "equal":
+            assert text_a[op["a"][0]:op["a"][1]].split() == text_b[op["b"][0]:op["b"][1]].split()
+            out.append(text_b[op["b"][0]:op["b"][1]])
+        elif op["op"] == "insert":
+            out.append(op["text"])
+    return "".join(out)
+
+
+def test_word_diff_ignores_reflow_and_marks_changed_word():
+    a = "1. PRICE: The purchase price is $350,000.00 payable\nat closing by wire.\n\n2. CLOSING DATE: July 15, 2025.\n"
+    b = "1. PRICE: The purchase price is $365,000.00 payable at\nclosing by wire.\n\n2. CLOSING DATE: July 15, 2025.\n"
+    result = compute_word_diff(a, b)
+    changed = [(op["op"], op["text"]) for op in result["diff_ops"] if op["op"] != "equal"]
+    assert changed == [("delete", "350"), ("insert", "365")]
+    assert _apply_ops(a, b, result["diff_ops"]) == b
+    assert '<del class="diff-remove">350</del><ins class="diff-add">365</ins>' in result["diff_html"]
+
+
+def test_word_diff_payload_smaller_than_line_diff_on_long_contract():
+    paragraph = "The parties agree that the terms of this section apply as written. " * 12
+    a = "".join(f"{i}. SECTION {i}:\n{paragraph}\n\n" for i in range(1, 60))
+    b = a.replace("30. SECTION 30:\nThe parties", "30. SECTION 30:\nBoth parties")
+    words = compute_word_diff(a, b)
+    lines = compute_diff(a, b)
+    assert _apply_ops(a, b, words["diff_ops"]) == b
+    assert len(words["diff_ops"]) == 4
+    assert len(words["diff_html"]) < len(lines["diff_html"])
@@ -0,0 +1,262 @@
+"""Email outbox tests (in-memory SQLite, local Resend stub)."""
+
+import ast
+import asyncio
+from collections import Counter
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
+from sqlmodel import Session, select
+
+from models.email_outbox import EmailOutbox
+from scripts.resend_stub import ResendStub
+from services import blob_store, email, email_outbox
+
+ATTACHMENT = [{"filename": "timeline.pdf", "content": "JVBERi0="}]
+
+
+@pytest.fixture
+def engine(sqlite_engine, monkeypatch):
+    monkeypatch.setattr(email.settings, "resend_api_key", "re_test")
+    return sqlite_engine([EmailOutbox], email_outbox)
+
+
+@pytest.fixture
+def stub(monkeypatch):
+    stub = ResendStub().start()
+    monkeypatch.setattr(email_outbox.settings, "resend_api_url", stub.url)
+    yield stub
+    stub.stop()
+
+
+def _rows(engine) -> dict[str, EmailOutbox]:
+    with Session(engine) as session:
+        return {row.to_email: row for row in session.exec(select(EmailOutbox)).all()}
+
+
+def _deliver_once(batch_size: int = 100) -> int:
+    async def run():
+        async with email_outbox.new_client() as client:
+            return await email_outbox.EmailSender(batch_size=batch_size).deliver_once(client)
+    return asyncio.run(run())
+
+
+def _make_due(engine) -> None:
+    with Session(engine) as session:
+        for row in session.exec(select(EmailOutbox)).all():
+            row.next_attempt_at = datetime.utcnow() - timedelta(seconds=1)
+            session.add(row)
+        session.commit()
+
+
+def test_send_email_only_enqueues_and_dedups(engine, stub):
+    assert email.send_email("a@example.com", "Hi", "<p>1</p>")
+    assert email.send_email(" A@example.com", "Hi", "<p>1</p>")  # same recipient and message
+    assert email.send_email("b@example.com", "Hi", "<p>1</p>")
+    assert email.send_email("a@example.com", "Hi", "<p>2</p>")
+    assert stub.requests == []
+    with Session(engine) as session:
+        assert len(session.exec(select(EmailOutbox)).all()) == 3
+
+
+def test_async_routers_queue_off_the_event_loop():
+    # Queueing blocks on a sync_engine connection
+    helpers = {name for name in vars(email) if name.startswith("notify_") or name in ("send_email", "send_emails")}
+    direct = []
+    for path in sorted((Path(__file__).parents[1] / "routers").glob("*.py")):
+        for handler in ast.walk(ast.parse(path.read_text())):
+            if isinstance(handler, ast.AsyncFunctionDef):
+                direct += [
+                    f"{path.name}:{call.lineno}" for call in ast.walk(handler)
+                    if isinstance(call, ast.Call) and isinstance(call.func, ast.Name) and call.func.id in helpers
+                ]
+    assert direct == []
+
+
+def test_not_configured_skips(engine, monkeypatch):
+    monkeypatch.setattr(email.settings, "resend_api_key", "")
+    assert email.send_email("a@example.com", "Hi", "<p>1</p>") is False
+    assert _rows(engine) == {}
+
+
+def test_plain_emails_batched_attachments_sent_alone(engine, stub):
+    for i in range(3):
+        email.send_email(f"user{i}@example.com", "Update", "<p>x</p>")
+    email.send_email("pdf@example.com", "Timeline", "<p>x</p>", attachments=ATTACHMENT)
+
+    assert _deliver_once() == 4
+    assert sorted(stub.paths()) == ["/emails", "/emails/batch"]
+    assert all(r["idempotency_key"] for r in stub.requests)
+    rows = _rows(engine)
+    assert {row.status for row in rows.values()} == {"sent"}
+    assert {row.provider_id for row in rows.values()} == {e["id"] for e in stub.emails}
+    single = next(r for r in stub.requests if r["path"] == "/emails")
+    assert single["body"]["to"] == ["pdf@example.com"]
+    assert single["body"]["attachments"] == ATTACHMENT
+
+
+def test_batch_size_splits_batches(engine, stub):
+    for i in range(5):
+        email.send_email(f"user{i}@example.com", "Update", "<p>x</p>")
+    assert _deliver_once(batch_size=2) == 2
+    assert stub.paths() == ["/emails/batch"]
+    assert len(stub.emails) == 2
+
+
+def test_server_error_retried_with_backoff(engine, stub):
+    email.send_email("a@example.com", "Hi", "<p>1</p>")
+    email.send_email("b@example.com", "Hi", "<p>1</p>")
+    stub.fail_next(503)
+
+    _deliver_once()
+    rows = _rows(engine)
+    assert {(r.status, r.attempts) for r in rows.values()} == {("pending", 1)}
+    assert all(r.next_attempt_at > datetime.utcnow() and "503" in r.error for r in rows.values())
+    assert _deliver_once() == 0  # not due yet
+
+    _make_due(engine)
+    _deliver_once()
+    assert {(r.status, r.attempts) for r in _rows(engine).values()} == {("sent", 2)}
+    assert len(stub.emails) == 2
+
+
+def test_lost_batch_response_is_not_delivered_twice(engine, stub):
+    for i in range(3):
+        email.send_email(f"user{i}@example.com", "Update", "<p>x</p>")
+    stub.drop_next()  # accepted, but the response never arrives
+
+    _deliver_once()
+    rows = _rows(engine).values()
+    assert {r.status for r in rows} == {"pending"}
+    assert len({(r.batch_key, r.next_attempt_at) for r in rows}) == 1
+    assert len(stub.emails) == 3
+
+    _make_due(engine)
+    _deliver_once()
+    first, retry = stub.requests
+    assert retry["idempotency_key"] == first["idempotency_key"] and retry["body"] == first["body"]
+    assert len(stub.emails) == 3
+    assert {r.status for r in _rows(engine).values()} == {"sent"}
+
+
+def test_retried_batch_is_claimed_whole(engine, monkeypatch):
+    monkeypatch.setattr(email_outbox.settings, "email_batch_size", 3)
+    for i in range(4):
+        email.send_email(f"user{i}@example.com", "Update", "<p>x</p>")
+    with Session(engine) as session:
+        messages = email_outbox.claim_batch(session, 10)
+        # One batch of three; the fourth has no partner and goes alone
+        assert sorted(Counter(m["batch_key"] for m in messages).values()) == [1, 3]
+        assert sum(1 for m in messages if m["batch_key"] is None) == 1
+        batched = {m["id"]: ("retry", "503") for m in messages if m["batch_key"]}
+        email_outbox.record_outcomes(session, batched)
+        email_outbox.record_outcomes(session, {m["id"]: ("sent", "re_1") for m in messages if not m["batch_key"]})
+    _make_due(engine)
+
+    with Session(engine) as session:
+        batch = email_outbox.claim_batch(session, 1)
+    assert len(batch) == 3 and len({m["batch_key"] for m in batch}) == 1
+    assert {m["id"] for m in batch} == set(batched)
+
+
+def test_partly_held_batch_is_not_claimed(engine):
+    for i in range(2):
+        email.send_email(f"user{i}@example.com", "Update", "<p>x</p>")
+    with Session(engine) as session:
+        email_outbox.claim_batch(session, 10)
+        held, free = session.exec(select(EmailOutbox)).all()
+        # Another sender still holds one email of the batch
+        held.locked_until = datetime.utcnow() + timedelta(minutes=1)
+        free.status, free.next_attempt_at = "pending", datetime.utcnow() - timedelta(seconds=1)
+        session.add_all([held, free])
+        session.commit()
+        assert email_outbox.claim_batch(session, 10) == []
+
+
+def test_rejected_batch_fails_only_the_bad_address(engine, stub):
+    email.send_email("good@example.com", "Hi", "<p>1</p>")
+    email.send_email("bad@example.com", "Hi", "<p>1</p>")
+    stub.reject("bad@example.com")
+
+    _deliver_once()
+    rows = _rows(engine)
+    assert rows["good@example.com"].status == "sent"
+    assert rows["bad@example.com"].status == "failed"
+    assert "422" in rows["bad@example.com"].error
+    assert stub.paths().count("/emails") == 2
+    # Split up: from now on each email is sent alone
+    assert {row.batch_key for row in rows.values()} == {None}
+
+
+def test_gives_up_after_max_attempts(engine, stub, monkeypatch):
+    monkeypatch.setattr(email_outbox.settings, "email_max_attempts", 2)
+    email.send_email("a@example.com", "Hi", "<p>1</p>")
+    stub.fail_next(500, 429)
+
+    _deliver_once()
+    _make_due(engine)
+    _deliver_once()
+    row = _rows(engine)["a@example.com"]
+    assert (row.status, row.attempts) == ("failed", 2)
+    assert stub.emails == []
+
+    # A failed email no longer blocks the same message from being queued
+    assert email.send_email("a@example.com", "Hi", "<p>1</p>")
+
+
+def test_expired_lease_is_reclaimed(engine):
+    email.send_email("a@example.com", "Hi", "<p>1</p>")
+    with Session(engine) as session:
+        assert len(email_outbox.claim_batch(session, 10, lease_seconds=-1)) == 1
+        # Lapsed lease: claimable again
+        assert len(email_outbox.claim_batch(session, 10)) == 1
+        assert email_outbox.claim_batch(session, 10) == []
+        assert session.exec(select(EmailOutbox)).one().attempts == 2
+
+
+@pytest.fixture
+def pdf_blob(tmp_path, monkeypatch):
+    monkeypatch.setattr(blob_store.settings, "storage_path", str(tmp_path))
+    return blob_store.put_bytes(b"%PDF-1.4 critical dates")
+
+
+def test_blob_attachment_shared_across_recipients(engine, stub, pdf_blob, monkeypatch):
+    recipients = ["a@example.com", "b@example.com", "", "owner@example.com"]
+    assert email.notify_timeline_generated(recipients, "Deal", "1 Main St", pdf_blob) == 3
+    # Rows hold the reference, not the PDF
+    rows = _rows(engine).values()
+    assert all(row.attachments == [{"filename": "Critical_Dates.pdf", "blob": pdf_blob}] for row in rows)
+
+    reads = []
+    read_bytes = blob_store.read_bytes
+    monkeypatch.setattr(blob_store, "read_bytes", lambda digest: reads.append(digest) or read_bytes(digest))
+    assert _deliver_once() == 3
+    assert reads == [pdf_blob]
+    assert {tuple(e["to"]) for e in stub.emails} == {(to,) for to in recipients if to}
+    assert {e["attachments"][0]["content"] for e in stub.emails} == {"JVBERi0xLjQgY3JpdGljYWwgZGF0ZXM="}
+    assert {row.status for row in _rows(engine).values()} == {"sent"}
+
+
+def test_missing_blob_fails_without_sending(engine, stub, pdf_blob):
+    email.send_emails(["a@example.com"], "Dates", "<p>x</p>", [{"filename": "x.pdf", "blob": "0" * 64}])
+    email.send_email("b@example.com", "Hi", "<p>x</p>")
+    _deliver_once()
+    rows = _rows(engine)
+    assert rows["a@example.com"].status == "failed"
+    assert "missing" in rows["a@example.com"].error
+    assert rows["b@example.com"].status == "sent"
+    assert stub.paths() == ["/emails"]
+
+
+def test_prune_keeps_pending_and_recent(engine):
+    old = datetime.utcnow() - timedelta(days=30)
+    with Session(engine) as session:
+        for to, status, created in [
+            ("old-sent", "sent", old), ("old-failed", "failed", old),
+            ("old-pending", "pending", old), ("new-sent", "sent", datetime.utcnow()),
+        ]:
+            session.add(EmailOutbox(to_email=to, subject="s", html="h", dedup_key=to, status=status, created_at=created))
+        session.commit()
+        assert email_outbox.prune_email_outbox(session, retention_days=14) == {"deleted": 2}
+    assert set(_rows(engine)) == {"old-pending", "new-sent"}
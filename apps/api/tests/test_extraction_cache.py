@@ -0,0 +1,87 @@
+"""Extraction result cache tests (in-memory SQLite)."""
+
+from datetime import datetime, timedelta
+
+import pytest
+from sqlmodel import Session, create_engine, select
+
+from models.extraction_cache import ExtractionCacheEntry
+from services import extraction_cache, ingestion
+
+TEXT = b"RESIDENTIAL CONTRACT FOR SALE AND PURCHASE. The parties agree as follows.\n" * 20
+
+
+@pytest.fixture
+def engine(sqlite_engine, monkeypatch):
+    monkeypatch.setattr(extraction_cache.settings, "extraction_cache_enabled", True)
+    return sqlite_engine([ExtractionCacheEntry], extraction_cache)
+
+
+def test_duplicate_upload_skips_extraction(engine, monkeypatch):
+    text, ok = ingestion.extract_text("listing.txt", TEXT)
+    assert ok
+
+    def fail(*args):
+        raise AssertionError("extracted twice")
+    monkeypatch.setattr(ingestion, "_extract", fail)
+    # Same content under another name, as a path or with a known digest
+    assert ingestion.extract_text("copy.txt", TEXT) == (text, ok)
+    assert ingestion.extract_text("copy.txt", b"", digest=ingestion.content_hash(TEXT)) == (text, ok)
+
+    with Session(engine) as session:
+        entry = session.exec(select(ExtractionCacheEntry)).one()
+        assert entry.key == f"text:{ingestion.content_hash(TEXT)}"
+        assert (entry.hits, entry.size_bytes) == (2, len(text))
+
+
+def test_kind_is_part_of_the_key(engine):
+    ingestion.extract_text("a.txt", TEXT)
+    # Same bytes named .pdf are not a valid PDF: a separate, failed entry
+    assert ingestion.extract_text("a.pdf", TEXT) == ("", False)
+    with Session(engine) as session:
+        assert len(session.exec(select(ExtractionCacheEntry)).all()) == 2
+
+
+@pytest.mark.parametrize("error", [
+    ingestion.ExtractionTimeout("too slow"),
+    ingestion.ExtractionUnavailable("pool failed"),
+    MemoryError(),
+    FileNotFoundError("blob gone"),
+])
+def test_infrastructure_failures_are_not_cached(engine, monkeypatch, error):
+    def fail(source, timeout=None):
+        raise error
+    monkeypatch.setattr(ingestion, "extract_text_from_pdf", fail)
+    assert ingestion.extract_text("scan.pdf", TEXT) == ("", False)
+    with Session(engine) as session:
+        assert session.exec(select(ExtractionCacheEntry)).all() == []
+
+
+def test_unreadable_document_is_cached(engine, monkeypatch):
+    def fail(source, timeout=None):
+        raise ValueError("not a PDF")
+    monkeypatch.setattr(ingestion, "extract_text_from_pdf", fail)
+    assert ingestion.extract_text("scan.pdf", TEXT) == ("", False)
+    with Session(engine) as session:
+        assert session.exec(select(ExtractionCacheEntry)).one().extraction_ok is False
+
+
+def test_prune_keeps_most_recent_within_budget(engine):
+    now = datetime.utcnow()
+    with Session(engine) as session:
+        for i in range(10):
+            session.add(ExtractionCacheEntry(
+                key=f"pdf:{i}", text="x" * 100, size_bytes=100, last_used_at=now - timedelta(hours=i),
+            ))
+        session.commit()
+
+        result = extraction_cache.prune_extraction_cache(session, max_bytes=350)
+        assert result == {"evicted": 7, "bytes": 300}
+        kept = {e.key for e in session.exec(select(ExtractionCacheEntry)).all()}
+        assert kept == {"pdf:0", "pdf:1", "pdf:2"}
+
+
+def test_backend_errors_are_misses(monkeypatch):
+    monkeypatch.setattr(extraction_cache.settings, "extraction_cache_enabled", True)
+    monkeypatch.setattr(extraction_cache, "sync_engine", create_engine("sqlite://"))  # no table
+    assert ingestion.extract_text("a.txt", TEXT)[1] is True
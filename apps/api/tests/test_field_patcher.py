@@ -0,0 +1,57 @@
+"""Tests for the deterministic field-only text patcher."""
+
+import services.versioning as versioning
+from services.field_patcher import patch_field_changes
+
+CONTRACT = (
+    "FAR/BAR AS-IS RESIDENTIAL CONTRACT FOR SALE AND PURCHASE\n\n"
+    "1. PURCHASE PRICE: $350,000.00 payable at closing.\n\n"
+    "2. DEPOSIT: Buyer shall deliver $10,000 to the escrow agent by 06/01/2025.\n\n"
+    "3. CLOSING DATE: This transaction shall close on July 15, 2025.\n\n"
+    "4. INSPECTION PERIOD: Buyer shall have fifteen (15) days for inspections.\n\n"
+    "5. RECEIPT: Escrow agent acknowledges $10,000 received.\n"
+)
+
+
+def _change(field, old, new, action="update"):
+    return {"field": field, "action": action, "from": old, "to": new, "confidence": 0.9}
+
+
+def test_patches_currency_date_and_days_in_their_own_format():
+    patched = patch_field_changes(CONTRACT, [
+        _change("purchase_price", 350000, 365000),
+        _change("closing_date", "2025-07-15", "2025-08-01"),
+        _change("inspection_period_days", 15, 10),
+    ])
+    assert "$365,000.00 payable" in patched
+    assert "close on August 1, 2025." in patched
+    assert "ten (10) days" in patched
+    assert patched.replace("365,000.00", "350,000.00").replace("August 1", "July 15") \
+        .replace("ten (10)", "fifteen (15)") == CONTRACT
+
+
+def test_value_written_twice_is_not_patched():
+    # "$10,000" appears twice; changing one copy would leave the other stale
+    assert patch_field_changes(CONTRACT, [_change("earnest_money", 10000, 15000)]) is None
+
+
+def test_returns_none_without_unique_anchor():
+    assert patch_field_changes(CONTRACT, [_change("purchase_price", 999000, 1)]) is None
+    assert patch_field_changes(CONTRACT, [_change("financing_type", "cash", "fha")]) is None
+    assert patch_field_changes(CONTRACT, [_change("closing_date", "2025-07-15", None, action="remove")]) is None
+    assert patch_field_changes(CONTRACT, []) is None
+
+
+def test_number_inside_longer_number_is_not_an_anchor():
+    assert patch_field_changes("Price: $1,350,000.00\n", [_change("purchase_price", 350000, 1)]) is None
+
+
+def test_rewrite_uses_patch_without_llm(monkeypatch):
+    def fail(*args, **kwargs):
+        raise AssertionError("LLM should not be called")
+
+    monkeypatch.setattr(versioning, "generate_text", fail)
+    result = versioning.rewrite_contract_text(CONTRACT, [_change("purchase_price", 350000, 365000)], [])
+    assert result["method"] == "patch"
+    assert result["_meta"]["output_tokens"] == 0
+    assert "$365,000.00" in result["text"]
@@ -0,0 +1,98 @@
+"""Page-parallel PDF text extraction."""
+
+import io
+import time
+
+import pytest
+from reportlab.lib.pagesizes import letter
+from reportlab.pdfgen import canvas
+
+from services import ingestion
+
+PAGES = 14
+
+
+def _pdf(pages: int = PAGES) -> bytes:
+    buf = io.BytesIO()
+    c = canvas.Canvas(buf, pagesize=letter)
+    for page in range(pages):
+        for line in range(5):
+            c.drawString(72, 700 - 14 * line, f"Page {page + 1} line {line + 1}: the parties agree to these terms.")
+        c.showPage()
+    c.save()
+    return buf.getvalue()
+
+
+@pytest.fixture
+def workers(monkeypatch):
+    def use(n: int):
+        monkeypatch.setattr(ingestion.settings, "pdf_extraction_workers", n)
+    monkeypatch.setattr(ingestion.settings, "extraction_cache_enabled", False)
+    yield use
+    ingestion._discard_pool()
+
+
+def test_page_ranges_cover_document_in_order():
+    ranges = ingestion._page_ranges(61, 4)
+    assert ranges[0][0] == 0 and ranges[-1][1] == 61
+    assert all(a[1] == b[0] for a, b in zip(ranges, ranges[1:]))
+    assert ingestion._page_ranges(3, 4) == [(0, 3)]
+
+
+def test_pool_matches_serial_extraction(workers, tmp_path):
+    data = _pdf()
+    path = tmp_path / "contract.pdf"
+    path.write_bytes(data)
+
+    workers(0)
+    serial = ingestion.extract_text_from_pdf(data)
+    workers(3)
+    pooled = ingestion.extract_text_from_pdf(str(path))
+
+    assert pooled == serial
+    assert pooled.index("Page 2 line 1") < pooled.index("Page 13 line 1")
+    assert f"Page {PAGES} line 5" in pooled
+
+
+def test_timeout_fails_soft(workers, monkeypatch):
+    workers(2)
+    monkeypatch.setattr(ingestion.settings, "pdf_extraction_timeout_seconds", 0)
+    data = _pdf()
+    assert ingestion.extract_text("slow.pdf", data) == ("", False)
+    assert ingestion._pools.current is None
+
+    monkeypatch.setattr(ingestion.settings, "pdf_extraction_timeout_seconds", 60)
+    text, ok = ingestion.extract_text("slow.pdf", data)
+    assert ok and "Page 1 line 1" in text
+
+
+def test_timeout_spares_concurrent_extractions(workers):
+    workers(2)
+    data = _pdf()
+    # Another upload's pages, in flight on the shared pool
+    pool = ingestion._pools.acquire()
+    other = pool.submit(ingestion._pdf_page_texts, data, 0, PAGES)
+
+    with pytest.raises(ingestion.ExtractionTimeout):
+        ingestion.extract_text_from_pdf(data, timeout=0)
+    assert ingestion._pools.current is None  # later uploads get a fresh pool
+    assert "Page 1 line 1" in other.result(timeout=60)[0]
+
+    # Terminated once the other upload is done with it
+    ingestion._pools.release(pool)
+    assert ingestion._pools._users == {} and ingestion._pools._retired == set()
+
+
+def test_dead_worker_pool_is_replaced(workers):
+    workers(2)
+    data = _pdf()
+    ingestion.extract_text_from_pdf(data)
+    broken = ingestion._pools.current
+    for process in list(broken._processes.values()):
+        process.kill()
+    deadline = time.monotonic() + 10
+    while not broken._broken and time.monotonic() < deadline:
+        time.sleep(0.05)
+
+    assert "Page 1 line 1" in ingestion.extract_text_from_pdf(data)
+    assert ingestion._pools.current is not None and ingestion._pools.current is not broken
@@ -0,0 +1,196 @@
+"""Job queue lease/retry and runner tests (in-memory SQLite; SKIP LOCKED is a no-op there)."""
+
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+from sqlmodel import Session, select
+
+from models.deal import Deal
+from models.job import JobRecord
+from workers import queue
+from workers.queue import (
+    QueueFullError, check_queue_capacity, claim_jobs, enqueue_followup, execute_job,
+    finish_job, new_job, queue_metrics,
+)
+from workers.registry import TASKS, PermanentJobError, task
+
+
+@pytest.fixture
+def engine(sqlite_engine):
+    return sqlite_engine([Deal, JobRecord], queue)
+
+
+@pytest.fixture
+def session(engine):
+    with Session(engine) as session:
+        yield session
+
+
+def _enqueue(session: Session, max_attempts: int = 3) -> str:
+    job = new_job(uuid.uuid4(), "parse_contract", {"deal_id": "d", "version_id": "v"}, max_attempts)
+    session.add(job)
+    session.commit()
+    return job.id
+
+
+def test_claim_leases_job_once(session):
+    job_id = _enqueue(session)
+    claimed = claim_jobs(session, "w1", 10, visibility_timeout=60)
+    assert [j["id"] for j in claimed] == [job_id]
+    assert claimed[0]["payload"] == {"deal_id": "d", "version_id": "v"}
+    assert claim_jobs(session, "w2", 10, visibility_timeout=60) == []
+
+    job = session.get(JobRecord, job_id)
+    assert job.status == "processing"
+    assert job.attempts == 1
+    assert job.locked_by == "w1"
+
+
+def test_expired_lease_is_reclaimed(session):
+    job_id = _enqueue(session)
+    claim_jobs(session, "w1", 10, visibility_timeout=60)
+    job = session.get(JobRecord, job_id)
+    job.locked_until = datetime.utcnow() - timedelta(seconds=1)
+    session.add(job)
+    session.commit()
+
+    claimed = claim_jobs(session, "w2", 10, visibility_timeout=60)
+    assert claimed[0]["attempts"] == 2
+    assert session.get(JobRecord, job_id).locked_by == "w2"
+
+
+def test_failure_is_retried_with_backoff(session):
+    job_id = _enqueue(session, max_attempts=2)
+    claim_jobs(session, "w1", 10, visibility_timeout=60)
+    finish_job(session, job_id, "w1", error="boom")
+
+    job = session.get(JobRecord, job_id)
+    assert job.status == "pending"
+    assert job.run_after > datetime.utcnow()
+    assert job.locked_by is None
+    assert claim_jobs(session, "w1", 10, visibility_timeout=60) == []
+
+    job.run_after = datetime.utcnow()
+    session.add(job)
+    session.commit()
+    claim_jobs(session, "w1", 10, visibility_timeout=60)
+    finish_job(session, job_id, "w1", error="boom again")
+    job = session.get(JobRecord, job_id)
+    assert job.status == "failed"
+    assert job.error == "boom again"
+
+
+def test_finish_ignores_lost_lease(session):
+    job_id = _enqueue(session)
+    claim_jobs(session, "w1", 10, visibility_timeout=60)
+    finish_job(session, job_id, "w2", error="stale worker")
+    job = session.get(JobRecord, job_id)
+    assert job.status == "processing"
+    assert job.locked_by == "w1"
+
+
+def test_lapsed_final_attempt_marked_failed(session):
+    job_id = _enqueue(session, max_attempts=1)
+    claim_jobs(session, "w1", 10, visibility_timeout=60)
+    job = session.get(JobRecord, job_id)
+    job.locked_until = datetime.utcnow() - timedelta(seconds=1)
+    session.add(job)
+    session.commit()
+
+    assert claim_jobs(session, "w2", 10, visibility_timeout=60) == []
+    assert session.get(JobRecord, job_id).status == "failed"
+
+
+@pytest.fixture
+def test_tasks():
+    @task("test_echo")
+    def echo(session, job_id, value):
+        enqueue_followup(session, uuid.uuid4(), "test_fail", {"permanent": True})
+        return {"value": value}
+
+    @task("test_fail")
+    def fail(session, job_id, permanent):
+        raise PermanentJobError("gone") if permanent else RuntimeError("flaky")
+
+    yield
+    TASKS.pop("test_echo")
+    TASKS.pop("test_fail")
+
+
+def _enqueue_task(session: Session, job_type: str, payload: dict) -> str:
+    job = new_job(uuid.uuid4(), job_type, payload)
+    session.add(job)
+    session.commit()
+    return job.id
+
+
+def test_execute_job_records_result_and_followups(session, test_tasks):
+    job_id = _enqueue_task(session, "test_echo", {"value": 7})
+    followup_ids = execute_job(job_id, "w1")
+
+    session.expire_all()
+    job = session.get(JobRecord, job_id)
+    assert job.status == "completed"
+    assert job.result == {"value": 7}
+    assert job.locked_by is None
+    followups = session.exec(select(JobRecord).where(JobRecord.job_type == "test_fail")).all()
+    assert [(f.id, f.job_type) for f in followups] == followup_ids
+    assert followups[0].status == "pending"
+
+
+def test_execute_job_retries_transient_errors_only(session, test_tasks):
+    flaky = _enqueue_task(session, "test_fail", {"permanent": False})
+    gone = _enqueue_task(session, "test_fail", {"permanent": True})
+    execute_job(flaky, "w1")
+    execute_job(gone, "w1")
+
+    session.expire_all()
+    assert session.get(JobRecord, flaky).status == "pending"
+    assert session.get(JobRecord, flaky).error == "flaky"
+    assert session.get(JobRecord, gone).status == "failed"
+
+
+def test_execute_job_skips_claimed_job(session, test_tasks):
+    job_id = _enqueue_task(session, "test_echo", {"value": 1})
+    claim_jobs(session, "w1", 10, visibility_timeout=60)
+    execute_job(job_id, "w2")
+
+    session.expire_all()
+    job = session.get(JobRecord, job_id)
+    assert job.status == "processing"
+    assert job.locked_by == "w1"
+
+
+def test_claim_filters_by_job_type(session):
+    pdf_job = _enqueue_task(session, "generate_timeline_pdf", {"deal_id": "d"})
+    _enqueue(session)
+    claimed = claim_jobs(session, "w1", 10, visibility_timeout=60, job_types=["generate_timeline_pdf"])
+    assert [j["id"] for j in claimed] == [pdf_job]
+
+
+def test_queue_capacity_is_per_job_class(session, monkeypatch):
+    monkeypatch.setattr(queue.settings, "job_queue_max_depth_llm", 2)
+    _enqueue(session)
+    _enqueue_task(session, "analyze_change_request", {"deal_id": "d", "cr_id": "c"})
+    _enqueue_task(session, "generate_timeline_pdf", {"deal_id": "d"})
+
+    with pytest.raises(QueueFullError) as exc:
+        check_queue_capacity(session, "generate_version")
+    assert (exc.value.job_class, exc.value.depth, exc.value.limit) == ("llm", 2, 2)
+    check_queue_capacity(session, "generate_timeline_pdf")
+
+
+def test_queue_metrics_reports_depth_and_wait(session):
+    job_id = _enqueue(session)
+    _enqueue(session)
+    job = session.get(JobRecord, job_id)
+    job.run_after = datetime.utcnow() - timedelta(seconds=30)
+    session.add(job)
+    session.commit()
+    claim_jobs(session, "w1", 1, visibility_timeout=60)
+
+    llm = queue_metrics(session)["classes"]["llm"]
+    assert (llm["pending"], llm["processing"]) == (1, 1)
+    assert llm["wait_seconds"]["count"] == 1
+    assert 29 <= llm["wait_seconds"]["max"] < 60
@@ -0,0 +1,81 @@
+"""LLM response cache tests (in-memory SQLite, mock LLM)."""
+
+from datetime import datetime, timedelta
+
+import pytest
+from sqlmodel import Session, select
+
+from llm import anthropic_client, cache
+from models.llm_cache import LLMCacheEntry
+
+
+@pytest.fixture
+def engine(sqlite_engine, monkeypatch):
+    monkeypatch.setattr(cache.settings, "llm_cache_enabled", True)
+    monkeypatch.setattr(cache.settings, "llm_mock_mode", True)
+    return sqlite_engine([LLMCacheEntry], cache)
+
+
+def test_key_covers_model_version_prompt_and_temperature():
+    base = cache.cache_key("m", "parse_v1", "prompt", 0.1)
+    assert base == cache.cache_key("m", "parse_v1", "prompt", 0.1)
+    assert len({
+        base,
+        cache.cache_key("other", "parse_v1", "prompt", 0.1),
+        cache.cache_key("m", "parse_v2", "prompt", 0.1),
+        cache.cache_key("m", "parse_v1", "prompt!", 0.1),
+        cache.cache_key("m", "parse_v1", "prompt", 0.2),
+    }) == 5
+
+
+def test_repeat_call_is_served_from_cache(engine, monkeypatch):
+    calls = []
+    real = anthropic_client._generate_json
+
+    def counting(*args):
+        calls.append(args)
+        result = real(*args)
+        result["_meta"] = {"input_tokens": 900, "output_tokens": 100, "model": "mock"}
+        return result
+
+    monkeypatch.setattr(anthropic_client, "_generate_json", counting)
+    hits_before = cache.cache_stats()["hits"]
+
+    first = anthropic_client.generate_json("FIELDS TO EXTRACT abc", cache_as="parse_contract_v1")
+    second = anthropic_client.generate_json("FIELDS TO EXTRACT abc", cache_as="parse_contract_v1")
+    anthropic_client.generate_json("FIELDS TO EXTRACT abc")  # not opted in
+
+    assert len(calls) == 2
+    assert second["fields"] == first["fields"]
+    assert second["_meta"]["cache_hit"] is True
+    assert cache.cache_stats()["hits"] == hits_before + 1
+    with Session(engine) as session:
+        entry = session.get(LLMCacheEntry, cache.cache_key(
+            "mock", "parse_contract_v1", "FIELDS TO EXTRACT abc", 0.1, ""))
+        assert (entry.hits, entry.input_tokens) == (1, 900)
+
+
+def test_expired_entry_is_a_miss(engine):
+    cache.put("k", "m", "v1", {"a": 1})
+    assert cache.get("k")["a"] == 1
+    with Session(engine) as session:
+        entry = session.get(LLMCacheEntry, "k")
+        entry.expires_at = datetime.utcnow() - timedelta(seconds=1)
+        session.add(entry)
+        session.commit()
+    assert cache.get("k") is None
+
+
+def test_prune_drops_expired_then_least_recently_used(engine):
+    now = datetime.utcnow()
+    with Session(engine) as session:
+        session.add(LLMCacheEntry(key="expired", model="m", prompt_version="v", result={},
+                                  expires_at=now - timedelta(hours=1)))
+        for i in range(4):
+            session.add(LLMCacheEntry(key=f"k{i}", model="m", prompt_version="v", result={},
+                                      last_used_at=now - timedelta(minutes=10 - i)))
+        session.commit()
+
+        assert cache.prune_llm_cache(session, max_entries=2) == {"expired": 1, "evicted": 2}
+        remaining = {e.key for e in session.exec(select(LLMCacheEntry)).all()}
+    assert remaining == {"k2", "k3"}
@@ -0,0 +1,72 @@
+"""Tests for the LLM gateway's fair limiter."""
+
+import asyncio
+
+import pytest
+
+from llm.gateway import FairLimiter, estimate_tokens
+
+
+def test_estimate_tokens_counts_input_and_output_budget():
+    kwargs = {"system": "x" * 400, "messages": [{"role": "user", "content": "y" * 800}], "max_tokens": 100}
+    assert estimate_tokens(kwargs) == 400
+
+
+def test_slots_are_shared_round_robin_across_orgs():
+    async def scenario():
+        limiter = FairLimiter(max_concurrency=1, tokens_per_minute=1_000_000)
+        order = []
+
+        async def call(org, n):
+            await limiter.acquire(org, 10)
+            order.append(f"{org}{n}")
+            await asyncio.sleep(0)
+            limiter.release(10, 10)
+
+        await limiter.acquire("setup", 10)  # hold the only slot while both orgs queue
+        tasks = [asyncio.create_task(call("a", n)) for n in range(3)]
+        tasks.append(asyncio.create_task(call("b", 0)))
+        await asyncio.sleep(0)
+        limiter.release(10, 10)
+        await asyncio.gather(*tasks)
+        return order
+
+    assert asyncio.run(scenario()) == ["a0", "b0", "a1", "a2"]
+
+
+def test_token_budget_delays_until_refilled():
+    async def scenario():
+        limiter = FairLimiter(max_concurrency=10, tokens_per_minute=600)  # 10 tokens/s
+        await limiter.acquire("a", 600)
+        limiter.release(600, 600)
+        started = asyncio.get_running_loop().time()
+        await asyncio.wait_for(limiter.acquire("a", 3), timeout=2)
+        return asyncio.get_running_loop().time() - started
+
+    assert 0.2 <= asyncio.run(scenario()) < 1.0
+
+
+def test_unused_reservation_is_refunded():
+    async def scenario():
+        limiter = FairLimiter(max_concurrency=10, tokens_per_minute=1000)
+        await limiter.acquire("a", 800)
+        limiter.release(800, 100)
+        return limiter.tokens
+
+    assert asyncio.run(scenario()) == pytest.approx(900, abs=1)
+
+
+def test_cancelled_waiter_leaves_queue():
+    async def scenario():
+        limiter = FairLimiter(max_concurrency=1, tokens_per_minute=1_000_000)
+        await limiter.acquire("a", 1)
+        waiter = asyncio.create_task(limiter.acquire("b", 1))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert limiter.waiting() == {}
+        limiter.release(1, 1)
+        return limiter.in_flight
+
+    assert asyncio.run(scenario()) == 0
@@ -0,0 +1,139 @@
+"""Batch PDF form filling on a process pool."""
+
+import asyncio
+import io
+import json
+import time
+import zipfile
+
+import fitz
+import pytest
+
+from services import blob_store, pdf_batch
+from services.pdf_form_filler import PDFFormFiller
+
+
+@pytest.fixture
+def filler(tmp_path, monkeypatch):
+    """Filler over a one-page form template; blobs under tmp_path."""
+    monkeypatch.setattr(blob_store.settings, "storage_path", str(tmp_path / "storage"))
+    templates = tmp_path / "templates"
+    (templates / "pdfs").mkdir(parents=True)
+    (templates / "mappings").mkdir()
+
+    doc = fitz.open()
+    page = doc.new_page()
+    for i, name in enumerate(["BuyerName", "PurchasePrice"]):
+        widget = fitz.Widget()
+        widget.field_name = name
+        widget.field_type = fitz.PDF_WIDGET_TYPE_TEXT
+        widget.rect = fitz.Rect(72, 72 + 30 * i, 300, 90 + 30 * i)
+        page.add_widget(widget)
+    doc.save(templates / "pdfs" / "form.pdf")
+    doc.close()
+    (templates / "mappings" / "form.json").write_text(json.dumps({
+        "template_slug": "form",
+        "pdf_file": "pdfs/form.pdf",
+        "field_mappings": {"text_fields": {
+            "buyer_name": {"pdf_field_name": "BuyerName"},
+            "purchase_price": {"pdf_field_name": "PurchasePrice", "format": "currency"},
+        }},
+    }))
+
+    pdf_batch._discard_pool()
+    yield PDFFormFiller(templates_dir=templates)
+    pdf_batch._discard_pool()
+
+
+def _fields(digest: str) -> dict:
+    doc = fitz.open(blob_store.blob_path(digest))
+    values = {w.field_name: w.field_value for page in doc for w in page.widgets()}
+    doc.close()
+    return values
+
+
+def _requests():
+    return [
+        pdf_batch.FillRequest("form", {"buyer_name": f"Buyer {i}", "purchase_price": 100000 * i})
+        for i in range(1, 6)
+    ] + [pdf_batch.FillRequest("missing", {})]
+
+
+@pytest.mark.parametrize("workers", [0, 2])
+def test_fill_batch_in_order_with_per_item_errors(filler, monkeypatch, workers):
+    monkeypatch.setattr(pdf_batch.settings, "pdf_fill_workers", workers)
+    results = asyncio.run(pdf_batch.fill_batch(_requests(), filler))
+
+    assert len(results) == 6
+    for i, result in enumerate(results[:5], start=1):
+        assert result.error is None and result.warnings == []
+        assert _fields(result.blob) == {"BuyerName": f"Buyer {i}", "PurchasePrice": f"${100000 * i:,.2f}"}
+    assert results[5].blob is None
+    assert "Mapping not found" in results[5].error
+
+
+def test_fill_batch_timeout_discards_pool(filler, monkeypatch):
+    monkeypatch.setattr(pdf_batch.settings, "pdf_fill_workers", 2)
+    results = asyncio.run(pdf_batch.fill_batch(_requests(), filler, timeout=0))
+    assert all(r.error and r.error.startswith("Timed out") for r in results)
+    assert pdf_batch._pools.current is None
+
+
+def test_timeout_spares_concurrent_batches(filler, monkeypatch):
+    monkeypatch.setattr(pdf_batch.settings, "pdf_fill_workers", 2)
+    requests = _requests()[:5]
+
+    async def both():
+        return await asyncio.gather(
+            # Too many to finish before the timeout fires; some may
+            pdf_batch.fill_batch(requests * 8, filler, timeout=0),
+            pdf_batch.fill_batch(requests, filler),
+        )
+    timed_out, completed = asyncio.run(both())
+
+    assert any(r.error and r.error.startswith("Timed out") for r in timed_out)
+    assert all(r.blob or r.error.startswith("Timed out") for r in timed_out)
+    assert all(r.blob and r.error is None for r in completed)
+    # Retired, and terminated once the other batch finished
+    assert pdf_batch._pools.current is None and pdf_batch._pools._users == {} and pdf_batch._pools._retired == set()
+
+
+def test_dead_worker_pool_is_replaced(filler, monkeypatch):
+    monkeypatch.setattr(pdf_batch.settings, "pdf_fill_workers", 2)
+    asyncio.run(pdf_batch.fill_batch(_requests()[:2], filler))
+    broken = pdf_batch._pools.current
+    for process in list(broken._processes.values()):
+        process.kill()
+    deadline = time.monotonic() + 10
+    while not broken._broken and time.monotonic() < deadline:
+        time.sleep(0.05)
+
+    results = asyncio.run(pdf_batch.fill_batch(_requests()[:5], filler))
+    assert all(r.blob for r in results)
+    assert pdf_batch._pools.current is not broken
+
+
+def test_outputs_are_recorded_per_deal(filler, monkeypatch):
+    monkeypatch.setattr(pdf_batch.settings, "pdf_fill_workers", 0)
+    (result,) = asyncio.run(pdf_batch.fill_batch(_requests()[:1], filler))
+    deal, other_deal = "deal-a", "deal-b"
+    pdf_batch.record_output(deal, result.blob)
+
+    assert pdf_batch.is_output_of(deal, result.blob)
+    assert not pdf_batch.is_output_of(other_deal, result.blob)
+    # Any other blob, e.g. another org's upload, is not reachable via the deal
+    assert not pdf_batch.is_output_of(deal, blob_store.put_bytes(b"someone else's contract"))
+
+
+def test_zip_stream(filler, monkeypatch):
+    monkeypatch.setattr(pdf_batch.settings, "pdf_fill_workers", 0)
+    results = asyncio.run(pdf_batch.fill_batch(_requests()[:2], filler))
+    chunks = list(pdf_batch.zip_stream(
+        [("a.pdf", results[0].blob), ("b.pdf", results[1].blob)],
+        [("manifest.json", b"{}")],
+    ))
+
+    with zipfile.ZipFile(io.BytesIO(b"".join(chunks))) as archive:
+        assert archive.namelist() == ["a.pdf", "b.pdf", "manifest.json"]
+        assert archive.read("b.pdf") == blob_store.read_bytes(results[1].blob)
+        assert archive.read("manifest.json") == b"{}"
@@ -1,4 +1,5 @@
 """Tests for PDF Form Filler Service."""
+import json
 import pytest
 from pathlib import Path
 from datetime import datetime
@@ -171,6 +172,127 @@ class TestPDFFormFiller:
         assert size == 10
 
 
+@pytest.fixture
+def form_filler(tmp_path):
+    """PDFFormFiller over a two-page form template with a few fields."""
+    import fitz
+
+    doc = fitz.open()
+    fields = [
+        (0, "Unmapped", fitz.PDF_WIDGET_TYPE_TEXT),
+        (0, "BuyerName", fitz.PDF_WIDGET_TYPE_TEXT),
+        (1, "PurchasePrice", fitz.PDF_WIDGET_TYPE_TEXT),
+        (1, "BuyerName", fitz.PDF_WIDGET_TYPE_TEXT),
+        (1, "CheckCash", fitz.PDF_WIDGET_TYPE_CHECKBOX),
+    ]
+    for _ in range(2):
+        doc.new_page()
+    for i, (page_number, name, field_type) in enumerate(fields):
+        widget = fitz.Widget()
+        widget.field_name = name
+        widget.field_type = field_type
+        widget.rect = fitz.Rect(72, 72 + 30 * i, 300, 90 + 30 * i)
+        doc[page_number].add_widget(widget)
+    (tmp_path / "pdfs").mkdir()
+    doc.save(tmp_path / "pdfs" / "form.pdf")
+    doc.close()
+
+    (tmp_path / "mappings").mkdir()
+    (tmp_path / "mappings" / "form.json").write_text(json.dumps({
+        "template_slug": "form",
+        "pdf_file": "pdfs/form.pdf",
+        "field_mappings": {
+            "text_fields": {
+                "buyer_name": {"pdf_field_name": "BuyerName", "transform": "uppercase"},
+                "purchase_price": {"pdf_field_name": "PurchasePrice", "format": "currency"},
+                "seller_name": {"pdf_field_name": "NotInTemplate"},
+            },
+            "checkbox_fields": {
+                "financing_cash": {"pdf_field_name": "CheckCash", "condition": "financing_type == 'Cash'"},
+            },
+        },
+    }))
+    return PDFFormFiller(templates_dir=tmp_path)
+
+
+class TestTemplateIndex:
+    """Filling through the parsed template index."""
+
+    def test_index_maps_names_to_first_widget(self, form_filler):
+        template = form_filler.get_template("form")
+        assert template.pdf_bytes[:4] == b"%PDF"
+        assert set(template.fields) == {"Unmapped", "BuyerName", "PurchasePrice", "CheckCash"}
+        assert template.fields["BuyerName"][0] == 0
+        assert template.fields["PurchasePrice"][0] == 1
+
+    def test_fill_pdf_from_cached_template(self, form_filler, tmp_path):
+        import fitz
+
+        deal_data = {"buyer_name": "John Smith", "purchase_price": 350000,
+                     "seller_name": "Jane Doe", "financing_type": "Cash"}
+        form_filler.fill_pdf("form", deal_data)
+        # Later fills never touch the template file
+        (tmp_path / "pdfs" / "form.pdf").unlink()
+        pdf_bytes, warnings = form_filler.fill_pdf("form", deal_data)
+        assert warnings == []
+
+        doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+        values = [(page.number, w.field_name, w.field_value) for page in doc for w in page.widgets()]
+        doc.close()
+        assert (0, "BuyerName", "JOHN SMITH") in values
+        assert (1, "PurchasePrice", "$350,000.00") in values
+        assert (1, "CheckCash", "Yes") in values
+        # Only the first widget of a repeated name is filled, as before
+        assert (1, "BuyerName", "") in values
+        # The cached template is unchanged by fills
+        assert b"JOHN SMITH" not in form_filler.get_template("form").pdf_bytes
+
+    def test_missing_template_pdf(self, form_filler, tmp_path):
+        (tmp_path / "pdfs" / "form.pdf").unlink()
+        with pytest.raises(PDFFormFillerError) as exc:
+            form_filler.fill_pdf("form", {})
+        assert "PDF template not found" in str(exc.value)
+
+
+class TestCompiledMapping:
+    """Conditions and formulas are compiled when the mapping loads."""
+
+    def test_formula_nested_fields_and_defaults(self, filler):
+        data = {"price": {"base": 300000, "upgrades": "50000"}, "credit": None}
+        assert filler._evaluate_formula("price.base + price.upgrades - (credit or 2500)", data) == 347500.0
+        assert filler._evaluate_formula("-price.base / 4 * 2", data) == -150000.0
+        # Division by zero degrades to 0 like any other failed formula
+        assert filler._evaluate_formula("price.base / credit", data) == 0.0
+
+    @pytest.mark.parametrize("formula", [
+        "__import__('os').system('true')",
+        "purchase_price ** 2",
+        "max(purchase_price, 1)",
+        "purchase_price -",
+    ])
+    def test_formula_rejects_anything_but_arithmetic(self, filler, formula):
+        assert filler._evaluate_formula(formula, {"purchase_price": 10}) == 0.0
+
+    def test_invalid_mapping_fails_at_load(self, form_filler, tmp_path):
+        path = tmp_path / "mappings" / "form.json"
+        mapping = json.loads(path.read_text())
+        mapping["field_mappings"]["calculated_fields"] = {
+            "balance": {"pdf_field_name": "Balance", "formula": "price; import os"},
+        }
+        path.write_text(json.dumps(mapping))
+        with pytest.raises(PDFFormFillerError) as exc:
+            form_filler.get_mapping("form")
+        assert "calculated_fields.balance" in str(exc.value)
+
+    def test_compiled_once_per_mapping(self, form_filler):
+        compiled = form_filler.get_compiled_mapping("form")
+        assert form_filler.get_compiled_mapping("form") is compiled
+        (field_key, condition, _), = compiled["checkbox_fields"]
+        assert field_key == "financing_cash"
+        assert condition({"financing_type": "Cash"}) is True
+        assert condition({}) is False
+
+
 class TestPDFFormFillerIntegration:
     """Integration tests that require the actual PDF template."""
 
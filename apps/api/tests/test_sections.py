@@ -0,0 +1,82 @@
+"""Tests for addressable sections and incremental version generation."""
+
+import services.versioning as versioning
+from services.sections import sections_for_changes, split_into_sections
+
+CONTRACT = (
+    "FAR/BAR AS-IS RESIDENTIAL CONTRACT FOR SALE AND PURCHASE\n"
+    "PARTIES: Jane Seller and John Buyer\n\n"
+    "1. PURCHASE PRICE: $350,000.00 payable at closing.\n\n"
+    "2. CLOSING DATE: This transaction shall close on July 15, 2025.\n\n"
+    "3. INSPECTION PERIOD: Buyer shall have 15 days for inspections.\n\n"
+    "4. TITLE: Seller shall convey marketable title.\n\n"
+    "5. ADDITIONAL TERMS: The deposit of 10,000 is held in escrow.\n"
+)
+
+
+def test_sections_have_stable_unique_ids_and_reassemble():
+    sections = split_into_sections(CONTRACT)
+    assert "".join(s.text for s in sections) == CONTRACT
+    ids = [s.id for s in sections]
+    assert len(ids) == len(set(ids))
+    assert "1-purchase-price" in ids
+
+    # Editing one section leaves every other id and hash unchanged
+    edited = split_into_sections(CONTRACT.replace("15 days", "10 days"))
+    before = {s.id: s.hash for s in sections}
+    after = {s.id: s.hash for s in edited}
+    assert before.keys() == after.keys()
+    assert [i for i in before if before[i] != after[i]] == ["3-inspection-period"]
+
+
+def test_changes_located_by_heading_and_value():
+    sections = split_into_sections(CONTRACT)
+    touched, unlocated = sections_for_changes(
+        sections,
+        [{"field": "closing_date", "action": "update", "from": "2025-07-15", "to": "2025-08-01"},
+         {"field": "earnest_money", "action": "update", "from": 10000, "to": 15000}],
+        [{"clause_key": "inspection_contingency", "action": "remove"}],
+    )
+    assert unlocated == []
+    assert [t.split("-", 1)[0] for t in touched] == ["2", "3", "5"]
+
+
+def test_unlocated_change_is_reported():
+    _, unlocated = sections_for_changes(
+        split_into_sections(CONTRACT), [], [{"clause_key": "pet_addendum", "action": "add"}],
+    )
+    assert unlocated == ["pet_addendum"]
+
+
+def test_rewrite_regenerates_only_touched_sections(monkeypatch):
+    prompts = []
+
+    def fake_generate_text(prompt, max_tokens=8192, **kwargs):
+        prompts.append((prompt, max_tokens))
+        return {"text": "2. CLOSING DATE: This transaction shall close on August 1, 2025.",
+                "_meta": {"input_tokens": 100, "output_tokens": 20, "model": "test"}}
+
+    monkeypatch.setattr(versioning, "generate_text", fake_generate_text)
+    # No "from" value, so the deterministic patcher cannot anchor it
+    result = versioning.rewrite_contract_text(
+        CONTRACT, [{"field": "closing_date", "action": "update", "to": "2025-08-01"}], [],
+    )
+    assert len(prompts) == 1
+    assert "PURCHASE PRICE" not in prompts[0][0]
+    assert prompts[0][1] < 1000
+    assert result["text"] == CONTRACT.replace("July 15, 2025", "August 1, 2025")
+    assert result["sections"]["regenerated"] == ["2-closing-date"]
+
+
+def test_rewrite_falls_back_to_full_text_when_unlocated(monkeypatch):
+    prompts = []
+
+    def fake_generate_text(prompt, max_tokens=8192, **kwargs):
+        prompts.append(prompt)
+        return {"text": "rewritten", "_meta": {}}
+
+    monkeypatch.setattr(versioning, "generate_text", fake_generate_text)
+    result = versioning.rewrite_contract_text(CONTRACT, [], [{"clause_key": "pet_addendum", "action": "add"}])
+    assert len(prompts) == 1 and "PURCHASE PRICE" in prompts[0]
+    assert result["text"] == "rewritten"
+    assert len(result["sections"]["regenerated"]) == result["sections"]["total"]
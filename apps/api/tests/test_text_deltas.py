@@ -0,0 +1,69 @@
+"""Delta-compressed ContractVersion text (in-memory SQLite)."""
+
+import uuid
+
+import pytest
+from sqlmodel import Session, select
+
+from models.contract import ContractVersion
+from services import text_deltas
+
+BASE = "".join(f"{i}. SECTION {i}: the parties agree to term number {i}.\n" for i in range(1, 400))
+
+
+@pytest.fixture
+def engine(sqlite_engine, monkeypatch):
+    monkeypatch.setattr(text_deltas.settings, "contract_keyframe_interval", 5)
+    return sqlite_engine([ContractVersion])
+
+
+def _text(n: int) -> str:
+    return BASE.replace("term number 7.", f"term number 7 (rev {n}).")
+
+
+def _add_versions(engine, deal_id, count, text=_text):
+    for n in range(count):
+        with Session(engine) as session:
+            session.add(ContractVersion(deal_id=deal_id, version_number=n, full_text=text(n), created_by=uuid.uuid4()))
+            session.commit()
+
+
+def test_delta_round_trip():
+    changed = BASE.replace("term number 3.", "term number 3, amended.") + "400. NEW SECTION\n"
+    delta = text_deltas.encode_delta(BASE, changed)
+    assert text_deltas.apply_delta(BASE, delta) == changed
+    assert len(delta) < len(changed) // 20
+
+
+def test_versions_stored_as_deltas_between_keyframes(engine):
+    deal_id = uuid.uuid4()
+    _add_versions(engine, deal_id, 12)
+    text_deltas._cache.clear()
+
+    with Session(engine) as session:
+        versions = session.exec(
+            select(ContractVersion).where(ContractVersion.deal_id == deal_id).order_by(ContractVersion.version_number)
+        ).all()
+        keyframes = [v.version_number for v in versions if v.text_delta is None]
+        assert keyframes == [0, 5, 10]
+        for v in versions:
+            assert v.full_text == _text(v.version_number)
+            if v.text_delta is not None:
+                assert v.stored_text == ""
+                assert v.text_base.version_number == v.version_number // 5 * 5
+
+
+def test_unrelated_text_is_stored_in_full(engine):
+    deal_id = uuid.uuid4()
+    _add_versions(engine, deal_id, 2, text=lambda n: BASE if n == 0 else BASE[::-1])
+    with Session(engine) as session:
+        latest = session.exec(select(ContractVersion).where(ContractVersion.version_number == 1)).one()
+        assert latest.text_delta is None and latest.full_text == BASE[::-1]
+
+
+def test_interval_one_disables_deltas(engine, monkeypatch):
+    monkeypatch.setattr(text_deltas.settings, "contract_keyframe_interval", 1)
+    deal_id = uuid.uuid4()
+    _add_versions(engine, deal_id, 3)
+    with Session(engine) as session:
+        assert all(v.text_delta is None for v in session.exec(select(ContractVersion)).all())
@@ -0,0 +1,65 @@
+"""Memoized timeline PDF rendering."""
+
+import pytest
+
+from services import blob_store, timeline_pdf
+
+TIMELINE = [
+    {"description": "Initial deposit due", "due_date": "2026-03-04", "category": "financing"},
+    {"description": "Inspection period ends", "due_date": "2026-03-15", "category": "inspection"},
+]
+
+
+@pytest.fixture
+def builds(tmp_path, monkeypatch):
+    """Blobs under tmp_path; returns the list of build_pdf calls."""
+    monkeypatch.setattr(blob_store.settings, "storage_path", str(tmp_path))
+    calls = []
+    build = timeline_pdf.build_pdf
+
+    def counting(*args):
+        calls.append(args)
+        return build(*args)
+    monkeypatch.setattr(timeline_pdf, "build_pdf", counting)
+    return calls
+
+
+def test_unchanged_inputs_reuse_the_render(builds):
+    digest, reused = timeline_pdf.render_pdf(TIMELINE, "1 Main St", "Acme Realty", "#112233")
+    assert not reused
+    assert blob_store.read_bytes(digest)[:4] == b"%PDF"
+
+    # A no-op re-extraction yields equal (not identical) items
+    again = [dict(reversed(list(item.items()))) for item in TIMELINE]
+    assert timeline_pdf.render_pdf(again, "1 Main St", "Acme Realty", "#112233") == (digest, True)
+    assert len(builds) == 1
+
+
+@pytest.mark.parametrize("change", [
+    {"timeline": TIMELINE[:1]},
+    {"property_address": "2 Main St"},
+    {"company_name": "Other Realty"},
+    {"primary_color": "#445566"},
+])
+def test_any_input_change_rebuilds(builds, change):
+    base = dict(timeline=TIMELINE, property_address="1 Main St", company_name="Acme Realty", primary_color="#112233")
+    first, _ = timeline_pdf.render_pdf(**base)
+    second, reused = timeline_pdf.render_pdf(**{**base, **change})
+    assert not reused and second != first
+    assert len(builds) == 2
+
+
+def test_template_version_is_part_of_the_key(builds, monkeypatch):
+    timeline_pdf.render_pdf(TIMELINE, "1 Main St")
+    monkeypatch.setattr(timeline_pdf, "TEMPLATE_VERSION", "timeline-pdf-test")
+    assert timeline_pdf.render_pdf(TIMELINE, "1 Main St")[1] is False
+
+
+def test_missing_blob_is_rebuilt(builds, tmp_path):
+    digest, _ = timeline_pdf.render_pdf(TIMELINE, "1 Main St")
+    (tmp_path / "blobs" / digest[:2] / digest[2:4] / digest).unlink()
+    assert timeline_pdf.render_pdf(TIMELINE, "1 Main St") == (digest, False)
+
+
+def test_build_is_deterministic():
+    assert timeline_pdf.build_pdf(TIMELINE, "1 Main St") == timeline_pdf.build_pdf(TIMELINE, "1 Main St")
@@ -0,0 +1,109 @@
+"""Streaming upload ingest: size cutoffs and bounded memory."""
+
+import asyncio
+import hashlib
+import os
+import tracemalloc
+
+import pytest
+from fastapi import FastAPI, File, UploadFile
+from fastapi.testclient import TestClient
+
+from services import blob_store
+from services.uploads import UploadSizeLimitMiddleware, store_upload
+
+MB = 1024 * 1024
+
+
+@pytest.fixture(autouse=True)
+def storage(tmp_path, monkeypatch):
+    monkeypatch.setattr(blob_store.settings, "storage_path", str(tmp_path))
+    return tmp_path
+
+
+def _blob_files() -> list[str]:
+    return [name for _, _, names in os.walk(blob_store.blob_root()) for name in names]
+
+
+def _client(request_limit: int) -> TestClient:
+    app = FastAPI()
+    app.add_middleware(UploadSizeLimitMiddleware, max_bytes=request_limit)
+
+    @app.post("/upload")
+    async def upload(file: UploadFile = File(...)):
+        digest, size = await store_upload(file, 2 * MB, "File too large. Maximum 2 MB.")
+        return {"digest": digest, "size": size}
+
+    return TestClient(app)
+
+
+def test_upload_is_stored_by_digest():
+    data = os.urandom(MB + 123)
+    resp = _client(4 * MB).post("/upload", files={"file": ("a.pdf", data)})
+    assert resp.status_code == 200
+    assert resp.json() == {"digest": hashlib.sha256(data).hexdigest(), "size": len(data)}
+    assert blob_store.read_bytes(resp.json()["digest"]) == data
+
+
+def test_endpoint_limit_rejects_without_leftovers():
+    resp = _client(4 * MB).post("/upload", files={"file": ("a.pdf", os.urandom(3 * MB))})
+    assert resp.status_code == 413
+    assert resp.json()["detail"] == "File too large. Maximum 2 MB."
+    assert _blob_files() == []
+
+
+def test_request_limit_uses_content_length():
+    resp = _client(MB).post("/upload", files={"file": ("a.pdf", os.urandom(2 * MB))})
+    assert resp.status_code == 413
+
+
+def test_request_limit_cuts_off_streamed_body():
+    head = (
+        b'--xyz\r\nContent-Disposition: form-data; name="file"; filename="a.bin"\r\n'
+        b"Content-Type: application/octet-stream\r\n\r\n"
+    )
+    chunks = [head] + [b"x" * (256 * 1024)] * 40
+    consumed = []
+    sent = []
+
+    async def receive():
+        consumed.append(1)
+        return {"type": "http.request", "body": chunks[len(consumed) - 1], "more_body": len(consumed) < len(chunks)}
+
+    async def send(message):
+        sent.append(message)
+
+    app = FastAPI()
+
+    @app.post("/upload")
+    async def upload(file: UploadFile = File(...)):
+        return {}
+
+    scope = {
+        "type": "http", "method": "POST", "path": "/upload", "raw_path": b"/upload",
+        "query_string": b"", "root_path": "", "scheme": "http", "http_version": "1.1",
+        "server": ("test", 80), "client": ("test", 1234),
+        # Chunked: no Content-Length to check up front
+        "headers": [(b"content-type", b"multipart/form-data; boundary=xyz")],
+    }
+    asyncio.run(UploadSizeLimitMiddleware(app, max_bytes=MB)(scope, receive, send))
+
+    assert sent[0]["status"] == 413
+    # Stopped reading just past the limit, not at the end of the 10 MB body
+    assert len(consumed) == 5
+
+
+def test_put_file_memory_is_bounded(tmp_path):
+    path = tmp_path / "big.bin"
+    with open(path, "wb") as f:
+        for _ in range(20):
+            f.write(os.urandom(MB))
+
+    tracemalloc.start()
+    with open(path, "rb") as f:
+        _, size = blob_store.put_file(f, max_size=25 * MB)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    assert size == 20 * MB
+    assert peak < 3 * blob_store.CHUNK_SIZE
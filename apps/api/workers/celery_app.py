@@ -16,11 +16,30 @@ celery_app.conf.update(
     timezone="UTC",
     enable_utc=True,
     task_track_started=True,
+    # Jobs are long LLM calls: take one at a time and ack after completion
+    worker_prefetch_multiplier=1,
+    task_acks_late=True,
     beat_schedule={
         "check-stale-deals": {
             "task": "check_stale_deals",
             "schedule": 86400.0,  # daily
         },
+        "reconcile-deal-health": {
+            "task": "reconcile_deal_health",
+            "schedule": 3600.0,  # hourly
+        },
+        "prune-llm-cache": {
+            "task": "prune_llm_cache",
+            "schedule": 86400.0,  # daily
+        },
+        "prune-extraction-cache": {
+            "task": "prune_extraction_cache",
+            "schedule": 86400.0,  # daily
+        },
+        "prune-email-outbox": {
+            "task": "prune_email_outbox",
+            "schedule": 86400.0,  # daily
+        },
         "check-deliverable-reminders": {
             "task": "check_deliverable_reminders",
             "schedule": 86400.0,  # daily
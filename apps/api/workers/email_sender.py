@@ -0,0 +1,36 @@
+"""Standalone email outbox sender.
+
+Run: python -m workers.email_sender
+Set EMAIL_SENDER_ENABLED=false on the API processes when running this, or
+keep both: senders coordinate through email_outbox.
+"""
+
+import argparse
+import logging
+import signal
+
+from config import settings
+from services.email_outbox import EmailSender
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Deliver queued email from email_outbox")
+    parser.add_argument("--batch-size", type=int, default=settings.email_batch_size)
+    parser.add_argument("--poll-interval", type=float, default=settings.email_poll_interval)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=settings.log_level)
+    sender = EmailSender(batch_size=args.batch_size, poll_interval=args.poll_interval)
+
+    def _shutdown(signum, frame):
+        logging.getLogger(__name__).info("Received signal %s, stopping", signum)
+        sender.request_stop()
+
+    signal.signal(signal.SIGTERM, _shutdown)
+    signal.signal(signal.SIGINT, _shutdown)
+
+    sender.run_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""Pluggable executors for background jobs.
+
+Every executor runs the same registered tasks (workers/jobs.py) through the
+same runner (workers.queue.run_job), so retries, leases and status updates
+behave identically. Executors differ only in where a freshly enqueued job
+runs first:
+
+- queue:   nothing happens at enqueue time; a QueueWorker claims the row.
+- thread:  the enqueuing process claims the job and runs it on a thread pool.
+- process: as thread, on a process pool (CPU-heavy work, e.g. PDF rendering).
+- celery:  a Celery worker claims and runs it (``run_job`` task).
+
+Thread and process executors keep one bounded pool per job class.
+
+Whichever executor is configured, the job row stays the source of truth: if
+the process running it dies, its lease lapses and any QueueWorker retries it.
+"""
+
+import logging
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Optional
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class JobExecutor:
+    name = "base"
+
+    def submit(self, job_id: str, job_type: str) -> None:
+        """Start a committed, pending job."""
+        raise NotImplementedError
+
+    def shutdown(self, wait: bool = True) -> None:
+        pass
+
+
+class QueueJobExecutor(JobExecutor):
+    name = "queue"
+
+    def submit(self, job_id: str, job_type: str) -> None:
+        from workers.queue import wake_local_workers
+        wake_local_workers()
+
+
+class PoolJobExecutor(JobExecutor):
+    """Runs jobs on one concurrent.futures pool per job class, so LLM calls,
+    PDF rendering and DB maintenance never wait on each other's workers.
+    Also used by QueueWorker to run the jobs it claims."""
+
+    def __init__(self, pools: dict[str, Executor]):
+        self.pools = pools
+
+    def _pool(self, job_type: str) -> Executor:
+        from workers.registry import job_class_of
+        return self.pools[job_class_of(job_type)]
+
+    def submit(self, job_id: str, job_type: str) -> None:
+        from workers.queue import execute_job
+        self._pool(job_type).submit(execute_job, job_id).add_done_callback(_after_run)
+
+    def run_claimed(self, job: dict, worker_id: str, visibility_timeout: int) -> Future:
+        from workers.queue import run_job
+        future = self._pool(job["job_type"]).submit(run_job, job, worker_id, visibility_timeout)
+        future.add_done_callback(_after_run)
+        return future
+
+    def shutdown(self, wait: bool = True) -> None:
+        for pool in self.pools.values():
+            pool.shutdown(wait=wait)
+
+
+class ThreadJobExecutor(PoolJobExecutor):
+    name = "thread"
+
+    def __init__(self, sizes: dict[str, int]):
+        super().__init__({
+            job_class: ThreadPoolExecutor(max_workers=size, thread_name_prefix=f"job-{job_class}")
+            for job_class, size in sizes.items()
+        })
+
+
+class ProcessJobExecutor(PoolJobExecutor):
+    name = "process"
+
+    def __init__(self, sizes: dict[str, int]):
+        super().__init__({
+            job_class: ProcessPoolExecutor(max_workers=size, initializer=_init_job_process)
+            for job_class, size in sizes.items()
+        })
+
+
+class CeleryJobExecutor(JobExecutor):
+    name = "celery"
+
+    def submit(self, job_id: str, job_type: str) -> None:
+        from workers.celery_app import celery_app
+        celery_app.send_task("run_job", args=[job_id])
+
+
+def _init_job_process() -> None:
+    # Connections inherited from the parent must not be shared across processes
+    from database import sync_engine
+    sync_engine.dispose(close=False)
+
+
+def _after_run(future: Future) -> None:
+    """Dispatch follow-up jobs from this process, where the executor lives."""
+    from workers.queue import dispatch
+
+    # run_job records task failures itself; anything raised here is a runner bug
+    # or a broken pool, and would otherwise vanish with the future.
+    exc = future.exception()
+    if exc:
+        logger.error("Job runner crashed", exc_info=exc)
+        return
+    if future.result():
+        dispatch(*future.result())
+
+
+def pool_sizes(llm_concurrency: int) -> dict[str, int]:
+    """Per-class pool sizes: the given LLM concurrency plus the configured
+    PDF and maintenance pools."""
+    return {
+        "llm": llm_concurrency,
+        "pdf": settings.job_pool_pdf_concurrency,
+        "maintenance": settings.job_pool_maintenance_concurrency,
+    }
+
+
+def make_pool_executor(kind: str, sizes: dict[str, int]) -> PoolJobExecutor:
+    if kind == "process":
+        return ProcessJobExecutor(sizes)
+    return ThreadJobExecutor(sizes)
+
+
+_executor: Optional[JobExecutor] = None
+
+
+def get_executor() -> JobExecutor:
+    """The process-wide executor selected by settings.job_executor."""
+    global _executor
+    if _executor is None:
+        _executor = make_executor(settings.job_executor)
+    return _executor
+
+
+def make_executor(name: str, concurrency: Optional[int] = None) -> JobExecutor:
+    concurrency = concurrency or settings.job_executor_concurrency
+    if name == "queue":
+        return QueueJobExecutor()
+    if name == "celery":
+        return CeleryJobExecutor()
+    if name in ("thread", "process"):
+        return make_pool_executor(name, pool_sizes(concurrency))
+    raise ValueError(f"Unknown job executor: {name}")
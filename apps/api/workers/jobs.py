@@ -0,0 +1,460 @@
+"""Background job implementations, registered in workers/registry.py.
+
+Each task does its work on the caller's session and returns the job result.
+Status updates, commits and retries belong to the runner (workers/queue.py).
+"""
+
+import json
+import logging
+import uuid
+from datetime import datetime
+from typing import Optional
+
+from sqlmodel import Session, select
+
+from models.audit import AuditEvent
+from models.change_request import ChangeRequest
+from models.contract import ContractVersion
+from models.deal import Deal, DealAssignment
+from models.notification import Notification
+from services import blob_store
+from services.contract_intelligence import apply_field_changes, apply_clause_actions
+from services.contract_parsing import parse_contract_text
+from services.ingestion import extract_text
+from services.versioning import rewrite_contract_text
+from services.diffing import store_diff
+from services.deal_health import refresh_deal_health_for_event
+from llm.anthropic_client import generate_json, generate_text
+from workers.queue import enqueue_followup
+from workers.registry import PermanentJobError, read_prompt, task
+
+logger = logging.getLogger(__name__)
+
+TEMPLATE_NAMES = {
+    "far_bar_asis": "FAR/BAR As-Is Residential Contract for Sale and Purchase",
+    "far_bar_standard": "FAR/BAR Standard Residential Contract for Sale and Purchase",
+}
+
+
+def _record_event(session: Session, deal_id: uuid.UUID, action: str, user_id=None, details=None) -> None:
+    event = AuditEvent(deal_id=deal_id, user_id=user_id, action=action, details=details or {})
+    session.add(event)
+    refresh_deal_health_for_event(session, event)
+
+
+def _notify_deal(session: Session, deal_id: uuid.UUID, type: str, title: str, message: str) -> None:
+    """Create notifications for deal participants."""
+    assignments = session.exec(select(DealAssignment).where(DealAssignment.deal_id == deal_id)).all()
+    for a in assignments:
+        session.add(Notification(user_id=a.user_id, deal_id=deal_id, type=type, title=title, message=message))
+
+
+def _latest_version(session: Session, deal_id: uuid.UUID):
+    return session.exec(
+        select(ContractVersion)
+        .where(ContractVersion.deal_id == deal_id)
+        .order_by(ContractVersion.version_number.desc())  # type: ignore
+        .limit(1)
+        .options(*ContractVersion.with_text())
+    ).first()
+
+
+@task("parse_contract")
+def parse_contract(
+    session: Session, job_id: str, deal_id: str, version_id: str, filename: Optional[str] = None,
+) -> dict:
+    version = session.get(ContractVersion, uuid.UUID(version_id), options=ContractVersion.with_text())
+    if not version:
+        raise PermanentJobError("Version not found")
+
+    extraction_ok = None
+    if version.source_blob and not version.full_text:
+        # Uploads are stored as blobs; their text is extracted here, off the API
+        if not blob_store.exists(version.source_blob):
+            raise PermanentJobError("Uploaded file not found")
+        text, extraction_ok = extract_text(
+            filename or "unknown.txt", blob_store.blob_path(version.source_blob), version.source_blob,
+        )
+        version.full_text = text
+        _record_event(session, uuid.UUID(deal_id), "contract_text_extracted", details={
+            "version_id": version_id, "extraction_ok": extraction_ok,
+        })
+
+    result = parse_contract_text(version.full_text)
+    result.pop("_meta", {})
+
+    version.extracted_fields = result.get("fields", {})
+    version.clause_tags = result.get("clauses", [])
+    version.contract_type = result.get("contract_type", "UNKNOWN")
+    version.prompt_version = "parse_contract_v1"
+    session.add(version)
+
+    _record_event(session, uuid.UUID(deal_id), "contract_parsed", details={
+        "version_id": version_id, "contract_type": version.contract_type,
+    })
+
+    # Risk analysis runs as its own job so parse completion isn't held up by it
+    enqueue_followup(session, uuid.UUID(deal_id), "risk_analysis", {"version_id": version_id})
+
+    return {"contract_type": version.contract_type, "extraction_ok": extraction_ok}
+
+
+@task("risk_analysis")
+def risk_analysis(session: Session, job_id: str, version_id: str) -> dict:
+    from services.risk_analysis import run_risk_analysis_sync
+
+    version = session.get(ContractVersion, uuid.UUID(version_id))
+    if not version:
+        raise PermanentJobError("Version not found")
+    # Best-effort: records risk_analysis_status itself and never raises
+    run_risk_analysis_sync(session, version)
+    return {"risk_analysis_status": version.risk_analysis_status}
+
+
+def _mark_analysis_failed(session: Session, deal_id: str, cr_id: str) -> None:
+    cr = session.get(ChangeRequest, uuid.UUID(cr_id))
+    if cr:
+        cr.analysis_status = "failed"
+        session.add(cr)
+
+
+@task("analyze_change_request", on_failure=_mark_analysis_failed)
+def analyze_change_request(session: Session, job_id: str, deal_id: str, cr_id: str) -> dict:
+    from services.email import notify_analysis_complete
+    from models.user import User
+
+    cr = session.get(ChangeRequest, uuid.UUID(cr_id))
+    if not cr:
+        raise PermanentJobError("Change request not found")
+
+    version = _latest_version(session, uuid.UUID(deal_id))
+    if not version:
+        raise PermanentJobError("No contract version found")
+
+    cr.analysis_status = "processing"
+    cr.analysis_job_id = job_id
+    session.add(cr)
+    session.commit()
+
+    prompt_template = read_prompt("analyze_change_request_v1.md")
+    contract_state = json.dumps({
+        "contract_type": version.contract_type,
+        "clauses": version.clause_tags or [],
+    })
+    current_fields = json.dumps(version.extracted_fields or {})
+
+    prompt = (
+        prompt_template
+        .replace("{contract_state}", contract_state)
+        .replace("{current_fields}", current_fields)
+        .replace("{change_request_text}", cr.raw_text)
+    )
+
+    result = generate_json(prompt)
+    meta = result.pop("_meta", {})
+
+    cr.analysis_status = "completed"
+    cr.analysis_result = result
+    cr.prompt_version = "analyze_change_request_v1"
+    cr.input_tokens = meta.get("input_tokens")
+    cr.output_tokens = meta.get("output_tokens")
+    cr.analyzed_at = datetime.utcnow()
+    session.add(cr)
+
+    _record_event(session, uuid.UUID(deal_id), "change_request_analyzed", cr.created_by, {
+        "cr_id": cr_id, "recommendation": result.get("recommendation"),
+    })
+    _notify_deal(session, uuid.UUID(deal_id), "cr_analyzed",
+                 "Change request analyzed",
+                 f"AI analysis complete. Recommendation: {result.get('recommendation', 'N/A')}")
+
+    # Email notification (best-effort)
+    try:
+        deal = session.get(Deal, uuid.UUID(deal_id))
+        user = session.get(User, cr.created_by)
+        if deal and user and user.email:
+            notify_analysis_complete(
+                to=user.email,
+                deal_title=deal.title,
+                recommendation=result.get("recommendation", "N/A"),
+            )
+    except Exception:
+        logger.exception("Analysis email notification failed (non-fatal)")
+
+    return {"recommendation": result.get("recommendation")}
+
+
+@task("generate_version")
+def generate_version(session: Session, job_id: str, deal_id: str, cr_id: str, user_id: str) -> dict:
+    cr = session.get(ChangeRequest, uuid.UUID(cr_id))
+    if not cr or not cr.analysis_result:
+        raise PermanentJobError("CR not found or not analyzed")
+
+    prev_version = _latest_version(session, uuid.UUID(deal_id))
+    if not prev_version:
+        raise PermanentJobError("No contract version found")
+
+    analysis = cr.analysis_result
+    changes = analysis.get("changes", [])
+    clause_actions = analysis.get("clause_actions", [])
+
+    # Step 1: Deterministic field apply
+    current_fields = prev_version.extracted_fields or {}
+    new_fields = apply_field_changes(current_fields, changes)
+
+    # Step 1b: Clause apply
+    current_clauses = prev_version.clause_tags or []
+    new_clauses = apply_clause_actions(current_clauses, clause_actions)
+
+    # Step 2: Deterministic patch, else constrained LLM text generation
+    result = rewrite_contract_text(prev_version.full_text, changes, clause_actions)
+    new_text = result["text"]
+    meta = result.get("_meta", {})
+
+    new_version = ContractVersion(
+        deal_id=uuid.UUID(deal_id),
+        version_number=prev_version.version_number + 1,
+        full_text=new_text,
+        extracted_fields=new_fields,
+        clause_tags=new_clauses,
+        contract_type=prev_version.contract_type,
+        change_summary={
+            "changes": changes,
+            "clause_actions": clause_actions,
+            "regenerated_sections": (result.get("sections") or {}).get("regenerated"),
+            "method": result.get("method"),
+        },
+        source="generated",
+        source_cr_id=uuid.UUID(cr_id),
+        created_by=uuid.UUID(user_id),
+        prompt_version=None if result.get("method") == "patch" else "generate_version_v1",
+    )
+    session.add(new_version)
+    session.flush()
+    # Reviewers open this diff right away; serve it from version_diffs
+    store_diff(session, prev_version, new_version)
+
+    _record_event(session, uuid.UUID(deal_id), "version_generated", uuid.UUID(user_id), {
+        "version_number": new_version.version_number,
+        "cr_id": cr_id,
+        "input_tokens": meta.get("input_tokens"),
+        "output_tokens": meta.get("output_tokens"),
+        "sections_regenerated": len((result.get("sections") or {}).get("regenerated") or []),
+        "sections_total": (result.get("sections") or {}).get("total"),
+        "method": result.get("method"),
+    })
+    _notify_deal(session, uuid.UUID(deal_id), "version_generated",
+                 "New contract version generated",
+                 f"Contract version {new_version.version_number} has been generated.")
+
+    return {
+        "version_id": str(new_version.id),
+        "version_number": new_version.version_number,
+    }
+
+
+@task("generate_timeline_pdf", job_class="pdf")
+def generate_timeline_pdf(session: Session, job_id: str, deal_id: str) -> dict:
+    from models.share_link import ShareLink
+    from models.user import User
+    from services.email import notify_timeline_generated
+    from services.timeline_pdf import (
+        create_deliverables_from_timeline,
+        extract_timeline_dates,
+        get_brand_for_deal_sync,
+        render_pdf,
+    )
+
+    deal = session.get(Deal, uuid.UUID(deal_id))
+    if not deal:
+        raise PermanentJobError("Deal not found")
+
+    version = _latest_version(session, uuid.UUID(deal_id))
+    if not version or not version.full_text:
+        raise PermanentJobError("No contract version found")
+
+    timeline = extract_timeline_dates(version.full_text)
+
+    # Create deliverables from timeline
+    try:
+        with session.begin_nested():
+            create_deliverables_from_timeline(session, deal, timeline)
+            _record_event(session, deal.id, "deliverables_created", details={"count": len(timeline)})
+    except Exception:
+        logger.exception("Deliverable creation failed (non-fatal)")
+
+    brand = get_brand_for_deal_sync(session, deal)
+    # Unchanged timeline and brand: reuses the stored render
+    digest, reused = render_pdf(
+        timeline=timeline,
+        property_address=deal.address or "",
+        company_name=brand["company_name"],
+        primary_color=brand["primary_color"],
+    )
+
+    deal.timeline_pdf_blob = digest
+    deal.timeline_generated_at = datetime.utcnow()
+    session.add(deal)
+
+    # Email counterparties and the deal owner (best-effort)
+    try:
+        recipients = [
+            sl.counterparty_email
+            for sl in session.exec(
+                select(ShareLink).where(
+                    ShareLink.deal_id == deal.id,
+                    ShareLink.is_active == True,  # noqa: E712
+                )
+            ).all()
+            if sl.counterparty_email
+        ]
+        owner = session.get(User, deal.created_by)
+        if owner and owner.email:
+            recipients.append(owner.email)
+        # One outbox insert for everyone; the PDF is attached by reference
+        notify_timeline_generated(
+            recipients=recipients,
+            deal_title=deal.title,
+            address=deal.address or "",
+            pdf_blob=digest,
+        )
+    except Exception:
+        logger.exception("Timeline PDF email notification failed (non-fatal)")
+
+    _record_event(session, deal.id, "timeline_pdf_generated", details={
+        "timeline_items": len(timeline), "render_reused": reused,
+    })
+
+    return {"timeline_items": len(timeline), "render_reused": reused}
+
+
+@task("generate_initial_contract")
+def generate_initial_contract(
+    session: Session, job_id: str, deal_id: str, template_slug: str,
+    deal_details: dict, supporting_texts: list[str], user_id: str,
+) -> dict:
+    template_type = TEMPLATE_NAMES.get(template_slug, template_slug)
+    supporting_docs_text = "\n\n".join(supporting_texts) if supporting_texts else "None provided."
+
+    prompt_template = read_prompt("generate_initial_contract_v1.md")
+    prompt = (
+        prompt_template
+        .replace("{template_type}", template_type)
+        .replace("{deal_details_json}", json.dumps(deal_details, indent=2))
+        .replace("{supporting_docs_text}", supporting_docs_text)
+    )
+
+    result = generate_text(
+        prompt,
+        system=(
+            "You are a senior Florida real estate attorney drafting system. "
+            "You produce complete, legally binding contracts that follow the official "
+            "FAR/BAR form structure exactly. Your contracts are comprehensive — every section, "
+            "every standard clause, every legal provision must be included in full. "
+            "Never abbreviate or summarize legal language. Output only the contract text."
+        ),
+        max_tokens=16000,
+    )
+    new_text = result["text"]
+    meta = result.get("_meta", {})
+
+    # Auto-parse the generated contract to extract fields/clauses
+    parse_result = parse_contract_text(new_text)
+    parse_result.pop("_meta", None)
+
+    version = ContractVersion(
+        deal_id=uuid.UUID(deal_id),
+        version_number=0,
+        full_text=new_text,
+        extracted_fields=parse_result.get("fields", {}),
+        clause_tags=parse_result.get("clauses", []),
+        contract_type=parse_result.get("contract_type", "UNKNOWN"),
+        source="ai_generated",
+        created_by=uuid.UUID(user_id),
+        prompt_version="generate_initial_contract_v1",
+    )
+    session.add(version)
+
+    _record_event(session, uuid.UUID(deal_id), "contract_ai_generated", uuid.UUID(user_id), {
+        "version_id": str(version.id),
+        "template": template_slug,
+        "input_tokens": meta.get("input_tokens"),
+        "output_tokens": meta.get("output_tokens"),
+    })
+
+    return {"version_id": str(version.id)}
+
+
+@task("generate_offer_letter")
+def generate_offer_letter(
+    session: Session, job_id: str, deal_id: str, user_prompt: str,
+    deal_title: str, deal_address: str, deal_type: str, user_id: str,
+) -> dict:
+    from models.offer_letter import OfferLetter
+
+    prompt_template = read_prompt("generate_offer_letter_v1.md")
+    prompt = (
+        prompt_template
+        .replace("{user_prompt}", user_prompt)
+        .replace("{deal_title}", deal_title or "N/A")
+        .replace("{deal_address}", deal_address or "N/A")
+        .replace("{deal_type}", deal_type or "sale")
+    )
+
+    result = generate_json(prompt, "Return the offer letter JSON.")
+    meta = result.pop("_meta", {})
+
+    offer_letter = OfferLetter(
+        deal_id=uuid.UUID(deal_id),
+        user_prompt=user_prompt,
+        full_text=result.get("full_text", ""),
+        buyer_name=result.get("buyer_name"),
+        seller_name=result.get("seller_name"),
+        property_address=result.get("property_address"),
+        purchase_price=result.get("purchase_price"),
+        earnest_money=result.get("earnest_money"),
+        closing_date=result.get("closing_date"),
+        contingencies=result.get("contingencies"),
+        additional_terms=result.get("additional_terms"),
+        prompt_version="generate_offer_letter_v1",
+        status="draft",
+        created_by=uuid.UUID(user_id),
+    )
+    session.add(offer_letter)
+
+    _record_event(session, uuid.UUID(deal_id), "offer_letter_generated", uuid.UUID(user_id), {
+        "offer_letter_id": str(offer_letter.id),
+        "input_tokens": meta.get("input_tokens"),
+        "output_tokens": meta.get("output_tokens"),
+    })
+
+    return {"offer_letter_id": str(offer_letter.id)}
+
+
+@task("reconcile_deal_health", job_class="maintenance")
+def reconcile_deal_health(session: Session, job_id: str) -> dict:
+    from services.deal_health import reconcile_deal_health as _reconcile
+
+    # Commits per batch, so a retry after a crash only redoes the tail
+    return {"deals": _reconcile(session)}
+
+
+@task("prune_llm_cache", job_class="maintenance")
+def prune_llm_cache(session: Session, job_id: str) -> dict:
+    from llm.cache import prune_llm_cache as _prune
+
+    return _prune(session)
+
+
+@task("prune_extraction_cache", job_class="maintenance")
+def prune_extraction_cache(session: Session, job_id: str) -> dict:
+    from services.extraction_cache import prune_extraction_cache as _prune
+
+    return _prune(session)
+
+
+@task("prune_email_outbox", job_class="maintenance")
+def prune_email_outbox(session: Session, job_id: str) -> dict:
+    from services.email_outbox import prune_email_outbox as _prune
+
+    return _prune(session)
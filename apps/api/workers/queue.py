@@ -0,0 +1,536 @@
+"""Durable job queue on the job_records table.
+
+Jobs are JobRecord rows carrying a JSON payload. Workers claim due rows with
+SELECT ... FOR UPDATE SKIP LOCKED and hold a lease (locked_until) that they
+renew while the job runs. A job whose lease lapses — worker crash, deploy,
+OOM — becomes claimable again, so nothing is left "processing" forever.
+Failed jobs are retried with exponential backoff up to max_attempts.
+
+Job bodies are registered tasks (workers/jobs.py); run_job is the single
+runner every executor (workers/executors.py) goes through.
+
+Each job class (LLM, PDF, maintenance) has its own bounded pool and a cap on
+open jobs. ensure_queue_capacity raises QueueFullError past the cap, which
+the API turns into 503 + Retry-After; queue_metrics reports depth and wait.
+
+Delivery is at-least-once: a job whose lease lapsed while it was still
+running may execute twice.
+"""
+
+import logging
+import os
+import random
+import socket
+import threading
+import uuid
+from concurrent.futures import Future
+from datetime import datetime, timedelta
+from typing import NamedTuple, Optional
+
+from sqlalchemy import and_, or_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlmodel import Session, func, select
+
+from config import settings
+from database import sync_engine
+from llm.gateway import org_scope
+from models.deal import Deal
+from models.job import JobRecord
+
+logger = logging.getLogger(__name__)
+
+BACKOFF_BASE_SECONDS = 10
+BACKOFF_MAX_SECONDS = 600
+
+# Workers running in this process; dispatch() wakes them instead of waiting
+# for the next poll.
+_local_workers: list["QueueWorker"] = []
+
+
+class JobRef(NamedTuple):
+    """What dispatch needs to know about a committed job."""
+    id: str
+    job_type: str
+
+
+class QueueFullError(Exception):
+    """A job class has reached its maximum number of open jobs."""
+
+    def __init__(self, job_class: str, depth: int, limit: int):
+        self.job_class = job_class
+        self.depth = depth
+        self.limit = limit
+        super().__init__(f"{job_class} job queue is full ({depth}/{limit} open jobs)")
+
+
+def new_job(
+    deal_id: Optional[uuid.UUID],
+    job_type: str,
+    payload: dict,
+    max_attempts: Optional[int] = None,
+) -> JobRecord:
+    """Build a pending job row. For callers that commit the job together
+    with other writes; call dispatch(job) once committed."""
+    return JobRecord(
+        id=str(uuid.uuid4()),
+        deal_id=deal_id,
+        job_type=job_type,
+        status="pending",
+        payload=payload,
+        max_attempts=max_attempts or settings.job_queue_max_attempts,
+    )
+
+
+def dispatch(*jobs: JobRef | JobRecord) -> None:
+    """Hand committed jobs to the configured executor (settings.job_executor)."""
+    from workers.executors import get_executor
+
+    executor = get_executor()
+    for job in jobs:
+        executor.submit(job.id, job.job_type)
+
+
+def max_queue_depth(job_class: str) -> int:
+    return getattr(settings, f"job_queue_max_depth_{job_class}")
+
+
+def open_job_count(session: Session, job_types: list[str]) -> int:
+    """Pending and processing jobs of the given types."""
+    return session.exec(
+        select(func.count()).select_from(JobRecord)
+        .where(JobRecord.status.in_(["pending", "processing"]), JobRecord.job_type.in_(job_types))
+    ).one()
+
+
+def check_queue_capacity(session: Session, job_type: str, count: int = 1) -> None:
+    """Raise QueueFullError if `count` more jobs of this type would exceed its
+    class's max depth. The limit is soft: concurrent enqueues can overshoot
+    it slightly."""
+    from workers.registry import job_class_of, job_types_in
+
+    job_class = job_class_of(job_type)
+    limit = max_queue_depth(job_class)
+    depth = open_job_count(session, job_types_in(job_class))
+    if depth + count > limit:
+        logger.warning("Rejecting %s %s job(s): %s/%s open", count, job_class, depth, limit)
+        raise QueueFullError(job_class, depth, limit)
+
+
+async def ensure_queue_capacity(session: AsyncSession, job_type: str, count: int = 1) -> None:
+    """Back-pressure check for endpoints that enqueue jobs. Call it before
+    writing anything, so a refused request leaves no partial state."""
+    await session.run_sync(check_queue_capacity, job_type, count)
+
+
+def wake_local_workers() -> None:
+    for worker in _local_workers:
+        worker.wake()
+
+
+async def enqueue_job(
+    session: AsyncSession,
+    deal_id: uuid.UUID,
+    job_type: str,
+    payload: dict,
+    max_attempts: Optional[int] = None,
+) -> str:
+    """Persist a pending job, dispatch it and return its id. Commits the session."""
+    job = new_job(deal_id, job_type, payload, max_attempts)
+    session.add(job)
+    await session.commit()
+    dispatch(job)
+    return job.id
+
+
+def enqueue_followup(session: Session, deal_id: Optional[uuid.UUID], job_type: str, payload: dict) -> str:
+    """Queue a job from inside a running task. It is committed with the task's
+    own writes and dispatched once the task completes."""
+    job = new_job(deal_id, job_type, payload)
+    session.add(job)
+    session.info.setdefault("followup_jobs", []).append(JobRef(job.id, job_type))
+    return job.id
+
+
+def retry_delay(attempts: int) -> float:
+    """Seconds to wait before retry number `attempts` (1-based), with jitter."""
+    delay = min(BACKOFF_BASE_SECONDS * 2 ** (attempts - 1), BACKOFF_MAX_SECONDS)
+    return delay * random.uniform(0.8, 1.2)
+
+
+def _lease(job: JobRecord, worker_id: str, now: datetime, visibility_timeout: int) -> dict:
+    job.status = "processing"
+    job.attempts += 1
+    job.locked_by = worker_id
+    job.locked_until = now + timedelta(seconds=visibility_timeout)
+    job.started_at = now
+    return {
+        "id": job.id,
+        "job_type": job.job_type,
+        "payload": job.payload or {},
+        "attempts": job.attempts,
+    }
+
+
+def claim_jobs(
+    session: Session,
+    worker_id: str,
+    limit: int,
+    visibility_timeout: int,
+    job_types: Optional[list[str]] = None,
+) -> list[dict]:
+    """Lease up to `limit` due jobs to worker_id, optionally only of the given
+    types. Commits.
+
+    Due jobs are pending rows whose run_after has passed, plus processing
+    rows whose lease has lapsed. Rows locked by a concurrent claimer are
+    skipped rather than waited on.
+    """
+    now = datetime.utcnow()
+    query = select(JobRecord).where(or_(
+        and_(JobRecord.status == "pending", JobRecord.run_after <= now),
+        and_(JobRecord.status == "processing", JobRecord.locked_until < now),
+    ))
+    if job_types is not None:
+        query = query.where(JobRecord.job_type.in_(job_types))
+    jobs = session.exec(
+        query
+        .order_by(JobRecord.run_after)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    ).all()
+
+    claimed = []
+    for job in jobs:
+        if job.attempts >= job.max_attempts:
+            # Lease lapsed during the final attempt
+            job.status = "failed"
+            job.error = job.error or "Job lease expired on final attempt"
+            job.completed_at = now
+            job.locked_by = None
+            job.locked_until = None
+        else:
+            claimed.append(_lease(job, worker_id, now, visibility_timeout))
+        session.add(job)
+    session.commit()
+    return claimed
+
+
+def claim_job(session: Session, job_id: str, worker_id: str, visibility_timeout: int) -> Optional[dict]:
+    """Lease one specific pending job, for executors that dispatch directly.
+    Returns None if it is already taken or not pending. Commits."""
+    job = session.exec(
+        select(JobRecord)
+        .where(JobRecord.id == job_id, JobRecord.status == "pending")
+        .with_for_update(skip_locked=True)
+    ).first()
+    claimed = _lease(job, worker_id, datetime.utcnow(), visibility_timeout) if job else None
+    if job:
+        session.add(job)
+    session.commit()
+    return claimed
+
+
+def renew_leases(session: Session, worker_id: str, job_ids: list[str], visibility_timeout: int) -> None:
+    """Extend the lease on jobs this worker is still running. Commits."""
+    if not job_ids:
+        return
+    session.exec(
+        update(JobRecord)
+        .where(
+            JobRecord.id.in_(job_ids),
+            JobRecord.locked_by == worker_id,
+            JobRecord.status == "processing",
+        )
+        .values(locked_until=datetime.utcnow() + timedelta(seconds=visibility_timeout))
+    )
+    session.commit()
+
+
+def finish_job(
+    session: Session,
+    job_id: str,
+    worker_id: str,
+    result: Optional[dict] = None,
+    error: Optional[str] = None,
+    retry: bool = True,
+) -> None:
+    """Record a run's outcome and release the lease. Commits, so a task's own
+    writes land in the same transaction as its completion.
+
+    A failed run goes back to pending with backoff while attempts remain.
+    """
+    job = session.get(JobRecord, job_id, with_for_update=True)
+    if not job or job.locked_by != worker_id:
+        # Lease lost to another worker, which now owns the outcome
+        session.commit()
+        return
+
+    now = datetime.utcnow()
+    if error is None:
+        job.status = "completed"
+        job.result = result
+        job.error = None
+        job.completed_at = now
+    elif retry and job.attempts < job.max_attempts:
+        job.status = "pending"
+        job.error = error
+        job.run_after = now + timedelta(seconds=retry_delay(job.attempts))
+        logger.warning("Job %s (%s) failed, retry %s scheduled", job.id, job.job_type, job.attempts)
+    else:
+        job.status = "failed"
+        job.error = error
+        job.completed_at = now
+    job.locked_by = None
+    job.locked_until = None
+    session.add(job)
+    session.commit()
+
+
+class _Heartbeat:
+    """Renews a job's lease in the background while it runs."""
+
+    def __init__(self, job_id: str, worker_id: str, visibility_timeout: int):
+        self._args = (worker_id, [job_id], visibility_timeout)
+        self._interval = visibility_timeout / 3
+        self._done = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"lease-{job_id[:8]}", daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._done.set()
+
+    def _run(self) -> None:
+        while not self._done.wait(self._interval):
+            try:
+                with Session(sync_engine) as session:
+                    renew_leases(session, *self._args)
+            except Exception:
+                logger.exception("Lease renewal failed")
+
+
+def run_job(job: dict, worker_id: str, visibility_timeout: Optional[int] = None) -> list[JobRef]:
+    """Run a claimed job through its registered task and record the outcome.
+
+    Returns the follow-up jobs the task queued; the caller dispatches them
+    from its own process (run_job may be running in a pool child).
+    """
+    from workers.registry import PermanentJobError, get_task
+
+    visibility_timeout = visibility_timeout or settings.job_queue_visibility_timeout
+    task = get_task(job["job_type"])
+    with Session(sync_engine) as session:
+        if task is None:
+            finish_job(session, job["id"], worker_id, error=f"Unknown job type: {job['job_type']}", retry=False)
+            return []
+
+        followups: list[JobRef] = []
+        # LLM calls made by the task queue fairly against other orgs' calls
+        org_id = session.exec(
+            select(Deal.organization_id).join(JobRecord, JobRecord.deal_id == Deal.id)
+            .where(JobRecord.id == job["id"])
+        ).first()
+        with _Heartbeat(job["id"], worker_id, visibility_timeout), org_scope(org_id):
+            try:
+                result = task.fn(session, job["id"], **job["payload"])
+                followups = session.info.pop("followup_jobs", [])
+                finish_job(session, job["id"], worker_id, result=result)
+            except Exception as e:
+                logger.exception("Job %s (%s) failed", job["id"], job["job_type"])
+                session.rollback()
+                session.info.pop("followup_jobs", None)
+                if task.on_failure:
+                    try:
+                        task.on_failure(session, **job["payload"])
+                        session.commit()
+                    except Exception:
+                        logger.exception("on_failure hook for %s failed", job["job_type"])
+                        session.rollback()
+                finish_job(
+                    session, job["id"], worker_id, error=str(e),
+                    retry=not isinstance(e, PermanentJobError),
+                )
+    return followups
+
+
+def execute_job(job_id: str, worker_id: Optional[str] = None) -> list[JobRef]:
+    """Claim and run one job by id (direct dispatch from thread, process and
+    Celery executors). A no-op if a queue worker got there first. Returns
+    follow-up jobs, like run_job."""
+    worker_id = worker_id or default_worker_id()
+    visibility_timeout = settings.job_queue_visibility_timeout
+    with Session(sync_engine) as session:
+        job = claim_job(session, job_id, worker_id, visibility_timeout)
+    if not job:
+        return []
+    return run_job(job, worker_id, visibility_timeout)
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+
+
+class QueueWorker:
+    """Claims jobs from job_records and runs them on one bounded thread or
+    process pool per job class (workers/executors.py). `concurrency` sizes
+    the LLM pool; PDF and maintenance pools come from settings.
+
+    start() runs the claim loop on a background thread (used inside API
+    processes); run_forever() blocks (used by workers/queue_worker.py).
+    """
+
+    def __init__(
+        self,
+        concurrency: int,
+        pool: str = "thread",
+        worker_id: Optional[str] = None,
+        poll_interval: Optional[float] = None,
+        visibility_timeout: Optional[int] = None,
+    ):
+        from workers.executors import make_pool_executor, pool_sizes
+
+        self.sizes = pool_sizes(concurrency)
+        self.executor = make_pool_executor(pool, self.sizes)
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.poll_interval = poll_interval or settings.job_queue_poll_interval
+        self.visibility_timeout = visibility_timeout or settings.job_queue_visibility_timeout
+        self._inflight: dict[str, dict[str, Future]] = {job_class: {} for job_class in self.sizes}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def wake(self) -> None:
+        self._wake.set()
+
+    def start(self) -> None:
+        _local_workers.append(self)
+        self._thread = threading.Thread(target=self.run_forever, name="job-dispatch", daemon=True)
+        self._thread.start()
+
+    def request_stop(self) -> None:
+        """Ask the claim loop to exit after its current iteration."""
+        self._stop.set()
+        self._wake.set()
+
+    def stop(self, wait: bool = True) -> None:
+        """Stop claiming jobs. With wait=True, block until in-flight jobs finish;
+        otherwise their leases lapse and another worker picks them up."""
+        self.request_stop()
+        if self in _local_workers:
+            _local_workers.remove(self)
+        if self._thread:
+            self._thread.join(timeout=self.poll_interval * 2)
+        self.executor.shutdown(wait=wait)
+
+    def run_forever(self) -> None:
+        logger.info(
+            "Queue worker %s started (pools=%s, kind=%s)",
+            self.worker_id, self.sizes, self.executor.name,
+        )
+        while not self._stop.is_set():
+            try:
+                claimed = self._claim()
+            except Exception:
+                logger.exception("Queue worker %s poll failed", self.worker_id)
+                claimed = []
+            if not claimed or not any(self.free_slots().values()):
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+        logger.info("Queue worker %s stopped", self.worker_id)
+
+    def free_slots(self) -> dict[str, int]:
+        with self._lock:
+            return {job_class: self.sizes[job_class] - len(jobs) for job_class, jobs in self._inflight.items()}
+
+    def _claim(self) -> list[dict]:
+        from workers.registry import job_types_in
+
+        claimed_all = []
+        for job_class, free in self.free_slots().items():
+            job_types = job_types_in(job_class)
+            if free <= 0 or not job_types:
+                continue
+            with Session(sync_engine) as session:
+                claimed = claim_jobs(session, self.worker_id, free, self.visibility_timeout, job_types)
+            for job in claimed:
+                future = self.executor.run_claimed(job, self.worker_id, self.visibility_timeout)
+                with self._lock:
+                    self._inflight[job_class][job["id"]] = future
+                future.add_done_callback(
+                    lambda _f, job_class=job_class, job_id=job["id"]: self._on_done(job_class, job_id)
+                )
+            claimed_all.extend(claimed)
+        return claimed_all
+
+    def _on_done(self, job_class: str, job_id: str) -> None:
+        with self._lock:
+            self._inflight[job_class].pop(job_id, None)
+        self._wake.set()
+
+
+def queue_metrics(session: Session, window_minutes: int = 15) -> dict:
+    """Per-class queue length and wait time, plus this process's pools.
+
+    Wait is started_at - run_after for jobs claimed in the last
+    `window_minutes`: time a due job sat in the queue before a worker took it.
+    """
+    from workers.registry import JOB_CLASSES, job_types_in
+
+    now = datetime.utcnow()
+    since = now - timedelta(minutes=window_minutes)
+    counts = session.exec(
+        select(JobRecord.job_type, JobRecord.status, func.count(), func.min(JobRecord.run_after))
+        .where(JobRecord.status.in_(["pending", "processing"]))
+        .group_by(JobRecord.job_type, JobRecord.status)
+    ).all()
+    started = session.exec(
+        select(JobRecord.job_type, JobRecord.run_after, JobRecord.started_at)
+        .where(JobRecord.started_at >= since)
+    ).all()
+
+    classes = {}
+    for job_class in JOB_CLASSES:
+        job_types = set(job_types_in(job_class))
+        pending = processing = 0
+        oldest_due = None
+        for job_type, status, count, min_run_after in counts:
+            if job_type not in job_types:
+                continue
+            if status == "processing":
+                processing += count
+            else:
+                pending += count
+                if min_run_after <= now and (oldest_due is None or min_run_after < oldest_due):
+                    oldest_due = min_run_after
+        waits = sorted(
+            max((started_at - run_after).total_seconds(), 0.0)
+            for job_type, run_after, started_at in started
+            if job_type in job_types
+        )
+        classes[job_class] = {
+            "pending": pending,
+            "processing": processing,
+            "max_depth": max_queue_depth(job_class),
+            "oldest_due_seconds": round((now - oldest_due).total_seconds(), 1) if oldest_due else 0.0,
+            "wait_seconds": {
+                "count": len(waits),
+                "avg": round(sum(waits) / len(waits), 2) if waits else 0.0,
+                "p95": round(waits[min(int(len(waits) * 0.95), len(waits) - 1)], 2) if waits else 0.0,
+                "max": round(waits[-1], 2) if waits else 0.0,
+            },
+        }
+
+    local_pools = []
+    for worker in _local_workers:
+        free = worker.free_slots()
+        local_pools.append({
+            "worker_id": worker.worker_id,
+            "pools": {
+                job_class: {"size": size, "busy": size - free[job_class]}
+                for job_class, size in worker.sizes.items()
+            },
+        })
+    return {"window_minutes": window_minutes, "classes": classes, "local_workers": local_pools}
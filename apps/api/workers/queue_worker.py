@@ -0,0 +1,38 @@
+"""Standalone job queue worker.
+
+Run: python -m workers.queue_worker [--concurrency N] [--pool thread|process]
+Scale by running more processes; they coordinate through job_records.
+"""
+
+import argparse
+import logging
+import signal
+
+from config import settings
+from workers.queue import QueueWorker
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run background jobs from job_records")
+    parser.add_argument("--concurrency", type=int, default=settings.job_queue_worker_concurrency,
+                        help="LLM job pool size; PDF and maintenance pools come from settings")
+    parser.add_argument("--pool", choices=("thread", "process"), default=settings.job_queue_worker_pool)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=settings.log_level)
+    worker = QueueWorker(concurrency=args.concurrency, pool=args.pool)
+
+    def _shutdown(signum, frame):
+        logging.getLogger(__name__).info("Received signal %s, draining", signum)
+        worker.request_stop()
+
+    signal.signal(signal.SIGTERM, _shutdown)
+    signal.signal(signal.SIGINT, _shutdown)
+
+    worker.run_forever()
+    # Let in-flight jobs finish before exiting
+    worker.stop(wait=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Registry of background task functions.
+
+A task is a plain function ``fn(session, job_id, **payload) -> dict`` that
+does its work on the given sync Session and returns the job result. It
+raises on failure; job status, retries and commits are handled by the
+runner in workers/queue.py, whichever executor dispatched the job.
+
+Each task belongs to a job class (LLM-bound, PDF rendering, DB maintenance).
+Classes get separate bounded pools and queue-depth limits, so a burst of one
+kind of work cannot starve the others.
+"""
+
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Optional
+
+PROMPTS_DIR = Path(__file__).parent.parent / "prompts"
+
+JOB_CLASSES = ("llm", "pdf", "maintenance")
+
+
+class PermanentJobError(Exception):
+    """Raised by a task when retrying cannot help (missing rows, bad input)."""
+
+
+@dataclass(frozen=True)
+class Task:
+    name: str
+    fn: Callable[..., dict]
+    job_class: str = "llm"
+    # Best-effort cleanup after a failed attempt, run on a fresh transaction
+    on_failure: Optional[Callable[..., None]] = None
+
+
+TASKS: dict[str, Task] = {}
+
+
+def task(name: str, job_class: str = "llm", on_failure: Optional[Callable[..., None]] = None):
+    if job_class not in JOB_CLASSES:
+        raise ValueError(f"Unknown job class: {job_class}")
+
+    def decorator(fn: Callable[..., dict]) -> Callable[..., dict]:
+        TASKS[name] = Task(name=name, fn=fn, job_class=job_class, on_failure=on_failure)
+        return fn
+    return decorator
+
+
+def _load_tasks() -> None:
+    import workers.jobs  # noqa: F401 — registers tasks on import
+
+
+def get_task(name: str) -> Optional[Task]:
+    _load_tasks()
+    return TASKS.get(name)
+
+
+def job_class_of(job_type: str) -> str:
+    """The class a job type runs in; unknown types go to "llm", where the
+    runner fails them."""
+    task = get_task(job_type)
+    return task.job_class if task else "llm"
+
+
+def job_types_in(job_class: str) -> list[str]:
+    _load_tasks()
+    return [name for name, t in TASKS.items() if t.job_class == job_class]
+
+
+def read_prompt(name: str) -> str:
+    return (PROMPTS_DIR / name).read_text()
+
@@ -1275,6 +1275,7 @@ export default function PublicReviewPage() {
                       .diff-add { background-color: #dcfce7; color: #166534; }
                       .diff-remove { background-color: #fef2f2; color: #991b1b; text-decoration: line-through; }
                       .diff-context { color: #6b7280; }
+                      .diff-words { color: #334155; white-space: pre-wrap; margin-bottom: 0.75rem; }
                       .diff-header { color: #6b7280; font-weight: bold; }
                       .diff-hunk { color: #7c3aed; font-weight: 600; }
                     `}</style>
@@ -247,8 +247,8 @@ export const publicApi = {
       method: "POST",
       headers: { "Content-Type": "application/json" },
     }).then(r => { if (!r.ok) throw new Error("Failed to accept terms"); return r.json(); }),
-  getVersionDiff: (token: string, versionId: string, against: string = "prev") =>
-    fetch(`${API_URL}/public/review/${token}/versions/${versionId}/diff?against=${against}`)
+  getVersionDiff: (token: string, versionId: string, against: string = "prev", mode: "line" | "word" = "word") =>
+    fetch(`${API_URL}/public/review/${token}/versions/${versionId}/diff?against=${against}&mode=${mode}`)
       .then(r => { if (!r.ok) throw new Error("Failed to load diff"); return r.json(); }),
   getChangesSummary: (token: string) =>
     fetch(`${API_URL}/public/review/${token}/changes-summary`)